@@ -0,0 +1,269 @@
+import re
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+
+# ==========================================
+# 地址正規化 / 標準化 (臺東縣)
+# ==========================================
+# 比對頁面、批次比對與 OCR 比對模組共用的地址規則：
+#   1. 全形轉半形 (NFKC)、台→臺、去除空白與標點
+#   2. 段 / 巷 / 弄 / 號 / 樓 / 鄰 前的國字數字轉為阿拉伯數字 (一段 -> 1段)
+#   3. 去除郵遞區號、縣市名稱，拆出鄉鎮市名稱 (字典比對)
+#   4. 拆解為結構化欄位，以「鄉鎮 + 路段巷弄號樓」組成標準鍵 (20號之1 與 20之1號 視為相同)
+# 兩個地址都寫了鄉鎮時鄉鎮必須相同 (不同鄉鎮常有同名道路)；
+# 只有一方未寫鄉鎮時，才退回不含鄉鎮的鍵比對。結果以 LRU 快取。
+
+# 縣市名稱 (去除用)
+COUNTY_NAMES = (
+    "臺東縣", "花蓮縣", "屏東縣", "高雄市", "臺北市", "新北市", "桃園市", "臺中市", "臺南市",
+    "基隆市", "新竹市", "新竹縣", "苗栗縣", "彰化縣", "南投縣", "雲林縣", "嘉義市", "嘉義縣",
+    "宜蘭縣", "澎湖縣", "金門縣", "連江縣",
+)
+
+# 臺東縣鄉鎮市 (去除用)
+TAITUNG_TOWNSHIPS = (
+    "臺東市", "成功鎮", "關山鎮", "卑南鄉", "大武鄉", "太麻里鄉", "東河鄉", "長濱鄉",
+    "鹿野鄉", "池上鄉", "綠島鄉", "延平鄉", "海端鄉", "達仁鄉", "金峰鄉", "蘭嶼鄉",
+)
+
+# 國字數字
+_CN_DIGITS = {'零': 0, '〇': 0, '一': 1, '二': 2, '兩': 2, '三': 3, '四': 4,
+              '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+_CN_UNITS = {'十': 10, '百': 100, '千': 1000}
+
+_CN_NUMBER_PATTERN = re.compile(r"([零〇一二兩三四五六七八九十百千]+)(?=段|巷|弄|號|樓|鄰|之)")
+_CN_AFTER_ZHI_PATTERN = re.compile(r"(?<=之)([零〇一二兩三四五六七八九十百千]+)")
+_POSTAL_CODE_PATTERN = re.compile(r"^\d{3,6}")
+_NUMBER_SUFFIX_PATTERN = re.compile(r"^(\d+)號之(\d+)$")
+_REMOVE_PATTERN = re.compile(r"[\s,，、.。()（）\[\]【】\"'“”‘’]")
+
+_COUNTY_PATTERN = re.compile("^(?:" + "|".join(COUNTY_NAMES) + ")")
+_TOWNSHIP_PATTERN = re.compile("^(?:" + "|".join(sorted(TAITUNG_TOWNSHIPS, key=len, reverse=True)) + ")")
+
+_ADDRESS_PATTERN = re.compile(
+    r"^(?P<village>[一-鿿]{1,3}[村里](?=\d+鄰|[^\d]{2,}?(?:大道|路|街)))?"
+    r"(?P<neighborhood>\d+鄰)?"
+    r"(?P<road>[^\d]+?(?:大道|路|街))?"
+    r"(?P<section>\d+段)?"
+    r"(?P<lane>\d+巷)?"
+    r"(?P<alley>\d+弄)?"
+    r"(?P<number>\d+(?:之\d+)?號(?:之\d+)?)?"
+    r"(?P<floor>(?:\d+|B\d+)樓(?:之\d+)?)?"
+    r"(?P<extra>.*)$"
+)
+
+AddressParts = namedtuple(
+    "AddressParts",
+    ["county", "township", "village", "neighborhood", "road", "section",
+     "lane", "alley", "number", "floor", "extra"]
+)
+
+# 組成標準鍵的欄位 (鄉鎮另外處理，縣市不列入：臺東縣內的鄉鎮名稱不重複)
+KEY_FIELDS = ("road", "section", "lane", "alley", "number", "floor")
+
+
+def chinese_to_int(text):
+    """
+    國字數字轉整數 (支援「二十三」、「一百零五」與逐字的「一二三」)
+
+    Args:
+        text (str): 國字數字
+
+    Returns:
+        int: 數值；無法轉換時回傳 None
+    """
+    if not text:
+        return None
+    if not any(ch in _CN_UNITS for ch in text):
+        if all(ch in _CN_DIGITS for ch in text):
+            return int("".join(str(_CN_DIGITS[ch]) for ch in text))
+        return None
+
+    total = 0
+    current = 0
+    for ch in text:
+        if ch in _CN_DIGITS:
+            current = _CN_DIGITS[ch]
+        elif ch in _CN_UNITS:
+            total += (current or 1) * _CN_UNITS[ch]
+            current = 0
+        else:
+            return None
+    return total + current
+
+
+def _replace_cn_number(match):
+    value = chinese_to_int(match.group(1))
+    return str(value) if value is not None else match.group(1)
+
+
+@lru_cache(maxsize=16384)
+def normalize_address_text(addr):
+    """
+    地址文字正規化 (保留縣市與鄉鎮)
+
+    Args:
+        addr (str): 原始地址
+
+    Returns:
+        str: 全形轉半形、台→臺、去除空白標點、國字數字轉換後的地址
+    """
+    if not addr:
+        return ""
+    text = unicodedata.normalize('NFKC', str(addr))
+    text = _REMOVE_PATTERN.sub("", text).replace("台", "臺").replace("-", "之")
+    text = _CN_NUMBER_PATTERN.sub(_replace_cn_number, text)
+    text = _CN_AFTER_ZHI_PATTERN.sub(_replace_cn_number, text)
+    return text
+
+
+@lru_cache(maxsize=16384)
+def parse_address(addr):
+    """
+    拆解地址為結構化欄位
+
+    Args:
+        addr (str): 原始地址
+
+    Returns:
+        AddressParts: 各欄位 (沒有的欄位為空字串)
+    """
+    text = _POSTAL_CODE_PATTERN.sub("", normalize_address_text(addr))
+
+    county = ""
+    match = _COUNTY_PATTERN.match(text)
+    if match:
+        county = match.group(0)
+        text = text[match.end():]
+
+    township = ""
+    match = _TOWNSHIP_PATTERN.match(text)
+    if match:
+        township = match.group(0)
+        text = text[match.end():]
+
+    parts = _ADDRESS_PATTERN.match(text).groupdict(default="")
+    # 「20號之1」統一為「20之1號」
+    parts['number'] = _NUMBER_SUFFIX_PATTERN.sub(r"\1之\2號", parts['number'])
+    return AddressParts(county=county, township=township, **parts)
+
+
+@lru_cache(maxsize=16384)
+def address_key(addr, include_township=True):
+    """
+    地址標準鍵 (鄉鎮 + 路段巷弄號樓)
+
+    沒有路名時 (鄉間地址常為「村 + 鄰 + 號」)，以去除縣市鄉鎮後的全文作為鍵。
+
+    Args:
+        addr (str): 原始地址
+        include_township (bool): 是否加上鄉鎮市 (地址有寫時)；
+            另一方地址未寫鄉鎮時傳入 False，只比路段門牌
+
+    Returns:
+        str: 標準鍵；空地址回傳空字串
+    """
+    parts = parse_address(addr)
+    if parts.road:
+        key = "".join(getattr(parts, f) for f in KEY_FIELDS) + parts.extra
+    else:
+        key = "".join(parts[2:])
+    if include_township and parts.township:
+        key = parts.township + key
+    return key
+
+
+def comparable_keys(addr1, addr2):
+    """
+    兩個地址可互相比較的標準鍵
+
+    兩者都寫了鄉鎮時含鄉鎮 (不同鄉鎮的同名道路不會相同)；任一方未寫鄉鎮時都不含鄉鎮。
+
+    Returns:
+        tuple: (地址 1 的鍵, 地址 2 的鍵)
+    """
+    both = bool(parse_address(addr1).township and parse_address(addr2).township)
+    return address_key(addr1, include_township=both), address_key(addr2, include_township=both)
+
+
+def building_key(addr):
+    """門牌鍵 (不含樓層)：同一棟建築的不同樓層視為相同"""
+    parts = parse_address(addr)
+    if parts.road:
+        return "".join(getattr(parts, f) for f in KEY_FIELDS if f != "floor")
+    return parts.village + parts.neighborhood + parts.number
+
+
+def addresses_match(addr1, addr2):
+    """
+    比較兩個地址
+
+    Returns:
+        str: "exact" (標準鍵相同)、"building" (門牌相同、樓層不同或缺漏)，否則 None
+        (兩者都寫了鄉鎮但不同時為 None)
+    """
+    key1, key2 = comparable_keys(addr1, addr2)
+    if not key1 or not key2:
+        return None
+    if key1 == key2:
+        return "exact"
+    township1, township2 = parse_address(addr1).township, parse_address(addr2).township
+    if township1 and township2 and township1 != township2:
+        return None
+    building1 = building_key(addr1)
+    if building1 and building1 == building_key(addr2):
+        return "building"
+    return None
+
+
+class AddressIndex:
+    """
+    地址索引 (列管資料預先建立)
+
+    以不含鄉鎮的標準鍵分桶，查詢時再排除鄉鎮不同的列 (任一方未寫鄉鎮時不排除)。
+    """
+
+    def __init__(self, addresses):
+        """
+        Args:
+            addresses (iterable): 依列順序的地址
+        """
+        self._rows = {}       # 不含鄉鎮的標準鍵 -> [(列位置, 鄉鎮)]
+        for pos, addr in enumerate(addresses):
+            key = address_key(addr, include_township=False) if isinstance(addr, str) else ""
+            if key:
+                self._rows.setdefault(key, []).append((pos, parse_address(addr).township))
+
+    def __len__(self):
+        return sum(len(rows) for rows in self._rows.values())
+
+    def lookup(self, addr):
+        """
+        找出地址相同的列
+
+        Args:
+            addr (str): 查詢地址
+
+        Returns:
+            list: 列位置 (依列順序)
+        """
+        key = address_key(addr, include_township=False) if addr else ""
+        if not key:
+            return []
+        township = parse_address(addr).township
+        return [pos for pos, row_township in self._rows.get(key, ())
+                if not township or not row_township or row_township == township]
+
+
+def build_address_index(addresses):
+    """
+    以標準鍵建立地址索引 (列管資料預先建立)
+
+    Args:
+        addresses (iterable): 依列順序的地址
+
+    Returns:
+        AddressIndex: lookup(地址) 回傳列位置
+    """
+    return AddressIndex(addresses)
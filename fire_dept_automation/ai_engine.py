@@ -4,6 +4,8 @@ import re
 import base64
 import pandas as pd
 from pathlib import Path
+import config_loader as cfg
+from ocr_system.llm_corrector import build_json_schema, parse_json_response, coerce_to_schema
 
 # Ollama API 設定
 OLLAMA_CHAT_URL = "http://localhost:11434/api/chat"
@@ -340,24 +342,9 @@ def analyze_document_structure(pdf_images_or_path, model=DEFAULT_VISION_MODEL):
         # Step 3 & 4: 交叉比對 & 生成報告
         print("\n✅ Step 3 & 4: 正在進行交叉比對並生成報告...")
         
-        report_data = []
-        for item in result['required_items']:
-            # 判定規則: 在 page_map 中尋找包含該項目名稱的頁面
-            found_pages = []
-            for page_num, doc_type in result['page_map'].items():
-                # 模糊匹配 (例如 "滅火器" 應該匹配 "滅火器檢查表")
-                if item in doc_type or doc_type in item:
-                    found_pages.append(page_num)
-            
-            status = "✅ 合規" if found_pages else "❌ 缺件"
-            page_list = ", ".join([f"第{p}頁" for p in found_pages]) if found_pages else "-"
-            
-            report_data.append({
-                '應檢附項目': item,
-                '是否勾選': '✓',
-                '實際頁數': page_list,
-                '狀態': status
-            })
+        # 判定規則: 在 page_map 中尋找包含該項目名稱的頁面 (頁面分類反向索引)
+        import page_classifier
+        report_data = page_classifier.check_integrity(result['required_items'], result['page_map'])
         
         result['validation_report'] = pd.DataFrame(report_data)
         
@@ -369,134 +356,377 @@ def analyze_document_structure(pdf_images_or_path, model=DEFAULT_VISION_MODEL):
         print(f"❌ 分析過程發生錯誤: {e}")
         return result
 
-def analyze_page_with_ai(text_content, model=DEFAULT_TEXT_MODEL):
+def vision_result_to_json(result):
     """
-    使用 AI 分析單頁內容 (基於文字的 OCR 結果)
-    
+    Vision AI 分析結果 -> 可 JSON 序列化的 dict (儲存至 case_analysis.vision_analysis)
+
     Args:
-        text_content (str): OCR 辨識出的文字
-        model (str): 使用的模型名稱
-        
+        result (dict): analyze_document_structure() 的回傳值
+
     Returns:
-        dict: AI 分析結果
+        dict: validation_report 轉為 records 列表
     """
-    if not text_content.strip():
-        return {"error": "No text content"}
+    data = dict(result)
+    report = data.get('validation_report')
+    if isinstance(report, pd.DataFrame):
+        data['validation_report'] = report.to_dict('records')
+    return data
 
-    prompt = f"""你是一個專業的消防安全檢查員。請從以下 OCR 文字中提取關鍵資訊。
-    
-    OCR 文字:
-    ----------------
-    {text_content}
-    ----------------
-    
-    📌 **核心規則（最高優先級 - 必須嚴格遵守）**：
-    
-    ⚠️ **勾選符號識別規則（這是最重要的規則！）**：
-    1. 在目錄頁（「消防安全設備檢修申報書目錄」）中，每個設備前面都有方框
-    2. **主要判斷依據：方框內有打勾（✓、☑、√、✔、■、●）的項目**
-    3. **💡 頁碼判斷法 (最準確的方法！)**：
-       - 在目錄頁中，每個設備項目後面會有頁碼（如 "2-1", "2-13", "2-24"）
-       - **如果設備名稱後面有頁碼，就表示該設備已勾選並有相應的檢查表**
-       - 例如：「滅火器檢查表 2-1」→ 滅火器已勾選
-       - 例如：「室內消防栓設備檢查表 2-2」→ 室內消防栓設備已勾選
-       - **如果設備名稱後面沒有頁碼，表示該設備未勾選**
+
+def vision_result_from_json(data):
+    """
+    儲存的 Vision AI 分析結果 -> 與 analyze_document_structure() 相同格式
+
+    Args:
+        data (dict): vision_result_to_json() 的輸出 (經 JSON 往返，頁碼鍵為字串)
+
+    Returns:
+        dict: page_map 頁碼還原為 int，validation_report 還原為 DataFrame
+    """
+    result = dict(data)
+    result['page_map'] = {int(k): v for k, v in (data.get('page_map') or {}).items()}
+    report = data.get('validation_report')
+    result['validation_report'] = pd.DataFrame(report) if report is not None else None
+    return result
+
+# ==========================================
+# 分析 Prompt (固定前綴 + OCR 文字)
+# ==========================================
+# 注意：前綴必須在每次呼叫時完全相同 (byte-identical)，
+# Ollama 才能重用已計算的 KV Cache，只需處理後面變動的 OCR 文字。
+# OCR 文字一律放在最後，請勿在前綴中插入任何動態內容。
+ANALYZE_PAGE_PROMPT_PREFIX = """你是一個專業的消防安全檢查員。請從文末的 OCR 文字中提取關鍵資訊。
+
+📌 **核心規則（最高優先級 - 必須嚴格遵守）**：
+
+⚠️ **勾選符號識別規則（這是最重要的規則！）**：
+1. 在目錄頁（「消防安全設備檢修申報書目錄」）中，每個設備前面都有方框
+2. **主要判斷依據：方框內有打勾（✓、☑、√、✔、■、●）的項目**
+3. **💡 頁碼判斷法 (最準確的方法！)**：
+   - 在目錄頁中，每個設備項目後面會有頁碼（如 "2-1", "2-13", "2-24"）
+   - **如果設備名稱後面有頁碼，就表示該設備已勾選並有相應的檢查表**
+   - 例如：「滅火器檢查表 2-1」→ 滅火器已勾選
+   - 例如：「室內消防栓設備檢查表 2-2」→ 室內消防栓設備已勾選
+   - **如果設備名稱後面沒有頁碼，表示該設備未勾選**
+
+✅ **正確範例**（應該提取）：
+- "☑ 滅火器檢查表 2-1" → 提取 "滅火器"
+- "室內消防栓設備檢查表 2-2" → 提取 "室內消防栓設備" (有頁碼)
+- "火警自動警報設備檢查表 2-13" → 提取 "火警自動警報設備"
+- "緊急廣播設備檢查表 2-14" → 提取 "緊急廣播設備"
+- "標示設備檢查表 2-17" → 提取 "標示設備"
+- "避難器具檢查表 2-18" → 提取 "避難器具"
+- "緊急照明設備檢查表 2-19" → 提取 "緊急照明設備"
+- "配線檢查表 2-24" → 提取 "配線"
+
+❌ **錯誤範例**（絕對不要提取）：
+- "☐ 室外消防栓設備" → **不提取**（明確的空白方框）
+- "□ 排煙設備" → **不提取**（無頁碼）
+- "連結送水管" → **不提取**（無頁碼，無勾選）
+
+💡 **實際案例**：
+如果 OCR 文字顯示：
+```
+滅火器檢查表 2-1
+室內消防栓設備檢查表 2-2
+□ 室外消防栓設備
+火警自動警報設備檢查表 2-13
+緊急廣播設備檢查表 2-14
+□ 排煙設備
+標示設備檢查表 2-17
+避難器具檢查表 2-18
+緊急照明設備檢查表 2-19
+配線檢查表 2-24
+```
+正確的 equipment_list 應該是：["滅火器", "室內消防栓設備", "火警自動警報設備", "緊急廣播設備", "標示設備", "避難器具", "緊急照明設備", "配線"]
+(室外消防栓和排煙設備沒有頁碼，所以不提取)
+
+---
+
+請提取以下欄位並以 JSON 格式回傳。
+
+⚠️ **其他重要規則**：
+0. **強制使用繁體中文**：所有輸出必須使用台灣繁體中文，嚴禁使用簡體字（例如：「台東」而非「台东」、「綱」而非「纲」）。
+1. **去除所有空格**：所有輸出的值都必須去除所有空格 (例如 "鳳 仙" -> "鳳仙")。
+2. **單一字串**：地址和管理權人必須是單一字串，嚴禁使用巢狀 JSON (例如不要回傳 {'city': ...})。
+3. **OCR 容錯**：OCR 可能有錯字、缺字、多字或空格問題，請使用模糊比對，相似度 80% 以上即可接受。
+
+欄位說明：
+1. document_type: 文件類型
+2. place_name: 場所名稱 (去除空格)
+3. address: 地址 (完整地址字串，去除空格)
+4. management_person: 管理權人 (姓名字串，去除空格)
+5. phone_number: 電話號碼 (去除空格，保留區碼和分機，例如：「(089)322112」→「089-322112」，「(089)3221123#457」→「089-3221123#457」)
+6. equipment_list: 消防設備列表 (Array，每個項目也要去除空格)
+
+📋 **標準設備清單** (請優先從以下清單中比對，使用模糊比對):
+- 滅火器
+- 室內消防栓設備
+- 室外消防栓設備
+- 自動撒水設備
+- 水霧滅火設備
+- 泡沫滅火設備
+- 二氧化碳滅火設備
+- 乾粉滅火設備
+- 海龍滅火設備(含海龍替代品)
+- 火警自動警報設備
+- 瓦斯漏氣火警自動警報設備
+- 緊急廣播設備
+- 標示設備
+- 避難器具
+- 緊急照明設備
+- 連結送水管
+- 消防專用蓄水池
+- 排煙設備
+- 無線電通信輔助設備
+
+🔍 **模糊比對規則**：
+- OCR 可能將「內」識別為「内」、「栓」識別為「拴」
+- 可能有多餘空格：「室 內 消 防 栓」-> 「室內消防栓設備」
+- 可能缺少「設備」二字：「室內消防栓」-> 「室內消防栓設備」
+- 簡體轉繁體：「灭火器」-> 「滅火器」
+- 全形轉半形：「(含海龍替代品)」-> 「(含海龍替代品)」
+
+OCR 輸入: "室 内 消 防 拴"
+正確輸出: "室內消防栓設備"
+
+OCR 輸入: "火警自動警報"
+正確輸出: "火警自動警報設備"
+
+如果找不到欄位，請填 null。只回傳 JSON，不要有其他文字。
+
+OCR 文字:
+----------------
+"""
+ANALYZE_PAGE_PROMPT_SUFFIX = "\n----------------\n"
+
+# 預設 OCR 文字 token 預算 (可於 config.toml 的 [ai] prompt_token_budget 調整)
+DEFAULT_PROMPT_TOKEN_BUDGET = 1200
+
+# 欄位標籤關鍵字 (命中即視為基本資料行)
+FIELD_LABEL_KEYWORDS = [
+    "場所名稱", "場所地址", "場所電話", "管理權人", "姓名", "地址", "電話",
+    "申報項目", "檢修項目"
+]
+
+# 目錄頁關鍵字 (與設備行同一優先順序，避免目錄的每一行都擠掉基本資料)
+TOC_LINE_KEYWORDS = ["目錄", "檢查表"]
+
+# 勾選 / 空白方框符號 (目錄頁的設備行)
+CHECKBOX_MARKERS = "✓☑√✔☒▣■●✅☐□▢▫▪"
+
+_KEY_VALUE_PATTERN = re.compile(r"^[^:：]{0,8}[:：]\s*\S")
+# 只有標籤、值被 OCR 拆到下一行 (例如 "場所地址：" / "臺東市...")
+_LABEL_ONLY_PATTERN = re.compile("(" + "|".join(FIELD_LABEL_KEYWORDS) + ")[:：|]?$")
+_TOC_PAGE_NO_PATTERN = re.compile(r"\d+\s*[-－]\s*\d+")
+_MEANINGFUL_CHAR_PATTERN = re.compile(r"[\u4e00-\u9fffA-Za-z0-9]")
+_CJK_CHAR_PATTERN = re.compile(r"[^\x00-\x7f]")
+
+def get_prompt_token_budget():
+    """讀取 config.toml 中的 prompt token 預算"""
+    return cfg.CONFIG.get("ai", {}).get("prompt_token_budget", DEFAULT_PROMPT_TOKEN_BUDGET)
+
+def estimate_tokens(text):
+    """
+    粗估文字的 token 數量
     
-    ✅ **正確範例**（應該提取）：
-    - "☑ 滅火器檢查表 2-1" → 提取 "滅火器"
-    - "室內消防栓設備檢查表 2-2" → 提取 "室內消防栓設備" (有頁碼)
-    - "火警自動警報設備檢查表 2-13" → 提取 "火警自動警報設備"
-    - "緊急廣播設備檢查表 2-14" → 提取 "緊急廣播設備"
-    - "標示設備檢查表 2-17" → 提取 "標示設備"
-    - "避難器具檢查表 2-18" → 提取 "避難器具"
-    - "緊急照明設備檢查表 2-19" → 提取 "緊急照明設備"
-    - "配線檢查表 2-24" → 提取 "配線"
+    中文字 (非 ASCII) 約 1 字 1 token，英數約 4 字元 1 token。
+    僅用於預算控制，不需精準。
+    """
+    if not text:
+        return 0
+    non_ascii = len(_CJK_CHAR_PATTERN.findall(text))
+    ascii_count = len(text) - non_ascii
+    return non_ascii + (ascii_count + 3) // 4
+
+def _equipment_keywords(equipment_list=None):
+    """取得設備關鍵字 (含去除「設備」二字的簡稱)"""
+    if equipment_list is None:
+        from utils import VALID_EQUIPMENT_LIST
+        equipment_list = VALID_EQUIPMENT_LIST
+    keywords = set()
+    for item in equipment_list:
+        keywords.add(item)
+        short = item.replace("設備", "")
+        if len(short) >= 2:
+            keywords.add(short)
+    return keywords
+
+def _classify_prompt_line(clean_line, equipment_keywords):
+    """
+    判斷單行 OCR 文字的保留優先順序
     
-    ❌ **錯誤範例**（絕對不要提取）：
-    - "☐ 室外消防栓設備" → **不提取**（明確的空白方框）
-    - "□ 排煙設備" → **不提取**（無頁碼）
-    - "連結送水管" → **不提取**（無頁碼，無勾選）
+    Returns:
+        int or None: 0 = 基本資料行，1 = 設備 / 目錄行，None = 雜訊 (捨棄)
+    """
+    if clean_line.startswith("---"):
+        return 0  # 分頁標記 (例如 "--- (以下為目錄頁內容) ---")
     
-    💡 **實際案例**：
-    如果 OCR 文字顯示：
-    ```
-    滅火器檢查表 2-1
-    室內消防栓設備檢查表 2-2
-    □ 室外消防栓設備
-    火警自動警報設備檢查表 2-13
-    緊急廣播設備檢查表 2-14
-    □ 排煙設備
-    標示設備檢查表 2-17
-    避難器具檢查表 2-18
-    緊急照明設備檢查表 2-19
-    配線檢查表 2-24
-    ```
-    正確的 equipment_list 應該是：["滅火器", "室內消防栓設備", "火警自動警報設備", "緊急廣播設備", "標示設備", "避難器具", "緊急照明設備", "配線"]
-    (室外消防栓和排煙設備沒有頁碼，所以不提取)
+    meaningful = len(_MEANINGFUL_CHAR_PATTERN.findall(clean_line))
+    if meaningful < 2 or meaningful / len(clean_line) < 0.5:
+        return None
     
-    ---
+    if any(kw in clean_line for kw in FIELD_LABEL_KEYWORDS) or _KEY_VALUE_PATTERN.match(clean_line):
+        return 0
+    if any(kw in clean_line for kw in equipment_keywords) or any(kw in clean_line for kw in TOC_LINE_KEYWORDS):
+        return 1
+    if any(marker in clean_line for marker in CHECKBOX_MARKERS) or _TOC_PAGE_NO_PATTERN.search(clean_line):
+        return 1
+    return None
+
+def compact_ocr_text(text_content, token_budget=None, equipment_list=None):
+    """
+    精簡 OCR 文字以降低 LLM 的 prompt 長度
     
-    請提取以下欄位並以 JSON 格式回傳。
+    - 去除雜訊行 (符號、過短的殘字)
+    - 只保留欄位標籤行 (場所名稱、地址、管理權人...) 與設備 / 目錄行；
+      只有標籤的行，下一行 (標籤的值) 視為基本資料行
+    - 依優先順序 (基本資料 > 設備、目錄) 填入，直到用完 token 預算
+    - 保留行的原始順序
     
-    ⚠️ **其他重要規則**：
-    0. **強制使用繁體中文**：所有輸出必須使用台灣繁體中文，嚴禁使用簡體字（例如：「台東」而非「台东」、「綱」而非「纲」）。
-    1. **去除所有空格**：所有輸出的值都必須去除所有空格 (例如 "鳳 仙" -> "鳳仙")。
-    2. **單一字串**：地址和管理權人必須是單一字串，嚴禁使用巢狀 JSON (例如不要回傳 {{'city': ...}})。
-    3. **OCR 容錯**：OCR 可能有錯字、缺字、多字或空格問題，請使用模糊比對，相似度 80% 以上即可接受。
+    Args:
+        text_content (str): OCR 文字 (可含多頁)
+        token_budget (int): token 預算 (None = 使用 config.toml 設定)
+        equipment_list (list): 標準設備清單 (None = utils.VALID_EQUIPMENT_LIST)
+        
+    Returns:
+        str: 精簡後的文字
+    """
+    if token_budget is None:
+        token_budget = get_prompt_token_budget()
     
-    欄位說明：
-    1. document_type: 文件類型
-    2. place_name: 場所名稱 (去除空格)
-    3. address: 地址 (完整地址字串，去除空格)
-    4. management_person: 管理權人 (姓名字串，去除空格)
-    5. phone_number: 電話號碼 (去除空格，保留區碼和分機，例如：「(089)322112」→「089-322112」，「(089)3221123#457」→「089-3221123#457」)
-    6. equipment_list: 消防設備列表 (Array，每個項目也要去除空格)
-
-    📋 **標準設備清單** (請優先從以下清單中比對，使用模糊比對):
-    - 滅火器
-    - 室內消防栓設備
-    - 室外消防栓設備
-    - 自動撒水設備
-    - 水霧滅火設備
-    - 泡沫滅火設備
-    - 二氧化碳滅火設備
-    - 乾粉滅火設備
-    - 海龍滅火設備(含海龍替代品)
-    - 火警自動警報設備
-    - 瓦斯漏氣火警自動警報設備
-    - 緊急廣播設備
-    - 標示設備
-    - 避難器具
-    - 緊急照明設備
-    - 連結送水管
-    - 消防專用蓄水池
-    - 排煙設備
-    - 無線電通信輔助設備
+    equipment_keywords = _equipment_keywords(equipment_list)
+    candidates = []  # (priority, index, line)
+    after_label = False
+    for index, line in enumerate(text_content.split("\n")):
+        clean_line = line.replace(" ", "").replace("\u3000", "").strip()
+        if not clean_line:
+            continue
+        priority = _classify_prompt_line(clean_line, equipment_keywords)
+        if after_label and _MEANINGFUL_CHAR_PATTERN.search(clean_line):
+            priority = 0
+        after_label = priority == 0 and _LABEL_ONLY_PATTERN.search(clean_line) is not None
+        if priority is not None:
+            candidates.append((priority, index, clean_line))
     
-    🔍 **模糊比對規則**：
-    - OCR 可能將「內」識別為「内」、「栓」識別為「拴」
-    - 可能有多餘空格：「室 內 消 防 栓」-> 「室內消防栓設備」
-    - 可能缺少「設備」二字：「室內消防栓」-> 「室內消防栓設備」
-    - 簡體轉繁體：「灭火器」-> 「滅火器」
-    - 全形轉半形：「(含海龍替代品)」-> 「(含海龍替代品)」
+    # 依優先順序填入預算 (同優先順序保持原順序)
+    kept = []
+    used = 0
+    for priority, index, line in sorted(candidates):
+        cost = estimate_tokens(line) + 1  # +1 為換行
+        if used + cost > token_budget:
+            continue
+        kept.append((index, line))
+        used += cost
     
-    OCR 輸入: "室 内 消 防 拴"
-    正確輸出: "室內消防栓設備"
+    if not kept:
+        # 全部被判定為雜訊時，退回原文並截斷至預算內
+        fallback = text_content.strip()
+        while fallback and estimate_tokens(fallback) > token_budget:
+            fallback = fallback[:int(len(fallback) * 0.8)]
+        return fallback
     
-    OCR 輸入: "火警自動警報"
-    正確輸出: "火警自動警報設備"
+    kept.sort()
+    return "\n".join(line for _, line in kept)
 
-    如果找不到欄位，請填 null。只回傳 JSON，不要有其他文字。
+def build_analysis_prompt(text_content, token_budget=None, equipment_list=None):
     """
+    組合分析用 prompt：固定前綴 + 精簡後的 OCR 文字
     
+    Args:
+        text_content (str): OCR 文字
+        token_budget (int): OCR 文字的 token 預算
+        equipment_list (list): 標準設備清單 (None = utils.VALID_EQUIPMENT_LIST)
+        
+    Returns:
+        str: 完整 prompt
+    """
+    compacted = compact_ocr_text(text_content, token_budget, equipment_list)
+    print(f"✂️ Prompt 精簡: {estimate_tokens(text_content)} → {estimate_tokens(compacted)} tokens (OCR 文字)")
+    return ANALYZE_PAGE_PROMPT_PREFIX + compacted + ANALYZE_PAGE_PROMPT_SUFFIX
+
+# ==========================================
+# 結構化輸出 (JSON Schema)
+# ==========================================
+# 透過 Ollama 的 `format` 參數傳入 JSON Schema，模型只能輸出符合 Schema 的 JSON，
+# 不需要再從自由文字中用 regex 撈 `{...}`。
+# 若回應仍有瑕疵 (被截斷、多了逗號)，在本機修補，不再重新呼叫模型。
+# Schema 建立、JSON 修補與欄位修正與 ocr_system 共用 (ocr_system/llm_corrector.py)。
+ANALYSIS_STRING_FIELDS = ["document_type", "place_name", "address", "management_person", "phone_number"]
+ANALYSIS_ARRAY_FIELDS = ["equipment_list"]
+
+ANALYSIS_SCHEMA = build_json_schema(ANALYSIS_STRING_FIELDS, ANALYSIS_ARRAY_FIELDS)
+
+def call_ollama_structured(prompt, model, schema, timeout=60):
+    """
+    以結構化輸出模式呼叫 Ollama
+
+    Ollama 0.5 以前的版本不支援以 JSON Schema 作為 `format`，會回傳 400，
+    此時改用 `format: "json"` (仍限制輸出為合法 JSON)。
+
+    Args:
+        prompt (str): 完整 prompt
+        model (str): 模型名稱
+        schema (dict): JSON Schema
+        timeout (int): 逾時秒數
+
+    Returns:
+        requests.Response: API 回應
+    """
     payload = {
         "model": model,
         "prompt": prompt,
-        "stream": False
+        "stream": False,
+        "format": schema,
+        "options": {"temperature": 0}
     }
+    response = requests.post(OLLAMA_GENERATE_URL, json=payload, timeout=timeout)
+    if response.status_code == 400:
+        print("⚠️ Ollama 不支援 JSON Schema format，改用 format=json")
+        payload["format"] = "json"
+        response = requests.post(OLLAMA_GENERATE_URL, json=payload, timeout=timeout)
+    return response
+
+def analyze_page_with_ai(text_content, model=DEFAULT_TEXT_MODEL, token_budget=None, compact=True, structured=True,
+                         fields=None):
+    """
+    使用 AI 分析單頁內容 (基於文字的 OCR 結果)
+    
+    Args:
+        text_content (str): OCR 辨識出的文字
+        model (str): 使用的模型名稱
+        token_budget (int): OCR 文字的 token 預算 (None = 使用 config.toml 設定)
+        compact (bool): 是否先精簡 OCR 文字 (去除雜訊行，只保留欄位與設備相關行)
+        structured (bool): 是否使用結構化輸出 (以 JSON Schema 限制模型輸出)
+        fields (list): 只提取指定欄位 (例如 ["address", "equipment_list"])，None = 全部欄位
+        
+    Returns:
+        dict: AI 分析結果
+    """
+    if not text_content.strip():
+        return {"error": "No text content"}
+
+    schema = ANALYSIS_SCHEMA
+    if fields:
+        # 前綴維持不變 (重用 KV Cache)，只以 Schema 限制輸出欄位
+        schema = build_json_schema([f for f in ANALYSIS_STRING_FIELDS if f in fields],
+                                   [f for f in ANALYSIS_ARRAY_FIELDS if f in fields])
+
+    if compact:
+        prompt = build_analysis_prompt(text_content, token_budget)
+    else:
+        prompt = ANALYZE_PAGE_PROMPT_PREFIX + text_content + ANALYZE_PAGE_PROMPT_SUFFIX
     
     try:
-        response = requests.post(OLLAMA_GENERATE_URL, json=payload, timeout=60)  # Extended timeout
+        if structured:
+            response = call_ollama_structured(prompt, model, schema, timeout=60)
+        else:
+            payload = {
+                "model": model,
+                "prompt": prompt,
+                "stream": False
+            }
+            response = requests.post(OLLAMA_GENERATE_URL, json=payload, timeout=60)  # Extended timeout
         if response.status_code == 200:
             result = response.json()
             response_text = result.get('response', '')
@@ -507,17 +737,19 @@ def analyze_page_with_ai(text_content, model=DEFAULT_TEXT_MODEL):
             # Debug: Print raw response (truncated for readability)
             print(f"🤖 AI Raw Response (first 500 chars): {response_text[:500]}")
 
-            # Multi-step JSON extraction with fallbacks
-            extracted_json = None
+            # 結構化輸出：直接解析 (必要時本機修補)
+            extracted_json = parse_json_response(response_text) if structured else None
             
+            # Multi-step JSON extraction with fallbacks (自由文字模式)
             # Step 1: Try to extract JSON from markdown code block (```json ... ```)
-            markdown_match = re.search(r'```(?:json)?\s*(\{[\s\S]*?\})\s*```', response_text, re.DOTALL)
-            if markdown_match:
-                try:
-                    extracted_json = json.loads(markdown_match.group(1))
-                    print("✅ Extracted JSON from markdown code block")
-                except json.JSONDecodeError:
-                    pass
+            if not extracted_json:
+                markdown_match = re.search(r'```(?:json)?\s*(\{[\s\S]*?\})\s*```', response_text, re.DOTALL)
+                if markdown_match:
+                    try:
+                        extracted_json = json.loads(markdown_match.group(1))
+                        print("✅ Extracted JSON from markdown code block")
+                    except json.JSONDecodeError:
+                        pass
             
             # Step 2: Try direct JSON object extraction (greedy match for nested objects)
             if not extracted_json:
@@ -565,9 +797,9 @@ def analyze_page_with_ai(text_content, model=DEFAULT_TEXT_MODEL):
                 except:
                     pass
             
-            # If extraction successful, return the JSON
+            # If extraction successful, return the JSON (依 Schema 修正欄位型別)
             if extracted_json and isinstance(extracted_json, dict):
-                return extracted_json
+                return coerce_to_schema(extracted_json, schema)
             
             # If all extraction methods fail, return error with raw response
             print(f"⚠️ All JSON extraction methods failed")
@@ -588,12 +820,13 @@ def analyze_page_with_ai(text_content, model=DEFAULT_TEXT_MODEL):
     except Exception as e:
         return {"error": str(e)}
 
-def analyze_document(pages_text, model=DEFAULT_TEXT_MODEL):
+def analyze_document(pages_text, model=DEFAULT_TEXT_MODEL, token_budget=None):
     """
     分析整份文件 (多頁) - 基於 OCR 文字
     
     Args:
         pages_text (list): 每一頁的 OCR 文字列表
+        token_budget (int): OCR 文字的 token 預算 (None = 使用 config.toml 設定)
         
     Returns:
         dict: 整合後的分析結果
@@ -626,5 +859,5 @@ def analyze_document(pages_text, model=DEFAULT_TEXT_MODEL):
         if toc_text:
             combined_text += "\n\n--- (以下為目錄頁內容) ---\n\n" + toc_text
             
-        return analyze_page_with_ai(combined_text, model)
+        return analyze_page_with_ai(combined_text, model, token_budget=token_budget)
     return {}
@@ -0,0 +1,261 @@
+from difflib import SequenceMatcher
+import numpy as np
+import pandas as pd
+import address_normalizer
+import equipment_vocab
+
+# C 版逐對相似度 (選用)
+try:
+    from rapidfuzz.process import cpdist
+    from rapidfuzz.distance import Indel
+    _rapidfuzz_available = True
+except ImportError:
+    cpdist = None
+    Indel = None
+    _rapidfuzz_available = False
+
+# ==========================================
+# 批次比對引擎
+# ==========================================
+# 把多份申報資料 (DataFrame) 與列管資料一次比對：
+#   1. 以正規化場所名稱 (台/臺統一、去除空白) 合併兩張表
+#   2. 各欄位以欄為單位計算比對狀態與相似度 (與自動比對頁面的判斷規則相同，地址以標準鍵比對)
+#   3. 消防設備以位元遮罩比對 (equipment_vocab)，列出漏報與新增項目
+# 輸出可直接作為主管每日差異報表。
+
+# 顯示名稱 -> (申報資料欄位, 列管資料欄位)
+FIELD_MAPPING = {
+    '場所名稱': ('場所名稱', '場所名稱'),
+    '場所地址': ('場所地址', '場所地址'),
+    '管理權人': ('管理權人', '管理權人姓名'),
+    '電話': ('場所電話', '場所電話'),
+}
+EQUIPMENT_FIELD = ('消防設備種類', '消防安全設備')
+
+PLACE_KEY_COLUMN = '_place_key'
+
+# 比對狀態
+STATUS_MATCH = "一致"
+STATUS_PARTIAL = "部分符合"
+STATUS_BOTH_EMPTY = "皆無資料"
+STATUS_SYSTEM_EMPTY = "系統無資料"
+STATUS_FILING_EMPTY = "申報資料空白"
+STATUS_MISMATCH = "不一致"
+STATUS_NOT_REGISTERED = "場所不在列管資料"
+
+# 需要人工確認的狀態
+DISCREPANCY_STATUSES = (STATUS_SYSTEM_EMPTY, STATUS_FILING_EMPTY, STATUS_MISMATCH, STATUS_NOT_REGISTERED)
+
+
+def _as_text(series):
+    """轉為字串並去除前後空白 (NaN/None 視為空字串)"""
+    return series.fillna("").astype(str).str.strip()
+
+
+def normalize_place_key(series):
+    """場所名稱正規化鍵 (與 place_index.normalize_place_name 相同規則，向量化)"""
+    return (series.fillna("").astype(str)
+            .str.replace("台", "臺", regex=False)
+            .str.replace(r"[ 　]", "", regex=True))
+
+
+def normalize_address_pair(system, filing):
+    """
+    逐列可互相比較的地址標準鍵 (address_normalizer.comparable_keys 的向量化版本)
+
+    兩者都寫了鄉鎮時含鄉鎮，任一方未寫鄉鎮時都不含鄉鎮。
+
+    Returns:
+        tuple: (列管地址鍵 Series, 申報地址鍵 Series)
+    """
+    def township(value):
+        return address_normalizer.parse_address(value).township
+
+    def bare_key(value):
+        return address_normalizer.address_key(value, include_township=False)
+
+    sys_township, ocr_township = system.map(township), filing.map(township)
+    both = (sys_township != "") & (ocr_township != "")
+    sys_key, ocr_key = system.map(bare_key), filing.map(bare_key)
+    return sys_key.where(~both, sys_township + sys_key), ocr_key.where(~both, ocr_township + ocr_key)
+
+
+def similarity_series(left, right):
+    """
+    逐列相似度 (0-1)
+
+    有安裝 rapidfuzz 時以 C 版 cpdist 一次計算，否則逐列使用 difflib。
+    """
+    if len(left) == 0:
+        return np.zeros(0)
+    if _rapidfuzz_available:
+        return np.asarray(cpdist(left.tolist(), right.tolist(), scorer=Indel.normalized_similarity), dtype=float)
+    return np.fromiter((SequenceMatcher(None, a, b).ratio() for a, b in zip(left, right)),
+                       dtype=float, count=len(left))
+
+
+def compare_field_columns(system, filing, normalizer=None, pair_normalizer=None):
+    """
+    以欄為單位比對單一欄位
+
+    規則與自動比對頁面相同：兩者皆有值時先比完全相同，再比互相包含 (部分符合)。
+    正規化後為空的鍵 (例如只寫縣市的地址) 無從比較，一律視為不一致
+    (與 address_normalizer.addresses_match 相同)。
+
+    Args:
+        system (pd.Series): 列管資料
+        filing (pd.Series): 申報資料
+        normalizer (callable): 比對前的向量化正規化函式 (例如場所名稱)
+        pair_normalizer (callable): 需同時參考兩欄的正規化函式 (system, filing) -> (鍵, 鍵)，例如地址
+
+    Returns:
+        tuple: (狀態 Series, 相似度 Series)
+    """
+    system = _as_text(system)
+    filing = _as_text(filing)
+    if pair_normalizer:
+        norm_sys, norm_ocr = pair_normalizer(system, filing)
+    else:
+        norm_sys = normalizer(system) if normalizer else system
+        norm_ocr = normalizer(filing) if normalizer else filing
+
+    sys_empty = system == ""
+    ocr_empty = filing == ""
+    both = ~sys_empty & ~ocr_empty
+    keyed = both & (norm_sys != "") & (norm_ocr != "")
+    exact = keyed & (norm_sys == norm_ocr)
+
+    status = np.full(len(system), STATUS_MISMATCH, dtype=object)
+    status[(sys_empty & ocr_empty).to_numpy()] = STATUS_BOTH_EMPTY
+    status[(sys_empty & ~ocr_empty).to_numpy()] = STATUS_SYSTEM_EMPTY
+    status[(~sys_empty & ocr_empty).to_numpy()] = STATUS_FILING_EMPTY
+    status[exact.to_numpy()] = STATUS_MATCH
+
+    similarity = np.where(exact.to_numpy(), 1.0, 0.0)
+    rest = (keyed & ~exact).to_numpy()
+    if rest.any():
+        rest_sys = norm_sys[rest]
+        rest_ocr = norm_ocr[rest]
+        contained = np.fromiter((a in b or b in a for a, b in zip(rest_ocr, rest_sys)),
+                                dtype=bool, count=len(rest_sys))
+        rest_status = status[rest]
+        rest_status[contained] = STATUS_PARTIAL
+        status[rest] = rest_status
+        similarity[rest] = similarity_series(rest_sys, rest_ocr)
+
+    return pd.Series(status, index=system.index), pd.Series(similarity, index=system.index)
+
+
+def compare_equipment_columns(system, filing, equipment_list=None):
+    """
+    以位元遮罩比對消防設備 (equipment_vocab)
+
+    Args:
+        system (pd.Series): 列管資料的設備字串
+        filing (pd.Series): 申報資料的設備字串 (OCR 或人工輸入)
+        equipment_list (list): 標準設備清單；兩邊都先依此清單正規化再轉遮罩
+
+    Returns:
+        pd.DataFrame: 狀態、漏報 (系統有申報無)、新增 (申報有系統無)
+    """
+    sys_masks = equipment_vocab.mask_series(system, equipment_list)
+    ocr_masks = equipment_vocab.mask_series(filing, equipment_list)
+    missing, extra = equipment_vocab.diff(sys_masks, ocr_masks)
+
+    sys_empty = sys_masks == 0
+    ocr_empty = ocr_masks == 0
+    statuses = np.select(
+        [sys_empty & ocr_empty, sys_empty, ocr_empty, (missing == 0) & (extra == 0)],
+        [STATUS_BOTH_EMPTY, STATUS_SYSTEM_EMPTY, STATUS_FILING_EMPTY, STATUS_MATCH],
+        default=STATUS_MISMATCH
+    )
+
+    return pd.DataFrame({
+        '消防設備種類_狀態': statuses,
+        '消防設備種類_漏報': equipment_vocab.decode_series(missing, system.index),
+        '消防設備種類_新增': equipment_vocab.decode_series(extra, system.index),
+    }, index=system.index)
+
+
+def compare_filings(filings, registry, equipment_list=None, field_mapping=None):
+    """
+    批次比對申報資料與列管資料
+
+    Args:
+        filings (pd.DataFrame): 申報資料 (欄位同 extract_info_from_ocr 的結果)
+        registry (pd.DataFrame): 列管資料 (utils.load_system_data)
+        equipment_list (list): 標準設備清單 (None = utils.VALID_EQUIPMENT_LIST)
+        field_mapping (dict): 顯示名稱 -> (申報欄位, 列管欄位)
+
+    Returns:
+        pd.DataFrame: 每份申報一列，含各欄位狀態 / 相似度、設備差異與不一致欄位
+    """
+    if equipment_list is None:
+        from utils import VALID_EQUIPMENT_LIST
+        equipment_list = VALID_EQUIPMENT_LIST
+    if field_mapping is None:
+        field_mapping = FIELD_MAPPING
+
+    filing_place_col, registry_place_col = field_mapping['場所名稱']
+    filings = filings.reset_index(drop=True)
+
+    # 1. 以正規化場所名稱合併 (同名場所取列管資料的第一筆)
+    left = filings.assign(**{PLACE_KEY_COLUMN: normalize_place_key(filings[filing_place_col])})
+    right = registry.assign(**{PLACE_KEY_COLUMN: normalize_place_key(registry[registry_place_col])})
+    right = right.drop_duplicates(PLACE_KEY_COLUMN, keep='first')
+    right = right.rename(columns={col: f"系統_{col}" for col in right.columns if col != PLACE_KEY_COLUMN})
+    merged = left.merge(right, on=PLACE_KEY_COLUMN, how='left', indicator=True)
+    registered = (merged['_merge'] == 'both').to_numpy()
+
+    result = filings.copy()
+    result['列管場所'] = merged[f"系統_{registry_place_col}"].where(registered, None)
+
+    # 2. 逐欄位 (以欄為單位) 比對
+    def column(frame, name):
+        return frame[name] if name in frame.columns else pd.Series("", index=frame.index)
+
+    status_columns = []
+    for display_name, (filing_col, registry_col) in field_mapping.items():
+        status, similarity = compare_field_columns(
+            column(merged, f"系統_{registry_col}"), column(merged, filing_col),
+            normalizer=normalize_place_key if display_name == '場所名稱' else None,
+            pair_normalizer=normalize_address_pair if display_name == '場所地址' else None,
+        )
+        result[f"{display_name}_狀態"] = status.where(registered, STATUS_NOT_REGISTERED)
+        result[f"{display_name}_相似度"] = similarity.where(registered, 0.0).round(4)
+        status_columns.append(display_name)
+
+    # 3. 消防設備位元遮罩比對
+    filing_equipment_col, registry_equipment_col = EQUIPMENT_FIELD
+    equipment = compare_equipment_columns(
+        column(merged, f"系統_{registry_equipment_col}"), column(merged, filing_equipment_col), equipment_list
+    )
+    equipment.loc[~registered, '消防設備種類_狀態'] = STATUS_NOT_REGISTERED
+    result = pd.concat([result, equipment], axis=1)
+    status_columns.append('消防設備種類')
+
+    # 4. 彙總不一致欄位
+    flags = pd.DataFrame({
+        name: result[f"{name}_狀態"].isin(DISCREPANCY_STATUSES) for name in status_columns
+    })
+    result['不一致欄位數'] = flags.sum(axis=1)
+    joined = pd.Series("", index=result.index, dtype=object)
+    for name in status_columns:
+        joined = joined + np.where(flags[name].to_numpy(), name + "、", "")
+    result['不一致欄位'] = joined.str.rstrip("、")
+    return result
+
+
+def discrepancy_report(results, sort_by='不一致欄位數'):
+    """
+    每日差異報表：只保留需要人工確認的申報
+
+    Args:
+        results (pd.DataFrame): compare_filings 的結果
+        sort_by (str): 排序欄位 (由多到少)
+
+    Returns:
+        pd.DataFrame: 有不一致欄位的申報
+    """
+    report = results[results['不一致欄位數'] > 0]
+    return report.sort_values(sort_by, ascending=False, kind='stable')
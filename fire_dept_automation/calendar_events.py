@@ -0,0 +1,94 @@
+import db_manager
+
+# ==========================================
+# 排班日曆事件 (增量更新)
+# ==========================================
+# 排班頁每次重新執行都要把前 30 天到後 60 天的任務轉成日曆事件。
+# CalendarEventFeed 依日期快取事件，每次 sync() 只查一次「每日版本」：
+#   - 版本 = (任務數, delivery_daily_summary.version 合計)
+#   - 建立任務、認領 / 釋出、打卡都會讓該任務的彙總 version + 1，只有那一天的版本改變
+#   - 只重新查詢、重建版本改變的日期，其餘日期沿用快取的事件 dict
+# streamlit-calendar 元件只接受完整事件列表，因此 events 仍為完整列表；
+# sync() 回傳的差異 (changed / removed) 供呼叫端判斷是否需要重畫。
+
+
+class CalendarEventFeed:
+    """
+    單一日期範圍、單一使用者的日曆事件快取
+
+    Args:
+        start_date (str): 開始日期 YYYY-MM-DD
+        end_date (str): 結束日期 YYYY-MM-DD
+        current_user (str): 當前使用者帳號 (決定事件顏色)
+    """
+
+    def __init__(self, start_date, end_date, current_user=None):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.current_user = current_user
+        self.events = []
+        self._versions = {}
+        self._day_events = {}
+
+    @property
+    def key(self):
+        return (self.start_date, self.end_date, self.current_user)
+
+    def sync(self):
+        """
+        與資料庫同步，只重建版本有變動的日期
+
+        Returns:
+            dict: {'changed': 新增或異動的日期, 'removed': 已無任務的日期}
+        """
+        versions = db_manager.get_task_day_versions(self.start_date, self.end_date)
+        changed = sorted(date for date, version in versions.items() if self._versions.get(date) != version)
+        removed = sorted(date for date in self._versions if date not in versions)
+
+        if changed:
+            day_events = {date: [] for date in changed}
+            for task in db_manager.get_tasks_by_dates(changed):
+                day_events[str(task['date'])].append(db_manager.task_to_event(task, self.current_user))
+            self._day_events.update(day_events)
+        for date in removed:
+            self._day_events.pop(date, None)
+        self._versions = versions
+
+        if changed or removed:
+            self.events = [event for date in sorted(self._day_events) for event in self._day_events[date]]
+        return {'changed': changed, 'removed': removed}
+
+    def invalidate(self, date=None):
+        """
+        強制下次 sync() 重新查詢指定日期 (None 表示全部)
+
+        Args:
+            date (str): 日期 YYYY-MM-DD
+        """
+        if date is None:
+            self._versions = {}
+        else:
+            self._versions.pop(date, None)
+
+
+def get_feed(store, start_date, end_date, current_user=None):
+    """
+    取得 (或建立) 存放在 store 中的日曆事件快取並同步
+
+    日期範圍或使用者不同時建立新的快取 (每個 store 只保留一份)。
+
+    Args:
+        store: dict 或 st.session_state
+        start_date (str): 開始日期 YYYY-MM-DD
+        end_date (str): 結束日期 YYYY-MM-DD
+        current_user (str): 當前使用者帳號
+
+    Returns:
+        tuple: (CalendarEventFeed, sync() 回傳的差異)
+    """
+    feed = store.get('calendar_feed')
+    if feed is None or feed.key != (start_date, end_date, current_user):
+        feed = CalendarEventFeed(start_date, end_date, current_user)
+        store['calendar_feed'] = feed
+    delta = feed.sync()
+    return feed, delta
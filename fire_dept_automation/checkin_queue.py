@@ -0,0 +1,243 @@
+import datetime
+import json
+import os
+import re
+import threading
+import time
+import db_manager
+
+# ==========================================
+# 志工打卡佇列 (離線累積、批次同步)
+# ==========================================
+# 每戶打卡原本各自呼叫 create_delivery_record (一次連線 + 交易 + 彙總重算)。
+# 改為在伺服器端累積後批次寫入：
+#   - checkin() 先存入佇列檔 (含打卡當下時間與照片路徑)，不連資料庫
+#   - 佇列累積 batch_size 筆、最舊一筆超過 max_age 秒、該路線最後一戶打卡
+#     或志工按「同步」時，flush() 以 db_manager.sync_delivery_checkins 一次寫入
+#   - 尚未同步的打卡由頁面疊加在配送進度上，志工看到的進度不受批次影響
+#   - (task_id, elderly_id) 為冪等鍵：佇列內重複打卡只保留第一筆，
+#     資料庫已有紀錄時略過，重送不會重複建立
+#   - 寫入失敗 (資料庫鎖定、磁碟錯誤等) 時佇列保留，下次再送；程式重啟後由佇列檔還原
+#   - 同一帳號可能同時開多個 session：每次操作都在同一把鎖內重新讀取佇列檔再寫回，
+#     不會互相覆蓋
+#
+# Streamlit 頁面在伺服器端執行，佇列檔也在伺服器上：手機斷線時打卡根本送不到這裡，
+# 離線打卡需要瀏覽器端的儲存，不在此模組範圍。照片由 photo_pipeline 先收下，佇列只記錄照片路徑。
+
+QUEUE_DIR = "uploads/checkin_queue"
+DEFAULT_BATCH_SIZE = 5
+DEFAULT_MAX_AGE = 300  # 秒
+
+# checkin() 的結果
+SYNCED = "synced"    # 已連同佇列一起寫入資料庫
+QUEUED = "queued"    # 存入佇列，等待下次批次同步
+FAILED = "failed"    # 已達同步條件但寫入失敗，保留在佇列
+
+# 每個佇列檔一把鎖 (Streamlit 的 session 是同一程序中的執行緒)
+_path_locks = {}
+_path_locks_lock = threading.Lock()
+
+
+def _lock_for(path):
+    """取得佇列檔對應的鎖；未指定檔案時回傳獨立的鎖"""
+    if not path:
+        return threading.Lock()
+    key = os.path.abspath(path)
+    with _path_locks_lock:
+        return _path_locks.setdefault(key, threading.Lock())
+
+
+def utc_timestamp(now=None):
+    """與 SQLite CURRENT_TIMESTAMP 相同格式 (UTC) 的時間字串"""
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    return now.strftime("%Y-%m-%d %H:%M:%S")
+
+
+class CheckinQueue:
+    """
+    志工打卡佇列
+
+    Args:
+        path (str): 佇列檔路徑 (JSON)，None 表示只保留在記憶體
+        batch_size (int): 累積幾筆後建議同步
+        max_age (float): 最舊一筆超過幾秒後建議同步
+    """
+
+    def __init__(self, path=None, batch_size=DEFAULT_BATCH_SIZE, max_age=DEFAULT_MAX_AGE):
+        self.path = path
+        self.batch_size = batch_size
+        self.max_age = max_age
+        self._items = []
+        self._lock = _lock_for(path)
+        with self._lock:
+            self._load()
+        if self._items:
+            print(f"📥 還原 {len(self._items)} 筆未同步的打卡")
+
+    def __len__(self):
+        with self._lock:
+            self._load()
+            return len(self._items)
+
+    def checkin(self, task_id, elderly_id, status="已送達", photo_path=None, notes="",
+                volunteer_id=None, abnormal_reason=None, checked_at=None, route_complete=False):
+        """
+        記錄一筆打卡：存入佇列，達到同步條件時一次寫入資料庫
+
+        Args:
+            route_complete (bool): 這筆是否為該路線最後一戶 (送完即同步，不等批次)
+            其餘參數同 add()
+
+        Returns:
+            str: SYNCED (已寫入)、QUEUED (等待批次同步) 或 FAILED (寫入失敗，保留在佇列)
+        """
+        self.add(task_id, elderly_id, status, photo_path, notes, volunteer_id, abnormal_reason, checked_at)
+        if not (route_complete or self.should_flush()):
+            return QUEUED
+        return FAILED if self.flush() is None else SYNCED
+
+    def add(self, task_id, elderly_id, status="已送達", photo_path=None, notes="",
+            volunteer_id=None, abnormal_reason=None, checked_at=None):
+        """
+        將一筆打卡存入佇列 (不連資料庫)
+
+        Args:
+            task_id (int): 任務 ID
+            elderly_id (int): 長者 ID
+            status (str): "已送達" 或 "異常"
+            photo_path (str): 送達證明照片路徑
+            notes (str): 備註
+            volunteer_id (str): 志工帳號
+            abnormal_reason (str): 異常原因
+            checked_at (str): 打卡時間 (UTC)，預設現在
+
+        Returns:
+            bool: 是否加入 (同一任務同一長者已在佇列中時回傳 False)
+        """
+        item = self._make_item(task_id, elderly_id, status, photo_path, notes,
+                               volunteer_id, abnormal_reason, checked_at)
+        with self._lock:
+            self._load()
+            return self._append(item)
+
+    def pending(self):
+        """尚未同步的打卡 (複本)"""
+        with self._lock:
+            self._load()
+            return [dict(item) for item in self._items]
+
+    def pending_keys(self):
+        """尚未同步的 (task_id, elderly_id)"""
+        with self._lock:
+            self._load()
+            return {(item['task_id'], item['elderly_id']) for item in self._items}
+
+    def should_flush(self, now=None):
+        """
+        是否建議同步 (累積筆數達 batch_size，或最舊一筆超過 max_age 秒)
+
+        Args:
+            now (float): 目前時間 (time.time())，測試用
+
+        Returns:
+            bool
+        """
+        with self._lock:
+            self._load()
+            if not self._items:
+                return False
+            if len(self._items) >= self.batch_size:
+                return True
+            now = time.time() if now is None else now
+            return now - self._items[0]['queued_at'] >= self.max_age
+
+    def flush(self):
+        """
+        將佇列中的打卡一次寫入資料庫
+
+        Returns:
+            dict: {'inserted', 'duplicates'}；佇列為空時兩者為 0；
+                  寫入失敗 (連線中斷等) 時回傳 None，佇列保留
+        """
+        # 持有鎖直到寫回，其他 session 不會同時送出同一批
+        with self._lock:
+            self._load()
+            if not self._items:
+                return {'inserted': 0, 'duplicates': 0}
+            try:
+                result = db_manager.sync_delivery_checkins(self._items)
+            except Exception as e:
+                print(f"❌ 打卡同步失敗，保留佇列: {e}")
+                return None
+            if result is None:
+                return None
+            self._items = []
+            self._save()
+            return result
+
+    @staticmethod
+    def _make_item(task_id, elderly_id, status, photo_path, notes, volunteer_id, abnormal_reason, checked_at):
+        return {
+            'task_id': task_id,
+            'elderly_id': elderly_id,
+            'status': status,
+            'photo_path': photo_path,
+            'notes': notes,
+            'volunteer_id': volunteer_id,
+            'abnormal_reason': abnormal_reason,
+            'delivery_time': checked_at or utc_timestamp(),
+            'queued_at': time.time(),
+        }
+
+    def _append(self, item):
+        """加入佇列並寫回 (呼叫端需持有鎖)；重複的 (task_id, elderly_id) 回傳 False"""
+        key = (item['task_id'], item['elderly_id'])
+        if any((queued['task_id'], queued['elderly_id']) == key for queued in self._items):
+            return False
+        self._items.append(item)
+        self._save()
+        return True
+
+    def _load(self):
+        """重新讀取佇列檔 (呼叫端需持有鎖)；其他 session 寫入的打卡也會讀到"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._items = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 打卡佇列檔讀取失敗: {e}")
+
+    def _save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._items, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+def queue_path(username, queue_dir=QUEUE_DIR):
+    """志工的佇列檔路徑 (帳號中的特殊字元以 _ 取代)"""
+    return os.path.join(queue_dir, f"{re.sub(r'[^0-9A-Za-z_.-]', '_', username)}.json")
+
+
+def get_queue(store, username, queue_dir=QUEUE_DIR):
+    """
+    取得 (或建立) 存放在 store 中的志工打卡佇列
+
+    Args:
+        store: dict 或 st.session_state
+        username (str): 志工帳號
+        queue_dir (str): 佇列檔目錄
+
+    Returns:
+        CheckinQueue
+    """
+    key = f"checkin_queue_{username}"
+    queue = store.get(key)
+    if queue is None:
+        queue = CheckinQueue(queue_path(username, queue_dir))
+        store[key] = queue
+    return queue
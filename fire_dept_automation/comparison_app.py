@@ -4,7 +4,12 @@ import os
 import fitz  # pymupdf
 from PIL import Image
 import pytesseract
-import re
+import ocr_parser
+import registry_store
+import place_index
+import equipment_vocab
+import page_assets
+import pdf_text_layer
 import config_loader
 
 # 設定頁面配置
@@ -84,20 +89,10 @@ def load_system_data(excel_source):
         return None
     try:
         # 如果是字串路徑，先檢查存在性
-        if isinstance(excel_source, str):
-            if not os.path.exists(excel_source):
-                return None
-            engine = 'xlrd' if excel_source.endswith('.xls') else None
-            df = pd.read_excel(excel_source, header=1, engine=engine)
-        else:
-            # 如果是檔案物件，直接讀取
-            filename = getattr(excel_source, 'name', '')
-            engine = 'xlrd' if filename.endswith('.xls') else None
-            df = pd.read_excel(excel_source, header=1, engine=engine)
-            
-        # 清理欄位名稱 (去除前後空白、換行符號)
-        df.columns = df.columns.astype(str).str.strip().str.replace('\n', '').str.replace('\r', '')
-        return df
+        if isinstance(excel_source, str) and not os.path.exists(excel_source):
+            return None
+        # 字串路徑與檔案物件皆使用 registry_store 快取 (檔案物件以內容雜湊為鍵)
+        return registry_store.load_registry(excel_source)
     except Exception as e:
         st.error(f"讀取 Excel 失敗: {e}")
         return None
@@ -190,130 +185,21 @@ def normalize_equipment_str(text):
     將輸入的文字 (OCR 或 系統資料) 進行模糊比對，
     只保留標準設備清單中的項目，並以頓號分隔。
     """
-    if not text or not isinstance(text, str):
-        return ""
-    
-    found_items = []
-    # 為了避免重複匹配 (例如 "火警自動警報設備" 包含 "警報設備")
-    # 我們已經將列表按長度排序。
-    # 但這裡我們採取簡單策略：只要字串中有出現該設備名稱，就列入。
-    # 為了避免重複 (例如同一個詞出現兩次)，使用 set 或檢查是否存在
-    
-    # 先移除常見干擾字元，方便比對
-    clean_text = text.replace(" ", "").replace("　", "").replace("\n", "")
-    
-    for item in VALID_EQUIPMENT_LIST:
-        if item in clean_text:
-            found_items.append(item)
-            
-    return "、".join(found_items)
+    return ocr_parser.normalize_equipment_str(text, VALID_EQUIPMENT_LIST)
 
 def extract_info_from_ocr(text, pages_text_list=None):
-    """從 OCR 文字中提取關鍵資訊 (極致去空白版)"""
-    info = {}
+    """
+    從 OCR 文字中提取關鍵資訊 (共用解析器，見 ocr_parser.py)
     
-    # --- 第一頁解析 (基本資料) ---
-    if text:
-        lines = text.split('\n')
-        for line in lines:
-            # 強力去除所有空白 (包含全形空格)
-            clean_line = line.replace(" ", "").replace("　", "").strip()
-            if not clean_line: continue
-            
-            # 1. 管理權人
-            # 優先找 "管理權人"
-            if "管理權人" in clean_line:
-                match = re.search(r"管理權人[:：|](.*)", clean_line)
-                if match:
-                    val = match.group(1)
-                    # 如果抓到的是 "通訊處..." 這種無效資料，就忽略
-                    if "通訊處" not in val:
-                        info['管理權人'] = val
-            
-            # 備用：找 "姓名" (但要排除 "檢修人員姓名")
-            if "姓名" in clean_line and "檢修人員" not in clean_line and "管理權人" not in info:
-                 match = re.search(r"姓名[:：|](.*)", clean_line)
-                 if match:
-                     # 可能會抓到 "廖偉銘身分證字號..."，試著切掉後面
-                     val = match.group(1)
-                     if "身分證" in val:
-                         val = val.split("身分證")[0]
-                     info['管理權人'] = val
-            
-            # 2. 地址
-            if "地址" in clean_line:
-                 # 優先抓 "場所地址"
-                 if "場所地址" in clean_line:
-                     match = re.search(r"場所地址[:：|](.*)", clean_line)
-                     if match:
-                         info['場所地址'] = match.group(1)
-                 # 如果是 "地址" 且 字典裡還沒有 "場所地址" (避免覆蓋掉真正的場所地址，因為後面可能會出現檢修單位的地址)
-                 elif "地址" in clean_line and '場所地址' not in info:
-                     match = re.search(r"地址[:：|](.*)", clean_line)
-                     if match:
-                         info['場所地址'] = match.group(1)
-
-            # 3. 電話
-            if "電話" in clean_line:
-                # 排除 "管理權人電話" (通常我們想抓場所電話)
-                # 只有當字典裡還沒有電話時才抓取 (避免抓到下面檢修公司的電話)
-                if '場所電話' not in info:
-                    match = re.search(r"電話[:：|]([\d\-]+)", clean_line)
-                    if match:
-                         info['場所電話'] = match.group(1)
-                     
-            # 4. 場所名稱
-            if "場所名稱" in clean_line:
-                match = re.search(r"場所名稱[:：|](.*)", clean_line)
-                if match:
-                    info['場所名稱'] = match.group(1)
-
-            # 5. 消防設備種類 (第一頁備用)
-            # 如果沒有第二頁資料，才嘗試從第一頁抓 (通常是 "申報項目" 或 "檢修項目")
-            if not pages_text_list:
-                if "申報項目" in clean_line or "檢修項目" in clean_line:
-                     match = re.search(r"(申報項目|檢修項目)[:：|](.*)", clean_line)
-                     if match:
-                         # 使用正規化函式處理
-                         info['消防設備種類'] = normalize_equipment_str(match.group(2))
-
-    # --- 多頁解析 (尋找消防設備種類) ---
-    if pages_text_list and isinstance(pages_text_list, list):
-        target_page_text = None
-        
-        # 1. 優先尋找包含 "消防安全設備檢修申報書目錄" 的頁面
-        for page_text in pages_text_list:
-            if "消防安全設備檢修申報書目錄" in page_text.replace(" ", ""):
-                target_page_text = page_text
-                break
-        
-        # 2. 如果找不到，回退使用第二頁 (Index 1)
-        if not target_page_text and len(pages_text_list) > 1:
-            target_page_text = pages_text_list[1]
-            
-        if target_page_text:
-            # 策略：
-            # 1. 找到 "二、消防安全設備檢查表" 之後的內容
-            # 2. 抓取所有包含 "檢查表" 的行
-            # 3. 傳入 normalize_equipment_str 進行統一比對
-            
-            # 為了提高準確率，我們先把 "二、消防安全設備檢查表" 之後的文字截取出來
-            # 簡單做法：找到關鍵字後，取其後的所有文字
-            clean_page_text = target_page_text.replace(" ", "").replace("　", "")
-            if "消防安全設備檢查表" in clean_page_text:
-                # 切割出後半段
-                relevant_text = clean_page_text.split("消防安全設備檢查表", 1)[1]
-                
-                # 直接對這段文字進行正規化比對
-                normalized_eq = normalize_equipment_str(relevant_text)
-                if normalized_eq:
-                    info['消防設備種類'] = normalized_eq
-                 
-    return info
-
-
-
-
+    設備種類取目錄頁「消防安全設備檢查表」之後出現的所有設備。
+    """
+    return ocr_parser.extract_info_from_ocr(
+        text, pages_text_list,
+        equipment_list=VALID_EQUIPMENT_LIST,
+        toc_keywords=ocr_parser.DEFAULT_TOC_KEYWORDS,
+        toc_mode=ocr_parser.TOC_MODE_SECTION,
+        record_toc_page=False
+    )
 
 
 # ==========================================
@@ -415,15 +301,16 @@ with st.sidebar:
         # 2. 選擇場所 (增加搜尋功能)
         st.header("2. 選擇比對場所")
         
-        # 取得所有場所名稱
-        all_place_names = df_system['場所名稱'].astype(str).unique().tolist()
+        # 取得所有場所名稱 (場所名稱索引只在列管資料變更時重建)
+        place_idx = place_index.get_place_index(df_system)
+        all_place_names = place_idx.unique_names
         
         # 搜尋框
         search_term = st.text_input("🔍 搜尋場所名稱 (支援模糊比對)", "")
         
-        # 根據搜尋結果過濾
+        # 根據搜尋結果過濾 (忽略台/臺與空白差異)
         if search_term:
-            filtered_places = [p for p in all_place_names if search_term in p]
+            filtered_places = place_idx.search(search_term)
         else:
             filtered_places = all_place_names
             
@@ -450,6 +337,7 @@ page_one_text = ""
 page_two_text = ""
 extracted_data = {}
 ocr_place_name = ""
+ocr_place_address = ""
 
 # 左欄：民眾申報資料 (PDF/圖片)
 with col1:
@@ -470,10 +358,12 @@ with col1:
         if st.session_state.ocr_cache.get('file_key') != file_key:
             # 1. 先轉換並顯示圖片 (讓使用者先看到預覽)
             images = []
+            text_layers = [] # 數位 PDF 的文字層 (可直接使用的頁面不需 OCR)
             if uploaded_file.type == "application/pdf":
                 # 顯示轉換訊息
                 with st.spinner("📄 正在將 PDF 轉換為圖片..."):
                     images = pdf_to_images(uploaded_file)
+                    text_layers = pdf_text_layer.extract_text_layers(uploaded_file.getvalue())
             else:
                 images = [Image.open(uploaded_file)]
             
@@ -490,7 +380,8 @@ with col1:
                 # 執行 OCR
                 pages_text = []
                 for i, img in enumerate(images):
-                    ocr_text = perform_ocr(img, tesseract_path)
+                    text_layer = text_layers[i] if i < len(text_layers) else None
+                    ocr_text = text_layer if text_layer is not None else perform_ocr(img, tesseract_path)
                     temp_all_text += ocr_text + "\n"
                     pages_text.append(ocr_text)
                     
@@ -503,7 +394,8 @@ with col1:
                 st.session_state.ocr_cache['page_one_text'] = temp_p1_text
                 st.session_state.ocr_cache['page_two_text'] = temp_p2_text
                 st.session_state.ocr_cache['pages_text'] = pages_text # 儲存所有頁面文字
-                st.session_state.ocr_cache['images'] = images 
+                # 此頁只需預覽，session 僅保留縮圖 (不保存原始解析度影像)
+                st.session_state.ocr_cache['thumbnails'] = [page_assets.make_thumbnail(img) for img in images]
                 
                 # 重新整理頁面以顯示 OCR 結果
                 st.rerun()
@@ -513,15 +405,16 @@ with col1:
         page_one_text = st.session_state.ocr_cache.get('page_one_text', "")
         page_two_text = st.session_state.ocr_cache.get('page_two_text', "")
         pages_text = st.session_state.ocr_cache.get('pages_text', [])
-        cached_images = st.session_state.ocr_cache.get('images', [])
+        cached_thumbnails = st.session_state.ocr_cache.get('thumbnails', [])
         
         # 提取資料
         extracted_data = extract_info_from_ocr(page_one_text, pages_text)
         ocr_place_name = extracted_data.get('場所名稱', '')
+        ocr_place_address = extracted_data.get('場所地址', '')
 
         # 顯示圖片與 OCR 結果 (這是 Rerun 後或 Cache Hit 會看到的)
-        for i, img in enumerate(cached_images):
-            st.image(img, caption=f"第 {i+1} 頁", use_container_width=True)
+        for i, thumbnail in enumerate(cached_thumbnails):
+            st.image(thumbnail, caption=f"第 {i+1} 頁", use_container_width=True)
             with st.expander(f"第 {i+1} 頁 OCR 文字內容 (除錯用)", expanded=False):
                 if i == 0: st.text(page_one_text)
                 elif i == 1: st.text(page_two_text)
@@ -539,26 +432,17 @@ with col1:
 
 auto_matched_place = None
 if df_system is not None and ocr_place_name:
-    # 嘗試自動搜尋
+    # 嘗試自動搜尋 (場所名稱索引)
     # 1. 完全符合
-    match = df_system[df_system['場所名稱'] == ocr_place_name]
-    if not match.empty:
-        auto_matched_place = ocr_place_name
-        target_row = match.iloc[0]
-    else:
-        # 2. 模糊/包含搜尋 (去除台/臺差異)
-        clean_ocr = ocr_place_name.replace("台", "臺").replace(" ", "")
-        
-        # 搜尋系統資料中是否有包含此名稱的
-        # 這裡做一個簡單的遍歷搜尋
-        for idx, row in df_system.iterrows():
-            sys_name = str(row['場所名稱'])
-            clean_sys = sys_name.replace("台", "臺").replace(" ", "")
-            
-            if clean_ocr and (clean_ocr in clean_sys or clean_sys in clean_ocr):
-                auto_matched_place = sys_name
-                target_row = row
-                break
+    # 2. 模糊/包含搜尋 (去除台/臺差異)
+    # 3. 地址標準鍵相同 (名稱辨識錯誤時)
+    place_idx = place_index.get_place_index(df_system)
+    matched_pos = place_idx.match(ocr_place_name)
+    if matched_pos is None and ocr_place_address:
+        matched_pos = place_idx.match_address(ocr_place_address)
+    if matched_pos is not None:
+        target_row = df_system.iloc[matched_pos]
+        auto_matched_place = str(target_row['場所名稱'])
 
 # 如果沒有自動比對到，則使用手動選擇的
 if target_row is None and selected_place and df_system is not None:
@@ -624,6 +508,9 @@ with col2:
             st.info(f"👤 目前手動選擇場所：{selected_place}")
             if ocr_place_name:
                 st.warning(f"⚠️ 系統無法自動對應 OCR 場所「{ocr_place_name}」，請確認手動選擇是否正確。")
+                candidates = place_index.get_place_index(df_system).top_k(ocr_place_name, k=3, min_score=0.3)
+                if candidates:
+                    st.caption("🔎 最相近的系統場所：" + "、".join(f"{name} ({score:.0%})" for _, name, score in candidates))
         
         if uploaded_file:
             # 顯示鎖定資訊
@@ -758,17 +645,16 @@ with col2:
             # 消防設備種類的特殊比對邏輯
             elif field == '消防設備種類':
                 if ocr_val and sys_val != ocr_val:
-                    # 轉為集合進行比對
-                    sys_set = set(sys_val.split("、")) if sys_val else set()
-                    ocr_set = set(ocr_val.split("、")) if ocr_val else set()
-                    
-                    # 去除空字串
-                    sys_set.discard("")
-                    ocr_set.discard("")
+                    # 兩邊以同一份標準清單正規化後轉為設備位元遮罩進行比對
+                    equipment_key = tuple(VALID_EQUIPMENT_LIST)
+                    missing_mask, extra_mask = equipment_vocab.diff(
+                        equipment_vocab.mask_from_str(sys_val, equipment_key),
+                        equipment_vocab.mask_from_str(ocr_val, equipment_key)
+                    )
                     
                     # 計算差異
-                    missing_in_ocr = sys_set - ocr_set # 系統有，申報無 (漏報?)
-                    extra_in_ocr = ocr_set - sys_set   # 申報有，系統無 (新增?)
+                    missing_in_ocr = equipment_vocab.decode(missing_mask) # 系統有，申報無 (漏報?)
+                    extra_in_ocr = equipment_vocab.decode(extra_mask)     # 申報有，系統無 (新增?)
                     
                     if not missing_in_ocr and not extra_in_ocr:
                         st.success(f"✅ 【{field}】一致")
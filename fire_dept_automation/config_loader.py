@@ -62,6 +62,9 @@ def get_default_config():
             "default_excel_path": "d:\\下載\\downloads\\00. 列管場所資料.xls",
             "default_tesseract_path": "C:\\Program Files\\Tesseract-OCR\\tesseract.exe"
         },
+        "ai": {
+            "prompt_token_budget": 1200
+        },
         "features": {
             "enable_2fa": True,
             "enable_line_notify": False,
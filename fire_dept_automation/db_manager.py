@@ -1,5 +1,6 @@
 import sqlite3
 import datetime
+import json
 import uuid
 import os
 import shutil
@@ -109,6 +110,24 @@ def migrate_database():
             c.execute("ALTER TABLE delivery_records ADD COLUMN photo_path TEXT")
             conn.commit()
             print("✅ 已新增 photo_path 欄位")
+        
+        # 檢查 delivery_daily_summary 表是否有 version 欄位 (日曆增量更新用)
+        c.execute("PRAGMA table_info(delivery_daily_summary)")
+        columns = [column[1] for column in c.fetchall()]
+        if columns and 'version' not in columns:
+            print("⚠️ 正在新增 version 欄位 (delivery_daily_summary)...")
+            c.execute("ALTER TABLE delivery_daily_summary ADD COLUMN version INTEGER DEFAULT 0")
+            conn.commit()
+            print("✅ 已新增 version 欄位")
+        
+        # daily_tasks 同一天同一路線只能有一筆 (排班重複產生時略過)
+        c.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_daily_tasks_route_date'")
+        if not c.fetchone():
+            _merge_duplicate_daily_tasks(c)
+            c.execute("CREATE UNIQUE INDEX idx_daily_tasks_route_date ON daily_tasks(date, route_id)")
+            # 唯一索引的前綴即可支援日期範圍查詢，舊的單欄索引只會拖慢批次寫入
+            c.execute("DROP INDEX IF EXISTS idx_daily_tasks_date")
+            conn.commit()
     
     except Exception as e:
         print(f"❌ 資料庫遷移失敗: {e}")
@@ -116,6 +135,33 @@ def migrate_database():
         conn.close()
 
 
+def _merge_duplicate_daily_tasks(c):
+    """
+    合併同一天同一路線的重複任務 (建立唯一索引前執行)
+    保留最早建立的一筆，送達紀錄移到保留的任務，志工沿用第一個有指派的任務
+    """
+    c.execute('''
+        SELECT date, route_id FROM daily_tasks
+        GROUP BY date, route_id HAVING COUNT(*) > 1
+    ''')
+    groups = c.fetchall()
+    for date, route_id in groups:
+        c.execute("SELECT id, assigned_volunteer FROM daily_tasks WHERE date = ? AND route_id = ? ORDER BY id",
+                  (date, route_id))
+        tasks = c.fetchall()
+        keep_id = tasks[0][0]
+        volunteer = next((t[1] for t in tasks if t[1]), None)
+        duplicate_ids = [t[0] for t in tasks[1:]]
+        marks = ",".join("?" * len(duplicate_ids))
+        c.execute(f"UPDATE delivery_records SET task_id = ? WHERE task_id IN ({marks})", [keep_id] + duplicate_ids)
+        c.execute(f"DELETE FROM delivery_daily_summary WHERE task_id IN ({marks})", duplicate_ids)
+        c.execute(f"DELETE FROM daily_tasks WHERE id IN ({marks})", duplicate_ids)
+        c.execute("UPDATE daily_tasks SET assigned_volunteer = ? WHERE id = ?", (volunteer, keep_id))
+        _refresh_task_summary(c, keep_id)
+    if groups:
+        print(f"⚠️ 已合併 {len(groups)} 組重複的每日任務")
+
+
 def backup_database():
     """
     資料庫自動備份
@@ -262,23 +308,17 @@ def seed_meal_data():
         today = datetime.date.today().strftime("%Y-%m-%d")
         print(f"📅 建立今天 ({today}) 的排班資料")
         
-        # Create tasks for all routes
-        for i, (name, desc, volunteer) in enumerate(routes):
-            route_id = route_ids[i]
-            # Use default volunteer if available
-            assigned = volunteer
-            c.execute("INSERT INTO daily_tasks (date, route_id, assigned_volunteer, status) VALUES (?, ?, ?, ?)", 
-                      (today, route_id, assigned, "待執行"))
+        # Create tasks for all routes (今天使用預設志工)
+        task_rows = [(today, route_ids[i], volunteer) for i, (name, desc, volunteer) in enumerate(routes)]
         
-        # 也建立未來1週的排班 (用於日曆測試)
+        # 也建立未來1週的排班 (用於日曆測試)，未來的任務不指派，留給志工認領
         for day_offset in range(1, 8):
             future_date = (datetime.date.today() + datetime.timedelta(days=day_offset)).strftime("%Y-%m-%d")
-            for i, (name, desc, volunteer) in enumerate(routes):
-                route_id = route_ids[i]
-                # 未來的任務不指派，留給志工認領
-                c.execute("INSERT INTO daily_tasks (date, route_id, assigned_volunteer, status) VALUES (?, ?, ?, ?)", 
-                          (future_date, route_id, None, "待執行"))
-                      
+            task_rows.extend((future_date, route_id, None) for route_id in route_ids)
+        c.executemany("INSERT OR IGNORE INTO daily_tasks (date, route_id, assigned_volunteer, status) VALUES (?, ?, ?, '待執行')",
+                      task_rows)
+        
+        _refresh_task_summaries(c)
         conn.commit()
         print("✅ 測試資料寫入完成 (包含今天與未來7天)")
     except Exception as e:
@@ -397,6 +437,84 @@ def init_db():
             FOREIGN KEY (elderly_id) REFERENCES elderly_profiles(id)
         )
     ''')
+    # 報表依日期範圍查詢 (daily_tasks 的唯一索引 (date, route_id) 見 migrate_database)，再以 task_id 關聯送達紀錄
+    c.execute("CREATE INDEX IF NOT EXISTS idx_delivery_records_task ON delivery_records(task_id, elderly_id)")
+
+    # Create delivery_daily_summary table (送餐系統：每日任務彙總，由寫入函式同步更新)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS delivery_daily_summary (
+            task_id INTEGER PRIMARY KEY,
+            date TEXT NOT NULL,
+            route_id INTEGER NOT NULL,
+            volunteer TEXT,
+            task_status TEXT,
+            planned_stops INTEGER DEFAULT 0,
+            visited_stops INTEGER DEFAULT 0,
+            delivered INTEGER DEFAULT 0,
+            abnormal INTEGER DEFAULT 0,
+            first_delivery TIMESTAMP,
+            last_delivery TIMESTAMP,
+            version INTEGER DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (task_id) REFERENCES daily_tasks(id)
+        )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_delivery_summary_date ON delivery_daily_summary(date, route_id, volunteer)")
+    # 彙總重算時依路線計算啟用長者數
+    c.execute("CREATE INDEX IF NOT EXISTS idx_elderly_route ON elderly_profiles(route_id, status)")
+
+    # Create route_schedules table (送餐系統：各路線的固定排班規則，由 schedule_engine 展開為 daily_tasks)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS route_schedules (
+            route_id INTEGER PRIMARY KEY,
+            weekdays TEXT DEFAULT '0,1,2,3,4',
+            skip_holidays INTEGER DEFAULT 1,
+            default_volunteer TEXT,
+            active INTEGER DEFAULT 1,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (route_id) REFERENCES delivery_routes(id)
+        )
+    ''')
+
+    # Create holidays table (送餐系統：不送餐的國定假日 / 停班日)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS holidays (
+            date TEXT PRIMARY KEY,
+            name TEXT
+        )
+    ''')
+
+    # Create geocode_cache table (地址 → 座標，由門牌資料匯入與人工補登，見 geocode_cache.py)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS geocode_cache (
+            address_key TEXT PRIMARY KEY,
+            building_key TEXT NOT NULL,
+            address TEXT,
+            lat REAL NOT NULL,
+            lon REAL NOT NULL,
+            source TEXT DEFAULT 'gazetteer',
+            updated_by TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_geocode_building ON geocode_cache(building_key)")
+
+    # Create data_versions table (資料表異動計數，由觸發程序遞增；程序內快取 (geo_index) 據此判斷是否失效)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    c.execute("INSERT OR IGNORE INTO data_versions (name, version) VALUES ('elderly_profiles', 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_elderly_profiles_version_{event.lower()}
+            AFTER {event} ON elderly_profiles
+            BEGIN
+                UPDATE data_versions SET version = version + 1 WHERE name = 'elderly_profiles';
+            END
+        ''')
     
     # Create museum_bookings table (防災館預約系統)
     c.execute('''
@@ -413,7 +531,27 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
-    
+
+    # Create case_analysis table (案件 OCR / AI 分析結果，以上傳檔案雜湊判斷是否失效)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS case_analysis (
+            case_id TEXT PRIMARY KEY,
+            file_hash TEXT NOT NULL,
+            ocr_engine TEXT,
+            pages_text TEXT,
+            page_types TEXT,
+            extracted_fields TEXT,
+            ai_result TEXT,
+            ai_model TEXT,
+            vision_analysis TEXT,
+            engine_versions TEXT,
+            timings TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (case_id) REFERENCES cases(id)
+        )
+    ''')
+
     conn.commit()
     conn.close()
     
@@ -423,6 +561,15 @@ def init_db():
     # Seed meal data if empty
     seed_meal_data()
     
+    # 既有資料庫第一次建立彙總表時，由歷史紀錄重建
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute("SELECT (SELECT COUNT(*) FROM delivery_daily_summary), (SELECT COUNT(*) FROM daily_tasks)")
+    summary_count, task_count = c.fetchone()
+    conn.close()
+    if summary_count == 0 and task_count > 0:
+        rebuild_delivery_daily_summary()
+    
     # Initialize default admin if no users exist
     init_admin_user()
 
@@ -695,10 +842,134 @@ def delete_case(case_id):
     """刪除案件"""
     conn = get_connection()
     c = conn.cursor()
+    c.execute('DELETE FROM case_analysis WHERE case_id = ?', (case_id,))
     c.execute('DELETE FROM cases WHERE id = ?', (case_id,))
     conn.commit()
     conn.close()
 
+# --- 案件分析結果 (OCR / AI) ---
+# 以 JSON 儲存的欄位
+CASE_ANALYSIS_JSON_FIELDS = ['pages_text', 'page_types', 'extracted_fields', 'ai_result',
+                             'vision_analysis', 'engine_versions', 'timings']
+
+def _decode_case_analysis(row):
+    """資料列 -> dict (JSON 欄位解碼)"""
+    analysis = dict(row)
+    for field in CASE_ANALYSIS_JSON_FIELDS:
+        if analysis.get(field):
+            analysis[field] = json.loads(analysis[field])
+    return analysis
+
+def save_case_analysis(case_id, file_hash, ocr_engine, pages_text, page_types, engine_versions=None, timings=None):
+    """
+    儲存案件的 OCR 結果 (重新辨識時一併清除舊的 AI 分析結果)
+
+    Args:
+        case_id (str): 案件單號
+        file_hash (str): 上傳檔案 SHA-256
+        ocr_engine (str): OCR 引擎
+        pages_text (list): 每頁 OCR 文字
+        page_types (list): 每頁頁面類型
+        engine_versions (dict): 引擎 / 模型版本 (例如 DPI、OCR 引擎)
+        timings (dict): 各步驟耗時 (秒)
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        c.execute('''
+            INSERT INTO case_analysis (case_id, file_hash, ocr_engine, pages_text, page_types, engine_versions, timings)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(case_id) DO UPDATE SET
+                file_hash = excluded.file_hash,
+                ocr_engine = excluded.ocr_engine,
+                pages_text = excluded.pages_text,
+                page_types = excluded.page_types,
+                engine_versions = excluded.engine_versions,
+                timings = excluded.timings,
+                extracted_fields = NULL,
+                ai_result = NULL,
+                ai_model = NULL,
+                vision_analysis = NULL,
+                updated_at = CURRENT_TIMESTAMP
+        ''', (case_id, file_hash, ocr_engine,
+              json.dumps(pages_text, ensure_ascii=False),
+              json.dumps(page_types, ensure_ascii=False),
+              json.dumps(engine_versions or {}, ensure_ascii=False),
+              json.dumps(timings or {}, ensure_ascii=False)))
+        conn.commit()
+    except Exception as e:
+        print(f"Error saving case analysis: {e}")
+    finally:
+        conn.close()
+
+def update_case_analysis_fields(case_id, updates):
+    """
+    更新案件分析結果的部分欄位 (AI 分析、擷取欄位、Vision AI)
+    updates: dict, e.g. {'ai_result': {...}, 'ai_model': 'qwen2.5:7b'}
+    """
+    if not updates:
+        return
+
+    # 白名單驗證欄位名稱，防止 SQL 注入
+    ALLOWED_FIELDS = ['extracted_fields', 'ai_result', 'ai_model', 'vision_analysis', 'timings']
+
+    safe_updates = {k: v for k, v in updates.items() if k in ALLOWED_FIELDS}
+    if not safe_updates:
+        print("Warning: No valid fields to update")
+        return
+
+    set_clause = ", ".join([f"{k} = ?" for k in safe_updates.keys()])
+    try:
+        values = [json.dumps(v, ensure_ascii=False) if k in CASE_ANALYSIS_JSON_FIELDS else v
+                  for k, v in safe_updates.items()]
+    except TypeError as e:
+        print(f"Error updating case analysis: {e}")
+        return
+    values.append(case_id)
+
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        c.execute(f"UPDATE case_analysis SET {set_clause}, updated_at = CURRENT_TIMESTAMP WHERE case_id = ?", values)
+        conn.commit()
+    except Exception as e:
+        print(f"Error updating case analysis: {e}")
+    finally:
+        conn.close()
+
+def get_case_analysis(case_id, file_hash=None, ocr_engine=None):
+    """
+    取得案件分析結果
+
+    Args:
+        case_id (str): 案件單號
+        file_hash (str): 目前檔案的 SHA-256 (不同時視為失效)
+        ocr_engine (str): 目前選用的 OCR 引擎 (不同時視為失效)
+
+    Returns:
+        dict: 分析結果 (JSON 欄位已解碼)；沒有或已失效時回傳 None
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute('SELECT * FROM case_analysis WHERE case_id = ?', (case_id,))
+    row = c.fetchone()
+    conn.close()
+    if row is None:
+        return None
+    if file_hash is not None and row['file_hash'] != file_hash:
+        return None
+    if ocr_engine is not None and row['ocr_engine'] != ocr_engine:
+        return None
+    return _decode_case_analysis(row)
+
+def delete_case_analysis(case_id):
+    """刪除案件分析結果 (強制重新辨識)"""
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute('DELETE FROM case_analysis WHERE case_id = ?', (case_id,))
+    conn.commit()
+    conn.close()
+
 # ==========================================
 # 送餐系統資料庫函式 (Meal Delivery System)
 # ==========================================
@@ -713,6 +984,7 @@ def create_elderly_profile(name, address, phone, gps_lat=None, gps_lon=None, die
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
     ''', (name, address, phone, gps_lat, gps_lon, diet_type, special_notes, route_id, sequence))
     elderly_id = c.lastrowid
+    _refresh_route_summaries(c, [route_id])
     conn.commit()
     conn.close()
     return elderly_id
@@ -730,11 +1002,59 @@ def get_elderly_by_route(route_id):
     """取得特定路線的長者名單"""
     conn = get_connection()
     c = conn.cursor()
-    c.execute('SELECT * FROM elderly_profiles WHERE route_id = ? AND status = "啟用" ORDER BY id', (route_id,))
+    c.execute('SELECT * FROM elderly_profiles WHERE route_id = ? AND status = "啟用" ORDER BY sequence, id', (route_id,))
+    profiles = c.fetchall()
+    conn.close()
+    return profiles
+
+def get_elderly_data_version():
+    """
+    長者資料的異動計數 (elderly_profiles 任何新增 / 修改 / 刪除都會由觸發程序遞增)，
+    座標索引 (geo_index) 判斷是否需重建
+
+    Returns:
+        int
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute("SELECT version FROM data_versions WHERE name = 'elderly_profiles'")
+    row = c.fetchone()
+    conn.close()
+    return row[0] if row else 0
+
+def get_elderly_missing_gps():
+    """取得啟用中、尚無座標的長者 (id, name, address, route_id)"""
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute('''
+        SELECT id, name, address, route_id FROM elderly_profiles
+        WHERE status = '啟用' AND (gps_lat IS NULL OR gps_lon IS NULL)
+        ORDER BY route_id, sequence, id
+    ''')
     profiles = c.fetchall()
     conn.close()
     return profiles
 
+def update_elderly_gps(updates):
+    """
+    批次更新長者座標
+
+    Args:
+        updates (list): (lat, lon, elderly_id)
+
+    Returns:
+        int: 更新筆數
+    """
+    updates = list(updates)
+    if not updates:
+        return 0
+    conn = get_connection()
+    c = conn.cursor()
+    c.executemany('UPDATE elderly_profiles SET gps_lat = ?, gps_lon = ? WHERE id = ?', updates)
+    conn.commit()
+    conn.close()
+    return len(updates)
+
 def update_elderly_profile_fields(profile_id, updates):
     """
     更新長者資料 (用於 st.data_editor)
@@ -762,18 +1082,112 @@ def update_elderly_profile_fields(profile_id, updates):
     values.append(profile_id)
     
     try:
+        if 'route_id' in safe_updates or 'status' in safe_updates:
+            c.execute('SELECT route_id FROM elderly_profiles WHERE id = ?', (profile_id,))
+            row = c.fetchone()
+            affected = {row[0] if row else None, safe_updates.get('route_id')}
+        else:
+            affected = set()
         c.execute(f"UPDATE elderly_profiles SET {set_clause} WHERE id = ?", values)
+        _refresh_route_summaries(c, affected)
         conn.commit()
     except Exception as e:
         print(f"Error updating profile: {e}")
     finally:
         conn.close()
 
+ELDERLY_EDITABLE_FIELDS = ['name', 'address', 'phone', 'gps_lat', 'gps_lon',
+                           'diet_type', 'special_notes', 'route_id', 'sequence', 'status']
+
+def bulk_sync_elderly_profiles(original_df, edited_df):
+    """
+    將 st.data_editor 的編輯結果一次寫回 (只處理有變動的列，同一交易)
+
+    - 新增：edited_df 中沒有 id 的列 (姓名空白的列略過)
+    - 更新：欄位值與 original_df 不同的列
+    - 刪除：original_df 有、edited_df 沒有的列 (軟刪除，status 改為停用)
+    - 受影響路線 (新舊 route_id) 的站點數量一併重新計算
+
+    Args:
+        original_df (pd.DataFrame): 編輯前的資料 (含 id 欄)
+        edited_df (pd.DataFrame): st.data_editor 回傳的資料
+
+    Returns:
+        dict: {'inserted': 筆數, 'updated': 筆數, 'deleted': 筆數}；失敗時回傳 None (全部不寫入)
+    """
+    import pandas as pd
+
+    def clean(value):
+        # NaN / NaT -> None，numpy 純量 -> Python 型別 (sqlite3 無法綁定 numpy 型別)
+        if value is None or pd.isna(value):
+            return None
+        return value.item() if hasattr(value, 'item') else value
+
+    fields = [f for f in ELDERLY_EDITABLE_FIELDS if f in edited_df.columns]
+    original = {}
+    for row in original_df.to_dict('records'):
+        if clean(row.get('id')) is not None:
+            original[int(row['id'])] = {f: clean(row.get(f)) for f in ELDERLY_EDITABLE_FIELDS}
+
+    inserts, updates, kept = [], [], set()
+    affected_routes = set()
+    for row in edited_df.to_dict('records'):
+        values = {f: clean(row.get(f)) for f in fields}
+        row_id = clean(row.get('id'))
+        if row_id is None or int(row_id) not in original:
+            if not values.get('name'):
+                continue
+            inserts.append(values)
+            affected_routes.add(values.get('route_id'))
+            continue
+
+        row_id = int(row_id)
+        kept.add(row_id)
+        before = original[row_id]
+        if any(values[f] != before[f] for f in fields):
+            updates.append((row_id, values))
+            if values.get('route_id') != before['route_id'] or values.get('status') != before['status']:
+                affected_routes.update([before['route_id'], values.get('route_id')])
+    deletes = [pid for pid in original if pid not in kept and original[pid]['status'] != "停用"]
+    affected_routes.update(original[pid]['route_id'] for pid in deletes)
+
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        if inserts:
+            c.executemany('''
+                INSERT INTO elderly_profiles (name, address, phone, gps_lat, gps_lon, diet_type, special_notes, route_id, sequence, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(v['name'], v.get('address') or "", v.get('phone'), v.get('gps_lat'), v.get('gps_lon'),
+                   v.get('diet_type') or "", v.get('special_notes') or "", v.get('route_id'),
+                   v.get('sequence') or 0, v.get('status') or "啟用") for v in inserts])
+        if updates:
+            set_clause = ", ".join(f"{f} = ?" for f in fields)
+            c.executemany(f"UPDATE elderly_profiles SET {set_clause} WHERE id = ?",
+                          [[values[f] for f in fields] + [row_id] for row_id, values in updates])
+        if deletes:
+            c.executemany('UPDATE elderly_profiles SET status = "停用" WHERE id = ?', [(pid,) for pid in deletes])
+        _refresh_route_stop_counts(c, affected_routes)
+        _refresh_route_summaries(c, affected_routes)
+        conn.commit()
+    except Exception as e:
+        print(f"Error syncing elderly profiles: {e}")
+        conn.rollback()
+        return None
+    finally:
+        conn.close()
+
+    return {'inserted': len(inserts), 'updated': len(updates), 'deleted': len(deletes)}
+
 def delete_elderly_profile(profile_id):
     """刪除長者資料 (軟刪除)"""
     conn = get_connection()
     c = conn.cursor()
     c.execute('UPDATE elderly_profiles SET status = "停用" WHERE id = ?', (profile_id,))
+    c.execute('SELECT route_id FROM elderly_profiles WHERE id = ?', (profile_id,))
+    row = c.fetchone()
+    if row:
+        _refresh_route_summaries(c, [row[0]])
     conn.commit()
     conn.close()
 
@@ -793,9 +1207,10 @@ def create_delivery_route(route_name, description="", default_volunteer_id=None)
         # 2. 自動建立今日任務
         today = datetime.date.today().strftime("%Y-%m-%d")
         c.execute('''
-            INSERT INTO daily_tasks (date, route_id, assigned_volunteer, status)
+            INSERT OR IGNORE INTO daily_tasks (date, route_id, assigned_volunteer, status)
             VALUES (?, ?, ?, ?)
         ''', (today, route_id, default_volunteer_id, '未配送'))
+        _refresh_task_summary(c, c.lastrowid)
         
         conn.commit()
         return route_id
@@ -825,20 +1240,256 @@ def update_route_stop_count(route_id):
     conn.commit()
     conn.close()
 
+def _refresh_route_stop_counts(c, route_ids):
+    """重新計算指定路線的站點數量 (使用呼叫端的 cursor，與其他寫入同一交易)"""
+    c.executemany('''
+        UPDATE delivery_routes SET num_stops = (
+            SELECT COUNT(*) FROM elderly_profiles WHERE route_id = delivery_routes.id AND status = "啟用"
+        ) WHERE id = ?
+    ''', [(route_id,) for route_id in route_ids if route_id is not None])
+
+def update_elderly_routes(assignments):
+    """
+    批次更新長者所屬路線，並重新計算受影響路線的站點數量 (同一交易)
+
+    Args:
+        assignments (dict): 長者 ID -> 新路線 ID
+    """
+    if not assignments:
+        return
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        ids = list(assignments)
+        affected = set(assignments.values())
+        for start in range(0, len(ids), 500):  # SQLite 參數數量上限
+            chunk = ids[start:start + 500]
+            c.execute(f'SELECT DISTINCT route_id FROM elderly_profiles WHERE id IN ({",".join("?" * len(chunk))})', chunk)
+            affected.update(row[0] for row in c.fetchall())
+        c.executemany('UPDATE elderly_profiles SET route_id = ? WHERE id = ?',
+                      [(route_id, elderly_id) for elderly_id, route_id in assignments.items()])
+        _refresh_route_stop_counts(c, affected)
+        _refresh_route_summaries(c, affected)
+        conn.commit()
+    except Exception as e:
+        print(f"Error updating elderly routes: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+def update_route_sequence(route_id, ordered_ids, estimated_time=None):
+    """
+    依新順序寫回路線上長者的 sequence (1, 2, 3...) 與路線預估時間 (同一交易)
+
+    Args:
+        route_id (int): 路線 ID
+        ordered_ids (list): 依送餐順序排列的長者 ID
+        estimated_time (int): 預估時間 (分鐘)，None 時不更新
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        c.executemany('UPDATE elderly_profiles SET sequence = ? WHERE id = ? AND route_id = ?',
+                      [(seq, elderly_id, route_id) for seq, elderly_id in enumerate(ordered_ids, start=1)])
+        if estimated_time is not None:
+            c.execute('UPDATE delivery_routes SET estimated_time = ? WHERE id = ?', (estimated_time, route_id))
+        conn.commit()
+    except Exception as e:
+        print(f"Error updating route sequence: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+# --- 地址座標快取 (geocode_cache.py) ---
+def save_geocodes(rows, source="gazetteer", updated_by=None):
+    """
+    寫入地址座標 (同一地址鍵覆蓋)；門牌資料匯入不覆蓋人工補登 (source = 'reviewer') 的座標
+
+    Args:
+        rows (iterable): (address_key, building_key, address, lat, lon)
+        source (str): 'gazetteer' (門牌資料匯入) 或 'reviewer' (人工補登)
+        updated_by (str): 補登人員帳號
+
+    Returns:
+        int: 寫入 (含覆蓋) 筆數
+    """
+    protect = "WHERE geocode_cache.source != 'reviewer'" if source != "reviewer" else ""
+    conn = get_connection()
+    c = conn.cursor()
+    c.executemany(f'''
+        INSERT INTO geocode_cache (address_key, building_key, address, lat, lon, source, updated_by, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(address_key) DO UPDATE SET
+            building_key = excluded.building_key, address = excluded.address,
+            lat = excluded.lat, lon = excluded.lon, source = excluded.source,
+            updated_by = excluded.updated_by, updated_at = excluded.updated_at
+        {protect}
+    ''', [tuple(row) + (source, updated_by) for row in rows])
+    count = c.rowcount
+    conn.commit()
+    conn.close()
+    return count
+
+def get_geocodes(address_keys=(), building_keys=()):
+    """
+    依地址鍵 / 門牌鍵查詢座標
+
+    Args:
+        address_keys (iterable): 含鄉鎮的地址鍵
+        building_keys (iterable): 不含鄉鎮的門牌鍵 (地址未寫鄉鎮時使用)
+
+    Returns:
+        tuple: ({address_key: (lat, lon)}, {building_key: [(lat, lon), ...]})
+    """
+    by_address, by_building = {}, {}
+    conn = get_connection()
+    c = conn.cursor()
+    for column, keys, target in (("address_key", address_keys, by_address), ("building_key", building_keys, by_building)):
+        keys = sorted(set(keys))
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            c.execute(f'SELECT {column}, lat, lon FROM geocode_cache WHERE {column} IN ({",".join("?" * len(chunk))})', chunk)
+            for key, lat, lon in c.fetchall():
+                if column == "address_key":
+                    target[key] = (lat, lon)
+                else:
+                    target.setdefault(key, []).append((lat, lon))
+    conn.close()
+    return by_address, by_building
+
+# --- 排班規則 (schedule_engine 展開為 daily_tasks) ---
+def get_route_schedules(active_only=True):
+    """
+    取得各路線的排班規則 (含路線名稱)
+
+    Args:
+        active_only (bool): 只取啟用中的規則
+
+    Returns:
+        list: sqlite3.Row (route_id, weekdays, skip_holidays, default_volunteer, active, route_name)
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute(f'''
+        SELECT rs.*, dr.route_name
+        FROM route_schedules rs
+        JOIN delivery_routes dr ON rs.route_id = dr.id
+        {"WHERE rs.active = 1" if active_only else ""}
+        ORDER BY dr.route_name
+    ''')
+    schedules = c.fetchall()
+    conn.close()
+    return schedules
+
+def save_route_schedule(route_id, weekdays, skip_holidays=True, default_volunteer=None, active=True):
+    """
+    新增或更新路線的排班規則
+
+    Args:
+        route_id (int): 路線 ID
+        weekdays (str): 送餐的星期，逗號分隔 (週一 = 0 ... 週日 = 6)，例如 "0,2,4"
+        skip_holidays (bool): 國定假日是否停送
+        default_volunteer (str): 預設志工帳號，None 表示留給志工認領
+        active (bool): 是否啟用
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute('''
+        INSERT OR REPLACE INTO route_schedules (route_id, weekdays, skip_holidays, default_volunteer, active, updated_at)
+        VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ''', (route_id, weekdays, int(bool(skip_holidays)), default_volunteer or None, int(bool(active))))
+    conn.commit()
+    conn.close()
+
+def get_holidays(start_date, end_date):
+    """取得日期範圍內的停送假日 (date -> name)"""
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute('SELECT date, name FROM holidays WHERE date BETWEEN ? AND ? ORDER BY date', (start_date, end_date))
+    holidays = {row['date']: row['name'] for row in c.fetchall()}
+    conn.close()
+    return holidays
+
+def save_holidays(holidays):
+    """
+    匯入停送假日 (同日期覆蓋)
+
+    Args:
+        holidays (iterable): (date, name) 序列
+
+    Returns:
+        int: 寫入筆數
+    """
+    holidays = list(holidays)
+    conn = get_connection()
+    c = conn.cursor()
+    c.executemany('INSERT OR REPLACE INTO holidays (date, name) VALUES (?, ?)', holidays)
+    conn.commit()
+    conn.close()
+    return len(holidays)
+
 # --- 每日任務管理 ---
 def create_daily_task(date, route_id, assigned_volunteer=None):
-    """建立每日送餐任務"""
+    """建立每日送餐任務 (同一天同一路線已有任務時不重複建立，回傳既有任務 ID)"""
     conn = get_connection()
     c = conn.cursor()
     c.execute('''
-        INSERT INTO daily_tasks (date, route_id, assigned_volunteer, status)
+        INSERT OR IGNORE INTO daily_tasks (date, route_id, assigned_volunteer, status)
         VALUES (?, ?, ?, "待執行")
     ''', (date, route_id, assigned_volunteer))
-    task_id = c.lastrowid
+    if c.rowcount:
+        task_id = c.lastrowid
+        _refresh_task_summary(c, task_id)
+    else:
+        c.execute('SELECT id FROM daily_tasks WHERE date = ? AND route_id = ?', (date, route_id))
+        task_id = c.fetchone()[0]
     conn.commit()
     conn.close()
     return task_id
 
+def insert_daily_tasks(tasks, batch_size=5000):
+    """
+    批次建立每日任務 (已存在的日期 + 路線略過)
+
+    Args:
+        tasks (iterable): (date, route_id, assigned_volunteer) 序列
+        batch_size (int): 每次 executemany 的筆數
+
+    Returns:
+        int: 實際新增的任務數；失敗時回傳 None
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        c.execute('SELECT COALESCE(MAX(id), 0) FROM daily_tasks')
+        last_id = c.fetchone()[0]
+        created = 0
+        batch = []
+        for task in tasks:
+            batch.append(task)
+            if len(batch) >= batch_size:
+                created += _insert_task_batch(c, batch)
+                batch = []
+        if batch:
+            created += _insert_task_batch(c, batch)
+        if created:
+            _insert_new_task_summaries(c, last_id)
+        conn.commit()
+        return created
+    except Exception as e:
+        print(f"❌ 批次建立任務失敗: {e}")
+        conn.rollback()
+        return None
+    finally:
+        conn.close()
+
+def _insert_task_batch(c, batch):
+    c.executemany('''
+        INSERT OR IGNORE INTO daily_tasks (date, route_id, assigned_volunteer, status)
+        VALUES (?, ?, ?, '待執行')
+    ''', batch)
+    return c.rowcount
+
 def get_tasks_by_date(date):
     """取得特定日期的所有任務"""
     conn = get_connection()
@@ -854,20 +1505,73 @@ def get_tasks_by_date(date):
     conn.close()
     return tasks
 
+_CALENDAR_TASK_SQL = '''
+    SELECT dt.*, dr.route_name, dr.description, s.planned_stops, s.visited_stops
+    FROM daily_tasks dt
+    JOIN delivery_routes dr ON dt.route_id = dr.id
+    LEFT JOIN delivery_daily_summary s ON s.task_id = dt.id
+    WHERE {where}
+    ORDER BY dt.date, dr.route_name
+'''
+
 def get_tasks_by_date_range(start_date, end_date):
     """取得指定日期範圍內的所有任務 (用於行事曆)"""
     conn = get_connection()
     c = conn.cursor()
+    c.execute(_CALENDAR_TASK_SQL.format(where="dt.date BETWEEN ? AND ?"), (start_date, end_date))
+    tasks = c.fetchall()
+    conn.close()
+    return tasks
+
+def get_tasks_by_dates(dates):
+    """
+    取得指定日期 (不連續) 的所有任務，欄位與 get_tasks_by_date_range 相同
+
+    Args:
+        dates (list): 日期 YYYY-MM-DD
+
+    Returns:
+        list: sqlite3.Row，依日期、路線名稱排序
+    """
+    dates = sorted(set(dates))
+    if not dates:
+        return []
+    conn = get_connection()
+    c = conn.cursor()
+    tasks = []
+    for i in range(0, len(dates), 500):
+        chunk = dates[i:i + 500]
+        c.execute(_CALENDAR_TASK_SQL.format(where=f"dt.date IN ({','.join('?' * len(chunk))})"), chunk)
+        tasks.extend(c.fetchall())
+    conn.close()
+    return tasks
+
+def get_task_day_versions(start_date, end_date):
+    """
+    取得日期範圍內每天的任務資料版本 (任務數, 彙總版本合計)
+
+    建立任務、指派 / 釋出志工、打卡都會重算該任務的彙總列並使 version + 1，
+    因此只有異動的那一天版本會改變。
+
+    Args:
+        start_date (str): 開始日期 YYYY-MM-DD
+        end_date (str): 結束日期 YYYY-MM-DD
+
+    Returns:
+        dict: 日期 -> (任務數, 版本合計)
+    """
+    conn = get_connection()
+    c = conn.cursor()
     c.execute('''
-        SELECT dt.*, dr.route_name, dr.description
+        SELECT dt.date, COUNT(*), COALESCE(SUM(s.version), 0)
         FROM daily_tasks dt
-        JOIN delivery_routes dr ON dt.route_id = dr.id
+        LEFT JOIN delivery_daily_summary s ON s.task_id = dt.id
         WHERE dt.date BETWEEN ? AND ?
-        ORDER BY dt.date, dr.route_name
+        GROUP BY dt.date
     ''', (start_date, end_date))
-    tasks = c.fetchall()
+    versions = {row[0]: (row[1], row[2]) for row in c.fetchall()}
     conn.close()
-    return tasks
+    return versions
 
 def get_my_tasks_today(username, date):
     """取得當前使用者今日的任務"""
@@ -888,6 +1592,7 @@ def update_task_volunteer(task_id, new_volunteer):
     conn = get_connection()
     c = conn.cursor()
     c.execute('UPDATE daily_tasks SET assigned_volunteer = ? WHERE id = ?', (new_volunteer, task_id))
+    _refresh_task_summary(c, task_id)
     conn.commit()
     conn.close()
 
@@ -896,6 +1601,7 @@ def update_task_status(task_id, status):
     conn = get_connection()
     c = conn.cursor()
     c.execute('UPDATE daily_tasks SET status = ? WHERE id = ?', (status, task_id))
+    _refresh_task_summary(c, task_id)
     conn.commit()
     conn.close()
 
@@ -919,44 +1625,156 @@ def get_task_events(start_date, end_date, current_user=None):
     Returns:
         list: 日曆事件列表, 每個事件包含 title, start, backgroundColor 等欄位
     """
-    tasks = get_tasks_by_date_range(start_date, end_date)
-    events = []
+    return [task_to_event(task, current_user) for task in get_tasks_by_date_range(start_date, end_date)]
+
+def task_to_event(task, current_user=None):
+    """
+    將任務 (get_tasks_by_date_range 的一列) 轉為日曆事件
+
+    Args:
+        task: sqlite3.Row 或 dict
+        current_user: 當前使用者帳號 (用於顏色區分), 可為 None
+
+    Returns:
+        dict: 日曆事件
+    """
+    volunteer = task['assigned_volunteer']
+    route_name = task['route_name']
+    task_date = str(task['date']) # Ensure string format YYYY-MM-DD
+    task_id = task['id']
     
-    for task in tasks:
-        volunteer = task['assigned_volunteer']
-        route_name = task['route_name']
-        task_date = str(task['date']) # Ensure string format YYYY-MM-DD
-        task_id = task['id']
-        
-        # 顏色邏輯
-        if not volunteer:
-            # 缺人 -> 紅色
-            color = "#FF4B4B"
-            title = f"🔴 {route_name} (缺人)"
-        elif current_user and volunteer == current_user:
-            # 自己 -> 綠色
-            color = "#3DD598"
-            title = f"🟢 {route_name} (我)"
-        else:
-            # 別人 -> 藍色
-            color = "#3788d8" 
-            title = f"👤 {route_name} ({volunteer})"
-            
-        events.append({
-            "title": title,
-            "start": task_date,
-            "allDay": True,
-            "backgroundColor": color,
-            "borderColor": color,
-            "extendedProps": {
-                "taskId": task_id,
-                "currentVolunteer": volunteer,
-                "routeId": task['route_id'],
-                "routeName": route_name
-            }
-        })
+    # 顏色邏輯
+    if not volunteer:
+        # 缺人 -> 紅色
+        color = "#FF4B4B"
+        title = f"🔴 {route_name} (缺人)"
+    elif current_user and volunteer == current_user:
+        # 自己 -> 綠色
+        color = "#3DD598"
+        title = f"🟢 {route_name} (我)"
+    else:
+        # 別人 -> 藍色
+        color = "#3788d8" 
+        title = f"👤 {route_name} ({volunteer})"
+    
+    # 配送進度 (來自每日彙總)
+    planned = task['planned_stops'] or 0
+    visited = task['visited_stops'] or 0
+    if visited:
+        title += f" {visited}/{planned}"
         
-    return events
+    return {
+        "title": title,
+        "start": task_date,
+        "allDay": True,
+        "backgroundColor": color,
+        "borderColor": color,
+        "extendedProps": {
+            "taskId": task_id,
+            "currentVolunteer": volunteer,
+            "routeId": task['route_id'],
+            "routeName": route_name,
+            "plannedStops": planned,
+            "visitedStops": visited
+        }
+    }
+
+# --- 每日送餐彙總 (delivery_daily_summary) ---
+# 每個每日任務一列 (日期、路線、志工)：應送站數、已拜訪、已送達、異常與首末筆打卡時間。
+# 建立任務、指派志工、打卡、路線成員異動時由各寫入函式在同一交易中重算該任務的一列，
+# 儀表板、日曆與月報只讀取這張小表，不再掃描 delivery_records。
+# 過去日期的應送站數保留當時的值 (長者轉路線或停用不影響歷史)。
+# 每次重算 version + 1，日曆 (calendar_events) 依每日版本只重新查詢有異動的日期。
+_SUMMARY_REFRESH_SQL = '''
+    INSERT OR REPLACE INTO delivery_daily_summary (
+        task_id, date, route_id, volunteer, task_status, planned_stops,
+        visited_stops, delivered, abnormal, first_delivery, last_delivery, version, updated_at
+    )
+    SELECT 
+        dt.id, dt.date, dt.route_id, dt.assigned_volunteer, dt.status,
+        CASE WHEN dt.date < date('now', 'localtime') AND s.task_id IS NOT NULL THEN s.planned_stops
+             ELSE (SELECT COUNT(*) FROM elderly_profiles ep WHERE ep.route_id = dt.route_id AND ep.status = '啟用')
+        END,
+        COUNT(DISTINCT rec.elderly_id),
+        COUNT(DISTINCT CASE WHEN rec.status = '已送達' THEN rec.elderly_id END),
+        COUNT(DISTINCT CASE WHEN rec.status != '已送達' THEN rec.elderly_id END),
+        MIN(rec.delivery_time),
+        MAX(rec.delivery_time),
+        COALESCE(s.version, 0) + 1,
+        CURRENT_TIMESTAMP
+    FROM daily_tasks dt
+    LEFT JOIN delivery_daily_summary s ON s.task_id = dt.id
+    LEFT JOIN delivery_records rec ON rec.task_id = dt.id
+    WHERE {where}
+    GROUP BY dt.id
+'''
+
+def _refresh_task_summaries(c, where="1 = 1", params=()):
+    """重算符合條件的任務彙總 (使用呼叫端的 cursor，與其他寫入同一交易)"""
+    c.execute(_SUMMARY_REFRESH_SQL.format(where=where), params)
+
+def _refresh_task_summary(c, task_id):
+    """重算單一任務的彙總"""
+    _refresh_task_summaries(c, "dt.id = ?", (task_id,))
+
+def _refresh_route_summaries(c, route_ids):
+    """路線成員異動後，重算該路線今天與未來任務的應送站數"""
+    c.executemany(_SUMMARY_REFRESH_SQL.format(where="dt.route_id = ? AND dt.date >= date('now', 'localtime')"),
+                  [(route_id,) for route_id in set(route_ids) if route_id is not None])
+
+def _insert_new_task_summaries(c, last_id):
+    """批次新增的任務 (id > last_id) 尚無送達紀錄：應送站數依路線一次彙總，其餘為 0"""
+    c.execute('''
+        INSERT OR REPLACE INTO delivery_daily_summary (
+            task_id, date, route_id, volunteer, task_status, planned_stops, version, updated_at
+        )
+        SELECT dt.id, dt.date, dt.route_id, dt.assigned_volunteer, dt.status, COALESCE(rc.stops, 0), 1, CURRENT_TIMESTAMP
+        FROM daily_tasks dt
+        LEFT JOIN (
+            SELECT route_id, COUNT(*) AS stops FROM elderly_profiles WHERE status = '啟用' GROUP BY route_id
+        ) rc ON rc.route_id = dt.route_id
+        WHERE dt.id > ?
+    ''', (last_id,))
+
+def rebuild_delivery_daily_summary():
+    """
+    由 daily_tasks / delivery_records 重建整張彙總表 (資料修復或匯入歷史資料後執行)
+
+    Returns:
+        int: 彙總列數
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        c.execute('DELETE FROM delivery_daily_summary WHERE task_id NOT IN (SELECT id FROM daily_tasks)')
+        _refresh_task_summaries(c)
+        conn.commit()
+        c.execute('SELECT COUNT(*) FROM delivery_daily_summary')
+        count = c.fetchone()[0]
+    finally:
+        conn.close()
+    print(f"📊 已重建每日送餐彙總: {count} 筆")
+    return count
+
+def get_task_summaries(task_ids):
+    """
+    取得任務彙總
+
+    Args:
+        task_ids (list): 任務 ID
+
+    Returns:
+        dict: task_id -> sqlite3.Row
+    """
+    task_ids = list(task_ids)
+    if not task_ids:
+        return {}
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute(f'SELECT * FROM delivery_daily_summary WHERE task_id IN ({",".join("?" * len(task_ids))})', task_ids)
+    summaries = {row['task_id']: row for row in c.fetchall()}
+    conn.close()
+    return summaries
 
 # --- 送達紀錄管理 ---
 def create_delivery_record(task_id, elderly_id, status="已送達", notes="", photo_path=None, volunteer_id=None, abnormal_reason=None):
@@ -968,6 +1786,7 @@ def create_delivery_record(task_id, elderly_id, status="已送達", notes="", ph
         VALUES (?, ?, ?, ?, ?, ?, ?)
     ''', (task_id, elderly_id, status, notes, photo_path, volunteer_id, abnormal_reason))
     record_id = c.lastrowid
+    _refresh_task_summary(c, task_id)
     conn.commit()
     conn.close()
     return record_id
@@ -996,32 +1815,186 @@ def check_delivery_status(task_id, elderly_id):
     conn.close()
     return record is not None
 
+def get_delivered_elderly_ids(task_id):
+    """取得任務中已有送達紀錄 (含異常) 的長者 ID，取代逐戶 check_delivery_status"""
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute('SELECT DISTINCT elderly_id FROM delivery_records WHERE task_id = ?', (task_id,))
+    elderly_ids = {row[0] for row in c.fetchall()}
+    conn.close()
+    return elderly_ids
+
+def sync_delivery_checkins(checkins):
+    """
+    批次寫入志工打卡 (checkin_queue 離線累積後同步)
+
+    以 (task_id, elderly_id) 為冪等鍵：該長者在該任務已有紀錄時略過，
+    同一批重送或斷線後重播都不會重複建立。全部在同一交易中寫入，
+    每個任務的彙總只重算一次。
+
+    Args:
+        checkins (list): dict，需有 task_id / elderly_id，可含 status / notes / photo_path /
+                         volunteer_id / abnormal_reason / delivery_time (UTC，YYYY-MM-DD HH:MM:SS)
+
+    Returns:
+        dict: {'inserted': 新增筆數, 'duplicates': 已存在而略過的筆數}；失敗時回傳 None (全部回滾)
+    """
+    rows = [(
+        item['task_id'], item['elderly_id'], item.get('status') or '已送達', item.get('notes') or '',
+        item.get('photo_path'), item.get('volunteer_id'), item.get('abnormal_reason'), item.get('delivery_time'),
+        item['task_id'], item['elderly_id']
+    ) for item in checkins]
+    if not rows:
+        return {'inserted': 0, 'duplicates': 0}
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        c.executemany('''
+            INSERT INTO delivery_records (task_id, elderly_id, status, notes, photo_path, volunteer_id, abnormal_reason, delivery_time)
+            SELECT ?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP)
+            WHERE NOT EXISTS (SELECT 1 FROM delivery_records WHERE task_id = ? AND elderly_id = ?)
+        ''', rows)
+        inserted = c.rowcount
+        for task_id in {row[0] for row in rows}:
+            _refresh_task_summary(c, task_id)
+        conn.commit()
+    except Exception as e:
+        print(f"❌ 打卡同步失敗: {e}")
+        conn.rollback()
+        return None
+    finally:
+        conn.close()
+    print(f"📡 打卡同步: 新增 {inserted} 筆，略過重複 {len(rows) - inserted} 筆")
+    return {'inserted': inserted, 'duplicates': len(rows) - inserted}
+
+DELIVERY_REPORT_SQL = '''
+    SELECT 
+        dt.date,
+        dr.route_name,
+        COALESCE(ep.name, '(已刪除的個案)') as elderly_name,
+        rec.volunteer_id,
+        rec.status,
+        rec.abnormal_reason,
+        rec.notes,
+        rec.photo_path,
+        rec.delivery_time
+    FROM delivery_records rec
+    JOIN daily_tasks dt ON rec.task_id = dt.id
+    JOIN delivery_routes dr ON dt.route_id = dr.id
+    LEFT JOIN elderly_profiles ep ON rec.elderly_id = ep.id
+    WHERE dt.date BETWEEN ? AND ?
+    ORDER BY dt.date DESC, dr.route_name, ep.sequence, rec.id
+'''
+
 def get_delivery_reports(start_date, end_date):
     """
-    取得送餐報表
+    取得送餐報表 (一次載入全部；大範圍請改用 iter_delivery_reports / get_delivery_reports_page)
     Returns: list of dicts (Date, Route, Elderly, Volunteer, Status, Notes, Photo)
     """
+    return [row for chunk in iter_delivery_reports(start_date, end_date) for row in chunk]
+
+def iter_delivery_reports(start_date, end_date, chunk_size=1000):
+    """
+    以 cursor 分批讀取送餐報表 (不會一次把整個期間載入記憶體)
+
+    Args:
+        start_date (str): 開始日期 YYYY-MM-DD
+        end_date (str): 結束日期 YYYY-MM-DD
+        chunk_size (int): 每批筆數
+
+    Yields:
+        list: 每批最多 chunk_size 筆 sqlite3.Row
+    """
+    conn = get_connection()
+    try:
+        c = conn.cursor()
+        c.execute(DELIVERY_REPORT_SQL, (start_date, end_date))
+        while True:
+            rows = c.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+def count_delivery_reports(start_date, end_date):
+    """
+    送餐報表總筆數 (分頁用)
+
+    與 DELIVERY_REPORT_SQL 及每日彙總相同的資料範圍：長者資料已刪除的紀錄仍計入，
+    報表表頭的筆數與 KPI 彙總不會對不起來。
+    """
     conn = get_connection()
     c = conn.cursor()
     c.execute('''
-        SELECT 
-            dt.date,
-            dr.route_name,
-            ep.name as elderly_name,
-            rec.volunteer_id,
-            rec.status,
-            rec.abnormal_reason,
-            rec.notes,
-            rec.photo_path,
-            rec.delivery_time
+        SELECT COUNT(*)
         FROM delivery_records rec
         JOIN daily_tasks dt ON rec.task_id = dt.id
-        JOIN elderly_profiles ep ON rec.elderly_id = ep.id
         JOIN delivery_routes dr ON dt.route_id = dr.id
         WHERE dt.date BETWEEN ? AND ?
-        ORDER BY dt.date DESC, dr.route_name, ep.sequence
     ''', (start_date, end_date))
-    
+    count = c.fetchone()[0]
+    conn.close()
+    return count
+
+def get_delivery_reports_page(start_date, end_date, page=1, page_size=100):
+    """
+    取得送餐報表的單一分頁 (畫面表格用，由 SQLite 處理 LIMIT / OFFSET)
+
+    Args:
+        page (int): 頁碼 (從 1 開始)
+        page_size (int): 每頁筆數
+
+    Returns:
+        list: sqlite3.Row
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute(DELIVERY_REPORT_SQL + " LIMIT ? OFFSET ?",
+              (start_date, end_date, page_size, max(page - 1, 0) * page_size))
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+def get_delivery_report_summary(start_date, end_date, group_by="route"):
+    """
+    送餐 KPI 彙總 (讀取 delivery_daily_summary，不掃描送達紀錄)
+
+    Args:
+        group_by (str): "route" (每條路線)、"date" (每日)、"volunteer" (每位志工) 或 "month" (每月)
+
+    Returns:
+        list: sqlite3.Row (分組欄位、tasks、planned_stops、visited_stops、delivered、abnormal、
+              completion_rate (%)、first_delivery、last_delivery)
+    """
+    GROUP_COLUMNS = {
+        "route": ("dr.route_name", "route_name"),
+        "date": ("s.date", "date"),
+        "volunteer": ("COALESCE(s.volunteer, '(未指派)')", "volunteer"),
+        "month": ("substr(s.date, 1, 7)", "month"),
+    }
+    if group_by not in GROUP_COLUMNS:
+        raise ValueError(f"不支援的彙總方式: {group_by}")
+    column, alias = GROUP_COLUMNS[group_by]
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute(f'''
+        SELECT 
+            {column} as {alias},
+            COUNT(*) as tasks,
+            SUM(s.planned_stops) as planned_stops,
+            SUM(s.visited_stops) as visited_stops,
+            SUM(s.delivered) as delivered,
+            SUM(s.abnormal) as abnormal,
+            ROUND(100.0 * SUM(s.visited_stops) / NULLIF(SUM(s.planned_stops), 0), 1) as completion_rate,
+            MIN(s.first_delivery) as first_delivery,
+            MAX(s.last_delivery) as last_delivery
+        FROM delivery_daily_summary s
+        JOIN delivery_routes dr ON s.route_id = dr.id
+        WHERE s.date BETWEEN ? AND ?
+        GROUP BY {column}
+        ORDER BY {column}
+    ''', (start_date, end_date))
     rows = c.fetchall()
     conn.close()
     return rows
@@ -1104,7 +2077,7 @@ def reset_meal_data():
         
         # 刪除所有送餐相關表格資料（保留表結構）
         # 使用白名單驗證 table 名稱，防止 SQL 注入
-        ALLOWED_TABLES = ['delivery_records', 'daily_tasks', 'elderly_profiles', 'delivery_routes']
+        ALLOWED_TABLES = ['delivery_daily_summary', 'delivery_records', 'daily_tasks', 'elderly_profiles', 'route_schedules', 'delivery_routes']
         for table in ALLOWED_TABLES:
             # 直接使用白名單中的值，無需額外驗證
             c.execute(f"DELETE FROM {table}")
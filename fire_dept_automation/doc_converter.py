@@ -0,0 +1,502 @@
+import atexit
+import concurrent.futures
+import json
+import os
+import queue
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import file_hash
+
+# ==========================================
+# Word -> PDF 轉檔服務 (常駐 LibreOffice)
+# ==========================================
+# 每次上傳都啟動一次 soffice --convert-to 需要數秒冷啟動，且輸出到原檔旁邊 (同名檔案會互相覆蓋)。
+#   - 少量常駐的 headless soffice (UNO socket)，由工作執行緒從佇列取出轉檔工作
+#   - 每個工作使用獨立的輸出目錄，結果以新的暫存檔回傳 (呼叫端用完可自行刪除)
+#   - 以來源檔內容雜湊 (SHA-256) 快取轉檔結果，同一份文件只轉一次
+#   - 快取超過保存期限或總容量時，依最後使用時間 (mtime) 由舊到新刪除；行程結束時停止 soffice
+# UNO 需要 LibreOffice 的 Python 模組 (uno)：目前的 Python 沒有時改用 LibreOffice 內附的 python 執行
+# 本檔的 --serve 模式；兩者都沒有時退回每次執行 soffice --convert-to (仍使用獨立的設定檔與輸出目錄)。
+
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "fire_dept_doc_cache")
+JOB_DIR = os.path.join(tempfile.gettempdir(), "fire_dept_doc_jobs")
+
+# 轉檔快取上限 (位元組) 與保存期限 (秒)；工作目錄中超過期限的暫存 PDF 也一併清除
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+MAX_CACHE_AGE = 7 * 24 * 60 * 60
+
+DEFAULT_WORKERS = 2
+DEFAULT_TIMEOUT = 120
+STARTUP_TIMEOUT = 60
+
+PDF_FILTER = "writer_pdf_Export"
+
+
+class ConversionError(Exception):
+    """轉檔失敗"""
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _profile_url(profile_dir):
+    """soffice -env:UserInstallation 參數 (每個 soffice 使用獨立設定檔，才能同時執行)"""
+    path = os.path.abspath(profile_dir).replace("\\", "/")
+    return "file:///" + path.lstrip("/")
+
+
+def _has_uno(python_path):
+    """檢查指定的 Python 是否可匯入 uno"""
+    try:
+        subprocess.run([python_path, "-c", "import uno"], check=True, capture_output=True, timeout=30)
+        return True
+    except (OSError, subprocess.SubprocessError):
+        return False
+
+
+def find_uno_python(soffice_path):
+    """
+    尋找可匯入 uno 的 Python (目前的 Python 或 LibreOffice 內附的 python)
+
+    Returns:
+        str: Python 執行檔路徑；找不到時回傳 None
+    """
+    try:
+        import uno  # noqa: F401
+        return sys.executable
+    except ImportError:
+        pass
+    program_dir = os.path.dirname(os.path.abspath(soffice_path))
+    for name in ("python.exe", "python", "python3"):
+        candidate = os.path.join(program_dir, name)
+        if os.path.exists(candidate) and _has_uno(candidate):
+            return candidate
+    return None
+
+
+# ==========================================
+# 轉檔工作者
+# ==========================================
+
+class UnoWorker:
+    """
+    常駐的 soffice (UNO socket)
+
+    以 uno_python 執行本檔的 --serve 模式，透過 stdin/stdout 逐行傳遞 JSON 工作。
+    """
+
+    def __init__(self, soffice_path, uno_python, profile_dir):
+        self.soffice_path = soffice_path
+        self.uno_python = uno_python
+        self.profile_dir = profile_dir
+        self._proc = None
+        self._soffice_pid = None
+
+    def alive(self):
+        return self._proc is not None and self._proc.poll() is None
+
+    def start(self):
+        self._proc = subprocess.Popen(
+            [self.uno_python, os.path.abspath(__file__), "--serve",
+             "--soffice", self.soffice_path, "--profile", self.profile_dir],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, encoding="utf-8"
+        )
+        ready = self._read_message()
+        if not ready.get("ready"):
+            self.stop()
+            raise ConversionError(f"LibreOffice 啟動失敗: {ready.get('error')}")
+        self._soffice_pid = ready.get("soffice_pid")
+        print(f"📄 LibreOffice 轉檔服務已啟動 (soffice pid {self._soffice_pid})")
+
+    def _read_message(self):
+        line = self._proc.stdout.readline()
+        if not line:
+            raise ConversionError("LibreOffice 轉檔服務已結束")
+        return json.loads(line)
+
+    def convert(self, src, output_dir):
+        if not self.alive():
+            self.start()
+        dst = os.path.join(output_dir, os.path.splitext(os.path.basename(src))[0] + ".pdf")
+        self._proc.stdin.write(json.dumps({"src": src, "dst": dst}, ensure_ascii=False) + "\n")
+        self._proc.stdin.flush()
+        reply = self._read_message()
+        if not reply.get("ok"):
+            raise ConversionError(reply.get("error", "LibreOffice 轉檔失敗"))
+        return dst
+
+    def kill(self):
+        """強制結束 (逾時使用)"""
+        for pid in (self._soffice_pid, self._proc.pid if self._proc else None):
+            if pid:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except OSError:
+                    pass
+
+    def stop(self):
+        if self._proc is None:
+            return
+        try:
+            self._proc.stdin.close()
+            self._proc.wait(timeout=10)
+        except (OSError, subprocess.SubprocessError):
+            self.kill()
+        self._proc = None
+
+
+class CommandWorker:
+    """每個工作執行一次 soffice --convert-to (沒有 uno 時使用)"""
+
+    def __init__(self, soffice_path, profile_dir, timeout=DEFAULT_TIMEOUT):
+        self.soffice_path = soffice_path
+        self.profile_dir = profile_dir
+        self.timeout = timeout
+        self._proc = None
+
+    def convert(self, src, output_dir):
+        cmd = [
+            self.soffice_path,
+            f"-env:UserInstallation={_profile_url(self.profile_dir)}",
+            "--headless", "--norestore",
+            "--convert-to", "pdf",
+            "--outdir", output_dir,
+            src
+        ]
+        self._proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            _, stderr = self._proc.communicate(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
+            raise ConversionError("LibreOffice 轉檔逾時")
+        if self._proc.returncode != 0:
+            raise ConversionError(f"LibreOffice 執行錯誤: {stderr.decode('utf-8', errors='ignore')}")
+        dst = os.path.join(output_dir, os.path.splitext(os.path.basename(src))[0] + ".pdf")
+        if not os.path.exists(dst):
+            raise ConversionError("LibreOffice 轉換失敗：未產生 PDF 檔案")
+        return dst
+
+    def kill(self):
+        if self._proc and self._proc.poll() is None:
+            self._proc.kill()
+
+    def stop(self):
+        self.kill()
+
+
+# ==========================================
+# 轉檔服務
+# ==========================================
+
+class DocConverter:
+    """工作佇列 + 工作者執行緒 + 內容雜湊快取"""
+
+    def __init__(self, worker_factory, workers=DEFAULT_WORKERS, cache_dir=CACHE_DIR, job_dir=JOB_DIR,
+                 timeout=DEFAULT_TIMEOUT, max_cache_bytes=MAX_CACHE_BYTES, max_cache_age=MAX_CACHE_AGE):
+        """
+        Args:
+            worker_factory (callable): worker_factory(index) -> 具備 convert(src, output_dir) / kill() / stop() 的工作者
+            workers (int): 工作者數量
+            cache_dir (str): 轉檔結果快取目錄
+            job_dir (str): 每個工作的輸出目錄所在位置
+            timeout (int): 單一工作逾時秒數
+            max_cache_bytes (int): 快取總容量上限
+            max_cache_age (int): 快取與暫存 PDF 的保存秒數 (以最後使用時間計)
+        """
+        self.cache_dir = cache_dir
+        self.job_dir = job_dir
+        self.timeout = timeout
+        self.max_cache_bytes = max_cache_bytes
+        self.max_cache_age = max_cache_age
+        self._closed = False
+        self._evict_lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        os.makedirs(job_dir, exist_ok=True)
+        self.evict_cache()
+
+        self._jobs = queue.Queue()
+        self._pending = {}  # 內容雜湊 -> Future (同一份文件同時轉檔只執行一次)
+        self._pending_lock = threading.Lock()
+        self._workers = [worker_factory(i) for i in range(workers)]
+        self._threads = [
+            threading.Thread(target=self._run, args=(worker,), name=f"doc-converter-{i}", daemon=True)
+            for i, worker in enumerate(self._workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _cache_path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}.pdf")
+
+    def _run(self, worker):
+        """工作者執行緒：取出工作、轉檔、寫入快取"""
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                worker.stop()
+                return
+            src, digest, future = job
+            if not future.set_running_or_notify_cancel():
+                with self._pending_lock:
+                    self._pending.pop(digest, None)
+                continue
+            output_dir = tempfile.mkdtemp(prefix="job_", dir=self.job_dir)
+            watchdog = threading.Timer(self.timeout, worker.kill)
+            watchdog.start()
+            try:
+                pdf_path = worker.convert(src, output_dir)
+                cache_path = self._cache_path(digest)
+                tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+                shutil.copyfile(pdf_path, tmp_path)
+                os.replace(tmp_path, cache_path)
+                self.evict_cache(keep=cache_path)
+                future.set_result(cache_path)
+            except Exception as e:
+                if isinstance(e, ConversionError):
+                    future.set_exception(e)
+                else:
+                    future.set_exception(ConversionError(f"LibreOffice 轉換發生例外: {e}"))
+                try:
+                    worker.stop()  # 下一個工作重新啟動 soffice
+                except Exception:
+                    pass
+            finally:
+                watchdog.cancel()
+                shutil.rmtree(output_dir, ignore_errors=True)
+                with self._pending_lock:
+                    self._pending.pop(digest, None)
+
+    def submit(self, doc_path):
+        """
+        送出轉檔工作
+
+        Returns:
+            Future: 結果為快取中的 PDF 路徑
+        """
+        digest = file_hash.file_sha256(doc_path)
+        future = concurrent.futures.Future()
+        cache_path = self._cache_path(digest)
+        try:
+            os.utime(cache_path)  # 更新最後使用時間 (清除快取時依此排序)
+            future.set_result(cache_path)
+            return future
+        except FileNotFoundError:
+            pass
+        with self._pending_lock:
+            pending = self._pending.get(digest)
+            if pending is not None:
+                return pending
+            self._pending[digest] = future
+        self._jobs.put((os.path.abspath(doc_path), digest, future))
+        return future
+
+    def convert(self, doc_path, timeout=None):
+        """
+        將 Word 檔轉為 PDF
+
+        Args:
+            doc_path (str): .doc / .docx 路徑
+            timeout (int): 等待秒數 (None = 服務逾時 + 佇列等待)
+
+        Returns:
+            str: 新的暫存 PDF 路徑 (每次呼叫都不同，呼叫端用完可刪除)
+
+        Raises:
+            ConversionError: 轉檔失敗或逾時
+        """
+        for attempt in range(2):
+            future = self.submit(doc_path)
+            try:
+                cache_path = future.result(timeout=timeout or self.timeout * (1 + self._jobs.qsize()))
+            except concurrent.futures.TimeoutError:
+                raise ConversionError("LibreOffice 轉檔逾時") from None
+
+            fd, pdf_path = tempfile.mkstemp(prefix="converted_", suffix=".pdf", dir=self.job_dir)
+            os.close(fd)
+            try:
+                shutil.copyfile(cache_path, pdf_path)
+                return pdf_path
+            except FileNotFoundError:
+                # 取得結果後、複製前快取剛好被清除：重新轉檔一次
+                os.remove(pdf_path)
+                if attempt:
+                    raise ConversionError("轉檔結果已被清除") from None
+
+    def evict_cache(self, keep=None, now=None):
+        """
+        清除過期或超過容量的轉檔快取 (依最後使用時間由舊到新)
+
+        Args:
+            keep (str): 不可刪除的快取檔 (剛寫入的結果)
+            now (float): 目前時間 (測試用)
+
+        Returns:
+            int: 刪除的檔案數
+        """
+        now = time.time() if now is None else now
+        removed = 0
+        with self._evict_lock:
+            entries = []
+            for folder in (self.cache_dir, self.job_dir):
+                try:
+                    entries.extend((folder, entry) for entry in os.scandir(folder) if entry.is_file())
+                except FileNotFoundError:
+                    continue
+
+            cached = []
+            for folder, entry in entries:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if entry.path != keep and now - stat.st_mtime > self.max_cache_age:
+                    removed += self._remove(entry.path)
+                elif folder == self.cache_dir and entry.name.endswith(".pdf"):
+                    cached.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total = sum(size for _, size, _ in cached)
+            for _, size, path in sorted(cached):
+                if total <= self.max_cache_bytes:
+                    break
+                if path == keep:
+                    continue
+                removed += self._remove(path)
+                total -= size
+        if removed:
+            print(f"🧹 清除轉檔快取: {removed} 個檔案")
+        return removed
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return 1
+        except OSError:
+            return 0
+
+    def shutdown(self):
+        """停止所有工作者 (可重複呼叫)"""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join(timeout=15)
+
+
+_converters = {}
+_converters_lock = threading.Lock()
+
+
+def get_converter(soffice_path, workers=DEFAULT_WORKERS):
+    """
+    取得共用的轉檔服務 (同一個 soffice 路徑只建立一次)
+
+    Args:
+        soffice_path (str): soffice 執行檔路徑
+        workers (int): 工作者數量
+    """
+    with _converters_lock:
+        converter = _converters.get(soffice_path)
+        if converter is None:
+            uno_python = find_uno_python(soffice_path)
+            profile_root = tempfile.mkdtemp(prefix="lo_profiles_")
+            if uno_python:
+                def factory(i):
+                    return UnoWorker(soffice_path, uno_python, os.path.join(profile_root, f"worker_{i}"))
+            else:
+                print("⚠️ 找不到 LibreOffice 的 uno 模組，改用 soffice --convert-to (每次冷啟動)")
+
+                def factory(i):
+                    return CommandWorker(soffice_path, os.path.join(profile_root, f"worker_{i}"))
+            converter = DocConverter(factory, workers=workers)
+            _converters[soffice_path] = converter
+            # 行程結束時先停止 soffice，再刪除設定檔目錄 (atexit 依註冊的相反順序執行)
+            atexit.register(shutil.rmtree, profile_root, ignore_errors=True)
+            atexit.register(converter.shutdown)
+        return converter
+
+
+# ==========================================
+# --serve 模式 (在可匯入 uno 的 Python 中執行)
+# ==========================================
+
+def _serve(soffice_path, profile_dir):
+    """啟動 soffice 並透過 UNO 逐一處理 stdin 傳入的轉檔工作"""
+    import uno
+    from com.sun.star.beans import PropertyValue
+
+    def prop(name, value):
+        p = PropertyValue()
+        p.Name = name
+        p.Value = value
+        return p
+
+    def reply(message):
+        sys.stdout.write(json.dumps(message, ensure_ascii=False) + "\n")
+        sys.stdout.flush()
+
+    port = _free_port()
+    soffice = subprocess.Popen([
+        soffice_path,
+        f"-env:UserInstallation={_profile_url(profile_dir)}",
+        "--headless", "--invisible", "--nologo", "--norestore", "--nodefault",
+        f"--accept=socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext",
+    ])
+
+    local_ctx = uno.getComponentContext()
+    resolver = local_ctx.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local_ctx)
+    deadline = time.time() + STARTUP_TIMEOUT
+    desktop = None
+    while desktop is None:
+        try:
+            ctx = resolver.resolve(f"uno:socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext")
+            desktop = ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+        except Exception as e:
+            if time.time() > deadline or soffice.poll() is not None:
+                reply({"ready": False, "error": str(e)})
+                soffice.kill()
+                return
+            time.sleep(0.25)
+    reply({"ready": True, "soffice_pid": soffice.pid})
+
+    try:
+        for line in sys.stdin:
+            job = json.loads(line)
+            try:
+                doc = desktop.loadComponentFromURL(
+                    uno.systemPathToFileUrl(job["src"]), "_blank", 0, (prop("Hidden", True),)
+                )
+                if doc is None:
+                    raise RuntimeError("無法開啟文件")
+                try:
+                    doc.storeToURL(uno.systemPathToFileUrl(job["dst"]), (prop("FilterName", PDF_FILTER),))
+                finally:
+                    doc.close(True)
+                reply({"ok": True})
+            except Exception as e:
+                reply({"ok": False, "error": str(e)})
+    finally:
+        try:
+            desktop.terminate()
+        except Exception:
+            pass
+        try:
+            soffice.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            soffice.kill()
+
+
+if __name__ == "__main__" and "--serve" in sys.argv:
+    args = sys.argv[1:]
+    _serve(args[args.index("--soffice") + 1], args[args.index("--profile") + 1])
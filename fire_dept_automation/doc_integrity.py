@@ -1,6 +1,7 @@
 import re
 from PIL import Image, ImageOps
 import pytesseract
+import page_classifier
 
 # ==========================================
 # 1. 頁面識別邏輯
@@ -9,43 +10,11 @@ import pytesseract
 def identify_page_type(header_text):
     """
     根據頁面前 30 個字識別文件類型
+
+    關鍵字對應表與優先順序見 page_classifier.PAGE_TYPE_KEYWORDS
+    (多模式自動機單次掃描)。
     """
-    if not header_text:
-        return "未知頁面"
-    
-    text = header_text.replace(" ", "").replace("\n", "")
-    
-    # 關鍵字對應表
-    keywords = {
-        "目錄": "目錄",
-        "檢修申報表": "消防安全設備檢修申報表",
-        "檢修報告書": "消防安全設備檢修報告書",
-        "改善計畫書": "消防安全設備改善計畫書",
-        "種類及數量表": "消防安全設備種類及數量表",
-        "滅火器": "滅火器檢查表",
-        "室內消防栓": "室內消防栓設備檢查表",
-        "自動撒水": "自動撒水設備檢查表",
-        "泡沫": "泡沫滅火設備檢查表",
-        "火警自動警報": "火警自動警報設備檢查表",
-        "緊急廣播": "緊急廣播設備檢查表",
-        "標示設備": "標示設備檢查表",
-        "避難設備": "避難設備檢查表",
-        "緊急照明": "緊急照明設備檢查表",
-        "連結送水管": "連結送水管檢查表",
-        "排煙": "排煙設備檢查表",
-        "無線電": "無線電通信輔助設備檢查表",
-        "使用執照": "建築物使用執照影本",
-        "營利事業": "營利事業登記證影本",
-        "開業證書": "專業機構合格證書影本",
-        "設備師": "消防設備師(士)證書影本",
-        "身分證": "管理權人身分證影本"
-    }
-    
-    for key, value in keywords.items():
-        if key in text:
-            return value
-            
-    return "其他文件"
+    return page_classifier.identify_page_type(header_text)
 
 # ==========================================
 # 2. Checkbox 檢測邏輯 (Pixel Analysis)
@@ -143,15 +112,7 @@ def parse_toc_requirements(toc_image, toc_text):
     
     n_boxes = len(data['text'])
     
-    # 欲搜尋的關鍵字清單 (對應標準文件名稱)
-    target_docs = [
-        "消防安全設備檢修申報表", "消防安全設備檢修報告書", "消防安全設備改善計畫書", "消防安全設備種類及數量表",
-        "滅火器檢查表", "室內消防栓設備檢查表", "自動撒水設備檢查表", "泡沫滅火設備檢查表", 
-        "火警自動警報設備檢查表", "緊急廣播設備檢查表", "標示設備檢查表", "避難設備檢查表",
-        "緊急照明設備檢查表", "連結送水管檢查表", "排煙設備檢查表", "無線電通信輔助設備檢查表",
-        "建築物使用執照影本", "營利事業登記證影本", "專業機構合格證書影本", 
-        "消防設備師(士)證書影本", "管理權人身分證影本"
-    ]
+    # 欲搜尋的關鍵字清單 (對應標準文件名稱): page_classifier.STANDARD_DOCUMENTS
     
     # 簡單演算法：
     # 1. 遍歷 OCR 結果，找到包含關鍵字的行
@@ -189,15 +150,9 @@ def parse_toc_requirements(toc_image, toc_text):
         line_text = "".join(line_data['text'])
         
         # 比對關鍵字
-        matched_doc = None
-        for doc in target_docs:
-            # 模糊比對：只要包含部分關鍵字
-            # 例如 "滅火器檢查表" 可能 OCR 成 "滅火器檢表"
-            # 取核心關鍵字
-            core_key = doc[:4] # 取前4字
-            if core_key in line_text:
-                matched_doc = doc
-                break
+        # 模糊比對：只要包含核心關鍵字 (前 4 字)
+        # 例如 "滅火器檢查表" 可能 OCR 成 "滅火器檢表"
+        matched_doc = page_classifier.match_toc_document(line_text)
         
         if matched_doc:
             # 檢查 Checkbox
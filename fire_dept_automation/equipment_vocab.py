@@ -0,0 +1,231 @@
+import threading
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+import ocr_parser
+
+# ==========================================
+# 消防設備代碼表 (位元遮罩)
+# ==========================================
+# 每個設備有固定的整數代碼，設備集合以位元遮罩 (int) 表示：
+#   - 漏報 = 系統 & ~申報，新增 = 申報 & ~系統
+#   - 整欄設備字串先轉為遮罩陣列 (相同字串只轉一次)，再以 numpy 位元運算一次比對
+# 不在代碼表中的名稱 (例如人工輸入) 於執行期間依序配發新代碼；
+# 代碼數達 int64 上限 (63) 後，新的名稱一律歸入「其他」並記錄，遮罩永遠是 int64。
+
+# 設備代碼表：代碼 = 位置，只能往後新增，不可調整順序
+EQUIPMENT_CATALOG = (
+    "滅火器", "自動撒水設備", "惰性氣體滅火設備", "簡易自動滅火設備", "警報設備",
+    "火警自動警報設備", "一一九火災通報裝置", "避難逃生設備", "標示設備",
+    "消防搶救上之必要設備", "連結送水管", "無線電通信輔助設備", "其他",
+    "冷卻撒水設備", "室內消防栓設備", "水霧滅火設備", "乾粉滅火設備",
+    "鹵化煙滅火設備", "瓦斯漏氣火警自動警報設備", "避難器具", "消防專用蓄水池",
+    "緊急電源插座", "室外消防栓設備", "泡沫滅火設備", "海龍滅火設備",
+    "緊急廣播設備", "緊急照明設備", "排煙設備", "防災監控系統綜合操作裝置",
+    "射水設備", "配線", "二氧化碳滅火設備", "海龍滅火設備(含海龍替代品)",
+)
+
+SEPARATOR = "、"
+
+# 代碼表已滿時，未知名稱歸入此項
+OTHER = "其他"
+
+# numpy int64 可容納的代碼數 (保留符號位元)
+_INT64_BITS = 63
+
+
+class EquipmentVocab:
+    """設備名稱 <-> 代碼 / 位元遮罩"""
+
+    def __init__(self, names=EQUIPMENT_CATALOG, max_size=_INT64_BITS):
+        """
+        Args:
+            names (iterable): 依代碼順序的設備名稱
+            max_size (int): 代碼數上限 (預設 63，遮罩可放入 int64)
+        """
+        self._names = []
+        self._ids = {}
+        self._overflow = set()
+        self._lock = threading.Lock()
+        self.max_size = max_size
+        names = list(names)
+        if OTHER not in names:
+            names.append(OTHER)
+        if len(set(names)) > max_size:
+            raise ValueError(f"設備代碼表超過 {max_size} 項")
+        for name in names:
+            self.id_of(name)
+
+    @property
+    def size(self):
+        return len(self._names)
+
+    @property
+    def names(self):
+        return tuple(self._names)
+
+    @property
+    def overflow(self):
+        """代碼表已滿後歸入「其他」的名稱"""
+        return frozenset(self._overflow)
+
+    def id_of(self, name):
+        """
+        取得設備代碼 (未知名稱配發新代碼；代碼表已滿時回傳「其他」的代碼)
+
+        Args:
+            name (str): 設備名稱
+
+        Returns:
+            int: 代碼 (位元位置)
+        """
+        item_id = self._ids.get(name)
+        if item_id is None:
+            with self._lock:
+                item_id = self._ids.get(name)
+                if item_id is None:
+                    if len(self._names) < self.max_size:
+                        item_id = len(self._names)
+                        self._names.append(name)
+                        self._ids[name] = item_id
+                    else:
+                        item_id = self._ids[OTHER]
+                        if name not in self._overflow:
+                            self._overflow.add(name)
+                            print(f"⚠️ 設備代碼表已滿 ({self.max_size} 項)，「{name}」歸入「{OTHER}」")
+        return item_id
+
+    def encode(self, items):
+        """
+        設備集合 -> 位元遮罩
+
+        Args:
+            items (iterable): 設備名稱 (空字串忽略)
+
+        Returns:
+            int: 位元遮罩
+        """
+        mask = 0
+        for item in items:
+            if item:
+                mask |= 1 << self.id_of(item)
+        return mask
+
+    def encode_str(self, text):
+        """以頓號分隔的設備字串 -> 位元遮罩"""
+        if not text or not isinstance(text, str):
+            return 0
+        return self.encode(item.strip() for item in text.split(SEPARATOR))
+
+    def decode(self, mask):
+        """
+        位元遮罩 -> 設備名稱 (依代碼順序)
+
+        Args:
+            mask (int): 位元遮罩
+
+        Returns:
+            list: 設備名稱
+        """
+        mask = int(mask)
+        names = []
+        while mask:
+            low_bit = mask & -mask
+            names.append(self._names[low_bit.bit_length() - 1])
+            mask ^= low_bit
+        return names
+
+    def decode_str(self, mask):
+        """位元遮罩 -> 以頓號分隔的設備字串"""
+        return SEPARATOR.join(self.decode(mask))
+
+
+_default_vocab = EquipmentVocab()
+
+
+def get_vocab():
+    """取得共用的設備代碼表"""
+    return _default_vocab
+
+
+@lru_cache(maxsize=4096)
+def mask_from_str(text, equipment_list=None):
+    """
+    設備字串 -> 位元遮罩 (快取，代碼配發後不會改變)
+
+    Args:
+        text (str): 以頓號分隔的設備字串
+        equipment_list (tuple): 標準設備清單；提供時先以 ocr_parser 正規化 (OCR / 系統原始文字)
+
+    Returns:
+        int: 位元遮罩
+    """
+    if equipment_list is not None:
+        text = ocr_parser.normalize_equipment_str(text, equipment_list)
+    return _default_vocab.encode_str(text)
+
+
+def as_mask(value):
+    """遮罩、設備字串或設備集合 -> 位元遮罩"""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if value is None or isinstance(value, str):
+        return mask_from_str(value or "")
+    return _default_vocab.encode(value)
+
+
+def contains(mask, item):
+    """遮罩是否包含設備"""
+    return bool(int(mask) >> _default_vocab.id_of(item) & 1)
+
+
+def diff(sys_mask, ocr_mask):
+    """
+    設備差異
+
+    Args:
+        sys_mask (int): 系統列管設備
+        ocr_mask (int): 申報設備
+
+    Returns:
+        tuple: (漏報遮罩 (系統有申報無), 新增遮罩 (申報有系統無))
+    """
+    return sys_mask & ~ocr_mask, ocr_mask & ~sys_mask
+
+
+def decode(mask):
+    """位元遮罩 -> 設備名稱 (依代碼順序)"""
+    return _default_vocab.decode(mask)
+
+
+def mask_series(series, equipment_list=None):
+    """
+    整欄設備字串 -> 遮罩陣列 (相同字串只轉換一次)
+
+    Args:
+        series (pd.Series): 設備字串
+        equipment_list (iterable): 標準設備清單；提供時先正規化
+
+    Returns:
+        np.ndarray: 位元遮罩 (int64)
+    """
+    values = series.fillna("").astype(str).str.strip()
+    key = tuple(equipment_list) if equipment_list is not None else None
+    lookup = {value: mask_from_str(value, key) for value in values.unique()}
+    return np.array([lookup[value] for value in values], dtype=np.int64)
+
+
+def decode_series(masks, index=None):
+    """
+    遮罩陣列 -> 以頓號分隔的設備字串 (相同遮罩只解碼一次)
+
+    Args:
+        masks (np.ndarray): 位元遮罩
+        index: 結果 Series 的索引
+
+    Returns:
+        pd.Series: 設備字串
+    """
+    masks = pd.Series(masks, index=index)
+    lookup = {mask: _default_vocab.decode_str(mask) for mask in masks.unique()}
+    return masks.map(lookup)
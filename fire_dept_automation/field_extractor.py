@@ -0,0 +1,258 @@
+import re
+import ocr_parser
+
+# ==========================================
+# 分層欄位提取引擎
+# ==========================================
+# 第 1 層：預先編譯的規則提取器，單次掃描 OCR 文字，並為每個欄位給出信心分數
+# 第 2 層：只有「缺漏」或「信心不足」的欄位才交給 LLM，且只送出相關的文字片段
+# 掃描品質良好的申報書通常在第 1 層就能完成，不需要呼叫 Ollama。
+
+# 規則欄位 -> AI 分析結果欄位 (ai_engine.ANALYSIS_SCHEMA)
+FIELD_TO_AI_KEY = {
+    '場所名稱': 'place_name',
+    '場所地址': 'address',
+    '管理權人': 'management_person',
+    '場所電話': 'phone_number',
+    '消防設備種類': 'equipment_list',
+}
+
+# 信心分數低於此值的欄位會交給 LLM 確認
+DEFAULT_CONFIDENCE_THRESHOLD = 0.7
+
+# 片段前後各保留幾行 (標籤與值常被 OCR 拆成上下兩行)
+SNIPPET_CONTEXT_LINES = 1
+
+# 標籤 -> (欄位, 標籤信心)；明確標籤 (場所地址) 比通用標籤 (地址) 可信
+_LABEL_RULES = {
+    '場所名稱': ('場所名稱', 0.9),
+    '場所地址': ('場所地址', 0.9),
+    '管理權人': ('管理權人', 0.9),
+    '場所電話': ('場所電話', 0.9),
+    '地址': ('場所地址', 0.7),
+    '電話': ('場所電話', 0.7),
+    '姓名': ('管理權人', 0.6),
+    '申報項目': ('消防設備種類', 0.6),
+    '檢修項目': ('消防設備種類', 0.6),
+}
+
+_PHONE_VALUE_PATTERN = re.compile(r"[\d\-\(\)\s（）#]+")
+_ADDRESS_HINT_PATTERN = re.compile(r"[縣市鄉鎮區村里路街段巷弄號]")
+_CJK_NAME_PATTERN = re.compile(r"^[\u4e00-\u9fff]{2,4}$")
+_TOC_PAGE_NO_PATTERN = re.compile(r"\d+\s*[-－]\s*\d+")
+
+
+def _clean(line):
+    """去除所有空白 (含全形空格)"""
+    return line.replace(" ", "").replace("　", "").strip()
+
+
+def _score_value(field, value, label_confidence):
+    """
+    依值的格式調整標籤信心分數
+
+    Args:
+        field (str): 欄位名稱
+        value (str): 提取到的值
+        label_confidence (float): 標籤本身的信心
+
+    Returns:
+        float: 0 ~ 1 的信心分數
+    """
+    if not value:
+        return 0.0
+    if field == '場所地址':
+        if _ADDRESS_HINT_PATTERN.search(value) and any(c.isdigit() for c in value):
+            return label_confidence
+        return min(label_confidence, 0.4)
+    if field == '場所電話':
+        digits = sum(c.isdigit() for c in value)
+        return label_confidence if digits >= 7 else min(label_confidence, 0.3)
+    if field == '管理權人':
+        return label_confidence if _CJK_NAME_PATTERN.match(value) else min(label_confidence, 0.5)
+    if field == '場所名稱':
+        return label_confidence if len(value) >= 2 else min(label_confidence, 0.3)
+    return label_confidence
+
+
+def _find_toc_page(pages_text):
+    """
+    尋找目錄頁
+
+    Returns:
+        tuple: (頁面索引, 是否以標題確認)；找不到時回傳 (None, False)
+    """
+    for i, page_text in enumerate(pages_text):
+        if ocr_parser.TOC_TITLE in _clean(page_text):
+            return i, True
+    if len(pages_text) > 1:
+        return 1, False
+    return None, False
+
+
+def extract_checked_equipment(toc_text, equipment_list):
+    """
+    從目錄頁提取已勾選的設備
+
+    勾選符號或目錄頁碼 (如 2-1) 皆視為已勾選；含空白方框的行一律排除。
+
+    Args:
+        toc_text (str): 目錄頁 OCR 文字
+        equipment_list (list): 標準設備清單 (長名稱在前)
+
+    Returns:
+        list: 已勾選的設備 (依出現順序)
+    """
+    checked = []
+    for line in toc_text.split('\n'):
+        if any(m in line for m in ocr_parser.UNCHECKED_MARKERS):
+            continue
+        if not (any(m in line for m in ocr_parser.CHECKED_MARKERS) or _TOC_PAGE_NO_PATTERN.search(line)):
+            continue
+        clean_line = _clean(line)
+        for equipment in equipment_list:
+            if equipment in clean_line or equipment.replace("設備", "") in clean_line:
+                if equipment not in checked:
+                    checked.append(equipment)
+                break
+    return checked
+
+
+def extract_fields_with_confidence(text, pages_text_list=None, equipment_list=None):
+    """
+    第 1 層：規則提取，並為每個欄位給出信心分數與來源片段
+
+    Args:
+        text (str): 第一頁 OCR 文字
+        pages_text_list (list): 所有頁面 OCR 文字
+        equipment_list (list): 標準設備清單 (None = utils.VALID_EQUIPMENT_LIST)
+
+    Returns:
+        dict: {欄位: {"value": 值, "confidence": 分數, "snippet": 片段}}，
+              另含 "toc_page_num" (找到目錄頁時)
+    """
+    if equipment_list is None:
+        from utils import VALID_EQUIPMENT_LIST
+        equipment_list = VALID_EQUIPMENT_LIST
+
+    parser = ocr_parser.get_parser(tuple(equipment_list))
+    fields = {}
+    lines = (text or "").split('\n')
+    for idx, clean_line, labels in parser.iter_label_values(ocr_parser.clean_text(text)):
+        for label, values in labels.items():
+            field, label_confidence = _LABEL_RULES[label]
+            value = values[0][1]
+            if label == '姓名' and "檢修人員" in clean_line:
+                continue
+            if field == '管理權人':
+                if "通訊處" in value:
+                    continue
+                value = value.split("身分證")[0]
+            elif field == '場所電話':
+                phone_match = _PHONE_VALUE_PATTERN.match(value)
+                value = phone_match.group(0).strip() if phone_match else ""
+            elif field == '消防設備種類':
+                if pages_text_list:
+                    continue
+                value = parser.normalize_equipment_str(value)
+
+            confidence = _score_value(field, value, label_confidence)
+            # 同一欄位只保留信心最高的候選 (同分時保留較早出現者)
+            if confidence > fields.get(field, {}).get("confidence", 0):
+                start = max(0, idx - SNIPPET_CONTEXT_LINES)
+                fields[field] = {
+                    "value": value,
+                    "confidence": confidence,
+                    "snippet": "\n".join(lines[start:idx + SNIPPET_CONTEXT_LINES + 1]),
+                }
+
+    if pages_text_list:
+        toc_idx, confirmed = _find_toc_page(pages_text_list)
+        if toc_idx is not None:
+            fields['toc_page_num'] = toc_idx + 1
+            checked = extract_checked_equipment(pages_text_list[toc_idx], equipment_list)
+            fields['消防設備種類'] = {
+                "value": "、".join(checked),
+                "confidence": (0.85 if confirmed else 0.6) if checked else 0.0,
+                "snippet": pages_text_list[toc_idx],
+            }
+
+    return fields
+
+
+def _rule_value(entry):
+    """取出規則提取結果的值 (AI 結果格式)"""
+    return entry.get("value") or None
+
+
+def extract_fields(text, pages_text_list=None, model=None, equipment_list=None,
+                   threshold=DEFAULT_CONFIDENCE_THRESHOLD, use_llm=True):
+    """
+    分層提取文件欄位
+
+    規則提取信心足夠的欄位直接採用；其餘欄位把相關片段交給 LLM，
+    並以只含這些欄位的 JSON Schema 限制輸出。
+
+    Args:
+        text (str): 第一頁 OCR 文字
+        pages_text_list (list): 所有頁面 OCR 文字
+        model (str): LLM 模型名稱 (None = ai_engine.DEFAULT_TEXT_MODEL)
+        equipment_list (list): 標準設備清單
+        threshold (float): 信心門檻，低於此值的欄位交給 LLM
+        use_llm (bool): 是否允許呼叫 LLM
+
+    Returns:
+        dict: 與 ai_engine.analyze_document 相同格式的結果，另含
+              "field_confidence" (各欄位信心)、"llm_fields" (交給 LLM 的欄位)
+    """
+    rule_fields = extract_fields_with_confidence(text, pages_text_list, equipment_list)
+
+    result = {"document_type": None}
+    field_confidence = {}
+    pending = []
+    for field, ai_key in FIELD_TO_AI_KEY.items():
+        entry = rule_fields.get(field, {})
+        value = _rule_value(entry)
+        if ai_key == 'equipment_list':
+            value = value.split("、") if value else []
+        result[ai_key] = value
+        field_confidence[field] = entry.get("confidence", 0.0)
+        if field_confidence[field] < threshold:
+            pending.append(field)
+    if 'toc_page_num' in rule_fields:
+        result['toc_page_num'] = rule_fields['toc_page_num']
+
+    llm_fields = []
+    if pending and use_llm:
+        import ai_engine
+        if model is None:
+            model = ai_engine.DEFAULT_TEXT_MODEL
+
+        # 只送出相關片段；欄位完全沒有線索時才送出整頁 (仍會經過 token 預算精簡)
+        snippets = []
+        for field in pending:
+            snippet = rule_fields.get(field, {}).get("snippet")
+            if not snippet:
+                snippet = (pages_text_list[1] if field == '消防設備種類' and pages_text_list and len(pages_text_list) > 1
+                           else text)
+            if snippet and snippet not in snippets:
+                snippets.append(snippet)
+
+        ai_keys = [FIELD_TO_AI_KEY[f] for f in pending]
+        print(f"🧩 規則提取信心不足，交給 LLM 的欄位: {pending}")
+        ai_result = ai_engine.analyze_page_with_ai("\n".join(snippets), model, fields=ai_keys)
+        if "error" in ai_result:
+            result["llm_error"] = ai_result["error"]
+        else:
+            for field in pending:
+                ai_key = FIELD_TO_AI_KEY[field]
+                if ai_result.get(ai_key):
+                    result[ai_key] = ai_result[ai_key]
+                    field_confidence[field] = max(field_confidence[field], threshold)
+            llm_fields = pending
+    elif not pending:
+        print("✅ 規則提取信心足夠，略過 LLM")
+
+    result["field_confidence"] = field_confidence
+    result["llm_fields"] = llm_fields
+    return result
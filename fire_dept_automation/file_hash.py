@@ -0,0 +1,40 @@
+import hashlib
+import os
+from functools import lru_cache
+
+# ==========================================
+# 檔案內容雜湊 (SHA-256)
+# ==========================================
+# 列管資料快取、轉檔快取與案件分析結果都以檔案內容雜湊作為版本鍵。
+# 本模組只使用標準函式庫 (doc_converter 會以 LibreOffice 內附的 python 執行)。
+# 同一個行程內以 (路徑, mtime, 大小) 記住雜湊，頁面重新執行時不必重讀整個檔案。
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path, chunk_size=CHUNK_SIZE):
+    """計算檔案 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=256)
+def _versioned_sha256(path, mtime_ns, size):
+    return file_sha256(path)
+
+
+def cached_file_sha256(path):
+    """
+    計算檔案 SHA-256 (檔案未變更時使用上次的結果)
+
+    Args:
+        path (str): 檔案路徑
+
+    Returns:
+        str: 64 字元十六進位字串
+    """
+    stat = os.stat(path)
+    return _versioned_sha256(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
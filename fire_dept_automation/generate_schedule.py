@@ -0,0 +1,15 @@
+"""
+依固定排班規則 (route_schedules) 產生未來的每日任務
+
+可由排程 (cron / 工作排程器) 每週執行，已存在的任務不會重複建立：
+    python generate_schedule.py          # 預設 90 天
+    python generate_schedule.py 365
+"""
+import sys
+import db_manager
+import schedule_engine
+
+if __name__ == "__main__":
+    db_manager.init_db()
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else schedule_engine.DEFAULT_HORIZON_DAYS
+    schedule_engine.generate_tasks(horizon_days=days)
@@ -0,0 +1,238 @@
+import math
+import threading
+import time
+import numpy as np
+import db_manager
+
+# ==========================================
+# 送餐站點座標索引 (網格)
+# ==========================================
+# 「我附近 N 公尺內有哪些站點」與打卡位置檢查不逐筆計算全部長者的距離：
+#   - 以參考緯度將經緯度投影為公尺 (臺東縣範圍內誤差 < 2%，查詢時多擴一圈補償)
+#   - 依 cell_m 公尺切成網格，每格記錄站點索引
+#   - 查詢只計算鄰近幾格內站點的大圓距離
+# get_stop_index() 以 db_manager.get_elderly_data_version() (elderly_profiles 的異動計數，
+# 姓名 / 地址修改也會遞增) 判斷資料是否異動，未異動時沿用同一份索引 (程序內共用)。
+# 每次打卡檢查都查詢版本也要一次連線，因此最多每 VERSION_CHECK_INTERVAL 秒查詢一次。
+
+EARTH_RADIUS_M = 6371000.0
+DEFAULT_CELL_M = 200.0
+CHECKIN_RADIUS_M = 150.0
+_PROJECTION_MARGIN = 1.02
+VERSION_CHECK_INTERVAL = 5.0  # 秒
+
+
+def haversine_m(lat, lon, lats, lons):
+    """
+    單點到多點的大圓距離
+
+    Args:
+        lat (float): 起點緯度
+        lon (float): 起點經度
+        lats: 目標緯度 (陣列)
+        lons: 目標經度 (陣列)
+
+    Returns:
+        ndarray: 距離 (公尺)
+    """
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GridIndex:
+    """
+    經緯度點的網格索引
+
+    Args:
+        ids (list): 點的識別碼 (例如長者 ID)
+        lats (list): 緯度
+        lons (list): 經度
+        cell_m (float): 網格邊長 (公尺)，約為常用查詢半徑
+    """
+
+    def __init__(self, ids, lats, lons, cell_m=DEFAULT_CELL_M):
+        self.ids = list(ids)
+        self.lats = np.asarray(lats, dtype=float)
+        self.lons = np.asarray(lons, dtype=float)
+        self.cell_m = float(cell_m)
+        self._position = {point_id: i for i, point_id in enumerate(self.ids)}
+
+        ref_lat = float(self.lats.mean()) if len(self.lats) else 23.0
+        self._ky = EARTH_RADIUS_M * math.pi / 180
+        self._kx = self._ky * math.cos(math.radians(ref_lat))
+
+        cells = {}
+        if len(self.ids):
+            ix = np.floor(self.lons * self._kx / self.cell_m).astype(int)
+            iy = np.floor(self.lats * self._ky / self.cell_m).astype(int)
+            for i, key in enumerate(zip(ix.tolist(), iy.tolist())):
+                cells.setdefault(key, []).append(i)
+            self._bounds = (ix.min(), ix.max(), iy.min(), iy.max())
+        self._cells = {key: np.array(members) for key, members in cells.items()}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _cell(self, lat, lon):
+        return (math.floor(lon * self._kx / self.cell_m), math.floor(lat * self._ky / self.cell_m))
+
+    def _candidates(self, cx, cy, ring_from, ring_to):
+        """收集與中心格距離 ring_from ~ ring_to 圈的網格中的點"""
+        found = []
+        for dx in range(-ring_to, ring_to + 1):
+            for dy in range(-ring_to, ring_to + 1):
+                if max(abs(dx), abs(dy)) < ring_from:
+                    continue
+                members = self._cells.get((cx + dx, cy + dy))
+                if members is not None:
+                    found.append(members)
+        if not found:
+            return np.empty(0, dtype=int)
+        return found[0] if len(found) == 1 else np.concatenate(found)
+
+    def within(self, lat, lon, radius_m):
+        """
+        半徑範圍內的點
+
+        Args:
+            lat (float): 緯度
+            lon (float): 經度
+            radius_m (float): 半徑 (公尺)
+
+        Returns:
+            list: (id, 距離公尺)，由近到遠
+        """
+        if not self.ids:
+            return []
+        cx, cy = self._cell(lat, lon)
+        rings = math.ceil(radius_m * _PROJECTION_MARGIN / self.cell_m)
+        candidates = self._candidates(cx, cy, 0, rings)
+        if not len(candidates):
+            return []
+        distances = haversine_m(lat, lon, self.lats[candidates], self.lons[candidates])
+        mask = distances <= radius_m
+        order = np.argsort(distances[mask], kind="stable")
+        hits, hit_distances = candidates[mask][order], distances[mask][order]
+        return [(self.ids[i], float(d)) for i, d in zip(hits.tolist(), hit_distances.tolist())]
+
+    def nearest(self, lat, lon, k=1, max_radius_m=None):
+        """
+        最近的 k 個點 (由中心格一圈一圈向外找，找到的第 k 近點比未搜尋的範圍近即停止)
+
+        Args:
+            lat (float): 緯度
+            lon (float): 經度
+            k (int): 數量
+            max_radius_m (float): 最遠距離 (公尺)，None 表示不限
+
+        Returns:
+            list: (id, 距離公尺)，由近到遠
+        """
+        if not self.ids:
+            return []
+        cx, cy = self._cell(lat, lon)
+        min_x, max_x, min_y, max_y = self._bounds
+        last_ring = max(abs(cx - min_x), abs(cx - max_x), abs(cy - min_y), abs(cy - max_y))
+        if max_radius_m is not None:
+            last_ring = min(last_ring, math.ceil(max_radius_m * _PROJECTION_MARGIN / self.cell_m))
+
+        found_idx, found_dist = np.empty(0, dtype=int), np.empty(0)
+        ring = 0
+        while ring <= last_ring:
+            candidates = self._candidates(cx, cy, ring, ring)
+            if len(candidates):
+                found_idx = np.concatenate([found_idx, candidates])
+                found_dist = np.concatenate([found_dist, haversine_m(lat, lon, self.lats[candidates], self.lons[candidates])])
+            # 第 ring 圈以外的點至少相距 ring 格
+            if len(found_dist) >= k and np.partition(found_dist, k - 1)[k - 1] <= ring * self.cell_m / _PROJECTION_MARGIN:
+                break
+            ring += 1
+
+        if max_radius_m is not None:
+            keep = found_dist <= max_radius_m
+            found_idx, found_dist = found_idx[keep], found_dist[keep]
+        order = np.argsort(found_dist, kind="stable")[:k]
+        return [(self.ids[i], float(d)) for i, d in zip(found_idx[order].tolist(), found_dist[order].tolist())]
+
+    def distance_to(self, point_id, lat, lon):
+        """
+        指定點到 (lat, lon) 的距離
+
+        Returns:
+            float: 公尺；點不在索引中 (無座標) 時回傳 None
+        """
+        i = self._position.get(point_id)
+        if i is None:
+            return None
+        return float(haversine_m(lat, lon, self.lats[i:i + 1], self.lons[i:i + 1])[0])
+
+
+# ==========================================
+# 啟用中長者的共用索引
+# ==========================================
+
+_stop_index = None
+_stop_index_version = None
+_stop_index_checked = 0.0
+_stop_index_lock = threading.Lock()
+
+
+def get_stop_index(cell_m=DEFAULT_CELL_M, max_age=VERSION_CHECK_INTERVAL):
+    """
+    取得啟用中且有座標的長者索引 (資料未異動時沿用)
+
+    Args:
+        cell_m (float): 網格大小 (公尺)
+        max_age (float): 距上次檢查資料版本未滿幾秒時直接沿用，不查詢資料庫
+
+    Returns:
+        tuple: (GridIndex, {elderly_id: sqlite3.Row})
+    """
+    global _stop_index, _stop_index_version, _stop_index_checked
+    with _stop_index_lock:
+        now = time.monotonic()
+        if _stop_index is not None and _stop_index[0].cell_m == cell_m and now - _stop_index_checked < max_age:
+            return _stop_index
+        version = db_manager.get_elderly_data_version()
+        _stop_index_checked = now
+        if _stop_index is None or _stop_index_version != version or _stop_index[0].cell_m != cell_m:
+            profiles = [p for p in db_manager.get_all_elderly() if p['gps_lat'] is not None and p['gps_lon'] is not None]
+            index = GridIndex([p['id'] for p in profiles], [p['gps_lat'] for p in profiles],
+                              [p['gps_lon'] for p in profiles], cell_m)
+            _stop_index = (index, {p['id']: p for p in profiles})
+            _stop_index_version = version
+            print(f"📍 站點座標索引: {len(profiles)} 筆")
+        return _stop_index
+
+
+def stops_within(lat, lon, radius_m):
+    """
+    (lat, lon) 半徑內的啟用中站點
+
+    Returns:
+        list: (長者資料 sqlite3.Row, 距離公尺)，由近到遠
+    """
+    index, profiles = get_stop_index()
+    return [(profiles[elderly_id], distance) for elderly_id, distance in index.within(lat, lon, radius_m)]
+
+
+def check_checkin_location(elderly_id, lat, lon, radius_m=CHECKIN_RADIUS_M):
+    """
+    打卡位置檢查：志工是否在該站點 radius_m 公尺內
+
+    Args:
+        elderly_id (int): 長者 ID
+        lat (float): 志工目前緯度
+        lon (float): 志工目前經度
+        radius_m (float): 允許距離 (公尺)
+
+    Returns:
+        tuple: (是否在範圍內, 距離公尺)；站點沒有座標時回傳 (None, None)
+    """
+    index, _ = get_stop_index()
+    distance = index.distance_to(elderly_id, lat, lon)
+    if distance is None:
+        return None, None
+    return distance <= radius_m, distance
@@ -0,0 +1,240 @@
+import math
+import numpy as np
+import pandas as pd
+import address_normalizer
+import db_manager
+
+# ==========================================
+# 地址座標快取 (本機 geocoding)
+# ==========================================
+# 許多長者資料沒有 gps_lat / gps_lon，路線最佳化與分區只能略過。
+# 不逐筆呼叫外部 geocoding 服務，改用本機的 geocode_cache 資料表：
+#   - 門牌資料 (內政部門牌位置 CSV，TWD97 二度分帶或經緯度) 離線匯入
+#   - 審核人員在後台人工補登 (不會被之後的匯入覆蓋)
+# 鍵值使用 address_normalizer 的門牌鍵 (不含樓層，同一棟同一座標)，
+# 有鄉鎮時以「鄉鎮 + 門牌鍵」區分不同鄉鎮的同名道路。
+
+# 欄位名稱 (依序嘗試)
+ADDRESS_COLUMNS = ("地址", "完整地址", "門牌", "address")
+LAT_COLUMNS = ("緯度", "lat", "latitude")
+LON_COLUMNS = ("經度", "lon", "lng", "longitude")
+TWD97_X_COLUMNS = ("TWD97_X", "TWD97X", "橫坐標", "X", "x")
+TWD97_Y_COLUMNS = ("TWD97_Y", "TWD97Y", "縱坐標", "Y", "y")
+# 門牌資料拆欄時依序組成地址；純數字的欄位補上單位
+ADDRESS_PART_COLUMNS = ("縣市", "鄉鎮市區", "村里", "鄰", "街路段", "地區", "巷", "弄", "號")
+_PART_SUFFIX = {"鄰": "鄰", "巷": "巷", "弄": "弄", "號": "號"}
+
+# TWD97 二度分帶 (TM2, 中央經線 121°E) 的 GRS80 參數
+_GRS80_A = 6378137.0
+_GRS80_F = 1 / 298.257222101
+_TM2_K0 = 0.9999
+_TM2_LON0 = 121.0
+_TM2_FALSE_EASTING = 250000.0
+
+
+def geocode_keys(address):
+    """
+    地址的快取鍵
+
+    Args:
+        address (str): 原始地址
+
+    Returns:
+        tuple: (地址鍵, 門牌鍵)；門牌鍵為空時表示無法解析
+    """
+    building = address_normalizer.building_key(address) if address else ""
+    if not building:
+        return "", ""
+    township = address_normalizer.parse_address(address).township
+    return township + building, building
+
+
+def twd97_to_wgs84(x, y):
+    """
+    TWD97 二度分帶座標轉經緯度 (橫麥卡托反算)
+
+    Args:
+        x: 橫坐標 (公尺，可為陣列)
+        y: 縱坐標 (公尺，可為陣列)
+
+    Returns:
+        tuple: (緯度, 經度) 度
+    """
+    x = np.asarray(x, dtype=float) - _TM2_FALSE_EASTING
+    y = np.asarray(y, dtype=float)
+    a, e2 = _GRS80_A, _GRS80_F * (2 - _GRS80_F)
+    ep2 = e2 / (1 - e2)
+    e1 = (1 - math.sqrt(1 - e2)) / (1 + math.sqrt(1 - e2))
+
+    mu = y / _TM2_K0 / (a * (1 - e2 / 4 - 3 * e2 ** 2 / 64 - 5 * e2 ** 3 / 256))
+    phi1 = (mu + (3 * e1 / 2 - 27 * e1 ** 3 / 32) * np.sin(2 * mu)
+            + (21 * e1 ** 2 / 16 - 55 * e1 ** 4 / 32) * np.sin(4 * mu)
+            + (151 * e1 ** 3 / 96) * np.sin(6 * mu)
+            + (1097 * e1 ** 4 / 512) * np.sin(8 * mu))
+
+    sin1, cos1, tan1 = np.sin(phi1), np.cos(phi1), np.tan(phi1)
+    c1 = ep2 * cos1 ** 2
+    t1 = tan1 ** 2
+    n1 = a / np.sqrt(1 - e2 * sin1 ** 2)
+    r1 = a * (1 - e2) / (1 - e2 * sin1 ** 2) ** 1.5
+    d = x / (n1 * _TM2_K0)
+
+    lat = phi1 - (n1 * tan1 / r1) * (
+        d ** 2 / 2
+        - (5 + 3 * t1 + 10 * c1 - 4 * c1 ** 2 - 9 * ep2) * d ** 4 / 24
+        + (61 + 90 * t1 + 298 * c1 + 45 * t1 ** 2 - 252 * ep2 - 3 * c1 ** 2) * d ** 6 / 720)
+    lon = (d - (1 + 2 * t1 + c1) * d ** 3 / 6
+           + (5 - 2 * c1 + 28 * t1 - 3 * c1 ** 2 + 8 * ep2 + 24 * t1 ** 2) * d ** 5 / 120) / cos1
+    return np.degrees(lat), _TM2_LON0 + np.degrees(lon)
+
+
+def _find_column(df, candidates):
+    for name in candidates:
+        if name in df.columns:
+            return name
+    return None
+
+
+def _compose_addresses(df):
+    """門牌資料拆欄 (縣市 / 鄉鎮市區 / 街路段 / 號 ...) 時組成完整地址"""
+    columns = [c for c in ADDRESS_PART_COLUMNS if c in df.columns]
+    if not columns:
+        raise ValueError(f"找不到地址欄位 (需有 {ADDRESS_COLUMNS[0]} 或門牌拆欄)")
+    parts = []
+    for column in columns:
+        values = df[column].fillna("").astype(str).str.strip()
+        if column in _PART_SUFFIX:
+            suffix = _PART_SUFFIX[column]
+            values = values.where(~values.str.fullmatch(r"\d+"), values.str.lstrip("0") + suffix)
+        parts.append(values)
+    return pd.concat(parts, axis=1).agg("".join, axis=1)
+
+
+def read_gazetteer(source, encoding=None):
+    """
+    讀取門牌資料 CSV 並轉為 (地址, 緯度, 經度)
+
+    Args:
+        source: 檔案路徑、檔案物件或 DataFrame
+        encoding (str): CSV 編碼，None 時依序嘗試 utf-8-sig、cp950
+
+    Returns:
+        DataFrame: address / lat / lon 欄位
+    """
+    if isinstance(source, pd.DataFrame):
+        df = source
+    elif encoding:
+        df = pd.read_csv(source, encoding=encoding, dtype=str)
+    else:
+        try:
+            df = pd.read_csv(source, encoding="utf-8-sig", dtype=str)
+        except UnicodeDecodeError:
+            if hasattr(source, "seek"):
+                source.seek(0)
+            df = pd.read_csv(source, encoding="cp950", dtype=str)
+
+    address_column = _find_column(df, ADDRESS_COLUMNS)
+    addresses = df[address_column].fillna("").astype(str) if address_column else _compose_addresses(df)
+
+    lat_column, lon_column = _find_column(df, LAT_COLUMNS), _find_column(df, LON_COLUMNS)
+    x_column, y_column = _find_column(df, TWD97_X_COLUMNS), _find_column(df, TWD97_Y_COLUMNS)
+    if lat_column and lon_column:
+        lats = pd.to_numeric(df[lat_column], errors="coerce").to_numpy()
+        lons = pd.to_numeric(df[lon_column], errors="coerce").to_numpy()
+    elif x_column and y_column:
+        lats, lons = twd97_to_wgs84(pd.to_numeric(df[x_column], errors="coerce").to_numpy(),
+                                    pd.to_numeric(df[y_column], errors="coerce").to_numpy())
+    else:
+        raise ValueError("找不到座標欄位 (需有經緯度或 TWD97 X / Y)")
+
+    result = pd.DataFrame({"address": addresses.to_numpy(), "lat": lats, "lon": lons})
+    return result.dropna(subset=["lat", "lon"])
+
+
+def import_gazetteer(source, encoding=None):
+    """
+    匯入門牌資料到 geocode_cache (不覆蓋人工補登的座標)
+
+    Args:
+        source: 檔案路徑、檔案物件或 DataFrame
+        encoding (str): CSV 編碼
+
+    Returns:
+        int: 寫入筆數
+    """
+    df = read_gazetteer(source, encoding)
+    rows = []
+    for address, lat, lon in zip(df["address"], df["lat"], df["lon"]):
+        address_key, building_key = geocode_keys(address)
+        if building_key:
+            rows.append((address_key, building_key, address, float(lat), float(lon)))
+    count = db_manager.save_geocodes(rows, source="gazetteer")
+    print(f"🗺️ 門牌資料匯入: {count} / {len(df)} 筆")
+    return count
+
+
+def lookup(addresses):
+    """
+    查詢地址座標 (只查本機快取)
+
+    先以地址鍵 (含鄉鎮) 比對；查無時以門牌鍵比對，只有唯一結果時採用
+    (地址或門牌資料未寫鄉鎮時，避免誤用其他鄉鎮同名道路的座標)。
+
+    Args:
+        addresses (iterable): 原始地址
+
+    Returns:
+        dict: {地址: (緯度, 經度)}，查無座標的地址不列入
+    """
+    keys = {address: geocode_keys(address) for address in set(addresses) if address}
+    keys = {address: k for address, k in keys.items() if k[1]}
+    by_address, by_building = db_manager.get_geocodes([k[0] for k in keys.values()], [k[1] for k in keys.values()])
+    found = {}
+    for address, (address_key, building_key) in keys.items():
+        coords = by_address.get(address_key)
+        if coords is None:
+            candidates = by_building.get(building_key, [])
+            coords = candidates[0] if len(candidates) == 1 else None
+        if coords:
+            found[address] = coords
+    return found
+
+
+def save_reviewed(address, lat, lon, reviewer=None, elderly_id=None):
+    """
+    人工補登座標 (寫入快取，並可同時更新長者資料)
+
+    Args:
+        address (str): 地址
+        lat (float): 緯度
+        lon (float): 經度
+        reviewer (str): 補登人員帳號
+        elderly_id (int): 要同時更新座標的長者 ID
+
+    Returns:
+        bool: 地址可解析並已寫入
+    """
+    address_key, building_key = geocode_keys(address)
+    if not building_key:
+        return False
+    db_manager.save_geocodes([(address_key, building_key, address, float(lat), float(lon))],
+                             source="reviewer", updated_by=reviewer)
+    if elderly_id is not None:
+        db_manager.update_elderly_gps([(float(lat), float(lon), elderly_id)])
+    return True
+
+
+def fill_missing_gps():
+    """
+    以快取補齊啟用中長者的座標
+
+    Returns:
+        dict: {'filled': 補齊筆數, 'missing': 仍無座標的長者 (sqlite3.Row 列表)}
+    """
+    profiles = db_manager.get_elderly_missing_gps()
+    found = lookup(p['address'] for p in profiles)
+    updates = [(found[p['address']][0], found[p['address']][1], p['id']) for p in profiles if p['address'] in found]
+    db_manager.update_elderly_gps(updates)
+    missing = [p for p in profiles if p['address'] not in found]
+    print(f"📍 座標補齊: {len(updates)} 筆，仍缺 {len(missing)} 筆")
+    return {'filled': len(updates), 'missing': missing}
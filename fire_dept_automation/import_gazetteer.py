@@ -0,0 +1,18 @@
+"""
+匯入門牌資料 (地址 → 座標) 到 geocode_cache，並補齊長者座標
+
+門牌資料需有「地址」或門牌拆欄 (鄉鎮市區、街路段、號...)，以及經緯度或 TWD97 X / Y 欄位：
+    python import_gazetteer.py 臺東縣門牌.csv
+    python import_gazetteer.py 臺東縣門牌.csv cp950
+"""
+import sys
+import db_manager
+import geocode_cache
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    db_manager.init_db()
+    geocode_cache.import_gazetteer(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    geocode_cache.fill_missing_gps()
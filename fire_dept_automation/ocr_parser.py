@@ -0,0 +1,344 @@
+import re
+from functools import lru_cache
+from operator import itemgetter
+
+# C 版 Aho-Corasick (選用，build_automaton 未安裝時改用 KeywordScanner)
+try:
+    import ahocorasick
+    _ahocorasick_available = True
+except ImportError:
+    ahocorasick = None
+    _ahocorasick_available = False
+
+# ==========================================
+# OCR 欄位解析器 (共用)
+# ==========================================
+# utils.py、comparison_app.py、pages/5_auto_comparison_system.py 共用的解析邏輯。
+# 欄位標籤以一條預先編譯的 alternation regex 掃描整頁 (不再逐行對每個標籤做 `in` + re.search)，
+# 勾選符號同樣合併為一條 regex；設備名稱逐一以 `in` 比對。
+# 曾改用 Aho-Corasick 自動機一次找出所有關鍵字，但命中結果的後處理在 Python 中進行，
+# 實測 (tests/bench_ocr_parser.py) 純 Python 版慢約 2.8 倍、pyahocorasick 也未比舊版快，故不採用。
+# build_automaton() 保留給 page_classifier 的頁首 / 目錄行關鍵字比對。
+
+TOC_TITLE = "消防安全設備檢修申報書目錄"
+SECTION_TITLE = "消防安全設備檢查表"
+
+# 欄位標籤 (標籤後必須接分隔符號)
+FIELD_LABELS = ("管理權人", "姓名", "場所地址", "地址", "場所電話", "電話", "場所名稱", "申報項目", "檢修項目")
+LABEL_SEPARATORS = ":：|"
+
+CHECKED_MARKERS = ('✓', '☑', 'v', 'V', '√', '✔', '☒', '▣', '■', '●', '✅')
+UNCHECKED_MARKERS = ('☐', '□', '▢', '▫', '▪')
+
+# 目錄頁偵測關鍵字
+DEFAULT_TOC_KEYWORDS = (TOC_TITLE,)
+EXTENDED_TOC_KEYWORDS = ("目錄", "附表", "二、消防安全設備檢查表", TOC_TITLE)
+
+# 目錄頁設備解析模式
+TOC_MODE_CHECKED = "checked"  # 逐行判斷勾選符號，空白方框的行排除
+TOC_MODE_SECTION = "section"  # 取「消防安全設備檢查表」之後出現的所有設備
+
+_PHONE_VALUE_PATTERN = re.compile(r"[\d\-\(\)\s]+")
+# 標籤 + 分隔符號；較長的標籤吃掉的後綴標籤 (「場所地址」中的「地址」) 由 _LABEL_SUFFIXES 補回
+_LABEL_PATTERN = re.compile(
+    "(" + "|".join(sorted(FIELD_LABELS, key=len, reverse=True)) + ")[" + re.escape(LABEL_SEPARATORS) + "]"
+)
+_CHECKED_MARKER_PATTERN = re.compile("|".join(map(re.escape, CHECKED_MARKERS)))
+_UNCHECKED_MARKER_PATTERN = re.compile("|".join(map(re.escape, UNCHECKED_MARKERS)))
+_LABEL_SUFFIXES = {label: [other for other in FIELD_LABELS if label.endswith(other)] for label in FIELD_LABELS}
+
+class KeywordScanner:
+    """
+    逐一關鍵字搜尋 (未安裝 pyahocorasick 時的備用方案)
+
+    每個模式以 str.find 找出所有 (含重疊) 出現位置，再依結束位置排序。
+    關鍵字只有數十個、每頁文字不長，C 實作的 find 比純 Python 的自動機快。
+    介面與 pyahocorasick 的 Automaton.iter() 相同。
+    """
+
+    def __init__(self, patterns):
+        """
+        Args:
+            patterns (dict): {模式字串: 值}
+        """
+        self._patterns = [(pattern, len(pattern) - 1, value) for pattern, value in patterns.items() if pattern]
+
+    def iter(self, text):
+        """
+        掃描文字
+
+        Returns:
+            iterator: (結束位置 (含), 值)，依結束位置排序
+        """
+        hits = []
+        find = text.find
+        for pattern, tail, value in self._patterns:
+            idx = find(pattern)
+            while idx >= 0:
+                hits.append((idx + tail, value))
+                idx = find(pattern, idx + 1)
+        hits.sort(key=itemgetter(0))
+        return iter(hits)
+
+
+def build_automaton(patterns):
+    """
+    建立多模式比對器 (優先使用 pyahocorasick，未安裝時逐一關鍵字搜尋)
+
+    Args:
+        patterns (dict): {模式字串: 值}
+
+    Returns:
+        具有 iter(text) -> (結束位置, 值) 的比對器
+    """
+    if _ahocorasick_available:
+        automaton = ahocorasick.Automaton()
+        for pattern, value in patterns.items():
+            if pattern:
+                automaton.add_word(pattern, value)
+        automaton.make_automaton()
+        return automaton
+    return KeywordScanner(patterns)
+
+
+def clean_text(text):
+    """去除所有空白 (含全形空格、Tab)，保留換行"""
+    if not text:
+        return ""
+    return text.replace(" ", "").replace("　", "").replace("\t", "").replace("\r", "")
+
+
+class OcrFieldParser:
+    """
+    OCR 欄位解析器
+
+    Args:
+        equipment_list (list): 標準設備清單 (長名稱在前)
+        toc_keywords (tuple): 目錄頁偵測關鍵字
+        toc_mode (str): TOC_MODE_CHECKED 或 TOC_MODE_SECTION
+        record_toc_page (bool): 是否在結果中記錄目錄頁碼 (toc_page_num)
+    """
+
+    def __init__(self, equipment_list, toc_keywords=DEFAULT_TOC_KEYWORDS,
+                 toc_mode=TOC_MODE_CHECKED, record_toc_page=False):
+        self.equipment_list = list(equipment_list)
+        self.toc_keywords = tuple(kw.replace(" ", "") for kw in toc_keywords)
+        self.toc_mode = toc_mode
+        self.record_toc_page = record_toc_page
+        self._equipment_aliases = [(name, name.replace("設備", "")) for name in self.equipment_list]
+
+    # ------------------------------------------
+    # 欄位
+    # ------------------------------------------
+    def iter_label_values(self, text):
+        """
+        逐行取出「標籤 + 分隔符號」之後的值 (到行尾)，只列出有標籤的行
+
+        Args:
+            text (str): clean_text() 處理後的文字
+
+        Yields:
+            tuple: (行索引, 行文字, {標籤: [(值起始位置, 值), ...]})
+                   同一標籤依出現順序列出；位置為整頁文字中的索引
+        """
+        line_idx, line_start, line_end = 0, 0, -1
+        line, labels = None, {}
+        for match in _LABEL_PATTERN.finditer(text):
+            pos = match.start()
+            if pos >= line_end:
+                if labels:
+                    yield line_idx, line, labels
+                next_start = text.rfind("\n", 0, pos) + 1
+                line_idx += text.count("\n", line_start, next_start)
+                line_start = next_start
+                line_end = text.find("\n", pos)
+                if line_end < 0:
+                    line_end = len(text)
+                line, labels = text[line_start:line_end], {}
+            value_start = match.end()
+            value = text[value_start:line_end]
+            for label in _LABEL_SUFFIXES[match.group(1)]:
+                labels.setdefault(label, []).append((value_start, value))
+        if labels:
+            yield line_idx, line, labels
+
+    # ------------------------------------------
+    # 設備
+    # ------------------------------------------
+    def equipment_in(self, text):
+        """文字中出現的標準設備 (依標準清單順序)"""
+        return [name for name in self.equipment_list if name in text]
+
+    def normalize_equipment_str(self, text):
+        """
+        只保留標準設備清單中的項目，並以頓號分隔
+
+        Args:
+            text (str): OCR 或系統資料文字
+
+        Returns:
+            str: 例如 "室內消防栓設備、滅火器"
+        """
+        if not text or not isinstance(text, str):
+            return ""
+        return "、".join(self.equipment_in(text.replace(" ", "").replace("　", "").replace("\n", "")))
+
+    def checked_equipment(self, text):
+        """
+        逐行解析目錄頁已勾選的設備
+
+        含空白方框的行一律排除；有勾選符號的行取清單中第一個尚未加入的設備
+        (比對完整名稱或去掉「設備」二字的名稱)。
+
+        Args:
+            text (str): 目錄頁 clean_text() 處理後的文字
+
+        Returns:
+            list: 已勾選的設備 (依出現順序)
+        """
+        checked = []
+        for line in text.split("\n"):
+            if not _CHECKED_MARKER_PATTERN.search(line) or _UNCHECKED_MARKER_PATTERN.search(line):
+                continue
+            for name, alias in self._equipment_aliases:
+                if name not in checked and (name in line or (alias and alias in line)):
+                    checked.append(name)
+                    break
+        return checked
+
+    def section_equipment(self, text):
+        """
+        取「消防安全設備檢查表」之後出現的所有設備 (標題不跨行，設備允許跨行)
+
+        Args:
+            text (str): 目錄頁 clean_text() 處理後的文字
+
+        Returns:
+            list: 設備 (依標準清單順序)；找不到標題時回傳 None
+        """
+        idx = text.find(SECTION_TITLE)
+        if idx < 0:
+            return None
+        rest = text[idx + len(SECTION_TITLE):].replace("\n", "")
+        return self.equipment_in(rest)
+
+    def is_toc_page(self, text):
+        """
+        是否含有目錄頁關鍵字 (不跨行)
+
+        Args:
+            text (str): clean_text() 處理後的文字 (保留換行)
+        """
+        return any(kw in text for kw in self.toc_keywords)
+
+    # ------------------------------------------
+    # 主流程
+    # ------------------------------------------
+    def parse(self, text, pages_text_list=None):
+        """
+        從 OCR 文字中提取關鍵資訊
+
+        Args:
+            text (str): 第一頁 OCR 文字
+            pages_text_list (list): 所有頁面 OCR 文字 (用於尋找目錄頁)
+
+        Returns:
+            dict: {'管理權人', '場所地址', '場所電話', '場所名稱', '消防設備種類', 'toc_page_num'} 中找到的欄位
+        """
+        info = {}
+
+        # --- 第一頁解析 (基本資料) ---
+        if text:
+            for _, line, labels in self.iter_label_values(clean_text(text)):
+                # 1. 管理權人
+                if "管理權人" in labels:
+                    val = labels["管理權人"][0][1]
+                    if "通訊處" not in val:
+                        info['管理權人'] = val
+
+                # 備用：找 "姓名" (排除 "檢修人員姓名")
+                if "姓名" in labels and "檢修人員" not in line and "管理權人" not in info:
+                    info['管理權人'] = labels["姓名"][0][1].split("身分證")[0]
+
+                # 2. 地址 (優先 "場所地址"；一般 "地址" 不覆蓋已找到的場所地址)
+                if "場所地址" in line:
+                    if "場所地址" in labels:
+                        info['場所地址'] = labels["場所地址"][0][1]
+                elif "地址" in labels and '場所地址' not in info:
+                    info['場所地址'] = labels["地址"][0][1]
+
+                # 3. 電話 (只取第一個，避免抓到檢修公司的電話)
+                if "電話" in labels and '場所電話' not in info:
+                    # 取第一個後面接電話號碼字元的「電話：」
+                    for _, value in labels["電話"]:
+                        match = _PHONE_VALUE_PATTERN.match(value)
+                        if match:
+                            val = match.group(0).strip()
+                            if any(char.isdigit() for char in val):
+                                info['場所電話'] = val
+                            break
+
+                # 4. 場所名稱
+                if "場所名稱" in labels:
+                    info['場所名稱'] = labels["場所名稱"][0][1]
+
+                # 5. 消防設備種類 (沒有其他頁面時才從第一頁的申報項目抓)
+                if not pages_text_list:
+                    item_labels = [labels[k][0] for k in ("申報項目", "檢修項目") if k in labels]
+                    if item_labels:
+                        value = min(item_labels)[1]
+                        info['消防設備種類'] = "、".join(self.equipment_in(value))
+
+        # --- 多頁解析 (尋找消防設備種類) ---
+        if pages_text_list and isinstance(pages_text_list, list):
+            toc_index = None
+            for i, page_text in enumerate(pages_text_list):
+                if self.is_toc_page(clean_text(page_text)):
+                    toc_index = i
+                    break
+
+            # 回退：使用第二頁
+            if toc_index is None and len(pages_text_list) > 1:
+                toc_index = 1
+
+            if toc_index is not None:
+                if self.record_toc_page:
+                    info['toc_page_num'] = toc_index + 1
+                toc_text = clean_text(pages_text_list[toc_index])
+                if self.toc_mode == TOC_MODE_SECTION:
+                    equipment = self.section_equipment(toc_text)
+                else:
+                    equipment = self.checked_equipment(toc_text)
+                if equipment:
+                    info['消防設備種類'] = "、".join(equipment)
+
+        return info
+
+
+@lru_cache(maxsize=8)
+def get_parser(equipment_list, toc_keywords=DEFAULT_TOC_KEYWORDS,
+               toc_mode=TOC_MODE_CHECKED, record_toc_page=False):
+    """
+    取得 (快取的) 解析器
+
+    Args:
+        equipment_list (tuple): 標準設備清單
+        其餘參數同 OcrFieldParser
+
+    Returns:
+        OcrFieldParser: 解析器
+    """
+    return OcrFieldParser(equipment_list, toc_keywords, toc_mode, record_toc_page)
+
+
+def extract_info_from_ocr(text, pages_text_list=None, equipment_list=(),
+                          toc_keywords=DEFAULT_TOC_KEYWORDS, toc_mode=TOC_MODE_CHECKED,
+                          record_toc_page=False):
+    """從 OCR 文字中提取關鍵資訊 (參數同 OcrFieldParser)"""
+    parser = get_parser(tuple(equipment_list), tuple(toc_keywords), toc_mode, record_toc_page)
+    return parser.parse(text, pages_text_list)
+
+
+def normalize_equipment_str(text, equipment_list=()):
+    """只保留標準設備清單中的項目，並以頓號分隔"""
+    return get_parser(tuple(equipment_list)).normalize_equipment_str(text)
@@ -7,12 +7,22 @@
 import os
 import json
 import re
+from abc import ABC, abstractmethod
 from typing import Dict, List, Tuple, Optional, Any, Union
 from dataclasses import dataclass, field
 from enum import Enum
 from difflib import SequenceMatcher, unified_diff
+from functools import lru_cache
 import unicodedata
 
+# C 版編輯距離 (選用)
+try:
+    from rapidfuzz.distance import Indel as _rapidfuzz_indel
+    _rapidfuzz_available = True
+except ImportError:
+    _rapidfuzz_indel = None
+    _rapidfuzz_available = False
+
 
 class MatchType(Enum):
     """比對結果類型"""
@@ -64,45 +74,149 @@ class ComparisonResult:
         }
 
 
+# 正規化用的預先編譯規則
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+_VARIANT_TABLE = str.maketrans({
+    '台': '臺',  # 統一台/臺 (與 address_normalizer 相同方向)
+    '－': '-',
+    '—': '-',
+    '：': ':',
+    '；': ';',
+})
+
+
+@lru_cache(maxsize=8192)
+def _normalize_cached(text: str) -> str:
+    text = text.strip()
+    
+    # 統一全形轉半形 (數字、英文)
+    text = unicodedata.normalize('NFKC', text)
+    
+    # 移除多餘空白
+    text = _WHITESPACE_PATTERN.sub(' ', text)
+    
+    # 統一常見變體
+    text = text.translate(_VARIANT_TABLE)
+    
+    return text.lower()
+
+
 def normalize_text(text: str) -> str:
     """
     正規化文字以進行比對
     - 移除多餘空白
     - 統一全形/半形
     - 統一大小寫
+    
+    結果會快取 (同一份登記資料在批次比對中會重複出現)。
     """
     if text is None:
         return ""
+    return _normalize_cached(str(text))
+
+
+# ==========================================
+# 相似度引擎 (可替換)
+# ==========================================
+
+class SimilarityEngine(ABC):
+    """
+    相似度引擎介面 (抽象類別，子類別必須實作 ratio)
     
-    text = str(text).strip()
+    ratio() 回傳 0-1 的相似度；score_cutoff > 0 時，
+    低於門檻的結果一律回傳 0.0 (允許引擎提早結束計算)。
+    """
+    name = "base"
     
-    # 統一全形轉半形 (數字、英文)
-    text = unicodedata.normalize('NFKC', text)
+    @abstractmethod
+    def ratio(self, str1: str, str2: str, score_cutoff: float = 0.0) -> float:
+        """兩字串的相似度 (0-1)"""
+
+
+class DifflibEngine(SimilarityEngine):
+    """標準函式庫 difflib.SequenceMatcher (純 Python)"""
+    name = "difflib"
+    
+    def ratio(self, str1: str, str2: str, score_cutoff: float = 0.0) -> float:
+        matcher = SequenceMatcher(None, str1, str2)
+        if score_cutoff > 0:
+            # 由便宜到昂貴的上限估計，任一低於門檻即可略過完整計算
+            if matcher.real_quick_ratio() < score_cutoff or matcher.quick_ratio() < score_cutoff:
+                return 0.0
+        score = matcher.ratio()
+        return score if score >= score_cutoff else 0.0
+
+
+class RapidFuzzEngine(SimilarityEngine):
+    """
+    rapidfuzz 的 Indel 正規化相似度 (C 實作)
     
-    # 移除多餘空白
-    text = re.sub(r'\s+', ' ', text)
+    與 difflib 同為 2*M/T，但 M 取最長共同子序列，
+    結果可能略高於 difflib 的 Ratcliff/Obershelp 比對。
+    """
+    name = "rapidfuzz"
     
-    # 統一常見變體
-    replacements = {
-        '臺': '台',  # 統一台/臺
-        '－': '-',
-        '—': '-',
-        '：': ':',
-        '；': ';',
-    }
-    for old, new in replacements.items():
-        text = text.replace(old, new)
+    def ratio(self, str1: str, str2: str, score_cutoff: float = 0.0) -> float:
+        return _rapidfuzz_indel.normalized_similarity(str1, str2, score_cutoff=score_cutoff or None)
+
+
+SIMILARITY_ENGINES = {
+    DifflibEngine.name: DifflibEngine,
+    RapidFuzzEngine.name: RapidFuzzEngine,
+}
+
+_similarity_engine: Optional[SimilarityEngine] = None
+
+
+def set_similarity_engine(engine: Union[str, SimilarityEngine, None]) -> SimilarityEngine:
+    """
+    設定相似度引擎
     
-    return text.lower()
+    Args:
+        engine: 引擎名稱 ("rapidfuzz" / "difflib")、引擎物件，或 None (自動選擇)
+    
+    Returns:
+        目前使用的引擎
+    """
+    global _similarity_engine
+    if engine is None:
+        engine = RapidFuzzEngine.name if _rapidfuzz_available else DifflibEngine.name
+    if isinstance(engine, str):
+        if engine == RapidFuzzEngine.name and not _rapidfuzz_available:
+            raise ImportError("請安裝 rapidfuzz: pip install rapidfuzz")
+        if engine not in SIMILARITY_ENGINES:
+            raise ValueError(f"未知的相似度引擎: {engine}")
+        engine = SIMILARITY_ENGINES[engine]()
+    _similarity_engine = engine
+    return engine
+
+
+def get_similarity_engine() -> SimilarityEngine:
+    """取得目前的相似度引擎 (預設優先使用 rapidfuzz)"""
+    if _similarity_engine is None:
+        return set_similarity_engine(None)
+    return _similarity_engine
 
 
-def calculate_similarity(str1: str, str2: str) -> float:
+def length_ratio_bound(len1: int, len2: int) -> float:
+    """
+    僅由長度推得的相似度上限: 2*min / (len1 + len2)
+    
+    兩種引擎的分數皆為 2*M/T 且 M <= 較短字串長度，因此不會超過此值。
+    """
+    total = len1 + len2
+    return 2 * min(len1, len2) / total if total else 1.0
+
+
+def calculate_similarity(str1: str, str2: str, score_cutoff: float = 0.0) -> float:
     """
     計算兩個字串的相似度 (0-1)
     
     Args:
         str1: 第一個字串
         str2: 第二個字串
+        score_cutoff: 提早結束門檻 (0 = 不使用)；
+                      長度比例或引擎估計已確定低於門檻時直接回傳 0.0
     
     Returns:
         相似度分數
@@ -118,13 +232,45 @@ def calculate_similarity(str1: str, str2: str) -> float:
     if norm1 == norm2:
         return 1.0
     
-    return SequenceMatcher(None, norm1, norm2).ratio()
+    if score_cutoff > 0 and length_ratio_bound(len(norm1), len(norm2)) < score_cutoff:
+        return 0.0
+    
+    return get_similarity_engine().ratio(norm1, norm2, score_cutoff)
+
+
+def find_best_match(value: str,
+                    candidates: List[str],
+                    threshold: float = 0.85) -> Optional[Tuple[int, float]]:
+    """
+    在候選清單中找出最相似的值 (批次比對登記資料用)
+    
+    每找到更好的候選就提高門檻，之後的候選可更早被排除。
+    
+    Args:
+        value: 要比對的值 (例如 OCR 場所名稱)
+        candidates: 候選值列表
+        threshold: 最低相似度
+    
+    Returns:
+        (候選索引, 相似度)；沒有達到門檻的候選時回傳 None
+    """
+    best = None
+    cutoff = threshold
+    for i, candidate in enumerate(candidates):
+        score = calculate_similarity(value, candidate, score_cutoff=cutoff)
+        if score >= cutoff and score > 0 and (best is None or score > best[1]):
+            best = (i, score)
+            if score == 1.0:
+                break
+            cutoff = score
+    return best
 
 
 def compare_field(field_name: str,
                  ocr_value: Any,
                  reference_value: Any,
-                 threshold: float = 0.85) -> FieldComparison:
+                 threshold: float = 0.85,
+                 early_exit: bool = False) -> FieldComparison:
     """
     比對單一欄位
     
@@ -133,6 +279,7 @@ def compare_field(field_name: str,
         ocr_value: OCR 提取的值
         reference_value: 參考資料的值
         threshold: 相似度閾值 (高於此視為相符)
+        early_exit: 確定低於閾值時略過完整計算 (不符欄位的相似度記為 0)
     
     Returns:
         欄位比對結果
@@ -169,7 +316,8 @@ def compare_field(field_name: str,
         )
     
     # 計算相似度
-    similarity = calculate_similarity(str(ocr_value), str(reference_value))
+    similarity = calculate_similarity(str(ocr_value), str(reference_value),
+                                      score_cutoff=threshold if early_exit else 0.0)
     
     # 判斷比對類型
     if similarity == 1.0:
@@ -196,7 +344,8 @@ def compare_documents(ocr_data: Dict,
                      reference_data: Dict,
                      fields_to_compare: Optional[List[str]] = None,
                      threshold: float = 0.85,
-                     document_id: str = "") -> ComparisonResult:
+                     document_id: str = "",
+                     early_exit: bool = False) -> ComparisonResult:
     """
     比對 OCR 結果與參考資料
     
@@ -206,6 +355,7 @@ def compare_documents(ocr_data: Dict,
         fields_to_compare: 要比對的欄位列表 (None = 全部)
         threshold: 相似度閾值
         document_id: 文件識別碼
+        early_exit: 確定低於閾值時略過完整計算 (批次比對用)
     
     Returns:
         比對結果
@@ -225,7 +375,7 @@ def compare_documents(ocr_data: Dict,
         ocr_value = ocr_data.get(field_name)
         ref_value = reference_data.get(field_name)
         
-        comparison = compare_field(field_name, ocr_value, ref_value, threshold)
+        comparison = compare_field(field_name, ocr_value, ref_value, threshold, early_exit)
         result.field_comparisons.append(comparison)
         
         total_similarity += comparison.similarity
@@ -260,6 +410,36 @@ def compare_documents(ocr_data: Dict,
     return result
 
 
+# Excel 查找索引快取: (路徑, mtime, 大小, 欄位) -> {查找值: 資料列}
+_excel_index_cache: Dict[Tuple[str, float, int, str], Dict[str, Dict]] = {}
+
+
+def _build_excel_index(excel_path: str, key_column: str) -> Dict[str, Dict]:
+    """
+    解析 Excel 並建立查找索引 (同一個值只保留第一筆)
+    
+    檔案的 mtime 或大小改變時自動重新解析，否則多次查找共用同一份索引。
+    """
+    import pandas as pd
+    
+    stat = os.stat(excel_path)
+    cache_key = (os.path.abspath(excel_path), stat.st_mtime, stat.st_size, key_column)
+    index = _excel_index_cache.get(cache_key)
+    if index is not None:
+        return index
+    
+    df = pd.read_excel(excel_path)
+    index = {}
+    for key, row in zip(df[key_column].astype(str), df.to_dict('records')):
+        index.setdefault(key, row)
+    
+    # 同一個檔案只保留最新版本的索引
+    for old_key in [k for k in _excel_index_cache if k[0] == cache_key[0] and k[3] == key_column]:
+        del _excel_index_cache[old_key]
+    _excel_index_cache[cache_key] = index
+    return index
+
+
 def load_reference_from_excel(excel_path: str, 
                              key_column: str,
                              key_value: str) -> Optional[Dict]:
@@ -275,18 +455,11 @@ def load_reference_from_excel(excel_path: str,
         找到的資料列 (字典形式)
     """
     try:
-        import pandas as pd
-        
-        df = pd.read_excel(excel_path)
-        
-        # 查找匹配的列
-        matches = df[df[key_column].astype(str) == str(key_value)]
-        
-        if len(matches) == 0:
-            return None
+        index = _build_excel_index(excel_path, key_column)
         
         # 返回第一筆匹配
-        return matches.iloc[0].to_dict()
+        row = index.get(str(key_value))
+        return dict(row) if row is not None else None
         
     except ImportError:
         raise ImportError("請安裝 pandas 和 openpyxl: pip install pandas openpyxl")
@@ -28,6 +28,7 @@ class LLMConfig:
     api_base: str = "http://localhost:11434"  # Ollama 預設
     temperature: float = 0.1  # 低溫度以獲得穩定輸出
     max_tokens: int = 4096
+    structured_output: bool = True  # 結構化提取時以 JSON Schema 限制輸出
 
 
 # 預設配置
@@ -96,13 +97,38 @@ def get_structuring_prompt(ocr_text: str, fields: List[str]) -> str:
     return prompt
 
 
-def call_ollama(prompt: str, config: LLMConfig) -> str:
+def build_json_schema(string_fields: List[str], array_fields: List[str] = ()) -> Dict:
+    """
+    建立結構化提取用的 JSON Schema (傳給 Ollama 的 format 參數)
+    
+    本模組不依賴主程式，主程式的 ai_engine 也匯入這裡的 Schema / JSON 修補函式。
+    
+    Args:
+        string_fields: 字串欄位 (允許 null)
+        array_fields: 字串陣列欄位
+    
+    Returns:
+        JSON Schema 字典
+    """
+    properties = {field: {"type": ["string", "null"]} for field in string_fields}
+    for field in array_fields:
+        properties[field] = {"type": "array", "items": {"type": "string"}}
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(string_fields) + list(array_fields)
+    }
+
+
+def call_ollama(prompt: str, config: LLMConfig,
+                json_schema: Optional[Dict] = None) -> str:
     """
     呼叫本地 Ollama API
     
     Args:
         prompt: 提示詞
         config: LLM 配置
+        json_schema: 輸出格式的 JSON Schema (None = 自由文字)
     
     Returns:
         模型回應
@@ -120,8 +146,14 @@ def call_ollama(prompt: str, config: LLMConfig) -> str:
                 "num_predict": config.max_tokens
             }
         }
+        if json_schema is not None:
+            payload["format"] = json_schema
         
         response = requests.post(url, json=payload, timeout=120)
+        if response.status_code == 400 and json_schema is not None:
+            # 舊版 Ollama 不支援 Schema，改用 format="json"
+            payload["format"] = "json"
+            response = requests.post(url, json=payload, timeout=120)
         response.raise_for_status()
         
         result = response.json()
@@ -133,13 +165,15 @@ def call_ollama(prompt: str, config: LLMConfig) -> str:
         raise RuntimeError(f"Ollama API 呼叫失敗: {e}")
 
 
-def call_openai_compatible(prompt: str, config: LLMConfig) -> str:
+def call_openai_compatible(prompt: str, config: LLMConfig,
+                           json_schema: Optional[Dict] = None) -> str:
     """
     呼叫 OpenAI 相容 API (包括 Qwen API)
     
     Args:
         prompt: 提示詞
         config: LLM 配置
+        json_schema: 輸出格式的 JSON Schema (None = 自由文字)
     
     Returns:
         模型回應
@@ -152,11 +186,17 @@ def call_openai_compatible(prompt: str, config: LLMConfig) -> str:
             base_url=config.api_base
         )
         
+        kwargs = {}
+        if json_schema is not None:
+            # 相容 API 不一定支援完整 Schema，統一使用 JSON 模式
+            kwargs["response_format"] = {"type": "json_object"}
+        
         response = client.chat.completions.create(
             model=config.model_name,
             messages=[{"role": "user", "content": prompt}],
             temperature=config.temperature,
-            max_tokens=config.max_tokens
+            max_tokens=config.max_tokens,
+            **kwargs
         )
         
         return response.choices[0].message.content
@@ -167,13 +207,15 @@ def call_openai_compatible(prompt: str, config: LLMConfig) -> str:
         raise RuntimeError(f"OpenAI API 呼叫失敗: {e}")
 
 
-def call_llm(prompt: str, config: LLMConfig = None) -> str:
+def call_llm(prompt: str, config: LLMConfig = None,
+             json_schema: Optional[Dict] = None) -> str:
     """
     統一的 LLM 呼叫介面
     
     Args:
         prompt: 提示詞
         config: LLM 配置 (使用預設配置如果為 None)
+        json_schema: 輸出格式的 JSON Schema (None = 自由文字)
     
     Returns:
         模型回應
@@ -182,9 +224,9 @@ def call_llm(prompt: str, config: LLMConfig = None) -> str:
         config = DEFAULT_CONFIG
     
     if config.backend == LLMBackend.OLLAMA:
-        return call_ollama(prompt, config)
+        return call_ollama(prompt, config, json_schema)
     else:
-        return call_openai_compatible(prompt, config)
+        return call_openai_compatible(prompt, config, json_schema)
 
 
 def correct_ocr_text(ocr_text: str, 
@@ -216,12 +258,159 @@ def correct_ocr_text(ocr_text: str,
     return corrected
 
 
+def repair_json_text(text: str) -> str:
+    """
+    在本機修補不完整的 JSON 文字 (不需再次呼叫模型)
+    
+    - 移除 JSON 前後的說明文字與 markdown 標記
+    - 補上被截斷的字串引號與未關閉的括號
+    - 移除 } 或 ] 前多餘的逗號
+    
+    Args:
+        text: 模型回應
+    
+    Returns:
+        修補後的 JSON 文字 (找不到 `{` 時回傳空字串)
+    """
+    start = text.find("{")
+    if start == -1:
+        return ""
+    
+    stack: List[str] = []
+    in_string = False
+    escaped = False
+    end = len(text)
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                end = i + 1
+                break
+    
+    repaired = text[start:end]
+    if stack:
+        # 回應被截斷：關閉字串、移除最後一個不完整的鍵值，再補上括號
+        if in_string:
+            repaired += '"'
+        repaired = re.sub(r',\s*"[^"]*"\s*:?\s*$', "", repaired)
+        repaired = re.sub(r':\s*$', ": null", repaired)
+        repaired += "".join(reversed(stack))
+    return re.sub(r",\s*([}\]])", r"\1", repaired)
+
+
+def parse_json_response(response_text: str) -> Optional[Dict]:
+    """
+    解析模型回應的 JSON (必要時先在本機修補)
+    
+    Args:
+        response_text: 模型回應
+    
+    Returns:
+        解析結果，失敗時回傳 None
+    """
+    try:
+        data = json.loads(response_text)
+        if isinstance(data, dict):
+            return data
+    except (json.JSONDecodeError, TypeError):
+        pass
+    
+    repaired = repair_json_text(response_text or "")
+    if not repaired:
+        return None
+    try:
+        data = json.loads(repaired)
+        print("🔧 JSON 已在本機修補")
+        return data if isinstance(data, dict) else None
+    except json.JSONDecodeError:
+        return None
+
+
+def _coerce_string(value) -> Optional[str]:
+    """將任意值轉為單一字串 (巢狀結構攤平)；空字串、"null" 視為 None"""
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        value = "".join(str(v) for v in value.values() if v)
+    elif isinstance(value, list):
+        value = "".join(str(v) for v in value if v)
+    value = str(value).strip()
+    if not value or value.lower() in ("null", "none"):
+        return None
+    return value
+
+
+def coerce_to_schema(data: Dict, schema: Dict) -> Dict:
+    """
+    依 Schema 驗證並修正解析結果
+    
+    - 只保留 Schema 中定義的欄位，缺少的欄位補 None / 空陣列
+    - 字串欄位若為巢狀物件或陣列，合併為單一字串
+    - 陣列欄位若為字串，以頓號、逗號拆分
+    
+    Args:
+        data: 解析後的 JSON
+        schema: build_json_schema() 建立的 JSON Schema
+    
+    Returns:
+        符合 Schema 的資料字典
+    """
+    result: Dict[str, Union[str, List[str], None]] = {}
+    for field, spec in schema["properties"].items():
+        value = data.get(field)
+        if spec.get("type") == "array":
+            if value is None:
+                items = []
+            elif isinstance(value, (list, tuple)):
+                items = value
+            else:
+                items = re.split(r"[、,，;；\n]", str(value))
+            result[field] = [item for item in (_coerce_string(v) for v in items) if item]
+        else:
+            result[field] = _coerce_string(value)
+    return result
+
+
+def parse_structured_response(response: str, fields: List[str]) -> Dict:
+    """
+    解析模型回應為結構化資料 (必要時在本機修補 JSON)
+    
+    Args:
+        response: 模型回應
+        fields: 需要提取的欄位列表
+    
+    Returns:
+        結構化資料字典 (無法解析時各欄位為 None)
+    """
+    data = parse_json_response(response)
+    if data is None:
+        return {field: None for field in fields}
+    return coerce_to_schema(data, build_json_schema(fields))
+
+
 def extract_structured_data(ocr_text: str,
                            fields: List[str],
                            config: LLMConfig = None) -> Dict:
     """
     從 OCR 文字中提取結構化資料
     
+    預設以 JSON Schema 限制模型輸出 (LLMConfig.structured_output)，
+    回應若有瑕疵則在本機修補，不會重新呼叫模型。
+    
     Args:
         ocr_text: OCR 辨識的文字
         fields: 需要提取的欄位列表
@@ -233,19 +422,14 @@ def extract_structured_data(ocr_text: str,
     if not ocr_text.strip():
         return {field: None for field in fields}
     
+    if config is None:
+        config = DEFAULT_CONFIG
+    
     prompt = get_structuring_prompt(ocr_text, fields)
-    response = call_llm(prompt, config)
+    json_schema = build_json_schema(fields) if config.structured_output else None
+    response = call_llm(prompt, config, json_schema)
     
-    # 解析 JSON
-    try:
-        # 嘗試提取 JSON 部分
-        json_match = re.search(r'\{[\s\S]*\}', response)
-        if json_match:
-            return json.loads(json_match.group())
-        else:
-            return {field: None for field in fields}
-    except json.JSONDecodeError:
-        return {field: None for field in fields}
+    return parse_structured_response(response, fields)
 
 
 def check_ollama_available(config: LLMConfig = None) -> bool:
@@ -0,0 +1,383 @@
+import atexit
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+import fitz  # pymupdf
+import numpy as np
+from PIL import Image, features
+
+# ==========================================
+# 頁面影像資產 (Page Assets)
+# ==========================================
+# 300 DPI 的申報書頁面一張約 25 MB，整份 30 頁放在每位審核人員的 session 會讓伺服器記憶體暴增。
+#   - session 只保存縮圖 (WebP，不支援時改用 JPEG)，作為頁面預覽
+#   - 原始解析度影像寫入每份文件的磁碟快取 (.npy)，需要時以記憶體映射讀取 (Vision AI、目錄頁解析)
+#   - 磁碟快取由同一行程的所有 session 共用，超過容量時依 LRU 刪除最久未使用的文件
+#   - 記錄來源檔 (PDF / 影像) 的文件被清除後，需要時由來源檔重新轉出該頁
+#   - open_source() 只以低解析度轉出縮圖，原始解析度頁面在第一次讀取時才轉出
+#     (數位 PDF 有文字層的頁面不需 OCR，也就不需要轉成 300 DPI 影像)
+# 每個行程使用自己的子目錄 (主程式與 comparison_app 可能同時執行)。
+
+ASSET_CACHE_DIR = os.path.join(tempfile.gettempdir(), "fire_dept_page_assets")
+# 其他行程留下超過此時間未更新的子目錄，視為已結束並清除
+STALE_DIR_SECONDS = 24 * 60 * 60
+
+# 磁碟快取上限 (位元組 / 文件數)
+MAX_CACHE_BYTES = 4 * 1024 * 1024 * 1024
+MAX_DOCUMENTS = 16
+
+# 預覽縮圖
+THUMBNAIL_WIDTH = 1000
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_FORMAT = "WEBP" if features.check("webp") else "JPEG"
+
+
+def make_thumbnail(image, width=THUMBNAIL_WIDTH, fmt=THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY):
+    """
+    產生預覽縮圖
+
+    Args:
+        image (PIL.Image): 原始影像
+        width (int): 最大寬度 (較窄的影像不放大)
+        fmt (str): 影像格式 (WEBP / JPEG)
+        quality (int): 壓縮品質
+
+    Returns:
+        bytes: 編碼後的縮圖 (可直接傳給 st.image)
+    """
+    thumb = image.convert("RGB")
+    if thumb.width > width:
+        thumb = thumb.resize((width, round(thumb.height * width / thumb.width)), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    thumb.save(buffer, format=fmt, quality=quality)
+    return buffer.getvalue()
+
+
+def render_page(source, index, dpi):
+    """
+    由來源檔轉出一頁影像
+
+    Args:
+        source (str): PDF 或影像檔路徑
+        index (int): 頁碼 (0 起算；影像檔只有第 0 頁)
+        dpi (int): PDF 轉檔解析度
+
+    Returns:
+        PIL.Image: RGB 影像
+    """
+    if os.path.splitext(source)[1].lower() == ".pdf":
+        with fitz.open(source) as doc:
+            pix = doc.load_page(index).get_pixmap(dpi=dpi)
+            return Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+    if index != 0:
+        raise IndexError(index)
+    with Image.open(source) as image:
+        return image.convert("RGB")
+
+
+def render_thumbnails(source, dpi, width=THUMBNAIL_WIDTH):
+    """
+    由來源檔直接以低解析度轉出各頁縮圖 (不產生原始解析度影像)
+
+    Args:
+        source (str): PDF 或影像檔路徑
+        dpi (int): 原始解析度 (用於計算頁面尺寸)
+        width (int): 縮圖寬度
+
+    Returns:
+        tuple: (縮圖 bytes 列表, 原始解析度頁面尺寸列表)
+    """
+    if os.path.splitext(source)[1].lower() != ".pdf":
+        image = render_page(source, 0, dpi)
+        return [make_thumbnail(image, width)], [image.size]
+    thumbnails, sizes = [], []
+    with fitz.open(source) as doc:
+        for page in doc:
+            rect = (page.rect * fitz.Matrix(dpi / 72, dpi / 72)).irect  # 與 get_pixmap(dpi) 相同的捨入
+            sizes.append((rect.width, rect.height))
+            thumb_dpi = min(dpi, width * 72 / page.rect.width)
+            pix = page.get_pixmap(dpi=max(int(thumb_dpi), 1))
+            thumbnails.append(make_thumbnail(Image.frombytes("RGB", [pix.width, pix.height], pix.samples), width))
+    return thumbnails, sizes
+
+
+class PageSequence:
+    """原始解析度頁面的延遲載入序列 (可直接取代 PIL Image 列表)"""
+
+    def __init__(self, assets):
+        self._assets = assets
+
+    def __len__(self):
+        return self._assets.page_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._assets.full_page(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+class DocumentAssets:
+    """
+    單一文件的頁面資產 (存放於 session state)
+
+    只保存縮圖與磁碟快取路徑；原始影像由 full_page() 以記憶體映射讀取，
+    磁碟快取沒有該頁時由來源檔 (source) 重新轉出。
+    """
+
+    def __init__(self, store, doc_key, directory, thumbnails, sizes, source=None, dpi=None):
+        self._store = store
+        self.doc_key = doc_key
+        self.directory = directory
+        self.thumbnails = thumbnails
+        self.sizes = sizes
+        self.source = source
+        self.dpi = dpi
+
+    @property
+    def page_count(self):
+        return len(self.thumbnails)
+
+    def thumbnail(self, index):
+        """第 index 頁 (0 起算) 的預覽縮圖 bytes"""
+        return self.thumbnails[index]
+
+    def page_path(self, index):
+        return os.path.join(self.directory, f"page_{index + 1:04d}.npy")
+
+    def has_source(self):
+        """來源檔是否仍存在 (可重新轉出頁面)"""
+        return bool(self.source) and os.path.exists(self.source)
+
+    def is_available(self):
+        """原始影像是否可取得 (仍在磁碟快取中，或可由來源檔重新轉出)"""
+        return (self._store.contains(self.doc_key) and os.path.isdir(self.directory)) or self.has_source()
+
+    def full_page(self, index):
+        """
+        讀取第 index 頁 (0 起算) 的原始解析度影像
+
+        Returns:
+            PIL.Image: RGB 影像
+
+        Raises:
+            KeyError: 文件已從磁碟快取刪除且沒有來源檔 (需重新轉檔)
+        """
+        self._store.touch(self.doc_key)
+        try:
+            pixels = np.load(self.page_path(index), mmap_mode='r')
+        except FileNotFoundError:
+            if not self.has_source():
+                raise KeyError(f"頁面資產已被清除: {self.doc_key}") from None
+            image = render_page(self.source, index, self.dpi)
+            self._store.add_page(self, index, image)
+            return image
+        return Image.fromarray(pixels)
+
+    def full_pages(self):
+        """所有頁面的延遲載入序列"""
+        return PageSequence(self)
+
+
+class PageAssetStore:
+    """跨 session 共用的頁面磁碟快取 (LRU)"""
+
+    def __init__(self, cache_dir=ASSET_CACHE_DIR, max_bytes=MAX_CACHE_BYTES, max_documents=MAX_DOCUMENTS,
+                 thumbnail_width=THUMBNAIL_WIDTH):
+        """
+        Args:
+            cache_dir (str): 磁碟快取目錄
+            max_bytes (int): 原始影像總容量上限
+            max_documents (int): 文件數上限
+            thumbnail_width (int): 預覽縮圖寬度
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_documents = max_documents
+        self.thumbnail_width = thumbnail_width
+        self._documents = OrderedDict()  # doc_key -> (目錄, 位元組數)
+        self._lock = threading.Lock()
+
+    def _directory(self, doc_key):
+        digest = hashlib.sha256(doc_key.encode("utf-8")).hexdigest()[:24]
+        return os.path.join(self.cache_dir, digest)
+
+    @property
+    def total_bytes(self):
+        return sum(size for _, size in self._documents.values())
+
+    def contains(self, doc_key):
+        with self._lock:
+            return doc_key in self._documents
+
+    def touch(self, doc_key):
+        """標記為最近使用"""
+        with self._lock:
+            if doc_key in self._documents:
+                self._documents.move_to_end(doc_key)
+
+    def _prepare_directory(self, doc_key, source, source_owned):
+        """建立 (清空) 文件目錄；暫存來源檔移入文件目錄"""
+        directory = self._directory(doc_key)
+        self.remove(doc_key)
+        os.makedirs(directory, exist_ok=True)
+        if source and source_owned:
+            moved = os.path.join(directory, "source" + os.path.splitext(source)[1].lower())
+            shutil.move(source, moved)
+            source = moved
+        return directory, source
+
+    def put(self, doc_key, images, source=None, dpi=None, source_owned=False):
+        """
+        儲存一份文件的頁面
+
+        Args:
+            doc_key (str): 文件識別碼 (例如檔名 + 大小 + DPI)
+            images (list): PIL Image 頁面
+            source (str): 來源檔 (PDF / 影像)，頁面被清除後由此重新轉出
+            dpi (int): 來源為 PDF 時的轉檔解析度
+            source_owned (bool): 來源檔為暫存檔 (例如 Word 轉出的 PDF)，移入文件目錄並隨文件一起清除
+
+        Returns:
+            DocumentAssets: 縮圖與磁碟快取資訊 (存入 session state)
+        """
+        directory, source = self._prepare_directory(doc_key, source, source_owned)
+
+        thumbnails = []
+        sizes = []
+        total = 0
+        for i, image in enumerate(images):
+            pixels = np.asarray(image.convert("RGB"))
+            np.save(os.path.join(directory, f"page_{i + 1:04d}.npy"), pixels)
+            total += pixels.nbytes
+            sizes.append(image.size)
+            thumbnails.append(make_thumbnail(image, self.thumbnail_width))
+
+        with self._lock:
+            self._documents[doc_key] = (directory, total)
+        self._evict(keep=doc_key)
+        print(f"🖼️ 頁面資產已快取: {doc_key} ({len(thumbnails)} 頁, {total / 1024 / 1024:.1f} MB)")
+        return DocumentAssets(self, doc_key, directory, thumbnails, sizes, source, dpi)
+
+    def open_source(self, doc_key, source, dpi, source_owned=False):
+        """
+        登記一份文件但不預先轉出原始解析度頁面 (只產生縮圖)
+
+        Args:
+            doc_key (str): 文件識別碼
+            source (str): 來源檔 (PDF / 影像)
+            dpi (int): 原始解析度
+            source_owned (bool): 來源檔為暫存檔，移入文件目錄並隨文件一起清除
+
+        Returns:
+            DocumentAssets: full_page() 第一次讀取某頁時才轉出並寫入磁碟快取
+        """
+        directory, source = self._prepare_directory(doc_key, source, source_owned)
+
+        thumbnails, sizes = render_thumbnails(source, dpi, self.thumbnail_width)
+        with self._lock:
+            self._documents[doc_key] = (directory, 0)
+        self._evict(keep=doc_key)
+        print(f"🖼️ 頁面資產已登記: {doc_key} ({len(thumbnails)} 頁，原始影像延遲轉出)")
+        return DocumentAssets(self, doc_key, directory, thumbnails, sizes, source, dpi)
+
+    def add_page(self, assets, index, image):
+        """
+        寫入由來源檔重新轉出的頁面 (文件已被清除時重新登記)
+
+        Args:
+            assets (DocumentAssets): 文件
+            index (int): 頁碼 (0 起算)
+            image (PIL.Image): RGB 影像
+        """
+        pixels = np.asarray(image.convert("RGB"))
+        os.makedirs(assets.directory, exist_ok=True)
+        path = assets.page_path(index)
+        temp_path = f"{path}.{threading.get_ident()}.tmp.npy"
+        np.save(temp_path, pixels)
+        os.replace(temp_path, path)
+        with self._lock:
+            directory, total = self._documents.pop(assets.doc_key, (assets.directory, 0))
+            self._documents[assets.doc_key] = (directory, total + pixels.nbytes)
+        self._evict(keep=assets.doc_key)
+
+    def remove(self, doc_key):
+        """刪除一份文件的磁碟快取"""
+        with self._lock:
+            entry = self._documents.pop(doc_key, None)
+        directory = entry[0] if entry else self._directory(doc_key)
+        shutil.rmtree(directory, ignore_errors=True)
+
+    def _evict(self, keep=None):
+        """超過容量或文件數時，刪除最久未使用的文件 (保留 keep)"""
+        evicted = []
+        with self._lock:
+            while len(self._documents) > 1 and (
+                len(self._documents) > self.max_documents or self.total_bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._documents))
+                if oldest == keep:
+                    self._documents.move_to_end(oldest)
+                    oldest = next(iter(self._documents))
+                evicted.append((oldest, self._documents.pop(oldest)[0]))
+        for doc_key, directory in evicted:
+            shutil.rmtree(directory, ignore_errors=True)
+            print(f"🧹 清除頁面資產: {doc_key}")
+
+    def clear(self):
+        """清除全部磁碟快取"""
+        with self._lock:
+            self._documents.clear()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+def clear_stale_dirs(root=ASSET_CACHE_DIR, max_age=STALE_DIR_SECONDS, now=None):
+    """
+    清除其他行程留下且久未更新的快取子目錄
+
+    Returns:
+        int: 清除的目錄數
+    """
+    now = time.time() if now is None else now
+    removed = 0
+    try:
+        entries = list(os.scandir(root))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_dir() and now - entry.stat().st_mtime > max_age:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """取得共用的頁面資產快取 (同一個 Streamlit 行程內所有 session 共用)"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            clear_stale_dirs(ASSET_CACHE_DIR)
+            _store = PageAssetStore(cache_dir=os.path.join(ASSET_CACHE_DIR, f"pid_{os.getpid()}"))
+            # 清除同一 PID 上次執行留下的檔案 (索引只存在於記憶體)；結束時清除本行程的目錄
+            _store.clear()
+            atexit.register(_store.clear)
+        return _store
@@ -0,0 +1,231 @@
+from functools import lru_cache
+import ocr_parser
+
+# ==========================================
+# 頁面分類索引
+# ==========================================
+# doc_integrity.identify_page_type 與完整性檢查共用的分類邏輯：
+#   1. 頁首關鍵字編譯成一個多模式自動機，單次掃描即可判斷頁面類型 (依優先順序)
+#   2. 應檢附項目 -> 可滿足該項目的頁面類型 (反向索引，跨文件共用快取)
+#   3. 完整性檢查只需 O(項目數 + 頁數)，可一次檢查整批申報案件
+
+UNKNOWN_PAGE = "未知頁面"
+OTHER_DOCUMENT = "其他文件"
+TOC_PAGE = "目錄"
+
+# 頁首關鍵字 -> 文件類型 (依優先順序，前面的關鍵字優先)
+PAGE_TYPE_KEYWORDS = (
+    ("目錄", TOC_PAGE),
+    ("檢修申報表", "消防安全設備檢修申報表"),
+    ("檢修報告書", "消防安全設備檢修報告書"),
+    ("改善計畫書", "消防安全設備改善計畫書"),
+    ("種類及數量表", "消防安全設備種類及數量表"),
+    ("滅火器", "滅火器檢查表"),
+    ("室內消防栓", "室內消防栓設備檢查表"),
+    ("自動撒水", "自動撒水設備檢查表"),
+    ("泡沫", "泡沫滅火設備檢查表"),
+    ("火警自動警報", "火警自動警報設備檢查表"),
+    ("緊急廣播", "緊急廣播設備檢查表"),
+    ("標示設備", "標示設備檢查表"),
+    ("避難設備", "避難設備檢查表"),
+    ("緊急照明", "緊急照明設備檢查表"),
+    ("連結送水管", "連結送水管檢查表"),
+    ("排煙", "排煙設備檢查表"),
+    ("無線電", "無線電通信輔助設備檢查表"),
+    ("使用執照", "建築物使用執照影本"),
+    ("營利事業", "營利事業登記證影本"),
+    ("開業證書", "專業機構合格證書影本"),
+    ("設備師", "消防設備師(士)證書影本"),
+    ("身分證", "管理權人身分證影本"),
+)
+
+# 目錄頁可勾選的標準文件 (依目錄順序)
+STANDARD_DOCUMENTS = [
+    "消防安全設備檢修申報表", "消防安全設備檢修報告書", "消防安全設備改善計畫書", "消防安全設備種類及數量表",
+    "滅火器檢查表", "室內消防栓設備檢查表", "自動撒水設備檢查表", "泡沫滅火設備檢查表",
+    "火警自動警報設備檢查表", "緊急廣播設備檢查表", "標示設備檢查表", "避難設備檢查表",
+    "緊急照明設備檢查表", "連結送水管檢查表", "排煙設備檢查表", "無線電通信輔助設備檢查表",
+    "建築物使用執照影本", "營利事業登記證影本", "專業機構合格證書影本",
+    "消防設備師(士)證書影本", "管理權人身分證影本"
+]
+
+# 目錄行比對時使用的核心關鍵字長度 (OCR 常漏字，只比對前幾個字)
+TOC_CORE_KEY_LENGTH = 4
+
+# identify_page_type 可能回傳的所有類型 (反向索引的詞彙)
+KNOWN_PAGE_TYPES = tuple(dict.fromkeys(
+    [page_type for _, page_type in PAGE_TYPE_KEYWORDS] + [OTHER_DOCUMENT, UNKNOWN_PAGE]
+))
+
+# 報告狀態
+STATUS_OK = "✅ 合規"
+STATUS_MISSING = "❌ 缺件"
+
+
+@lru_cache(maxsize=1)
+def _page_type_automaton():
+    """頁首關鍵字自動機 (值為優先順序)"""
+    return ocr_parser.build_automaton({keyword: i for i, (keyword, _) in enumerate(PAGE_TYPE_KEYWORDS)})
+
+
+@lru_cache(maxsize=1)
+def _toc_document_automaton():
+    """目錄行核心關鍵字自動機 (值為 STANDARD_DOCUMENTS 的順序)"""
+    patterns = {}
+    for i, doc in enumerate(STANDARD_DOCUMENTS):
+        # 多個文件共用同一個核心關鍵字時，保留清單中較前面的文件
+        patterns.setdefault(doc[:TOC_CORE_KEY_LENGTH], i)
+    return ocr_parser.build_automaton(patterns)
+
+
+def identify_page_type(header_text):
+    """
+    根據頁首文字識別文件類型
+
+    多個關鍵字同時出現時，取 PAGE_TYPE_KEYWORDS 中順序最前面者。
+
+    Args:
+        header_text (str): 頁面前 30 個字
+
+    Returns:
+        str: 標準文件類型；無文字時回傳「未知頁面」，無法判斷時回傳「其他文件」
+    """
+    if not header_text:
+        return UNKNOWN_PAGE
+
+    text = header_text.replace(" ", "").replace("\n", "")
+    best = None
+    for _, priority in _page_type_automaton().iter(text):
+        if best is None or priority < best:
+            best = priority
+            if best == 0:
+                break
+
+    if best is None:
+        return OTHER_DOCUMENT
+    return PAGE_TYPE_KEYWORDS[best][1]
+
+
+def match_toc_document(line_text):
+    """
+    比對目錄行對應的標準文件 (比對前 4 字的核心關鍵字)
+
+    Args:
+        line_text (str): 目錄頁的一行文字
+
+    Returns:
+        str: 標準文件名稱；無對應時回傳 None
+    """
+    best = None
+    for _, order in _toc_document_automaton().iter(line_text):
+        if best is None or order < best:
+            best = order
+    return STANDARD_DOCUMENTS[best] if best is not None else None
+
+
+def _matches(item, doc_type):
+    """模糊匹配規則 (例如「滅火器」應該匹配「滅火器檢查表」)"""
+    return item in doc_type or doc_type in item
+
+
+@lru_cache(maxsize=1024)
+def page_types_for_item(item):
+    """
+    反向索引：可滿足某個應檢附項目的已知頁面類型
+
+    結果跨文件快取，批次檢查時每個項目只需計算一次。
+
+    Args:
+        item (str): 應檢附項目名稱
+
+    Returns:
+        tuple: 已知頁面類型 (KNOWN_PAGE_TYPES 的子集)
+    """
+    return tuple(page_type for page_type in KNOWN_PAGE_TYPES if _matches(item, page_type))
+
+
+class PageTypeIndex:
+    """
+    單一文件的頁面類型索引 (文件類型 -> 頁碼)
+
+    已知類型透過反向索引查詢；Vision AI 回傳的自由文字類型 (不在 KNOWN_PAGE_TYPES 中)
+    才逐一比對，且只比對不重複的類型。
+    """
+
+    def __init__(self, page_map):
+        """
+        Args:
+            page_map (dict): {頁碼: 文件類型}
+        """
+        self.pages_by_type = {}
+        for page_num, doc_type in page_map.items():
+            self.pages_by_type.setdefault(doc_type, []).append(page_num)
+        known = set(KNOWN_PAGE_TYPES)
+        self._other_types = [t for t in self.pages_by_type if t not in known]
+
+    def matching_types(self, item):
+        """
+        找出本文件中可滿足該項目的頁面類型
+
+        Returns:
+            list: 文件類型
+        """
+        types = [t for t in page_types_for_item(item) if t in self.pages_by_type]
+        types.extend(t for t in self._other_types if _matches(item, t))
+        return types
+
+    def find_pages(self, item):
+        """
+        找出可滿足該項目的頁碼
+
+        Returns:
+            list: 頁碼 (由小到大)
+        """
+        pages = []
+        for doc_type in self.matching_types(item):
+            pages.extend(self.pages_by_type[doc_type])
+        return sorted(pages)
+
+
+def check_integrity(required_items, page_map):
+    """
+    完整性檢查：目錄勾選項目 vs 實際檢附頁面
+
+    Args:
+        required_items (list): 目錄勾選項目
+        page_map (dict | PageTypeIndex): {頁碼: 文件類型} 或已建立的索引
+
+    Returns:
+        list: 報告列 [{'應檢附項目', '是否勾選', '實際頁數', '狀態'}]
+    """
+    index = page_map if isinstance(page_map, PageTypeIndex) else PageTypeIndex(page_map)
+    report = []
+    for item in required_items:
+        found_pages = index.find_pages(item)
+        report.append({
+            '應檢附項目': item,
+            '是否勾選': '✓',
+            '實際頁數': ", ".join(f"第{p}頁" for p in found_pages) if found_pages else "-",
+            '狀態': STATUS_OK if found_pages else STATUS_MISSING
+        })
+    return report
+
+
+def check_integrity_batch(filings):
+    """
+    批次完整性檢查 (多份申報案件共用反向索引快取)
+
+    Args:
+        filings (dict): {案件識別碼: (目錄勾選項目, {頁碼: 文件類型})}
+
+    Returns:
+        dict: {案件識別碼: {"report": 報告列, "missing": [缺件項目]}}
+    """
+    results = {}
+    for filing_id, (required_items, page_map) in filings.items():
+        report = check_integrity(required_items, page_map)
+        results[filing_id] = {
+            "report": report,
+            "missing": [row['應檢附項目'] for row in report if row['狀態'] == STATUS_MISSING],
+        }
+    return results
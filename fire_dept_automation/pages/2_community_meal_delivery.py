@@ -5,6 +5,15 @@ import urllib.parse
 import os
 import time
 import utils
+import route_optimizer
+import route_partitioner
+import report_export
+import calendar_events
+import schedule_engine
+import checkin_queue
+import geocode_cache
+import geo_index
+import photo_pipeline
 import auth_session  # Cookie-based session management
 from streamlit_calendar import calendar
 
@@ -32,8 +41,10 @@ def check_login():
         st.stop()
     return st.session_state['username']
 
-def get_google_maps_url(address):
-    """Generate Google Maps navigation URL"""
+def get_google_maps_url(address, lat=None, lon=None):
+    """Generate Google Maps navigation URL (有座標時直接以座標導航，不依賴地址解析)"""
+    if lat is not None and lon is not None:
+        return f"https://www.google.com/maps/dir/?api=1&destination={lat},{lon}"
     encoded_address = urllib.parse.quote(address)
     return f"https://www.google.com/maps/dir/?api=1&destination={encoded_address}"
 
@@ -94,10 +105,34 @@ def main():
     # --- Tab 1: Today's Delivery ---
     with tab1:
         st.header(f"👋 早安，{username}")
+        if 'checkin_toast' in st.session_state:
+            toast_text, toast_icon = st.session_state.pop('checkin_toast')
+            st.toast(toast_text, icon=toast_icon)
         today = datetime.date.today().strftime("%Y-%m-%d")
         
+        # 打卡先存入佇列，累積一批、等待過久、路線送完或志工按下同步時一次寫入資料庫
+        queue = checkin_queue.get_queue(st.session_state, username)
+        if queue.should_flush():
+            if queue.flush() is None:
+                st.warning(f"⚠️ 資料庫暫時無法寫入，{len(queue)} 筆打卡已保存，稍後會自動同步")
+        if len(queue):
+            sync_col1, sync_col2 = st.columns([3, 1])
+            sync_col1.info(f"⏳ {len(queue)} 筆打卡尚未同步")
+            if sync_col2.button("🔄 立即同步", use_container_width=True):
+                if queue.flush() is None:
+                    st.error("同步失敗，請稍後再試 (打卡紀錄不會遺失)")
+                else:
+                    st.rerun()
+        
         # Metrics Calculation
         my_tasks = db.get_my_tasks_today(username, today)
+        # 已同步的送達紀錄每個任務查詢一次，進度與待同步打卡的過濾共用
+        delivered_by_task = {task['id']: db.get_delivered_elderly_ids(task['id']) for task in my_tasks}
+        pending_keys = queue.pending_keys()
+        for task_id in {task_id for task_id, _ in pending_keys} - delivered_by_task.keys():
+            delivered_by_task[task_id] = db.get_delivered_elderly_ids(task_id)
+        # 其他 session 可能已同步部分打卡，只計入資料庫中還沒有的
+        pending_keys = {(task_id, e_id) for task_id, e_id in pending_keys if e_id not in delivered_by_task[task_id]}
         total_tasks_count = len(my_tasks)
         completed_tasks_count = 0
         
@@ -105,17 +140,11 @@ def main():
         # Logic: If all stops in a task are delivered, the task is "completed". 
         # But maybe metrics should be "Stops to deliver" vs "Stops delivered"?
         # Let's do "Total Stops" vs "Completed Stops" for better granularity.
-        total_stops_count = 0
-        completed_stops_count = 0
-        
-        for task in my_tasks:
-            route_id = task['route_id']
-            task_id = task['id']
-            elderly_list = db.get_elderly_by_route(route_id)
-            total_stops_count += len(elderly_list)
-            for elderly in elderly_list:
-                if db.check_delivery_status(task_id, elderly['id']):
-                    completed_stops_count += 1
+        # 讀取每日彙總 (delivery_daily_summary)，不需逐戶查詢送達紀錄
+        task_summaries = db.get_task_summaries([task['id'] for task in my_tasks])
+        total_stops_count = sum(summary['planned_stops'] for summary in task_summaries.values())
+        completed_stops_count = sum(summary['visited_stops'] for summary in task_summaries.values())
+        completed_stops_count += sum(1 for task_id, _ in pending_keys if task_id in task_summaries)
         
         # Display Metrics
         m1, m2, m3 = st.columns(3)
@@ -141,14 +170,10 @@ def main():
                 # Sort by sequence
                 elderly_list.sort(key=lambda x: x['sequence'])
                 
-                # Progress bar
+                # Progress bar (已同步的紀錄一次查詢，加上佇列中尚未同步的打卡)
                 total_stops = len(elderly_list)
-                completed_stops = 0
-                
-                # Calculate progress first
-                for elderly in elderly_list:
-                    if db.check_delivery_status(task_id, elderly['id']):
-                        completed_stops += 1
+                delivered_ids = delivered_by_task[task_id] | {e_id for t_id, e_id in pending_keys if t_id == task_id}
+                completed_stops = sum(1 for elderly in elderly_list if elderly['id'] in delivered_ids)
                 
                 if total_stops > 0:
                     progress = completed_stops / total_stops
@@ -162,7 +187,7 @@ def main():
                     notes = elderly['special_notes']
                     
                     # Check if already delivered
-                    is_delivered = db.check_delivery_status(task_id, elderly_id)
+                    is_delivered = elderly_id in delivered_ids
                     
                     # Card Style
                     card_border = "1px solid #ddd"
@@ -185,7 +210,7 @@ def main():
                                 st.warning(f"⚠️ 注意事項：{notes}")
                                 
                             st.markdown(f"📍 **地址**：{address}")
-                            st.link_button("🗺️ Google 導航", get_google_maps_url(address))
+                            st.link_button("🗺️ Google 導航", get_google_maps_url(address, elderly['gps_lat'], elderly['gps_lon']))
                             
                         with col2:
                             if is_delivered:
@@ -209,15 +234,16 @@ def main():
                                     
                                     with col_deliver:
                                         if st.button("✅ 確認送達並上傳", key=f"btn_ok_{elderly_id}", use_container_width=True, type="primary"):
-                                            # 使用新的 save_proof_photo
+                                            # 照片先收下即回傳路徑，壓縮與縮圖在背景處理
                                             photo_path = utils.save_proof_photo(photo, task_id)
                                             
-                                            db.create_delivery_record(task_id, elderly_id, "已送達", photo_path=photo_path, volunteer_id=username)
-                                            
-                                            # UI Feedback
-                                            st.toast("✅ 送達成功！感謝您的付出", icon="🎉")
-                                            st.balloons()
-                                            time.sleep(1.5) # Wait for balloons
+                                            result = queue.checkin(task_id, elderly_id, "已送達", photo_path=photo_path, volunteer_id=username,
+                                                                   route_complete=completed_stops + 1 >= total_stops)
+                                            # UI Feedback (重新整理後顯示，不用 sleep 等動畫)
+                                            if result == checkin_queue.FAILED:
+                                                st.session_state.checkin_toast = ("⚠️ 資料庫暫時無法寫入，打卡已保存，稍後會自動同步", "💾")
+                                            else:
+                                                st.session_state.checkin_toast = ("✅ 送達成功！感謝您的付出", "🎉")
                                             st.rerun()
                                     
                                     with col_issue:
@@ -235,10 +261,14 @@ def main():
                                         # 異常情況也必須有照片
                                         if photo is not None:
                                             photo_path = utils.save_proof_photo(photo, task_id)
-                                            db.create_delivery_record(task_id, elderly_id, "異常", notes=issue_note, volunteer_id=username, abnormal_reason=issue_reason, photo_path=photo_path)
-                                            st.toast("⚠️ 異常回報已提交", icon="🛡️")
+                                            result = queue.checkin(task_id, elderly_id, "異常", photo_path=photo_path, notes=issue_note,
+                                                                   volunteer_id=username, abnormal_reason=issue_reason,
+                                                                   route_complete=completed_stops + 1 >= total_stops)
+                                            if result == checkin_queue.FAILED:
+                                                st.session_state.checkin_toast = ("⚠️ 資料庫暫時無法寫入，異常回報已保存，稍後會自動同步", "💾")
+                                            else:
+                                                st.session_state.checkin_toast = ("⚠️ 異常回報已提交", "🛡️")
                                             st.session_state[f"show_issue_{elderly_id}"] = False
-                                            time.sleep(1)
                                             st.rerun()
                                         else:
                                             st.error("請先拍照再回報異常")
@@ -252,10 +282,9 @@ def main():
         start_date = (datetime.date.today() - datetime.timedelta(days=30)).strftime("%Y-%m-%d")
         end_date = (datetime.date.today() + datetime.timedelta(days=60)).strftime("%Y-%m-%d")
         
-        tasks = db.get_tasks_by_date_range(start_date, end_date)
-        
-        # 2. 使用後端函式獲取日曆事件
-        events = db.get_task_events(start_date, end_date, current_user=username)
+        # 2. 日曆事件 (快取於 session，只重新查詢有異動的日期)
+        calendar_feed, _ = calendar_events.get_feed(st.session_state, start_date, end_date, username)
+        events = calendar_feed.events
             
         # 3. 設定 Calendar 選項
         calendar_options = {
@@ -295,16 +324,12 @@ def main():
                 routes_list = [dict(r) for r in db.get_all_routes()]
                 new_task_route = st.selectbox("路線", options=routes_list, format_func=lambda x: x['route_name'])
                 if st.form_submit_button("新增任務"):
-                    # Check if exists?
-                    # For simplicity, just create. DB might need unique constraint or check logic.
-                    # Assuming one task per route per day.
-                    existing = db.get_tasks_by_date(new_task_date.strftime("%Y-%m-%d"))
-                    exists = any(t['route_id'] == new_task_route['id'] for t in existing)
+                    # daily_tasks 有 UNIQUE(date, route_id)，已存在時新增筆數為 0
+                    created = db.insert_daily_tasks([(new_task_date.strftime("%Y-%m-%d"), new_task_route['id'], None)])
                     
-                    if exists:
+                    if not created:
                         st.error("該日期此路線已存在任務！")
                     else:
-                        db.create_daily_task(new_task_date.strftime("%Y-%m-%d"), new_task_route['id'], None)
                         st.toast("✅ 任務已建立！", icon="📅")
                         time.sleep(1)
                         st.rerun()
@@ -378,47 +403,13 @@ def main():
                     # Actually, st.data_editor has `on_change` but it's for the widget state.
                     # Let's add a "💾 儲存變更" button to commit changes from `edited_df` to DB.
                     if st.button("💾 儲存長者資料變更"):
-                        # We need to compare `df` and `edited_df` or just update all? Updating all is inefficient.
-                        # Better: Iterate over edited_df and update each record.
-                        # For new records (no ID), create them.
-                        # For deleted records? st.data_editor handles deletion if `num_rows="dynamic"`.
-                        # But `edited_df` only contains the current rows. We need to find missing IDs to delete.
-                        
-                        current_ids = set(df['id'].tolist())
-                        new_ids = set(edited_df['id'].dropna().tolist())
-                        
-                        # 1. Update existing & Create new
-                        for index, row in edited_df.iterrows():
-                            if pd.isna(row['id']): # New row (ID is NaN usually for new rows in some configs, or we need to handle it)
-                                # Actually st.data_editor new rows might have None/NaN ID if we didn't set it.
-                                # We should check if 'id' exists in DB.
-                                db.create_elderly_profile(
-                                    row['name'], row['address'], row['phone'], 
-                                    diet_type=row['diet_type'], special_notes=row['special_notes'], 
-                                    route_id=row['route_id'], sequence=row['sequence']
-                                )
-                            else:
-                                # Update
-                                updates = {
-                                    "name": row['name'],
-                                    "address": row['address'],
-                                    "phone": row['phone'],
-                                    "diet_type": row['diet_type'],
-                                    "special_notes": row['special_notes'],
-                                    "route_id": row['route_id'],
-                                    "sequence": row['sequence'],
-                                    "status": row['status']
-                                }
-                                db.update_elderly_profile_fields(row['id'], updates)
-                        
-                        # 2. Delete removed
-                        # IDs in current but not in new
-                        deleted_ids = current_ids - new_ids
-                        for pid in deleted_ids:
-                            db.delete_elderly_profile(pid)
-                            
-                        st.success("資料已更新")
-                        st.rerun()
+                        # 比對編輯前後的資料，只寫入新增 / 修改 / 刪除的列 (同一交易)
+                        result = db.bulk_sync_elderly_profiles(df, edited_df)
+                        if result is None:
+                            st.error("儲存失敗，資料未變更 (請檢查必填欄位)")
+                        else:
+                            st.success(f"資料已更新：新增 {result['inserted']} 筆、修改 {result['updated']} 筆、刪除 {result['deleted']} 筆")
+                            st.rerun()
                 else:
                     st.info("尚無長者資料")
                     # Still show editor for adding new?
@@ -426,15 +417,12 @@ def main():
                     df = pd.DataFrame(columns=["id", "name", "address", "phone", "diet_type", "route_id", "sequence", "status", "special_notes"])
                     edited_df = st.data_editor(df, num_rows="dynamic", key="elderly_editor_empty")
                     if st.button("💾 儲存新增資料"):
-                        for index, row in edited_df.iterrows():
-                            if row['name']:
-                                db.create_elderly_profile(
-                                    row['name'], row['address'], row['phone'], 
-                                    diet_type=row['diet_type'], special_notes=row['special_notes'], 
-                                    route_id=row['route_id'], sequence=row['sequence']
-                                )
-                        st.success("資料已新增")
-                        st.rerun()
+                        result = db.bulk_sync_elderly_profiles(df, edited_df)
+                        if result is None:
+                            st.error("儲存失敗，資料未變更 (請檢查必填欄位)")
+                        else:
+                            st.success(f"資料已新增 {result['inserted']} 筆")
+                            st.rerun()
 
             with col_b:
                 st.subheader("新增路線")
@@ -450,6 +438,131 @@ def main():
                             time.sleep(1)
                             st.rerun()
 
+                st.subheader("🗺️ 路線順序最佳化")
+                st.caption("依長者 GPS 座標重新排列送餐順序 (起點維持目前的第一站，無座標者排在最後)")
+                if routes:
+                    opt_route = st.selectbox("選擇路線", routes, format_func=lambda r: r['route_name'], key="opt_route")
+                    if st.button("🚀 最佳化送餐順序", use_container_width=True):
+                        with st.spinner("計算最佳路徑中..."):
+                            result = route_optimizer.optimize_route(opt_route['id'])
+                        st.success(f"已更新順序：{result['before_km']:.1f} km → {result['after_km']:.1f} km，"
+                                   f"預估 {result['estimated_time']} 分鐘")
+                        if result['missing_gps']:
+                            st.warning(f"{len(result['missing_gps'])} 位長者沒有座標，請補上 GPS 後再執行")
+
+                st.subheader("🧭 自動分配路線")
+                st.caption("依地理位置將長者分配到各路線，並平均各路線的站數 (確認後才會寫入)")
+                if routes and st.button("📐 計算建議分配", use_container_width=True):
+                    with st.spinner("分區計算中..."):
+                        st.session_state.route_proposal = route_partitioner.propose_routes()
+                proposal = st.session_state.get('route_proposal')
+                if proposal:
+                    import pandas as pd
+                    st.dataframe(pd.DataFrame(proposal['summary']).rename(columns={
+                        'route_name': '路線', 'stops_before': '目前站數', 'stops_after': '建議站數',
+                        'minutes_before': '目前預估(分)', 'minutes_after': '建議預估(分)', 'pinned': '無座標(留原路線)'
+                    }).drop(columns=['route_id']), hide_index=True, use_container_width=True)
+                    if proposal['changes']:
+                        route_names = {r['id']: r['route_name'] for r in routes}
+                        diff_df = pd.DataFrame(proposal['changes'])
+                        diff_df['current_route_id'] = diff_df['current_route_id'].map(route_names).fillna("未分配")
+                        diff_df['proposed_route_id'] = diff_df['proposed_route_id'].map(route_names)
+                        st.dataframe(diff_df.drop(columns=['elderly_id']).rename(columns={
+                            'name': '姓名', 'address': '地址', 'current_route_id': '目前路線', 'proposed_route_id': '建議路線'
+                        }), hide_index=True, use_container_width=True)
+                        if st.button(f"✅ 套用 {len(proposal['changes'])} 筆異動", type="primary", use_container_width=True):
+                            route_partitioner.apply_route_changes(proposal['changes'])
+                            del st.session_state.route_proposal
+                            st.success("已更新路線分配並重新排序")
+                            time.sleep(1)
+                            st.rerun()
+                    else:
+                        st.info("目前分配已是最佳，無需異動")
+                    if proposal['missing_gps']:
+                        st.warning(f"{len(proposal['missing_gps'])} 位長者沒有座標，維持原路線")
+
+                st.subheader("🔁 固定排班")
+                st.caption("設定各路線每週送餐日，一次產生未來的每日任務 (已存在的任務不會重複建立)")
+                if routes:
+                    schedules = {s['route_id']: s for s in db.get_route_schedules(active_only=False)}
+                    with st.form("route_schedule_form"):
+                        sch_route = st.selectbox("路線", routes, format_func=lambda r: r['route_name'], key="sch_route")
+                        current = schedules.get(sch_route['id'])
+                        current_days = schedule_engine.parse_weekdays(current['weekdays']) if current else schedule_engine.DEFAULT_WEEKDAYS
+                        sch_days = st.multiselect("送餐日", list(range(7)), default=sorted(current_days),
+                                                  format_func=lambda d: f"週{schedule_engine.WEEKDAY_LABELS[d]}")
+                        sch_skip = st.checkbox("國定假日停送", value=bool(current['skip_holidays']) if current else True)
+                        volunteers = [None] + db.get_all_usernames()
+                        default_vol = current['default_volunteer'] if current else sch_route['default_volunteer_id']
+                        sch_vol = st.selectbox("預設志工 (空白則開放認領)", volunteers,
+                                               index=volunteers.index(default_vol) if default_vol in volunteers else 0)
+                        sch_active = st.checkbox("啟用", value=bool(current['active']) if current else True)
+                        if st.form_submit_button("💾 儲存排班規則"):
+                            db.save_route_schedule(sch_route['id'], schedule_engine.format_weekdays(sch_days),
+                                                   sch_skip, sch_vol, sch_active)
+                            st.success("已儲存")
+
+                    horizon = st.number_input("產生天數", min_value=7, max_value=366, value=schedule_engine.DEFAULT_HORIZON_DAYS, step=7)
+                    if st.button("📅 依規則產生排班", use_container_width=True):
+                        result = schedule_engine.generate_tasks(horizon_days=int(horizon))
+                        if result is None:
+                            st.error("產生失敗，請查看系統紀錄")
+                        else:
+                            st.success(f"{result['start']} ~ {result['end']}：新增 {result['created']} 筆任務 "
+                                       f"(規則共 {result['planned']} 筆，其餘已存在)")
+
+                    with st.expander("🎌 停送假日"):
+                        holiday_text = st.text_area("每行一個日期與名稱，例如「2026-10-10 國慶日」", key="holiday_text")
+                        if st.button("匯入假日"):
+                            count = db.save_holidays(schedule_engine.parse_holiday_lines(holiday_text))
+                            st.success(f"已匯入 {count} 筆假日 (之後產生的排班會略過，已存在的任務不受影響)")
+
+                st.subheader("📍 長者座標")
+                st.caption("由本機地址座標庫 (門牌資料匯入 + 人工補登) 補齊 GPS，不呼叫外部服務")
+                missing_gps = db.get_elderly_missing_gps()
+                gps_col1, gps_col2 = st.columns([2, 1])
+                gps_col1.metric("尚無座標", f"{len(missing_gps)} 位")
+                if gps_col2.button("🔍 以座標庫補齊", use_container_width=True, disabled=not missing_gps):
+                    result = geocode_cache.fill_missing_gps()
+                    st.success(f"已補齊 {result['filled']} 位，仍缺 {len(result['missing'])} 位")
+                    st.rerun()
+
+                with st.expander("🗂️ 匯入門牌資料 (CSV)"):
+                    st.caption("需有「地址」或門牌拆欄 (鄉鎮市區、街路段、號...)，以及經緯度或 TWD97 X / Y 欄位")
+                    gazetteer_file = st.file_uploader("門牌資料", type=["csv"], key="gazetteer_file")
+                    if gazetteer_file and st.button("匯入"):
+                        try:
+                            count = geocode_cache.import_gazetteer(gazetteer_file)
+                            st.success(f"已匯入 {count} 筆地址座標")
+                        except ValueError as e:
+                            st.error(str(e))
+
+                if missing_gps:
+                    with st.form("review_gps_form"):
+                        st.write("✍️ 人工補登座標")
+                        review_target = st.selectbox("長者", missing_gps, format_func=lambda p: f"{p['name']} - {p['address']}")
+                        review_lat = st.number_input("緯度", min_value=21.5, max_value=25.5, value=22.7583, format="%.6f")
+                        review_lon = st.number_input("經度", min_value=119.0, max_value=122.5, value=121.1444, format="%.6f")
+                        if st.form_submit_button("💾 儲存座標"):
+                            if geocode_cache.save_reviewed(review_target['address'], review_lat, review_lon,
+                                                           reviewer=username, elderly_id=review_target['id']):
+                                st.success("已儲存，同地址的長者之後可直接補齊")
+                            else:
+                                st.error("地址無法解析，請先修正地址")
+
+                with st.expander("📡 附近站點查詢"):
+                    stop_index, stop_profiles = geo_index.get_stop_index()
+                    if len(stop_index):
+                        center = st.selectbox("中心站點", list(stop_profiles.values()),
+                                              format_func=lambda p: f"{p['name']} - {p['address']}", key="near_center")
+                        radius = st.slider("半徑 (公尺)", 50, 2000, 300, step=50)
+                        nearby = geo_index.stops_within(center['gps_lat'], center['gps_lon'], radius)
+                        st.dataframe([{"姓名": p['name'], "地址": p['address'], "路線": p['route_id'], "距離(m)": round(d)}
+                                      for p, d in nearby if p['id'] != center['id']],
+                                     hide_index=True, use_container_width=True)
+                    else:
+                        st.info("尚無具座標的長者")
+
     # --- Tab 4: History & Reports ---
     with tab4:
         user_info = db.get_user(username)
@@ -469,25 +582,42 @@ def main():
             if start_date > end_date:
                 st.error("開始日期不能晚於結束日期")
             else:
-                # Fetch data
-                report_data = db.get_delivery_reports(start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"))
+                start_str, end_str = start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+                total_records = db.count_delivery_reports(start_str, end_str)
                 
-                if report_data:
+                if total_records:
                     import pandas as pd
-                    df_report = pd.DataFrame([dict(r) for r in report_data])
                     
-                    # Rename columns for display
-                    df_report = df_report.rename(columns={
-                        "date": "日期",
-                        "route_name": "路線",
-                        "elderly_name": "長者姓名",
-                        "volunteer_id": "志工帳號",
-                        "status": "狀態",
-                        "abnormal_reason": "異常原因",
-                        "notes": "備註",
-                        "photo_path": "送達證明",
-                        "delivery_time": "打卡時間"
-                    })
+                    # 1. KPI 彙總 (讀取每日彙總表，不掃描送達紀錄)
+                    route_summary = pd.DataFrame([dict(r) for r in db.get_delivery_report_summary(start_str, end_str, "route")])
+                    m1, m2, m3, m4 = st.columns(4)
+                    m1.metric("總紀錄數", f"{total_records} 筆")
+                    m2.metric("已送達", f"{int(route_summary['delivered'].sum())} 戶次")
+                    m3.metric("異常", f"{int(route_summary['abnormal'].sum())} 戶次")
+                    planned_total = int(route_summary['planned_stops'].sum())
+                    m4.metric("完成率", f"{route_summary['visited_stops'].sum() / planned_total:.1%}" if planned_total else "-")
+                    
+                    summary_columns = {
+                        "route_name": "路線", "date": "日期", "volunteer": "志工", "month": "月份",
+                        "tasks": "任務數", "planned_stops": "應送戶次", "visited_stops": "已拜訪",
+                        "delivered": "已送達", "abnormal": "異常", "completion_rate": "完成率(%)",
+                        "first_delivery": "首筆打卡", "last_delivery": "末筆打卡"
+                    }
+                    summary_tabs = st.tabs(["🛣️ 各路線", "📅 每日", "🙋 各志工", "🗓️ 每月"])
+                    for summary_tab, group_by in zip(summary_tabs, ["route", "date", "volunteer", "month"]):
+                        with summary_tab:
+                            summary_df = route_summary if group_by == "route" else \
+                                pd.DataFrame([dict(r) for r in db.get_delivery_report_summary(start_str, end_str, group_by)])
+                            st.dataframe(summary_df.rename(columns=summary_columns), hide_index=True, use_container_width=True)
+                    
+                    # 2. 明細 (伺服器端分頁，每頁只查詢、顯示 REPORT_PAGE_SIZE 筆)
+                    REPORT_PAGE_SIZE = 100
+                    total_pages = (total_records + REPORT_PAGE_SIZE - 1) // REPORT_PAGE_SIZE
+                    page = st.number_input(f"頁碼 (共 {total_pages} 頁)", min_value=1, max_value=total_pages, value=1, step=1)
+                    df_report = pd.DataFrame([dict(r) for r in db.get_delivery_reports_page(start_str, end_str, page, REPORT_PAGE_SIZE)])
+                    # 表格只載入本頁的縮圖 (data URI)，不傳送原始照片
+                    df_report['photo_path'] = df_report['photo_path'].map(photo_pipeline.thumbnail_data_uri)
+                    df_report = df_report.rename(columns=dict(report_export.REPORT_COLUMNS))
                     
                     # 配置 ImageColumn
                     column_config = {
@@ -504,14 +634,39 @@ def main():
                         column_config=column_config
                     )
                     
-                    # CSV Download
-                    csv = df_report.to_csv(index=False).encode('utf-8-sig')
-                    st.download_button(
-                        label="📥 下載報表 (CSV)",
-                        data=csv,
-                        file_name=f"送餐紀錄_{start_date}_{end_date}.csv",
-                        mime="text/csv"
-                    )
+                    # 3. 下載 (分批寫入暫存檔，不在記憶體中組出整份報表)
+                    exp_col1, exp_col2 = st.columns([1, 2])
+                    with exp_col1:
+                        export_fmt = st.radio("格式", ["csv", "xlsx"], horizontal=True, key="report_fmt")
+                    # 報表檔只對應產生當時的 (開始日, 結束日, 格式)；條件改變就刪除舊檔。
+                    # 下載後離開頁面留下的檔案由 report_export 在之後的匯出時依保留時間清除
+                    export_key = (start_str, end_str, export_fmt)
+                    report_export_state = st.session_state.get('report_export')
+                    if report_export_state and report_export_state['key'] != export_key:
+                        if os.path.exists(report_export_state['path']):
+                            os.remove(report_export_state['path'])
+                        del st.session_state['report_export']
+                        report_export_state = None
+                    with exp_col2:
+                        if st.button("📄 產生報表檔", use_container_width=True):
+                            if report_export_state and os.path.exists(report_export_state['path']):
+                                os.remove(report_export_state['path'])
+                            with st.spinner(f"正在匯出 {total_records} 筆紀錄..."):
+                                path, _ = report_export.export_delivery_report(start_str, end_str, export_fmt)
+                            report_export_state = {'key': export_key, 'path': path}
+                            st.session_state.report_export = report_export_state
+                    
+                    if report_export_state and os.path.exists(report_export_state['path']):
+                        export_path = report_export_state['path']
+                        ext = os.path.splitext(export_path)[1]
+                        with open(export_path, "rb") as f:
+                            st.download_button(
+                                label=f"📥 下載報表 ({ext[1:].upper()})",
+                                data=f,
+                                file_name=f"送餐紀錄_{start_date}_{end_date}{ext}",
+                                mime="text/csv" if ext == ".csv" else
+                                     "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                            )
                 else:
                     st.info("查無資料")
 
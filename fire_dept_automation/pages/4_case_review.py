@@ -8,6 +8,7 @@ import os
 import datetime
 from PIL import Image
 import config_loader as cfg
+import file_hash
 
 st.set_page_config(page_title="案件審核 - 消防安全設備檢修申報", page_icon="👮", layout="wide")
 
@@ -593,6 +594,24 @@ if page == "案件審核":
                 file_path = row.get('file_path')
                 if file_path and os.path.exists(file_path):
                     st.success(f"已找到檔案: {os.path.basename(file_path)}")
+
+                    # 已儲存的分析結果 (自動比對頁面產生，檔案變更後自動失效；雜湊依檔案版本快取，重新執行不必重讀檔案)
+                    analysis = db_manager.get_case_analysis(selected_case_id, file_hash.cached_file_sha256(file_path))
+                    if analysis:
+                        timings = analysis.get('timings') or {}
+                        st.caption(f"💾 已有分析結果 ({analysis['ocr_engine']}，{analysis['updated_at']}，"
+                                   f"OCR 耗時 {timings.get('ocr', '-')} 秒)")
+                        if analysis.get('extracted_fields'):
+                            st.dataframe(
+                                pd.DataFrame(list(analysis['extracted_fields'].items()), columns=["欄位", "申報資料"]),
+                                hide_index=True, use_container_width=True
+                            )
+                        with st.expander(f"📑 頁面類型 ({len(analysis['page_types'] or [])} 頁)", expanded=False):
+                            for page_num, page_type in enumerate(analysis['page_types'] or [], start=1):
+                                st.write(f"第 {page_num} 頁：{page_type}")
+                    else:
+                        st.info("尚無分析結果，請至「自動比對系統」執行辨識。")
+
                     if st.button("🔍 執行 OCR 比對 (Tesseract)"):
                         st.info("OCR 功能開發中...")
                         # 這裡可以加入 OCR 邏輯
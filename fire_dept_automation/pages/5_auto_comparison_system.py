@@ -5,7 +5,8 @@ import os
 import fitz  # pymupdf
 from PIL import Image
 import pytesseract
-import re
+import time
+import ocr_parser
 import config_loader as cfg
 import smtplib
 from email.mime.text import MIMEText
@@ -36,6 +37,13 @@ st.sidebar.divider()
 import utils
 utils.load_custom_css()
 import doc_integrity  # New module for integrity check
+import page_classifier
+import registry_store
+import file_hash
+import place_index
+import address_normalizer
+import equipment_vocab
+import page_assets
 
 # ==========================================
 # 原有程式碼繼續
@@ -186,144 +194,21 @@ def normalize_equipment_str(text):
     將輸入的文字 (OCR 或 系統資料) 進行模糊比對，
     只保留標準設備清單中的項目，並以頓號分隔。
     """
-    if not text or not isinstance(text, str):
-        return ""
-    
-    found_items = []
-    # 為了避免重複匹配 (例如 "火警自動警報設備" 包含 "警報設備")
-    # 我們已經將列表按長度排序。
-    # 但這裡我們採取簡單策略：只要字串中有出現該設備名稱，就列入。
-    # 為了避免重複 (例如同一個詞出現兩次)，使用 set 或檢查是否存在
-    
-    # 先移除常見干擾字元，方便比對
-    clean_text = text.replace(" ", "").replace("　", "").replace("\n", "")
-    
-    for item in VALID_EQUIPMENT_LIST:
-        if item in clean_text:
-            found_items.append(item)
-            
-    return "、".join(found_items)
+    return ocr_parser.normalize_equipment_str(text, VALID_EQUIPMENT_LIST)
 
 def extract_info_from_ocr(text, pages_text_list=None):
-    """從 OCR 文字中提取關鍵資訊 (極致去空白版)"""
-    info = {}
+    """
+    從 OCR 文字中提取關鍵資訊 (共用解析器，見 ocr_parser.py)
     
-    # --- 第一頁解析 (基本資料) ---
-    if text:
-        lines = text.split('\n')
-        for line in lines:
-            # 強力去除所有空白 (包含全形空格)
-            clean_line = line.replace(" ", "").replace("　", "").strip()
-            if not clean_line: continue
-            
-            # 1. 管理權人
-            # 優先找 "管理權人"
-            if "管理權人" in clean_line:
-                match = re.search(r"管理權人[:：|](.*)", clean_line)
-                if match:
-                    val = match.group(1)
-                    # 如果抓到的是 "通訊處..." 這種無效資料，就忽略
-                    if "通訊處" not in val:
-                        info['管理權人'] = val
-            
-            # 備用：找 "姓名" (但要排除 "檢修人員姓名")
-            if "姓名" in clean_line and "檢修人員" not in clean_line and "管理權人" not in info:
-                 match = re.search(r"姓名[:：|](.*)", clean_line)
-                 if match:
-                     # 可能會抓到 "廖偉銘身分證字號..."，試著切掉後面
-                     val = match.group(1)
-                     if "身分證" in val:
-                         val = val.split("身分證")[0]
-                     info['管理權人'] = val
-            
-            # 2. 地址
-            if "地址" in clean_line:
-                 # 優先抓 "場所地址"
-                 if "場所地址" in clean_line:
-                     match = re.search(r"場所地址[:：|](.*)", clean_line)
-                     if match:
-                         info['場所地址'] = match.group(1)
-                 # 如果是 "地址" 且 字典裡還沒有 "場所地址" (避免覆蓋掉真正的場所地址，因為後面可能會出現檢修單位的地址)
-                 elif "地址" in clean_line and '場所地址' not in info:
-                     match = re.search(r"地址[:：|](.*)", clean_line)
-                     if match:
-                         info['場所地址'] = match.group(1)
-
-            # 3. 電話
-            if "電話" in clean_line:
-                # 排除 "管理權人電話" (通常我們想抓場所電話)
-                # 只有當字典裡還沒有電話時才抓取 (避免抓到下面檢修公司的電話)
-                if '場所電話' not in info:
-                    # 修改 Regex 以支援括號和空格，例如 (089) 322112
-                    match = re.search(r"電話[:：|]([\d\-\(\)\s]+)", clean_line)
-                    if match:
-                        # 抓出來的可能是 "089-330928" 或 "(089) 322112"
-                        val = match.group(1).strip()
-                        # 簡單過濾，至少要有數字
-                        if any(char.isdigit() for char in val):
-                            info['場所電話'] = val
-                     
-            # 4. 場所名稱
-            if "場所名稱" in clean_line:
-                match = re.search(r"場所名稱[:：|](.*)", clean_line)
-                if match:
-                    info['場所名稱'] = match.group(1)
-
-            # 5. 消防設備種類 (第一頁備用)
-            # 如果沒有第二頁資料，才嘗試從第一頁抓 (通常是 "申報項目" 或 "檢修項目")
-            if not pages_text_list:
-                if "申報項目" in clean_line or "檢修項目" in clean_line:
-                     match = re.search(r"(申報項目|檢修項目)[:：|](.*)", clean_line)
-                     if match:
-                         # 使用正規化函式處理
-                         info['消防設備種類'] = normalize_equipment_str(match.group(2))
-
-    # --- 多頁解析 (尋找消防設備種類) ---
-    if pages_text_list and isinstance(pages_text_list, list):
-        target_page_text = None
-        
-        # 1. 優先尋找目錄頁 (根據使用者指定的關鍵字)
-        # 關鍵字: "目錄", "附表", "二、消防安全設備檢查表"
-        toc_keywords = ["目錄", "附表", "二、消防安全設備檢查表", "消防安全設備檢修申報書目錄"]
-        
-        for i, page_text in enumerate(pages_text_list):
-            clean_text = page_text.replace(" ", "").replace("　", "").strip()
-            
-            # 檢查是否包含任一關鍵字
-            if any(kw.replace(" ", "") in clean_text for kw in toc_keywords):
-                target_page_text = page_text
-                info['toc_page_num'] = i + 1 # 紀錄頁碼
-                # print(f"DEBUG: Found TOC page with keyword at page {i+1}") # Debug use
-                break
-        
-        # 4. 最後回退：使用第二頁 (Index 1)
-        if not target_page_text and len(pages_text_list) > 1:
-            target_page_text = pages_text_list[1]
-            info['toc_page_num'] = 2
-            
-        if target_page_text:
-            # 策略：
-            # 1. 找到 "二、消防安全設備檢查表" 之後的內容
-            # 2. 抓取所有包含 "檢查表" 的行
-            # 3. 傳入 normalize_equipment_str 進行統一比對
-            
-            # 為了提高準確率，我們先把 "二、消防安全設備檢查表" 之後的文字截取出來
-            # 簡單做法：找到關鍵字後，取其後的所有文字
-            clean_page_text = target_page_text.replace(" ", "").replace("　", "")
-            if "消防安全設備檢查表" in clean_page_text:
-                # 切割出後半段
-                relevant_text = clean_page_text.split("消防安全設備檢查表", 1)[1]
-                
-                # 直接對這段文字進行正規化比對
-                normalized_eq = normalize_equipment_str(relevant_text)
-                if normalized_eq:
-                    info['消防設備種類'] = normalized_eq
-                 
-    return info
-
-
-
-
+    設備種類取目錄頁「消防安全設備檢查表」之後出現的所有設備。
+    """
+    return ocr_parser.extract_info_from_ocr(
+        text, pages_text_list,
+        equipment_list=VALID_EQUIPMENT_LIST,
+        toc_keywords=ocr_parser.EXTENDED_TOC_KEYWORDS,
+        toc_mode=ocr_parser.TOC_MODE_SECTION,
+        record_toc_page=True
+    )
 
 
 # ==========================================
@@ -413,15 +298,16 @@ with st.sidebar:
     if df_system is not None:
         st.header("1. 選擇比對場所")
         
-        # 取得所有場所名稱
-        all_place_names = df_system['場所名稱'].astype(str).unique().tolist()
+        # 取得所有場所名稱 (場所名稱索引只在列管資料變更時重建)
+        place_idx = place_index.get_place_index(df_system)
+        all_place_names = place_idx.unique_names
         
         # 搜尋框
         search_term = st.text_input("🔍 搜尋場所名稱 (支援模糊比對)", "")
         
-        # 根據搜尋結果過濾
+        # 根據搜尋結果過濾 (忽略台/臺與空白差異)
         if search_term:
-            filtered_places = [p for p in all_place_names if search_term in p]
+            filtered_places = place_idx.search(search_term)
         else:
             filtered_places = all_place_names
             
@@ -515,6 +401,8 @@ with st.sidebar:
                  st.rerun()
 
         if st.button("🔄 重新讀取資料"):
+            if isinstance(st.session_state.get("system_excel_source"), str):
+                registry_store.invalidate(st.session_state["system_excel_source"])
             utils.load_system_data.clear()
             st.cache_data.clear()
             st.rerun()
@@ -570,6 +458,7 @@ page_one_text = ""
 page_two_text = ""
 extracted_data = {}
 ocr_place_name = ""
+ocr_place_address = ""
 
 # 左欄：民眾申報資料 (PDF/圖片)
 with col1:
@@ -652,6 +541,11 @@ with col1:
             
             cache_miss = st.session_state.ocr_cache.get('file_key') != file_key
             
+            # 原始解析度頁面已被 LRU 清除時也需重新轉檔
+            cached_assets = st.session_state.ocr_cache.get('assets')
+            if not cache_miss and cached_assets is not None and not cached_assets.is_available():
+                cache_miss = True
+            
             if cache_miss or force_reocr or engine_changed:
                 if force_reocr:
                     st.toast("正在重新執行 OCR...", icon="🔄")
@@ -666,6 +560,7 @@ with col1:
                     del st.session_state.ocr_cache['ai_result']
                 if 'last_text_model' in st.session_state.ocr_cache:
                     del st.session_state.ocr_cache['last_text_model']
+                st.session_state.ocr_cache.pop('saved_fields', None)
                 
                 # 清除 Vision AI 快取
                 if 'vision_analysis' in st.session_state:
@@ -673,29 +568,40 @@ with col1:
                 if 'vision_cache_key' in st.session_state:
                     del st.session_state['vision_cache_key']
                 
-                # 1. 先轉換並顯示圖片 (讓使用者先看到預覽)
-                images = []
+                # 已儲存的分析結果 (同一份檔案、同一個 OCR 引擎；其他審核人員或重新整理前的結果)
+                file_digest = file_hash.cached_file_sha256(uploaded_file_path)
+                stored_analysis = None
+                if force_reocr:
+                    db_manager.delete_case_analysis(target_case['id'])
+                else:
+                    stored_analysis = db_manager.get_case_analysis(target_case['id'], file_digest, ocr_engine)
+                
+                # 1. 先讀取文字層並顯示縮圖預覽 (原始解析度頁面只在需要 OCR 時才轉出)
+                raster_start = time.perf_counter()
+                page_assets_doc = None
+                text_layers = [] # 數位 PDF 的文字層 (可直接使用的頁面不需 OCR)
                 # target_dpi = 150 if use_fast_mode else 300
                 target_dpi = 300 # 強制使用 300 DPI 以提升 OCR 對勾選框的辨識率 (User Request)
+                asset_key = f"{file_key}_{target_dpi}dpi"
                 
                 try:
                     ext = os.path.splitext(uploaded_file_path)[1].lower()
                     if ext == ".pdf":
-                        # 顯示轉換訊息
-                        with st.spinner(f"📄 正在將 PDF 轉換為圖片 (DPI: {target_dpi})..."):
-                            with open(uploaded_file_path, "rb") as f:
-                                images = utils.pdf_to_images(f, dpi=target_dpi)
+                        with st.spinner("📄 正在讀取 PDF 文字層與頁面預覽..."):
+                            text_layers = utils.extract_pdf_text_layers(uploaded_file_path)
+                            page_assets_doc = page_assets.get_store().open_source(asset_key, uploaded_file_path, target_dpi)
                     elif ext in [".doc", ".docx"]:
                          with st.spinner("📄 正在將 Word 文件轉換為 PDF (需安裝 Microsoft Word)..."):
                             temp_pdf_path = None
                             try:
                                 temp_pdf_path = utils.convert_doc_to_pdf(uploaded_file_path)
-                                with open(temp_pdf_path, "rb") as f:
-                                    images = utils.pdf_to_images(f, dpi=target_dpi)
+                                text_layers = utils.extract_pdf_text_layers(temp_pdf_path)
+                                # 轉出的 PDF 交由頁面資產快取保管 (隨文件一起清除)
+                                page_assets_doc = page_assets.get_store().open_source(
+                                    asset_key, temp_pdf_path, target_dpi, source_owned=True
+                                )
                             except Exception as e:
                                 st.error(f"❌ Word 轉換失敗: {e}")
-                                images = []
-                            finally:
                                 # Clean up temp PDF
                                 if temp_pdf_path and os.path.exists(temp_pdf_path):
                                     try: os.remove(temp_pdf_path)
@@ -706,80 +612,116 @@ with col1:
                             ratio = 1500 / img.width
                             new_height = int(img.height * ratio)
                             img = img.resize((1500, new_height), Image.Resampling.LANCZOS)
-                        images = [img]
+                        page_assets_doc = page_assets.get_store().put(asset_key, [img], source=uploaded_file_path)
                     else:
                         st.error(f"❌ 不支援的檔案格式：{ext}。請上傳 PDF、Word 或圖片檔。")
-                        images = []
                 except Exception as e:
                     st.error(f"無法讀取檔案: {e}")
-                    images = []
+                    page_assets_doc = None
                 
-                if images:
+                if page_assets_doc is not None and page_assets_doc.page_count:
                     # 先顯示圖片預覽
-                    for i, img in enumerate(images):
-                        st.image(img, caption=f"第 {i+1} 頁 (預覽)", use_container_width=True)
+                    for i in range(page_assets_doc.page_count):
+                        st.image(page_assets_doc.thumbnail(i), caption=f"第 {i+1} 頁 (預覽)", use_container_width=True)
+                    
+                    raster_seconds = time.perf_counter() - raster_start
                     
-                    # 2. 執行 OCR
-                    with st.spinner("🔍 正在進行 OCR 辨識中 (請稍候)..."):
-                        temp_all_text = ""
-                        temp_p1_text = ""
-                        temp_p2_text = ""
+                    if stored_analysis:
+                        # 2. 使用已儲存的 OCR 結果 (不需重新辨識)
+                        pages_text = stored_analysis['pages_text']
+                        pages_info = [
+                            {"page_num": i + 1, "first_30": text[:30], "type": page_type, "text": text}
+                            for i, (text, page_type) in enumerate(zip(pages_text, stored_analysis['page_types']))
+                        ]
+                        temp_all_text = "".join(text + "\n" for text in pages_text)
+                        temp_p1_text = pages_text[0] if len(pages_text) > 0 else ""
+                        temp_p2_text = pages_text[1] if len(pages_text) > 1 else ""
+                        
+                        if stored_analysis.get('ai_result'):
+                            st.session_state.ocr_cache['ai_result'] = stored_analysis['ai_result']
+                            st.session_state.ocr_cache['last_text_model'] = stored_analysis['ai_model']
+                        if stored_analysis.get('vision_analysis'):
+                            import ai_engine
+                            st.session_state.vision_analysis = ai_engine.vision_result_from_json(stored_analysis['vision_analysis'])
+                            st.session_state.vision_cache_key = file_key
+                        st.toast(f"已載入儲存的分析結果 ({stored_analysis['updated_at']})", icon="💾")
+                    else:
+                        # 2. 執行 OCR
+                        ocr_start = time.perf_counter()
+                        with st.spinner("🔍 正在進行 OCR 辨識中 (請稍候)..."):
+                            temp_all_text = ""
+                            temp_p1_text = ""
+                            temp_p2_text = ""
                         
-                        # 執行 OCR
-                        pages_text = []
-                        pages_info = [] # Store page info
+                            # 執行 OCR
+                            pages_text = []
+                            pages_info = [] # Store page info
                         
-                        for i, img in enumerate(images):
-                            # 執行 OCR (根據選定的引擎)
-                            if use_paddle:
-                                try:
-                                    import paddle_ocr
-                                    ocr_text = paddle_ocr.perform_paddle_ocr(img)
+                            for i in range(page_assets_doc.page_count):
+                                text_layer = text_layers[i] if i < len(text_layers) else None
+                                # 有可信的文字層時直接使用 (不轉出影像)，否則轉出該頁並執行 OCR (根據選定的引擎)
+                                if text_layer is not None:
+                                    ocr_text = text_layer
+                                elif use_paddle:
+                                    img = page_assets_doc.full_page(i)
+                                    try:
+                                        import paddle_ocr
+                                        ocr_text = paddle_ocr.perform_paddle_ocr(img)
                                     
-                                    # 檢查 PaddleOCR 是否回傳錯誤
-                                    if "Error:" in ocr_text:
-                                        st.warning(f"PaddleOCR 執行失敗 (第 {i+1} 頁): {ocr_text}")
-                                        st.info("🔄 自動切換至 Tesseract 進行重試...")
-                                        ocr_text = perform_ocr(img, tesseract_path)
+                                        # 檢查 PaddleOCR 是否回傳錯誤
+                                        if "Error:" in ocr_text:
+                                            st.warning(f"PaddleOCR 執行失敗 (第 {i+1} 頁): {ocr_text}")
+                                            st.info("🔄 自動切換至 Tesseract 進行重試...")
+                                            ocr_text = perform_ocr(img, tesseract_path)
                                         
-                                except Exception as e:
-                                    st.warning(f"PaddleOCR 執行失敗，切換至 Tesseract: {e}")
-                                    ocr_text = perform_ocr(img, tesseract_path)
-                            else:
-                                ocr_text = perform_ocr(img, tesseract_path)
+                                    except Exception as e:
+                                        st.warning(f"PaddleOCR 執行失敗，切換至 Tesseract: {e}")
+                                        ocr_text = perform_ocr(img, tesseract_path)
+                                else:
+                                    ocr_text = perform_ocr(page_assets_doc.full_page(i), tesseract_path)
                             
-                            # 再次檢查 Tesseract 是否也失敗
-                            if "Error:" in ocr_text:
-                                st.error(f"❌ OCR 嚴重失敗 (第 {i+1} 頁): {ocr_text}")
+                                # 再次檢查 Tesseract 是否也失敗
+                                if "Error:" in ocr_text:
+                                    st.error(f"❌ OCR 嚴重失敗 (第 {i+1} 頁): {ocr_text}")
                                 
-                            temp_all_text += ocr_text + "\n"
-                            pages_text.append(ocr_text)
+                                temp_all_text += ocr_text + "\n"
+                                pages_text.append(ocr_text)
                             
-                            # Identify page type
-                            first_30 = ocr_text[:30]
-                            page_type = doc_integrity.identify_page_type(first_30)
+                                # Identify page type
+                                first_30 = ocr_text[:30]
+                                page_type = doc_integrity.identify_page_type(first_30)
                             
-                            pages_info.append({
-                                "page_num": i + 1,
-                                "first_30": first_30,
-                                "type": page_type,
-                                "text": ocr_text
-                            })
+                                pages_info.append({
+                                    "page_num": i + 1,
+                                    "first_30": first_30,
+                                    "type": page_type,
+                                    "text": ocr_text
+                                })
                             
-                            if i == 0: temp_p1_text = ocr_text
-                            if i == 1: temp_p2_text = ocr_text
-                        
-                        # 存入 Session State
-                        st.session_state.ocr_cache['file_key'] = file_key
-                        st.session_state.ocr_cache['all_ocr_text'] = temp_all_text
-                        st.session_state.ocr_cache['page_one_text'] = temp_p1_text
-                        st.session_state.ocr_cache['page_two_text'] = temp_p2_text
-                        st.session_state.ocr_cache['pages_text'] = pages_text # 儲存所有頁面文字
-                        st.session_state.ocr_cache['pages_info'] = pages_info # 儲存頁面資訊
-                        st.session_state.ocr_cache['images'] = images 
+                                if i == 0: temp_p1_text = ocr_text
+                                if i == 1: temp_p2_text = ocr_text
                         
-                        # 重新整理頁面以顯示 OCR 結果
-                        st.rerun()
+                        # 儲存分析結果 (重新整理或其他審核人員開啟同一案件時不需重新辨識)
+                        db_manager.save_case_analysis(
+                            target_case['id'], file_digest, ocr_engine,
+                            pages_text, [info['type'] for info in pages_info],
+                            engine_versions={"ocr_engine": ocr_engine, "dpi": target_dpi,
+                                             "text_layer_pages": sum(layer is not None for layer in text_layers)},
+                            timings={"rasterize": round(raster_seconds, 2),
+                                     "ocr": round(time.perf_counter() - ocr_start, 2)}
+                        )
+                    
+                    # 存入 Session State
+                    st.session_state.ocr_cache['file_key'] = file_key
+                    st.session_state.ocr_cache['all_ocr_text'] = temp_all_text
+                    st.session_state.ocr_cache['page_one_text'] = temp_p1_text
+                    st.session_state.ocr_cache['page_two_text'] = temp_p2_text
+                    st.session_state.ocr_cache['pages_text'] = pages_text # 儲存所有頁面文字
+                    st.session_state.ocr_cache['pages_info'] = pages_info # 儲存頁面資訊
+                    st.session_state.ocr_cache['assets'] = page_assets_doc
+                    
+                    # 重新整理頁面以顯示 OCR 結果
+                    st.rerun()
             else:
                 with col_status_msg:
                     st.success("✅ 使用快取資料 (無需重新辨識)")
@@ -789,7 +731,9 @@ with col1:
             page_one_text = st.session_state.ocr_cache.get('page_one_text', "")
             page_two_text = st.session_state.ocr_cache.get('page_two_text', "")
             pages_text = st.session_state.ocr_cache.get('pages_text', [])
-            cached_images = st.session_state.ocr_cache.get('images', [])
+            cached_assets = st.session_state.ocr_cache.get('assets')
+            # 原始解析度頁面 (延遲從磁碟快取讀取，供 Vision AI 使用)
+            cached_images = cached_assets.full_pages() if cached_assets and cached_assets.is_available() else []
             # 提取資料 (邏輯分流)
             if use_ai_mode:
                 import ai_engine
@@ -826,8 +770,17 @@ with col1:
                                     st.warning("Vision AI 未能提取到設備清單，將使用 OCR 文字分析結果作為備案。")
                                 
                             else:
-                                # === 純文字模式 ===
-                                ai_result = ai_engine.analyze_document(pages_text, model=text_model)
+                                # === 純文字模式 (分層提取：規則優先，只有信心不足的欄位才呼叫 LLM) ===
+                                import field_extractor
+                                ai_result = field_extractor.extract_fields(
+                                    page_one_text, pages_text,
+                                    model=text_model,
+                                    equipment_list=VALID_EQUIPMENT_LIST
+                                )
+                                if ai_result.get('llm_fields'):
+                                    st.caption(f"🧩 規則提取信心不足，已交由 AI 補足: {'、'.join(ai_result['llm_fields'])}")
+                                else:
+                                    st.caption("⚡ 規則提取信心足夠，未呼叫 AI")
                             
                             # 立即應用簡繁轉換
                             ai_result = utils.convert_to_traditional(ai_result)
@@ -835,6 +788,9 @@ with col1:
                             # Save to cache
                             st.session_state.ocr_cache['ai_result'] = ai_result
                             st.session_state.ocr_cache['last_text_model'] = text_model
+                            db_manager.update_case_analysis_fields(
+                                target_case['id'], {'ai_result': ai_result, 'ai_model': text_model}
+                            )
                             st.toast("已完成 AI 智慧分析", icon="🤖")
                     
                     # 處理 AI 結果
@@ -886,8 +842,7 @@ with col1:
                         # --- Fallback 機制 ---
                         if not extracted_data.get('場所名稱'):
                             st.warning("⚠️ AI 未能識別場所名稱，嘗試使用規則提取補救...")
-                            fallback_data = extract_info_from_ocr(page_one_text, pages_text)
-                            for key, val in fallback_data.items():
+                            for key, val in ocr_info_for_toc.items():
                                 if not extracted_data.get(key):
                                     extracted_data[key] = val
                         
@@ -904,11 +859,17 @@ with col1:
                 # 應用簡繁轉換
                 extracted_data = utils.convert_to_traditional(extracted_data)
                 
+            # 儲存擷取欄位 (內容改變時才寫入)
+            if st.session_state.ocr_cache.get('saved_fields') != extracted_data:
+                db_manager.update_case_analysis_fields(target_case['id'], {'extracted_fields': extracted_data})
+                st.session_state.ocr_cache['saved_fields'] = extracted_data
+            
             ocr_place_name = extracted_data.get('場所名稱', '')
+            ocr_place_address = extracted_data.get('場所地址', '')
 
             # 顯示圖片與 OCR 結果 (這是 Rerun 後或 Cache Hit 會看到的)
-            for i, img in enumerate(cached_images):
-                st.image(img, caption=f"第 {i+1} 頁", use_container_width=True)
+            for i in range(cached_assets.page_count if cached_assets else 0):
+                st.image(cached_assets.thumbnail(i), caption=f"第 {i+1} 頁", use_container_width=True)
                 with st.expander(f"第 {i+1} 頁 OCR 文字內容 (除錯用)", expanded=False):
 
                     # 顯示每一頁的前30個字和完整內容
@@ -940,26 +901,17 @@ with col1:
 
 auto_matched_place = None
 if df_system is not None and ocr_place_name:
-    # 嘗試自動搜尋
+    # 嘗試自動搜尋 (場所名稱索引)
     # 1. 完全符合
-    match = df_system[df_system['場所名稱'] == ocr_place_name]
-    if not match.empty:
-        auto_matched_place = ocr_place_name
-        target_row = match.iloc[0]
-    else:
-        # 2. 模糊/包含搜尋 (去除台/臺差異)
-        clean_ocr = ocr_place_name.replace("台", "臺").replace(" ", "")
-        
-        # 搜尋系統資料中是否有包含此名稱的
-        # 這裡做一個簡單的遍歷搜尋
-        for idx, row in df_system.iterrows():
-            sys_name = str(row['場所名稱'])
-            clean_sys = sys_name.replace("台", "臺").replace(" ", "")
-            
-            if clean_ocr and (clean_ocr in clean_sys or clean_sys in clean_ocr):
-                auto_matched_place = sys_name
-                target_row = row
-                break
+    # 2. 模糊/包含搜尋 (去除台/臺差異)
+    # 3. 地址標準鍵相同 (名稱辨識錯誤時)
+    place_idx = place_index.get_place_index(df_system)
+    matched_pos = place_idx.match(ocr_place_name)
+    if matched_pos is None and ocr_place_address:
+        matched_pos = place_idx.match_address(ocr_place_address)
+    if matched_pos is not None:
+        target_row = df_system.iloc[matched_pos]
+        auto_matched_place = str(target_row['場所名稱'])
 
 # 如果沒有自動比對到，則使用手動選擇的
 if target_row is None and selected_place and df_system is not None:
@@ -1075,6 +1027,9 @@ with col2:
             st.info(f"👤 目前手動選擇場所：{selected_place}")
             if ocr_place_name:
                 st.warning(f"⚠️ 系統無法自動對應 OCR 場所「{ocr_place_name}」，請確認手動選擇是否正確。")
+                candidates = place_index.get_place_index(df_system).top_k(ocr_place_name, k=3, min_score=0.3)
+                if candidates:
+                    st.caption("🔎 最相近的系統場所：" + "、".join(f"{name} ({score:.0%})" for _, name, score in candidates))
         
         if target_case and uploaded_file_path:
             # 顯示鎖定資訊
@@ -1170,17 +1125,14 @@ with col2:
             # 視覺化比對區塊 (Diff View)
             st.subheader("📊 視覺化比對")
             
-            # 轉換為集合以進行比對
-            sys_set = set(equip_sys_val.split("、")) if equip_sys_val else set()
-            ocr_set = set(equip_ocr_val.split("、")) if equip_ocr_val else set()
-            
-            # 去除空字串
-            sys_set.discard("")
-            ocr_set.discard("")
+            # 兩邊以同一份標準清單正規化後轉換為設備位元遮罩 (相同字串只轉換一次)
+            equipment_key = tuple(VALID_EQUIPMENT_LIST)
+            sys_mask = equipment_vocab.mask_from_str(equip_sys_val or "", equipment_key)
+            ocr_mask = equipment_vocab.mask_from_str(equip_ocr_val or "", equipment_key)
             
             # 渲染差異視覺化
-            if sys_set or ocr_set:
-                diff_html = utils.render_equipment_diff(sys_set, ocr_set)
+            if sys_mask or ocr_mask:
+                diff_html = utils.render_equipment_diff(sys_mask, ocr_mask)
                 st.markdown(diff_html, unsafe_allow_html=True)
             else:
                 st.info("無設備資料")
@@ -1240,19 +1192,8 @@ with col2:
                 
                 # 地址模糊比對邏輯
                 if field == '場所地址':
-                    # 定義正規化函式
-                    def normalize_addr(addr):
-                        if not addr: return ""
-                        # 1. 統一 台/臺
-                        addr = addr.replace("台", "臺")
-                        # 2. 去除開頭的 "臺東縣" (或 "台東縣")
-                        addr = addr.replace("臺東縣", "")
-                        # 3. 去除空白
-                        addr = addr.replace(" ", "")
-                        return addr
-                    
-                    norm_sys = normalize_addr(sys_val)
-                    norm_ocr = normalize_addr(ocr_val)
+                    # 地址標準鍵 (全半形、國字數字差異皆已統一；兩者都寫了鄉鎮時鄉鎮必須相同)
+                    norm_sys, norm_ocr = address_normalizer.comparable_keys(sys_val, ocr_val)
                     
                     # 嚴格判斷邏輯
                     if not sys_val and ocr_val:
@@ -1416,7 +1357,13 @@ with tab_check:
         st.caption("📝 使用傳統 OCR 模式 (Tesseract)")
     
     if 'ocr_cache' in st.session_state and 'pages_info' in st.session_state.ocr_cache:
-        images = st.session_state.ocr_cache.get('images', [])
+        page_assets_doc = st.session_state.ocr_cache.get('assets')
+        images = []
+        if page_assets_doc is not None:
+            if page_assets_doc.is_available():
+                images = page_assets_doc.full_pages()
+            else:
+                st.warning("⚠️ 原始頁面影像已從快取清除，請按「重新辨識」後再進行 Vision AI / 目錄勾選分析。")
         pages_info = st.session_state.ocr_cache.get('pages_info', [])  # 在兩種模式都需要這個變數
         
         # === Vision AI 模式 ===
@@ -1442,6 +1389,10 @@ with tab_check:
                             result = ai_engine.analyze_document_structure(images)
                             st.session_state.vision_analysis = result
                             st.session_state.vision_cache_key = cache_key
+                            if not result.get('error') and target_case:
+                                db_manager.update_case_analysis_fields(
+                                    target_case['id'], {'vision_analysis': ai_engine.vision_result_to_json(result)}
+                                )
                     else:
                         result = st.session_state.vision_analysis
                         st.success("✅ 使用快取的 Vision AI 分析結果")
@@ -1523,24 +1474,21 @@ with tab_check:
                 
                 if toc_page:
                     st.success(f"✅ 已識別目錄頁 (第 {toc_page['page_num']} 頁)")
-                    toc_img = images[toc_page['page_num']-1]
-                    st.image(toc_img, caption="目錄頁預覽", use_container_width=True)
+                    toc_img = images[toc_page['page_num']-1] if images else None
+                    st.image(page_assets_doc.thumbnail(toc_page['page_num']-1), caption="目錄頁預覽", use_container_width=True)
                     
                     # Parse TOC (Lazy load)
-                    if 'detected_reqs' not in st.session_state or st.session_state.get('last_file_key') != st.session_state.ocr_cache.get('file_key'):
+                    if toc_img is None:
+                        # 原始影像已清除：沿用同一份文件先前的解析結果，不能解析時由使用者手動勾選
+                        if st.session_state.get('last_file_key') != st.session_state.ocr_cache.get('file_key'):
+                            st.session_state.detected_reqs = []
+                    elif 'detected_reqs' not in st.session_state or st.session_state.get('last_file_key') != st.session_state.ocr_cache.get('file_key'):
                         with st.spinner("🔍 正在分析目錄勾選項目..."):
                             st.session_state.detected_reqs = doc_integrity.parse_toc_requirements(toc_img, toc_page['text'])
                             st.session_state.last_file_key = st.session_state.ocr_cache.get('file_key')
                     
                     # Full list of possible documents
-                    all_docs = [
-                        "消防安全設備檢修申報表", "消防安全設備檢修報告書", "消防安全設備改善計畫書", "消防安全設備種類及數量表",
-                        "滅火器檢查表", "室內消防栓設備檢查表", "自動撒水設備檢查表", "泡沫滅火設備檢查表", 
-                        "火警自動警報設備檢查表", "緊急廣播設備檢查表", "標示設備檢查表", "避難設備檢查表",
-                        "緊急照明設備檢查表", "連結送水管檢查表", "排煙設備檢查表", "無線電通信輔助設備檢查表",
-                        "建築物使用執照影本", "營利事業登記證影本", "專業機構合格證書影本", 
-                        "消防設備師(士)證書影本", "管理權人身分證影本"
-                    ]
+                    all_docs = page_classifier.STANDARD_DOCUMENTS
                     
                     # UI for manual correction
                     selected_reqs = st.multiselect(
@@ -1565,29 +1513,21 @@ with tab_check:
                 # Analysis Logic
                 report_data = []
                 
-                # Get all identified page types
-                found_types = set(p['type'] for p in pages_info)
+                # Page type index (page type -> pages, shared reverse index for items)
+                type_index = page_classifier.PageTypeIndex({p['page_num']: p['type'] for p in pages_info})
                 
                 # 1. Check Required Docs
                 for req in selected_reqs:
                     status = "❌ 缺漏"
                     note = ""
                     
-                    # Fuzzy match logic
-                    # If req is in found_types (exact match)
-                    if req in found_types:
+                    # identify_page_type returns standardized names, so exact match is the common case;
+                    # otherwise any page type containing (or contained in) the item satisfies it
+                    matched_types = type_index.matching_types(req)
+                    if matched_types:
                         status = "✅ 已檢附"
-                    else:
-                        # Fuzzy check
-                        # e.g. "滅火器檢查表" vs "滅火器" (from identify_page_type)
-                        # Our identify_page_type returns standardized names, so exact match should work if keywords align.
-                        # Let's check if any found type contains core keywords of req
-                        core_key = req[:4]
-                        for ft in found_types:
-                            if core_key in ft:
-                                status = "✅ 已檢附"
-                                note = f"(對應: {ft})"
-                                break
+                        if req not in matched_types:
+                            note = f"(對應: {matched_types[0]})"
                     
                     report_data.append({
                         "項目": req,
@@ -0,0 +1,127 @@
+import io
+import fitz  # pymupdf
+
+# ==========================================
+# PDF 文字層擷取 (數位 PDF 免 OCR)
+# ==========================================
+# 由 Word 匯出的申報書本身就有正確的文字層，不需轉成 300 DPI 圖片再 OCR：
+#   1. 逐頁以 page.get_text("blocks") 取出文字區塊 (依座標由上而下、由左而右排序)
+#   2. 判斷文字層是否可信 (字數、亂碼比例、中文字數、是否為掃描影像)
+#   3. 可信的頁面直接使用文字層；掃描頁回傳 None，由呼叫端交給 Tesseract / PaddleOCR
+# Word 的 Wingdings 勾選框在文字層中是私有區字元，轉換為 ☑ / ☒ / □ 後交給 ocr_parser 判斷。
+
+# 文字層判斷門檻
+MIN_TEXT_CHARS = 20            # 非空白字元數下限
+MIN_CJK_CHARS = 5              # 中文字數下限 (申報書皆為中文)
+MAX_BAD_CHAR_RATIO = 0.1       # 亂碼 (替代字元、未對應的私有區字元、控制字元) 比例上限
+SCANNED_IMAGE_COVERAGE = 0.5   # 影像覆蓋頁面比例超過此值視為掃描頁...
+SCANNED_MAX_TEXT_CHARS = 200   # ...且文字少於此字數時 (例如只有頁首) 仍交給 OCR
+
+# Word 符號字型 (Wingdings) 的勾選框 -> 標準字元
+_GLYPH_TABLE = str.maketrans({
+    '\uf0fe': '☑',  # Wingdings 0xFE 勾選方框
+    '\uf0fd': '☒',  # Wingdings 0xFD 打叉方框
+    '\uf078': '☒',  # Wingdings 'x'
+    '\uf0a8': '□',  # Wingdings 0xA8 空白方框
+    '\uf06f': '□',  # Wingdings 'o'
+    '\uf071': '□',  # Wingdings 'q'
+    '\uf0fc': '✓',  # Wingdings 0xFC 勾號
+})
+
+
+def normalize_glyphs(text):
+    """Wingdings 勾選框等私有區字元轉為標準字元"""
+    return text.translate(_GLYPH_TABLE)
+
+
+def _is_cjk(ch):
+    return '\u4e00' <= ch <= '\u9fff' or '\u3400' <= ch <= '\u4dbf'
+
+
+def _is_bad(ch):
+    return ch == '\ufffd' or '\ue000' <= ch <= '\uf8ff' or (ord(ch) < 32 and ch not in '\n\t')
+
+
+def is_plausible_text(text):
+    """
+    判斷文字層是否可信 (不是空白、亂碼或缺少字型對應表的文字)
+
+    Args:
+        text (str): 頁面文字層 (已轉換勾選框)
+
+    Returns:
+        bool: 可直接使用時回傳 True
+    """
+    chars = [ch for ch in text if not ch.isspace()]
+    if len(chars) < MIN_TEXT_CHARS:
+        return False
+    if sum(_is_cjk(ch) for ch in chars) < MIN_CJK_CHARS:
+        return False
+    return sum(_is_bad(ch) for ch in chars) / len(chars) <= MAX_BAD_CHAR_RATIO
+
+
+def _image_coverage(page):
+    """頁面被影像覆蓋的比例 (近似值：各影像面積總和)"""
+    page_area = abs(page.rect.width * page.rect.height) or 1.0
+    covered = 0.0
+    for info in page.get_image_info():
+        rect = fitz.Rect(info["bbox"]) & page.rect
+        covered += abs(rect.width * rect.height)
+    return min(covered / page_area, 1.0)
+
+
+def page_text(page):
+    """
+    取出單頁文字層 (依區塊座標排序)
+
+    Args:
+        page (fitz.Page): PDF 頁面
+
+    Returns:
+        str: 文字 (區塊間以換行分隔)
+    """
+    blocks = page.get_text("blocks", sort=True)
+    text = "\n".join(block[4].strip() for block in blocks if block[6] == 0 and block[4].strip())
+    return normalize_glyphs(text)
+
+
+def page_text_layer(page):
+    """
+    取出可信的單頁文字層
+
+    Returns:
+        str: 文字；掃描頁或文字層不可信時回傳 None (需 OCR)
+    """
+    text = page_text(page)
+    if not is_plausible_text(text):
+        return None
+    if len(text) < SCANNED_MAX_TEXT_CHARS and _image_coverage(page) > SCANNED_IMAGE_COVERAGE:
+        return None
+    return text
+
+
+def extract_text_layers(pdf_file):
+    """
+    逐頁擷取 PDF 文字層
+
+    Args:
+        pdf_file: PDF 路徑、bytes 或 file-like object
+
+    Returns:
+        list: 每頁的文字 (需 OCR 的頁面為 None)；無法開啟時回傳空列表
+    """
+    try:
+        if isinstance(pdf_file, str):
+            doc = fitz.open(pdf_file)
+        else:
+            data = pdf_file.read() if hasattr(pdf_file, 'read') else pdf_file
+            doc = fitz.open(stream=io.BytesIO(data), filetype="pdf")
+    except Exception as e:
+        print(f"⚠️ 無法讀取 PDF 文字層: {e}")
+        return []
+
+    with doc:
+        layers = [page_text_layer(page) for page in doc]
+    found = sum(layer is not None for layer in layers)
+    print(f"📄 PDF 文字層: {found}/{len(layers)} 頁可直接使用")
+    return layers
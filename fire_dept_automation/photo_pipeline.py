@@ -0,0 +1,311 @@
+import base64
+import functools
+import glob
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait as _wait_futures
+from PIL import Image, ImageOps
+
+# ==========================================
+# 送達證明照片處理管線
+# ==========================================
+# 志工在現場以手機網路打卡，按鈕處理程序只做最少的事：
+#   1. 計算原始檔的 SHA-256，決定最終路徑 (內容定址，同一張照片重複上傳只存一份)
+#   2. 原始檔寫入暫存區 (incoming/)，立即回傳路徑寫入送餐紀錄
+#   3. 背景執行緒池：解碼 → 依 EXIF 轉正 → 縮至 800px → 產生縮圖 → 刪除暫存檔
+#
+# 檔案配置 (相對於 root)：
+#   {hash[:2]}/{hash}.jpg            送達證明 (800px)
+#   thumbs/{hash[:2]}/{hash}.jpg     報表縮圖
+#   incoming/{hash}.upload           尚未處理的原始檔 (程式重啟時由 recover() 補處理)
+#
+# 舊資料 (uploads/delivery_proofs/YYYYMM/...) 路徑不變，報表縮圖改為即時產生並快取。
+
+PROOF_DIR = "uploads/delivery_proofs"
+MAX_WIDTH = 800
+THUMB_SIZE = 160
+JPEG_QUALITY = 85
+THUMB_QUALITY = 75
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+
+def content_hash(data):
+    """
+    計算照片內容雜湊 (SHA-256)
+
+    Args:
+        data (bytes): 原始檔內容
+
+    Returns:
+        str: 64 字元十六進位字串
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def proof_paths(digest, root=PROOF_DIR):
+    """
+    依內容雜湊產生照片與縮圖路徑
+
+    Args:
+        digest (str): content_hash() 的結果
+        root (str): 照片根目錄
+
+    Returns:
+        tuple: (照片路徑, 縮圖路徑)
+    """
+    photo_path = os.path.join(root, digest[:2], f"{digest}.jpg")
+    thumb_path = os.path.join(root, "thumbs", digest[:2], f"{digest}.jpg")
+    return photo_path, thumb_path
+
+
+def _read_buffer(file_buffer):
+    """取得 Streamlit UploadedFile / BytesIO / bytes 的內容"""
+    if isinstance(file_buffer, (bytes, bytearray)):
+        return bytes(file_buffer)
+    if hasattr(file_buffer, "getvalue"):
+        return file_buffer.getvalue()
+    file_buffer.seek(0)
+    return file_buffer.read()
+
+
+def _save_atomic(image, path, **save_kwargs):
+    """先寫入暫存檔再改名，讀取端不會看到寫到一半的 JPEG"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    image.save(tmp_path, "JPEG", **save_kwargs)
+    os.replace(tmp_path, path)
+
+
+def process_image(data, photo_path, thumb_path, max_width=MAX_WIDTH, thumb_size=THUMB_SIZE):
+    """
+    解碼、轉正、縮圖並存檔 (背景執行緒呼叫)
+
+    Args:
+        data (bytes): 原始檔內容
+        photo_path (str): 送達證明輸出路徑
+        thumb_path (str): 縮圖輸出路徑
+        max_width (int): 送達證明最大寬度
+        thumb_size (int): 縮圖最長邊
+
+    Returns:
+        tuple: (照片寬, 照片高)
+    """
+    image = Image.open(io.BytesIO(data))
+    # JPEG 以 DCT 縮放直接解碼到接近目標大小 (兩邊都不小於 max_width，轉正後寬度仍足夠)
+    image.draft("RGB", (max_width, max_width))
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    if image.width > max_width:
+        new_height = max(1, round(image.height * max_width / image.width))
+        image = image.resize((max_width, new_height), Image.Resampling.LANCZOS)
+
+    thumb = image.copy()
+    thumb.thumbnail((thumb_size, thumb_size), Image.Resampling.LANCZOS)
+
+    # 縮圖先寫，照片最後寫：照片存在即代表處理完成
+    _save_atomic(thumb, thumb_path, quality=THUMB_QUALITY)
+    _save_atomic(image, photo_path, quality=JPEG_QUALITY, optimize=True)
+    return image.size
+
+
+class PhotoPipeline:
+    """
+    送達證明照片的背景處理佇列
+
+    Args:
+        root (str): 照片根目錄
+        workers (int): 背景執行緒數 (Pillow 解碼與縮放會釋放 GIL)
+    """
+
+    def __init__(self, root=PROOF_DIR, workers=DEFAULT_WORKERS):
+        self.root = root
+        self.incoming_dir = os.path.join(root, "incoming")
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="photo")
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def submit(self, file_buffer):
+        """
+        接收上傳照片：寫入暫存區後立即回傳最終路徑，處理交給背景執行緒
+
+        Args:
+            file_buffer: Streamlit camera_input / file_uploader 的 buffer 或 bytes
+
+        Returns:
+            str: 照片相對路徑 (用於存入資料庫)；無照片時回傳 None
+        """
+        if file_buffer is None:
+            return None
+        data = _read_buffer(file_buffer)
+        digest = content_hash(data)
+        photo_path, _ = proof_paths(digest, self.root)
+
+        with self._lock:
+            if digest in self._pending or os.path.exists(photo_path):
+                print(f"♻️ 照片已存在，沿用: {photo_path}")
+                return photo_path
+            os.makedirs(self.incoming_dir, exist_ok=True)
+            with open(self._spool_path(digest), "wb") as f:
+                f.write(data)
+            self._schedule(digest)
+        return photo_path
+
+    def recover(self):
+        """
+        重新排入上次未處理完的暫存檔 (程式重啟後呼叫)
+
+        Returns:
+            int: 重新排入的數量
+        """
+        count = 0
+        with self._lock:
+            for spool in glob.glob(os.path.join(self.incoming_dir, "*.upload")):
+                digest = os.path.splitext(os.path.basename(spool))[0]
+                if digest not in self._pending:
+                    self._schedule(digest)
+                    count += 1
+        if count:
+            print(f"📷 重新處理 {count} 張未完成的照片")
+        return count
+
+    def wait(self, timeout=None):
+        """
+        等待目前排隊中的照片處理完成
+
+        Args:
+            timeout (float): 最長等待秒數，None 表示不限
+
+        Returns:
+            bool: 是否全部完成
+        """
+        with self._lock:
+            futures = list(self._pending.values())
+        _, not_done = _wait_futures(futures, timeout=timeout)
+        return not not_done
+
+    def pending_count(self):
+        """排隊中 / 處理中的照片數"""
+        with self._lock:
+            return len(self._pending)
+
+    def shutdown(self, wait=True):
+        """停止背景執行緒 (未處理的暫存檔保留，下次 recover() 補處理)"""
+        self._executor.shutdown(wait=wait)
+
+    def _spool_path(self, digest):
+        return os.path.join(self.incoming_dir, f"{digest}.upload")
+
+    def _schedule(self, digest):
+        # 呼叫端需持有 self._lock
+        future = self._executor.submit(self._process, digest)
+        self._pending[digest] = future
+        future.add_done_callback(lambda _f, d=digest: self._done(d))
+
+    def _done(self, digest):
+        with self._lock:
+            self._pending.pop(digest, None)
+
+    def _process(self, digest):
+        spool = self._spool_path(digest)
+        photo_path, thumb_path = proof_paths(digest, self.root)
+        with open(spool, "rb") as f:
+            data = f.read()
+        try:
+            process_image(data, photo_path, thumb_path)
+            os.remove(spool)
+        except Exception as e:
+            # 無法解碼時保留原檔作為證明 (與舊版 save_proof_photo 相同)，不產生縮圖
+            print(f"圖片處理失敗: {e}")
+            os.makedirs(os.path.dirname(photo_path), exist_ok=True)
+            os.replace(spool, photo_path)
+        return photo_path
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline():
+    """
+    取得共用的照片處理管線 (第一次呼叫時建立並補處理暫存檔)
+
+    Returns:
+        PhotoPipeline
+    """
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = PhotoPipeline()
+            _pipeline.recover()
+        return _pipeline
+
+
+# ==========================================
+# 報表縮圖
+# ==========================================
+
+def thumbnail_path(photo_path, root=PROOF_DIR):
+    """
+    取得內容定址照片的縮圖路徑
+
+    Args:
+        photo_path (str): 送餐紀錄中的 photo_path
+        root (str): 照片根目錄
+
+    Returns:
+        str: 縮圖路徑；非內容定址的舊照片回傳 None
+    """
+    if not photo_path:
+        return None
+    digest = os.path.splitext(os.path.basename(photo_path))[0]
+    if len(digest) != 64 or os.path.normpath(photo_path) != os.path.normpath(proof_paths(digest, root)[0]):
+        return None
+    return proof_paths(digest, root)[1]
+
+
+def _data_uri(jpeg_bytes):
+    return "data:image/jpeg;base64," + base64.b64encode(jpeg_bytes).decode("ascii")
+
+
+@functools.lru_cache(maxsize=512)
+def _legacy_thumbnail_uri(photo_path, mtime):
+    # 舊照片沒有預先產生的縮圖：即時縮小並依 (路徑, 修改時間) 快取
+    image = Image.open(photo_path)
+    image.draft("RGB", (THUMB_SIZE, THUMB_SIZE))
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    image.thumbnail((THUMB_SIZE, THUMB_SIZE), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=THUMB_QUALITY)
+    return _data_uri(buffer.getvalue())
+
+
+def thumbnail_data_uri(photo_path, root=PROOF_DIR):
+    """
+    取得報表表格 (st.column_config.ImageColumn) 使用的縮圖 data URI
+
+    Args:
+        photo_path (str): 送餐紀錄中的 photo_path
+        root (str): 照片根目錄
+
+    Returns:
+        str: data:image/jpeg;base64,...；無照片、尚在處理中或無法讀取時回傳 None
+    """
+    if not photo_path:
+        return None
+    thumb = thumbnail_path(photo_path, root)
+    try:
+        if thumb:
+            if not os.path.exists(thumb):
+                return None
+            with open(thumb, "rb") as f:
+                return _data_uri(f.read())
+        if not os.path.exists(photo_path):
+            return None
+        return _legacy_thumbnail_uri(photo_path, os.path.getmtime(photo_path))
+    except Exception as e:
+        print(f"縮圖讀取失敗 ({photo_path}): {e}")
+        return None
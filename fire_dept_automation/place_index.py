@@ -0,0 +1,236 @@
+from collections import OrderedDict
+import pandas as pd
+import address_normalizer
+
+# ==========================================
+# 場所名稱索引
+# ==========================================
+# 列管資料載入後建立一次 (依場所名稱內容快取)，之後每次互動只查索引：
+#   - 正規化鍵：台/臺統一、去除空白
+#   - 字元 / 2-gram 倒排索引：快速找出包含查詢字串的場所
+#   - 3-gram 相似度排序：OCR 名稱無法直接對應時，列出最相近的候選場所
+#   - 地址標準鍵索引：名稱無法對應時，以地址找出同一場所
+
+PLACE_NAME_COLUMN = '場所名稱'
+ADDRESS_COLUMN = '場所地址'
+
+# 依名稱內容快取的索引數量 (預設資料 + 上傳檔案)
+_INDEX_CACHE_SIZE = 4
+_index_cache = OrderedDict()
+
+
+def normalize_place_name(name):
+    """
+    場所名稱正規化 (台/臺統一、去除空白)
+
+    Args:
+        name: 場所名稱
+
+    Returns:
+        str: 正規化後的名稱
+    """
+    if name is None:
+        return ""
+    return str(name).replace("台", "臺").replace(" ", "").replace("　", "")
+
+
+def _bigrams(key):
+    """字元 2-gram (單一字元的鍵以字元本身代表)"""
+    if len(key) < 2:
+        return {key} if key else set()
+    return {key[i:i + 2] for i in range(len(key) - 1)}
+
+
+def _trigrams(key):
+    """加上首尾標記的字元 3-gram"""
+    padded = f"^{key}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class PlaceIndex:
+    """
+    場所名稱索引
+
+    所有查詢回傳的列位置 (row position) 可直接用於 df.iloc。
+    """
+
+    def __init__(self, names, addresses=None):
+        """
+        Args:
+            names (list): 依列順序的場所名稱
+            addresses (list): 依列順序的場所地址 (選用)
+        """
+        self.names = [str(n) for n in names]
+        self._exact = {}      # 原始名稱 -> 第一個列位置
+        self._key_rows = {}   # 正規化鍵 -> 第一個列位置
+        for pos, name in enumerate(self.names):
+            self._exact.setdefault(name, pos)
+            self._key_rows.setdefault(normalize_place_name(name), pos)
+
+        # 以不重複的正規化鍵建立索引
+        self.keys = list(self._key_rows)
+        self._postings = {}
+        self._key_trigrams = []
+        for key_id, key in enumerate(self.keys):
+            # 單一字元也建立索引 (1 個字的查詢)
+            for gram in _bigrams(key) | set(key):
+                self._postings.setdefault(gram, []).append(key_id)
+            self._key_trigrams.append(_trigrams(key))
+
+        # 不重複的原始名稱 (側邊欄下拉選單)
+        self.unique_names = list(dict.fromkeys(self.names))
+        self._unique_keys = [normalize_place_name(n) for n in self.unique_names]
+
+        # 地址標準鍵 -> 列位置
+        self._address_index = address_normalizer.build_address_index(addresses if addresses is not None else [])
+
+    def __len__(self):
+        return len(self.names)
+
+    def _keys_containing(self, key):
+        """找出包含 key 的正規化鍵 (倒排索引取交集後驗證)"""
+        grams = _bigrams(key)
+        if not grams:
+            return list(range(len(self.keys)))
+        postings = sorted((self._postings.get(g, []) for g in grams), key=len)
+        if not postings[0]:
+            return []
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+        return [k for k in candidates if key in self.keys[k]]
+
+    def _keys_contained_in(self, key):
+        """找出為 key 子字串的正規化鍵 (列舉 key 的所有子字串查表，與列管筆數無關)"""
+        found = []
+        key_len = len(key)
+        seen = set()
+        for start in range(key_len + 1):
+            for end in range(start, key_len + 1):
+                sub = key[start:end]
+                if sub in seen:
+                    continue
+                seen.add(sub)
+                if sub in self._key_rows:
+                    found.append(sub)
+        return found
+
+    def match(self, ocr_name):
+        """
+        自動對應 OCR 場所名稱
+
+        規則與原本的逐列比對相同：先找完全相同的名稱，
+        否則取第一個 (依列順序) 正規化後互相包含的場所。
+
+        Args:
+            ocr_name (str): OCR 辨識的場所名稱
+
+        Returns:
+            int: 列位置；找不到時回傳 None
+        """
+        if not ocr_name:
+            return None
+        if ocr_name in self._exact:
+            return self._exact[ocr_name]
+
+        clean_ocr = normalize_place_name(ocr_name)
+        if not clean_ocr:
+            return None
+
+        rows = [self._key_rows[self.keys[k]] for k in self._keys_containing(clean_ocr)]
+        rows.extend(self._key_rows[sub] for sub in self._keys_contained_in(clean_ocr))
+        return min(rows) if rows else None
+
+    def match_address(self, address):
+        """
+        以地址標準鍵找出場所 (兩者都寫了鄉鎮時鄉鎮必須相同)
+
+        Args:
+            address (str): 地址 (通常為 OCR 場所地址)
+
+        Returns:
+            int: 第一個地址相同的列位置；找不到時回傳 None
+        """
+        rows = self._address_index.lookup(address)
+        return rows[0] if rows else None
+
+    def search(self, term):
+        """
+        側邊欄搜尋：名稱包含搜尋字串的場所 (忽略台/臺與空白差異)
+
+        Args:
+            term (str): 搜尋字串
+
+        Returns:
+            list: 不重複的場所名稱 (依列順序)
+        """
+        clean_term = normalize_place_name(term)
+        if not clean_term:
+            return list(self.unique_names)
+        matched = set(self.keys[k] for k in self._keys_containing(clean_term))
+        return [name for name, key in zip(self.unique_names, self._unique_keys) if key in matched]
+
+    def top_k(self, query, k=5, min_score=0.0):
+        """
+        依 3-gram 相似度 (Dice 係數) 排序候選場所
+
+        只計算與查詢至少共用一個 2-gram 的場所。
+
+        Args:
+            query (str): 查詢名稱 (通常為 OCR 場所名稱)
+            k (int): 回傳數量
+            min_score (float): 最低分數
+
+        Returns:
+            list: [(列位置, 場所名稱, 分數)]，分數由高到低
+        """
+        clean_query = normalize_place_name(query)
+        if not clean_query:
+            return []
+        candidates = set()
+        for gram in _bigrams(clean_query):
+            candidates.update(self._postings.get(gram, ()))
+
+        query_grams = _trigrams(clean_query)
+        scored = []
+        for key_id in candidates:
+            key_grams = self._key_trigrams[key_id]
+            score = 2 * len(query_grams & key_grams) / (len(query_grams) + len(key_grams))
+            if score >= min_score:
+                pos = self._key_rows[self.keys[key_id]]
+                scored.append((pos, self.names[pos], round(score, 3)))
+        scored.sort(key=lambda item: (-item[2], item[0]))
+        return scored[:k]
+
+
+def get_place_index(df, column=PLACE_NAME_COLUMN, address_column=ADDRESS_COLUMN):
+    """
+    取得列管資料的場所名稱索引 (同一份名稱與地址只建立一次)
+
+    Args:
+        df (pd.DataFrame): 列管資料
+        column (str): 場所名稱欄位
+        address_column (str): 場所地址欄位 (不存在時不建立地址索引)
+
+    Returns:
+        PlaceIndex: 索引；df 為 None 時回傳 None
+    """
+    if df is None or column not in df.columns:
+        return None
+    # 以名稱 (與地址) 欄位的內容雜湊 (向量化計算) 判斷是否為同一份資料
+    columns = [column] + ([address_column] if address_column in df.columns else [])
+    content_hash = pd.util.hash_pandas_object(df[columns], index=False).values.tobytes()
+    cache_key = (len(df), tuple(columns), hash(content_hash))
+    index = _index_cache.get(cache_key)
+    if index is not None:
+        _index_cache.move_to_end(cache_key)
+        return index
+
+    addresses = df[address_column].tolist() if address_column in df.columns else None
+    index = PlaceIndex(df[column].tolist(), addresses)
+    _index_cache[cache_key] = index
+    if len(_index_cache) > _INDEX_CACHE_SIZE:
+        _index_cache.popitem(last=False)
+    return index
@@ -0,0 +1,11 @@
+"""
+重建每日送餐彙總表 (delivery_daily_summary)
+
+平常由 db_manager 的寫入函式同步更新；直接修改資料庫、匯入歷史紀錄或懷疑彙總不一致時執行：
+    python rebuild_delivery_summary.py
+"""
+import db_manager
+
+if __name__ == "__main__":
+    db_manager.init_db()
+    db_manager.rebuild_delivery_daily_summary()
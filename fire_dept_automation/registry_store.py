@@ -0,0 +1,306 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+import datetime
+import pandas as pd
+import config_loader
+import file_hash
+
+# ==========================================
+# 列管場所資料快取 (Registry Store)
+# ==========================================
+# 列管場所 Excel (00. 列管場所資料.xls) 用 xlrd 解析一次要好幾秒。
+# 第一次讀取後把整張表轉存到 SQLite (registry_cache.db)，以來源檔的
+# mtime / 大小 / SHA-256 作為版本鍵：
+#   - mtime 與大小不變：直接從快取讀取 (記憶體映射，不需解析 Excel)
+#   - mtime 改變但內容雜湊相同 (例如複製、覆蓋同一份檔案)：只更新版本鍵
+#   - 內容改變：重新解析 Excel 並取代舊快取
+# 另外在同一個行程內保留一份 DataFrame，st.cache_data.clear() 不會影響它。
+# 上傳檔沒有路徑與 mtime，以內容雜湊為 key，只保留最近 MAX_UPLOAD_ENTRIES 份。
+# 快取資料庫位置：config.toml [ocr] registry_cache_dir > 列管資料 Excel 所在目錄 > 程式目錄
+# (不寫到目前工作目錄，從不同目錄啟動也會用到同一份快取)。
+
+REGISTRY_DB_NAME = "registry_cache.db"
+
+# 未設定資料目錄、且 Excel 所在目錄無法寫入 (或來源為上傳檔) 時使用
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 記憶體映射大小 (SQLite PRAGMA mmap_size)
+MMAP_SIZE = 256 * 1024 * 1024
+
+# 列管資料的標題列 (第 2 列)
+DEFAULT_HEADER_ROW = 1
+
+# 上傳檔以內容雜湊為 key，每次上傳新版本都會新增一筆；只保留最近幾份
+MAX_UPLOAD_ENTRIES = 3
+
+_memo = {}
+_memo_lock = threading.Lock()
+
+
+def default_db_path(source=None):
+    """
+    快取資料庫預設路徑
+
+    Args:
+        source: 列管資料檔案路徑 (str)；檔案物件或 None 時不參考來源位置
+
+    Returns:
+        str: 設定的資料目錄、Excel 所在目錄 (可寫入時) 或程式目錄下的 registry_cache.db
+    """
+    data_dir = config_loader.CONFIG.get("ocr", {}).get("registry_cache_dir")
+    if data_dir:
+        os.makedirs(data_dir, exist_ok=True)
+        return os.path.join(data_dir, REGISTRY_DB_NAME)
+    if isinstance(source, str):
+        source_dir = os.path.dirname(os.path.abspath(source))
+        if os.access(source_dir, os.W_OK):
+            return os.path.join(source_dir, REGISTRY_DB_NAME)
+    return os.path.join(APP_DIR, REGISTRY_DB_NAME)
+
+
+def get_connection(db_path=None):
+    """建立快取資料庫連線 (啟用記憶體映射)"""
+    conn = sqlite3.connect(db_path or default_db_path())
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS registry_sources (
+            source_key TEXT PRIMARY KEY,
+            mtime REAL,
+            size INTEGER,
+            sha256 TEXT NOT NULL,
+            table_name TEXT NOT NULL,
+            columns TEXT NOT NULL,
+            dtypes TEXT NOT NULL,
+            row_count INTEGER,
+            header_row INTEGER,
+            cached_at TEXT
+        )
+    ''')
+    return conn
+
+
+def clean_columns(df):
+    """清理欄位名稱 (去除前後空白、換行符號)"""
+    df.columns = df.columns.astype(str).str.strip().str.replace('\n', '').str.replace('\r', '')
+    return df
+
+
+def read_registry_excel(source, header=DEFAULT_HEADER_ROW):
+    """
+    解析列管資料 Excel (字串路徑使用複製策略以避免檔案鎖定)
+
+    Args:
+        source: 檔案路徑 (str) 或檔案物件 (UploadedFile)
+        header (int): 標題列
+
+    Returns:
+        pd.DataFrame: 已清理欄位名稱的資料
+    """
+    if not isinstance(source, str):
+        filename = getattr(source, 'name', '')
+        engine = 'xlrd' if filename.endswith('.xls') else None
+        return clean_columns(pd.read_excel(source, header=header, engine=engine))
+
+    temp_path = f"temp_system_data_{uuid.uuid4().hex[:8]}{os.path.splitext(source)[1]}"
+    try:
+        # 1. 複製檔案到暫存檔
+        shutil.copy2(source, temp_path)
+
+        # 2. 讀取暫存檔
+        engine = 'xlrd' if source.endswith('.xls') else None
+        return clean_columns(pd.read_excel(temp_path, header=header, engine=engine))
+    finally:
+        # 3. 刪除暫存檔
+        if os.path.exists(temp_path):
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass  # 刪除失敗不影響流程
+
+
+def _source_signature(source):
+    """
+    取得來源的版本資訊
+
+    Returns:
+        tuple: (source_key, mtime, size)；檔案物件沒有 mtime，以內容雜湊作為 key
+    """
+    if isinstance(source, str):
+        stat = os.stat(source)
+        return os.path.abspath(source), stat.st_mtime, stat.st_size
+    data = source.getvalue() if hasattr(source, 'getvalue') else source.read()
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return "upload:" + hashlib.sha256(data).hexdigest(), None, len(data)
+
+
+def _table_name(sha256, header):
+    return f"registry_rows_{sha256[:16]}_h{header}"
+
+
+def _write_cache(conn, source_key, mtime, size, sha256, header, df):
+    """將 DataFrame 寫入快取表並更新版本資訊"""
+    table_name = _table_name(sha256, header)
+    dtypes = {col: str(dtype) for col, dtype in df.dtypes.items()}
+
+    # 日期欄位以 ISO 字串儲存，讀回時還原
+    stored = df.copy()
+    for col, dtype in dtypes.items():
+        if dtype.startswith('datetime64'):
+            stored[col] = stored[col].dt.strftime('%Y-%m-%d %H:%M:%S')
+    stored.columns = [f"c{i}" for i in range(len(stored.columns))]
+    stored.to_sql(table_name, conn, if_exists='replace', index=False)
+
+    old = conn.execute("SELECT table_name FROM registry_sources WHERE source_key = ?", (source_key,)).fetchone()
+    conn.execute('''
+        INSERT OR REPLACE INTO registry_sources
+        (source_key, mtime, size, sha256, table_name, columns, dtypes, row_count, header_row, cached_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (source_key, mtime, size, sha256, table_name,
+          json.dumps(list(df.columns), ensure_ascii=False), json.dumps(dtypes, ensure_ascii=False),
+          len(df), header, datetime.datetime.now().isoformat()))
+
+    stale = [old['table_name']] if old and old['table_name'] != table_name else []
+    if source_key.startswith("upload:"):
+        stale += _evict_uploads(conn)
+    _drop_unused_tables(conn, stale)
+    conn.commit()
+
+
+def _evict_uploads(conn, keep=MAX_UPLOAD_ENTRIES):
+    """
+    刪除較舊的上傳檔版本資訊，只保留最近 keep 份
+
+    Returns:
+        list: 被刪除項目的資料表名稱
+    """
+    rows = conn.execute(
+        "SELECT source_key, table_name FROM registry_sources WHERE source_key LIKE 'upload:%' "
+        "ORDER BY cached_at DESC, rowid DESC LIMIT -1 OFFSET ?", (keep,)
+    ).fetchall()
+    conn.executemany("DELETE FROM registry_sources WHERE source_key = ?", [(row['source_key'],) for row in rows])
+    return [row['table_name'] for row in rows]
+
+
+def _drop_unused_tables(conn, table_names):
+    """刪除已無任何來源使用的快取表"""
+    for table_name in set(table_names):
+        in_use = conn.execute("SELECT 1 FROM registry_sources WHERE table_name = ?", (table_name,)).fetchone()
+        if not in_use:
+            conn.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+
+
+def _read_cache(conn, meta):
+    """從快取表讀回 DataFrame (還原欄位名稱與型別)"""
+    df = pd.read_sql_query(f'SELECT * FROM "{meta["table_name"]}"', conn)
+    columns = json.loads(meta['columns'])
+    dtypes = json.loads(meta['dtypes'])
+    df.columns = columns
+    for col, dtype in dtypes.items():
+        if dtype.startswith('datetime64'):
+            df[col] = pd.to_datetime(df[col])
+        elif dtype == 'bool':
+            df[col] = df[col].astype(bool)
+        elif dtype == 'object':
+            # SQLite NULL 讀回為 None，還原為 Excel 解析時的 NaN
+            df[col] = df[col].astype(object).where(df[col].notna(), float('nan'))
+    return df
+
+
+def _load_uncached(source, header, db_path, reader):
+    """檢查快取版本；必要時重新解析 Excel"""
+    source_key, mtime, size = _source_signature(source)
+    conn = get_connection(db_path)
+    try:
+        meta = conn.execute("SELECT * FROM registry_sources WHERE source_key = ?", (source_key,)).fetchone()
+        table_ok = meta is not None and meta['header_row'] == header and conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (meta['table_name'],)
+        ).fetchone() is not None
+
+        if table_ok and (mtime is None or (meta['mtime'] == mtime and meta['size'] == size)):
+            return _read_cache(conn, meta), (mtime, size)
+
+        sha256 = file_hash.file_sha256(source) if mtime is not None else source_key.split(":", 1)[1]
+        if table_ok and meta['sha256'] == sha256:
+            # 檔案被覆蓋但內容相同：只更新版本鍵
+            conn.execute("UPDATE registry_sources SET mtime = ?, size = ? WHERE source_key = ?",
+                         (mtime, size, source_key))
+            conn.commit()
+            return _read_cache(conn, meta), (mtime, size)
+
+        print(f"📥 解析列管資料 Excel 並建立快取: {source_key}")
+        df = reader(source, header=header)
+        _write_cache(conn, source_key, mtime, size, sha256, header, df)
+        return df, (mtime, size)
+    finally:
+        conn.close()
+
+
+def load_registry(source, header=DEFAULT_HEADER_ROW, db_path=None, reader=read_registry_excel):
+    """
+    讀取列管場所資料 (優先使用快取)
+
+    Args:
+        source: 檔案路徑 (str) 或檔案物件 (UploadedFile)
+        header (int): 標題列
+        db_path (str): 快取資料庫路徑 (None = default_db_path(source))
+        reader (callable): Excel 解析函式 reader(source, header=...)
+
+    Returns:
+        pd.DataFrame: 列管資料 (呼叫端可自由修改，不影響快取)
+    """
+    db_path = db_path or default_db_path(source)
+    if isinstance(source, str):
+        stat = os.stat(source)
+        memo_key = (os.path.abspath(source), header, db_path)
+        with _memo_lock:
+            cached = _memo.get(memo_key)
+        if cached and cached[0] == (stat.st_mtime, stat.st_size):
+            return cached[1].copy()
+    else:
+        memo_key = None
+
+    df, version = _load_uncached(source, header, db_path, reader)
+    if memo_key is not None:
+        with _memo_lock:
+            _memo[memo_key] = (version, df)
+        return df.copy()
+    return df
+
+
+def invalidate(source=None, db_path=None):
+    """
+    清除快取，下次讀取時重新解析 Excel
+
+    Args:
+        source (str): 檔案路徑 (None = 全部)
+        db_path (str): 快取資料庫路徑 (None = default_db_path(source))
+    """
+    db_path = db_path or default_db_path(source)
+    with _memo_lock:
+        if source is None:
+            _memo.clear()
+        else:
+            key = os.path.abspath(source)
+            for memo_key in [k for k in _memo if k[0] == key]:
+                del _memo[memo_key]
+
+    conn = get_connection(db_path)
+    try:
+        if source is None:
+            rows = conn.execute("SELECT table_name FROM registry_sources").fetchall()
+            conn.execute("DELETE FROM registry_sources")
+        else:
+            rows = conn.execute("SELECT table_name FROM registry_sources WHERE source_key = ?",
+                                (os.path.abspath(source),)).fetchall()
+            conn.execute("DELETE FROM registry_sources WHERE source_key = ?", (os.path.abspath(source),))
+        _drop_unused_tables(conn, [row['table_name'] for row in rows])
+        conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,156 @@
+import csv
+import io
+import os
+import tempfile
+import time
+import db_manager
+
+# Excel 匯出 (openpyxl write-only 模式，逐列寫入不保留整份工作表)
+try:
+    from openpyxl import Workbook
+    _openpyxl_available = True
+except ImportError:
+    Workbook = None
+    _openpyxl_available = False
+
+# ==========================================
+# 送餐報表串流匯出
+# ==========================================
+# 大範圍 (例如全縣一年) 的送餐紀錄不能一次載入記憶體再 to_csv()：
+#   - db_manager.iter_delivery_reports 以 cursor 分批讀取
+#   - 每批直接寫入暫存檔 (CSV 或 XLSX write-only)，記憶體只保留一批資料
+#   - 畫面表格改用 db_manager.get_delivery_reports_page 分頁查詢
+#   - 暫存檔集中在 EXPORT_DIR；使用者下載後不一定會再操作頁面，
+#     每次匯出前先刪除超過 EXPORT_TTL 的舊檔
+
+# 欄位順序與中文標題 (與頁面表格一致)
+REPORT_COLUMNS = [
+    ("date", "日期"),
+    ("route_name", "路線"),
+    ("elderly_name", "長者姓名"),
+    ("volunteer_id", "志工帳號"),
+    ("status", "狀態"),
+    ("abnormal_reason", "異常原因"),
+    ("notes", "備註"),
+    ("photo_path", "送達證明"),
+    ("delivery_time", "打卡時間"),
+]
+
+DEFAULT_CHUNK_SIZE = 1000
+
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "fire_dept_report_exports")
+EXPORT_TTL = 60 * 60  # 秒
+
+
+def _row_values(row):
+    return [row[key] for key, _ in REPORT_COLUMNS]
+
+
+def write_csv(chunks, stream):
+    """
+    將分批資料寫成 CSV (UTF-8 with BOM，Excel 可直接開啟中文)
+
+    Args:
+        chunks: 可迭代的資料批次 (每批為 sqlite3.Row / dict 的列表)
+        stream: 文字模式的檔案物件 (需以 newline="" 開啟)
+
+    Returns:
+        int: 寫入的資料筆數
+    """
+    writer = csv.writer(stream)
+    stream.write("\ufeff")
+    writer.writerow([label for _, label in REPORT_COLUMNS])
+    count = 0
+    for chunk in chunks:
+        writer.writerows(_row_values(row) for row in chunk)
+        count += len(chunk)
+    return count
+
+
+def write_xlsx(chunks, path, sheet_title="送餐紀錄"):
+    """
+    將分批資料寫成 Excel (write-only 模式)
+
+    Args:
+        chunks: 可迭代的資料批次
+        path (str): 輸出檔案路徑
+        sheet_title (str): 工作表名稱
+
+    Returns:
+        int: 寫入的資料筆數
+    """
+    if not _openpyxl_available:
+        raise ImportError("請安裝 openpyxl: pip install openpyxl")
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_title)
+    sheet.append([label for _, label in REPORT_COLUMNS])
+    count = 0
+    for chunk in chunks:
+        for row in chunk:
+            sheet.append(_row_values(row))
+        count += len(chunk)
+    workbook.save(path)
+    return count
+
+
+def cleanup_exports(export_dir=EXPORT_DIR, max_age=EXPORT_TTL, now=None):
+    """
+    刪除超過 max_age 秒的匯出暫存檔
+
+    Args:
+        export_dir (str): 匯出目錄
+        max_age (float): 保留秒數
+        now (float): 目前時間 (time.time())，測試用
+
+    Returns:
+        int: 刪除的檔案數
+    """
+    if not os.path.isdir(export_dir):
+        return 0
+    now = time.time() if now is None else now
+    removed = 0
+    for entry in os.scandir(export_dir):
+        try:
+            if entry.is_file() and now - entry.stat().st_mtime > max_age:
+                os.remove(entry.path)
+                removed += 1
+        except OSError:
+            pass  # 其他 session 已刪除或仍在使用
+    if removed:
+        print(f"🧹 刪除 {removed} 個過期的報表匯出檔")
+    return removed
+
+
+def export_delivery_report(start_date, end_date, fmt="csv", chunk_size=DEFAULT_CHUNK_SIZE, export_dir=EXPORT_DIR):
+    """
+    匯出送餐報表到暫存檔 (呼叫端可提早刪除；未刪除的檔案在 EXPORT_TTL 後的下一次匯出時清除)
+
+    Args:
+        start_date (str): 開始日期 YYYY-MM-DD
+        end_date (str): 結束日期 YYYY-MM-DD
+        fmt (str): "csv" 或 "xlsx"
+        chunk_size (int): 每批讀取筆數
+        export_dir (str): 暫存檔目錄
+
+    Returns:
+        tuple: (暫存檔路徑, 資料筆數)
+    """
+    if fmt not in ("csv", "xlsx"):
+        raise ValueError(f"不支援的匯出格式: {fmt}")
+    cleanup_exports(export_dir)
+    os.makedirs(export_dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="delivery_report_", suffix=f".{fmt}", dir=export_dir)
+    chunks = db_manager.iter_delivery_reports(start_date, end_date, chunk_size)
+    try:
+        if fmt == "csv":
+            with io.open(fd, "w", encoding="utf-8", newline="") as f:
+                count = write_csv(chunks, f)
+        else:
+            os.close(fd)
+            count = write_xlsx(chunks, path)
+    except Exception:
+        chunks.close()
+        os.remove(path)
+        raise
+    print(f"📥 送餐報表匯出 ({fmt}): {count} 筆")
+    return path, count
@@ -0,0 +1,234 @@
+import time
+import numpy as np
+import db_manager
+
+# ==========================================
+# 送餐路線順序最佳化
+# ==========================================
+# elderly_profiles 已有 gps_lat / gps_lon，依座標自動排出送餐順序：
+#   1. numpy 計算各站之間的大圓距離 (haversine) 矩陣
+#   2. 最近鄰居法 (nearest neighbour) 建立初始路徑
+#   3. 在時間預算內以 2-opt (反轉區段) 與 Or-opt (搬移 1~3 站) 反覆改善
+#   4. 寫回 elderly_profiles.sequence 與 delivery_routes.estimated_time
+# 路徑為「開放路徑」：志工送完最後一站不需返回。起點固定為目前順序的第一站
+# (通常是離廚房 / 取餐點最近的一戶)；沒有座標的站點保持原順序排在最後。
+
+EARTH_RADIUS_KM = 6371.0
+ROAD_FACTOR = 1.3            # 直線距離換算道路距離的係數
+AVERAGE_SPEED_KMH = 30.0     # 市區 / 鄉道平均車速
+STOP_SERVICE_MINUTES = 3     # 每站停車、交付餐點的時間
+DEFAULT_TIME_BUDGET = 1.0    # 每條路線的最佳化時間上限 (秒)
+OR_OPT_SEGMENT_LENGTHS = (1, 2, 3)
+_EPSILON = 1e-9
+
+
+def haversine_matrix(lats, lons):
+    """
+    計算各點之間的大圓距離矩陣
+
+    Args:
+        lats (array-like): 緯度 (度)
+        lons (array-like): 經度 (度)
+
+    Returns:
+        np.ndarray: n x n 距離矩陣 (公里)
+    """
+    lat = np.radians(np.asarray(lats, dtype=float))
+    lon = np.radians(np.asarray(lons, dtype=float))
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:, None]) * np.cos(lat[None, :]) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def path_length(order, dist):
+    """開放路徑的總距離"""
+    order = np.asarray(order)
+    if len(order) < 2:
+        return 0.0
+    return float(dist[order[:-1], order[1:]].sum())
+
+
+def nearest_neighbour(dist, start=0):
+    """
+    最近鄰居法建立初始路徑
+
+    Args:
+        dist (np.ndarray): 距離矩陣
+        start (int): 起點索引
+
+    Returns:
+        list: 站點索引順序
+    """
+    n = len(dist)
+    visited = np.zeros(n, dtype=bool)
+    order = [start]
+    visited[start] = True
+    for _ in range(n - 1):
+        row = np.where(visited, np.inf, dist[order[-1]])
+        nxt = int(np.argmin(row))
+        order.append(nxt)
+        visited[nxt] = True
+    return order
+
+
+def _two_opt_pass(order, dist, deadline):
+    """
+    2-opt：反轉 order[i..j] 區段 (起點固定)，對每個 i 以向量化方式找出最佳的 j
+
+    Returns:
+        bool: 本輪是否有改善
+    """
+    improved = False
+    n = len(order)
+    for i in range(1, n - 1):
+        if time.perf_counter() > deadline:
+            break
+        a, b = order[i - 1], order[i]
+        cs = order[i + 1:]
+        es = order[i + 2:]
+        delta = dist[a, cs] - dist[a, b]
+        delta[:-1] += dist[b, es] - dist[cs[:-1], es]
+        j = int(np.argmin(delta))
+        if delta[j] < -_EPSILON:
+            order[i:i + j + 2] = order[i:i + j + 2][::-1].copy()
+            improved = True
+    return improved
+
+
+def _or_opt_pass(order, dist, deadline):
+    """
+    Or-opt：將連續 1~3 站搬移到其他位置 (可反向插入)，對每個區段向量化評估所有插入點
+
+    Returns:
+        bool: 本輪是否有改善
+    """
+    improved = False
+    for length in OR_OPT_SEGMENT_LENGTHS:
+        i = 1
+        while i + length <= len(order):
+            if time.perf_counter() > deadline:
+                return improved
+            n = len(order)
+            prev, first, last = order[i - 1], order[i], order[i + length - 1]
+            has_next = i + length < n
+            nxt = order[i + length] if has_next else None
+
+            removal_gain = dist[prev, first]
+            if has_next:
+                removal_gain += dist[last, nxt] - dist[prev, nxt]
+
+            rest = np.concatenate([order[:i], order[i + length:]])
+            left, right = rest, rest[1:]
+            best_delta, best = -_EPSILON, None
+            for head, tail, reverse in ((first, last, False), (last, first, True)):
+                # 插入 rest[p] 與 rest[p + 1] 之間；最後一個位置為接在路徑末端
+                add = dist[left, head]
+                add[:-1] += dist[tail, right] - dist[left[:-1], right]
+                delta = add - removal_gain
+                delta[i - 1] = np.inf  # 原位置
+                p = int(np.argmin(delta))
+                if delta[p] < best_delta:
+                    best_delta, best = delta[p], (p, reverse)
+
+            if best is not None:
+                p, reverse = best
+                segment = order[i:i + length]
+                if reverse:
+                    segment = segment[::-1]
+                order[:] = np.concatenate([rest[:p + 1], segment, rest[p + 1:]])
+                improved = True
+            else:
+                i += 1
+    return improved
+
+
+def solve_route_order(dist, start=0, time_budget=DEFAULT_TIME_BUDGET):
+    """
+    求解開放路徑的站點順序 (起點固定)
+
+    Args:
+        dist (np.ndarray): 距離矩陣
+        start (int): 起點索引
+        time_budget (float): 區域搜尋時間上限 (秒)
+
+    Returns:
+        tuple: (站點索引順序 list, 總距離 float)
+    """
+    n = len(dist)
+    if n == 0:
+        return [], 0.0
+    order = np.array(nearest_neighbour(dist, start), dtype=np.intp)
+    deadline = time.perf_counter() + time_budget
+    while n > 3 and time.perf_counter() < deadline:
+        improved = _two_opt_pass(order, dist, deadline)
+        improved = _or_opt_pass(order, dist, deadline) or improved
+        if not improved:
+            break
+    return order.tolist(), path_length(order, dist)
+
+
+def estimate_minutes(distance_km, num_stops):
+    """
+    估計路線所需時間 (行車 + 每站停留)
+
+    Args:
+        distance_km (float): 直線路徑距離 (公里)
+        num_stops (int): 站數
+
+    Returns:
+        int: 分鐘
+    """
+    drive = distance_km * ROAD_FACTOR / AVERAGE_SPEED_KMH * 60
+    return int(round(drive + num_stops * STOP_SERVICE_MINUTES))
+
+
+def optimize_route(route_id, time_budget=DEFAULT_TIME_BUDGET, apply=True):
+    """
+    最佳化單一路線的送餐順序並寫回資料庫
+
+    Args:
+        route_id (int): 路線 ID
+        time_budget (float): 區域搜尋時間上限 (秒)
+        apply (bool): False 時只計算不寫入 (預覽用)
+
+    Returns:
+        dict: ordered_ids (新順序的長者 ID)、missing_gps (無座標的長者 ID)、
+              before_km / after_km (原順序與新順序的直線距離)、estimated_time (分鐘)
+    """
+    profiles = sorted(db_manager.get_elderly_by_route(route_id), key=lambda p: (p['sequence'] or 0, p['id']))
+    located = [p for p in profiles if p['gps_lat'] is not None and p['gps_lon'] is not None]
+    missing = [p['id'] for p in profiles if p['gps_lat'] is None or p['gps_lon'] is None]
+
+    if len(located) >= 2:
+        dist = haversine_matrix([p['gps_lat'] for p in located], [p['gps_lon'] for p in located])
+        order, after_km = solve_route_order(dist, 0, time_budget)
+        before_km = path_length(np.arange(len(located)), dist)
+    else:
+        order, before_km, after_km = list(range(len(located))), 0.0, 0.0
+
+    ordered_ids = [located[i]['id'] for i in order] + missing
+    estimated_time = estimate_minutes(after_km, len(ordered_ids))
+    if apply and ordered_ids:
+        db_manager.update_route_sequence(route_id, ordered_ids, estimated_time)
+    if missing:
+        print(f"⚠️ 路線 {route_id}: {len(missing)} 位長者沒有座標，排在最後")
+    print(f"🗺️ 路線 {route_id}: {before_km:.2f} km -> {after_km:.2f} km，預估 {estimated_time} 分鐘")
+
+    return {
+        'ordered_ids': ordered_ids,
+        'missing_gps': missing,
+        'before_km': before_km,
+        'after_km': after_km,
+        'estimated_time': estimated_time,
+    }
+
+
+def optimize_all_routes(time_budget=DEFAULT_TIME_BUDGET):
+    """
+    最佳化所有路線
+
+    Returns:
+        dict: route_id -> optimize_route 的結果
+    """
+    return {route['id']: optimize_route(route['id'], time_budget) for route in db_manager.get_all_routes()}
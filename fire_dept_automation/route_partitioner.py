@@ -0,0 +1,263 @@
+import math
+import numpy as np
+import db_manager
+import route_optimizer
+
+# ==========================================
+# 送餐路線自動分區 (容量限制 k-means)
+# ==========================================
+# 依長者 GPS 座標把啟用中的長者分配到各路線，並讓每條路線的站數接近：
+#   1. 經緯度投影為平面公里座標 (臺東範圍小，等距圓柱投影誤差可忽略)
+#   2. 以現有路線成員的中心點作為初始中心 (維持路線與區域的對應，減少異動)；
+#      沒有成員的路線以 k-means++ 補足
+#   3. 指派：依「最近與次近中心的距離差」由大到小，逐一指派給仍有容量的最近中心；
+#      站數低於下限的路線再向超過下限的路線補入「改派成本」最低的點
+#   4. 更新中心點，重複直到指派不再變動
+# 結果為建議異動清單 (diff)，由管理員確認後才寫回 elderly_profiles.route_id。
+# 沒有座標的長者維持原路線，並佔用該路線的容量 (每條路線的上下限扣除這些站)。
+
+KM_PER_DEG_LAT = 110.574
+KM_PER_DEG_LON = 111.320
+DEFAULT_SLACK = 0.1          # 每條路線可超過 / 低於平均站數的比例
+MAX_ITERATIONS = 30
+
+
+def project_km(lats, lons):
+    """
+    經緯度轉為平面座標 (公里)
+
+    Returns:
+        np.ndarray: n x 2 (x: 東西向, y: 南北向)
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    scale = math.cos(math.radians(float(lats.mean()))) if len(lats) else 1.0
+    return np.column_stack([lons * KM_PER_DEG_LON * scale, lats * KM_PER_DEG_LAT])
+
+
+def default_capacity(n, k, slack=DEFAULT_SLACK):
+    """每條路線的站數上限：平均站數加上 slack 比例 (四捨五入到小數 6 位避免浮點誤差進位)"""
+    return max(math.ceil(round(n / k * (1 + slack), 6)), 1)
+
+
+def default_minimum(n, k, slack=DEFAULT_SLACK):
+    """每條路線的站數下限：平均站數減去 slack 比例"""
+    return max(math.floor(round(n / k * (1 - slack), 6)), 0)
+
+
+def _squared_distances(points, centroids):
+    return ((points[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+
+
+def _kmeans_plus_plus(points, centroids, k, rng):
+    """以 k-means++ 補足中心點到 k 個"""
+    centroids = list(centroids)
+    if not centroids:
+        centroids.append(points[rng.integers(len(points))])
+    while len(centroids) < k:
+        d2 = _squared_distances(points, np.array(centroids)).min(axis=1)
+        total = d2.sum()
+        idx = rng.choice(len(points), p=d2 / total) if total > 0 else rng.integers(len(points))
+        centroids.append(points[idx])
+    return np.array(centroids, dtype=float)
+
+
+def _assign_with_capacity(points, centroids, capacity, minimum=None):
+    """
+    容量限制下的指派 (regret 貪婪法)，再補足站數下限
+
+    Returns:
+        np.ndarray: 每個點的分區編號
+    """
+    d2 = _squared_distances(points, centroids)
+    preference = np.argsort(d2, axis=1)
+    if d2.shape[1] > 1:
+        sorted_d2 = np.take_along_axis(d2, preference[:, :2], axis=1)
+        regret = sorted_d2[:, 1] - sorted_d2[:, 0]
+    else:
+        regret = np.zeros(len(points))
+    load = np.zeros(len(centroids), dtype=int)
+    labels = np.empty(len(points), dtype=int)
+    for idx in np.argsort(-regret, kind="stable"):
+        for c in preference[idx]:
+            if load[c] < capacity[c]:
+                labels[idx] = c
+                load[c] += 1
+                break
+    if minimum is not None:
+        _fill_to_minimum(d2, labels, load, minimum)
+    return labels
+
+
+def _fill_to_minimum(d2, labels, load, minimum):
+    """
+    補足站數下限 (就地修改 labels / load)
+
+    站數最少的分區先補，每次從仍超過下限的分區改派「距離增加最少」的點。
+    總站數不足以讓所有分區達到下限時，盡量補足。
+    """
+    rows = np.arange(len(labels))
+    for c in np.argsort(load - minimum, kind="stable"):
+        need = minimum[c] - load[c]
+        if need <= 0:
+            continue
+        candidates = np.flatnonzero((labels != c) & (load[labels] > minimum[labels]))
+        cost = d2[candidates, c] - d2[rows[candidates], labels[candidates]]
+        for idx in candidates[np.argsort(cost, kind="stable")]:
+            donor = labels[idx]
+            if load[donor] <= minimum[donor]:
+                continue
+            labels[idx] = c
+            load[donor] -= 1
+            load[c] += 1
+            need -= 1
+            if need == 0:
+                break
+
+
+def partition(points, k, capacity=None, minimum=None, init_centroids=None, max_iter=MAX_ITERATIONS, seed=0):
+    """
+    容量限制 k-means
+
+    Args:
+        points (np.ndarray): n x 2 平面座標
+        k (int): 分區數
+        capacity (int|array): 每區站數上限，預設為 default_capacity(n, k)
+        minimum (int|array): 每區站數下限 (不超過上限)，預設為 default_minimum(n, k)
+        init_centroids (np.ndarray): 初始中心點 (可少於 k 個，不足以 k-means++ 補足)
+        max_iter (int): 最多迭代次數
+        seed (int): 亂數種子
+
+    Returns:
+        tuple: (labels np.ndarray, centroids np.ndarray)
+    """
+    n = len(points)
+    if n == 0 or k <= 0:
+        return np.empty(0, dtype=int), np.empty((0, 2))
+    if capacity is None:
+        capacity = default_capacity(n, k)
+    capacity = np.broadcast_to(np.asarray(capacity, dtype=int), (k,))
+    if capacity.sum() < n:
+        raise ValueError(f"路線容量不足：{n} 位長者，總容量 {capacity.sum()}")
+    if minimum is None:
+        minimum = default_minimum(n, k)
+    minimum = np.minimum(np.broadcast_to(np.asarray(minimum, dtype=int), (k,)), capacity)
+
+    rng = np.random.default_rng(seed)
+    seeds = [] if init_centroids is None else [c for c in init_centroids if c is not None][:k]
+    centroids = _kmeans_plus_plus(points, seeds, k, rng)
+
+    labels = None
+    for _ in range(max_iter):
+        new_labels = _assign_with_capacity(points, centroids, capacity, minimum)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        counts = np.bincount(labels, minlength=k)
+        for axis in range(2):
+            sums = np.bincount(labels, weights=points[:, axis], minlength=k)
+            centroids[:, axis] = np.where(counts > 0, sums / np.maximum(counts, 1), centroids[:, axis])
+    return labels, centroids
+
+
+def estimate_route_minutes(lats, lons):
+    """以最近鄰居路徑估計單一路線所需時間 (分鐘)"""
+    if len(lats) < 2:
+        return route_optimizer.estimate_minutes(0.0, len(lats))
+    dist = route_optimizer.haversine_matrix(lats, lons)
+    length = route_optimizer.path_length(route_optimizer.nearest_neighbour(dist, 0), dist)
+    return route_optimizer.estimate_minutes(length, len(lats))
+
+
+def propose_routes(route_ids=None, slack=DEFAULT_SLACK, seed=0):
+    """
+    計算建議的路線分配
+
+    Args:
+        route_ids (list): 參與分配的路線 ID，預設為所有路線
+        slack (float): 每條路線可超過 / 低於平均站數的比例
+        seed (int): 亂數種子
+
+    Returns:
+        dict: changes (異動清單：elderly_id / name / address / current_route_id / proposed_route_id)、
+              summary (每條路線：route_id / route_name / stops_before / stops_after /
+                       minutes_before / minutes_after / pinned)、missing_gps (無座標的長者 ID)
+        stops_* 與 minutes_* 只計有座標的長者；pinned 為留在原路線的無座標長者數
+    """
+    routes = {r['id']: r for r in db_manager.get_all_routes()}
+    if route_ids is None:
+        route_ids = list(routes)
+    route_ids = [rid for rid in route_ids if rid in routes]
+    if not route_ids:
+        return {'changes': [], 'summary': [], 'missing_gps': []}
+
+    profiles = [p for p in db_manager.get_all_elderly()
+                if p['route_id'] in route_ids or p['route_id'] is None]
+    located = [p for p in profiles if p['gps_lat'] is not None and p['gps_lon'] is not None]
+    missing = [p['id'] for p in profiles if p['gps_lat'] is None or p['gps_lon'] is None]
+
+    lats = np.array([p['gps_lat'] for p in located], dtype=float)
+    lons = np.array([p['gps_lon'] for p in located], dtype=float)
+    current = np.array([route_ids.index(p['route_id']) if p['route_id'] in route_ids else -1 for p in located])
+    points = project_km(lats, lons)
+
+    # 無座標的長者留在原路線：以全部站數計算上下限，再扣除各路線留下的站數
+    pinned = np.zeros(len(route_ids), dtype=int)
+    for p in profiles:
+        if (p['gps_lat'] is None or p['gps_lon'] is None) and p['route_id'] in route_ids:
+            pinned[route_ids.index(p['route_id'])] += 1
+    total = len(located) + int(pinned.sum())
+    route_capacity = np.maximum(default_capacity(total, len(route_ids), slack) - pinned, 0)
+    route_minimum = np.maximum(default_minimum(total, len(route_ids), slack) - pinned, 0)
+
+    # 現有路線成員的中心點作為初始中心 (沒有成員的路線以 k-means++ 補足)
+    init = [points[current == i].mean(axis=0) for i in range(len(route_ids)) if (current == i).any()]
+    seeded = [i for i in range(len(route_ids)) if (current == i).any()]
+    # partition 的前 len(seeded) 個中心對應到有成員的路線，其餘依序對應空路線
+    cluster_to_route = seeded + [i for i in range(len(route_ids)) if i not in seeded]
+    labels, _ = partition(points, len(route_ids), init_centroids=init, seed=seed,
+                          capacity=route_capacity[cluster_to_route], minimum=route_minimum[cluster_to_route])
+    proposed = np.array([cluster_to_route[label] for label in labels], dtype=int)
+
+    changes = [
+        {
+            'elderly_id': p['id'],
+            'name': p['name'],
+            'address': p['address'],
+            'current_route_id': p['route_id'],
+            'proposed_route_id': route_ids[proposed[i]],
+        }
+        for i, p in enumerate(located) if current[i] != proposed[i]
+    ]
+
+    summary = []
+    for i, rid in enumerate(route_ids):
+        before, after = current == i, proposed == i
+        summary.append({
+            'route_id': rid,
+            'route_name': routes[rid]['route_name'],
+            'stops_before': int(before.sum()),
+            'stops_after': int(after.sum()),
+            'minutes_before': estimate_route_minutes(lats[before], lons[before]),
+            'minutes_after': estimate_route_minutes(lats[after], lons[after]),
+            'pinned': int(pinned[i]),
+        })
+    print(f"🧭 路線分區：{len(located)} 位長者 / {len(route_ids)} 條路線，建議異動 {len(changes)} 位")
+    return {'changes': changes, 'summary': summary, 'missing_gps': missing}
+
+
+def apply_route_changes(changes, reoptimize=True):
+    """
+    寫回路線分配，並重新最佳化受影響路線的送餐順序
+
+    Args:
+        changes (list): propose_routes 的異動清單
+        reoptimize (bool): 是否重新計算受影響路線的順序與預估時間
+    """
+    if not changes:
+        return
+    db_manager.update_elderly_routes({c['elderly_id']: c['proposed_route_id'] for c in changes})
+    if reoptimize:
+        affected = {c['proposed_route_id'] for c in changes} | {c['current_route_id'] for c in changes}
+        for route_id in sorted(rid for rid in affected if rid is not None):
+            route_optimizer.optimize_route(route_id)
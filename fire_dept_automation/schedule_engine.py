@@ -0,0 +1,131 @@
+import datetime
+import db_manager
+
+# ==========================================
+# 固定排班產生器
+# ==========================================
+# 各路線的排班規則 (route_schedules)：送餐的星期、國定假日是否停送、預設志工。
+# generate_tasks() 將規則展開為 horizon 天內的 daily_tasks：
+#   - 日期清單只建立一次，每條路線以星期篩選 (不逐日查詢資料庫)
+#   - db_manager.insert_daily_tasks 以 executemany 分批寫入
+#   - daily_tasks 有 UNIQUE(date, route_id)，重複執行只補上缺少的任務，
+#     已認領 / 釋出 / 打卡的任務不受影響
+
+WEEKDAY_LABELS = ["一", "二", "三", "四", "五", "六", "日"]
+DEFAULT_WEEKDAYS = (0, 1, 2, 3, 4)
+DEFAULT_HORIZON_DAYS = 90
+
+
+def parse_weekdays(text):
+    """
+    解析排班規則中的星期欄位
+
+    Args:
+        text (str): 逗號分隔的星期 (週一 = 0 ... 週日 = 6)，例如 "0,2,4"
+
+    Returns:
+        frozenset: 星期集合；空白時回傳空集合
+    """
+    if not text:
+        return frozenset()
+    weekdays = frozenset(int(part) for part in str(text).split(",") if part.strip())
+    if any(day < 0 or day > 6 for day in weekdays):
+        raise ValueError(f"星期需介於 0 (週一) 與 6 (週日): {text}")
+    return weekdays
+
+
+def format_weekdays(weekdays):
+    """星期集合轉為儲存格式 "0,2,4" """
+    return ",".join(str(day) for day in sorted(set(weekdays)))
+
+
+def expand_rules(rules, start_date, end_date, holidays=()):
+    """
+    將排班規則展開為每日任務 (不存取資料庫)
+
+    Args:
+        rules (list): 排班規則，每筆需有 route_id / weekdays / skip_holidays / default_volunteer
+        start_date (datetime.date): 開始日期 (含)
+        end_date (datetime.date): 結束日期 (含)
+        holidays (iterable): 停送日期 YYYY-MM-DD
+
+    Returns:
+        list: (date, route_id, assigned_volunteer)，依路線、日期排序
+    """
+    holidays = set(holidays)
+    days = []
+    day = start_date
+    while day <= end_date:
+        date_str = day.strftime("%Y-%m-%d")
+        days.append((date_str, day.weekday(), date_str in holidays))
+        day += datetime.timedelta(days=1)
+
+    tasks = []
+    for rule in rules:
+        weekdays = rule['weekdays']
+        if isinstance(weekdays, str):
+            weekdays = parse_weekdays(weekdays)
+        skip_holidays = bool(rule['skip_holidays'])
+        route_id, volunteer = rule['route_id'], rule['default_volunteer']
+        tasks.extend((date_str, route_id, volunteer)
+                     for date_str, weekday, is_holiday in days
+                     if weekday in weekdays and not (skip_holidays and is_holiday))
+    return tasks
+
+
+def generate_tasks(start_date=None, horizon_days=DEFAULT_HORIZON_DAYS, route_ids=None):
+    """
+    依排班規則產生 start_date 起 horizon_days 天的每日任務
+
+    Args:
+        start_date (datetime.date): 開始日期，預設今天
+        horizon_days (int): 產生天數
+        route_ids (list): 只產生指定路線，None 表示所有啟用中的規則
+
+    Returns:
+        dict: {'planned': 規則展開的任務數, 'created': 實際新增數, 'start': 開始日期, 'end': 結束日期}
+              寫入失敗時回傳 None
+    """
+    start_date = start_date or datetime.date.today()
+    end_date = start_date + datetime.timedelta(days=horizon_days - 1)
+    start_str, end_str = start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+
+    rules = db_manager.get_route_schedules()
+    if route_ids is not None:
+        route_ids = set(route_ids)
+        rules = [rule for rule in rules if rule['route_id'] in route_ids]
+    holidays = db_manager.get_holidays(start_str, end_str)
+
+    tasks = expand_rules(rules, start_date, end_date, holidays)
+    created = db_manager.insert_daily_tasks(tasks)
+    if created is None:
+        return None
+    print(f"📅 排班產生 {start_str} ~ {end_str}: {len(rules)} 條路線，新增 {created} / {len(tasks)} 筆任務")
+    return {'planned': len(tasks), 'created': created, 'start': start_str, 'end': end_str}
+
+
+def parse_holiday_lines(text):
+    """
+    解析假日匯入文字 (每行「YYYY-MM-DD 名稱」，也接受逗號分隔與 YYYY/MM/DD、YYYYMMDD)
+
+    Args:
+        text (str): 多行文字
+
+    Returns:
+        list: (date, name)；無法解析的行略過
+    """
+    holidays = []
+    for line in text.splitlines():
+        parts = line.replace(",", " ").split(None, 1)
+        if not parts:
+            continue
+        raw = parts[0].replace("/", "-")
+        for fmt in ("%Y-%m-%d", "%Y%m%d"):
+            try:
+                date = datetime.datetime.strptime(raw, fmt).strftime("%Y-%m-%d")
+                break
+            except ValueError:
+                date = None
+        if date:
+            holidays.append((date, parts[1].strip() if len(parts) > 1 else ""))
+    return holidays
@@ -0,0 +1,212 @@
+"""
+OCR 欄位解析器效能測試 (micro-benchmark)
+
+比較舊版逐行 `in` + re.search 解析與共用解析器 (ocr_parser) 的速度，
+並確認兩者輸出一致。
+
+語料：ocr_system/test_ocr_result.json 的實際 OCR 頁面 + 合成的申報書頁面。
+
+執行方式：
+    python tests/bench_ocr_parser.py
+    python tests/bench_ocr_parser.py --repeat 200
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import ocr_parser
+
+# utils.VALID_EQUIPMENT_LIST (不匯入 utils 以免需要 streamlit)
+EQUIPMENT_LIST = sorted([
+    "滅火器", "室內消防栓設備", "室外消防栓設備", "自動撒水設備", "水霧滅火設備",
+    "泡沫滅火設備", "二氧化碳滅火設備", "乾粉滅火設備", "海龍滅火設備(含海龍替代品)",
+    "火警自動警報設備", "瓦斯漏氣火警自動警報設備", "緊急廣播設備", "標示設備",
+    "避難器具", "緊急照明設備", "連結送水管", "消防專用蓄水池", "排煙設備",
+    "無線電通信輔助設備",
+], key=len, reverse=True)
+
+
+# ==========================================
+# 舊版解析器 (重構前的 utils.extract_info_from_ocr，作為比較基準)
+# ==========================================
+def legacy_normalize_equipment_str(text):
+    if not text or not isinstance(text, str):
+        return ""
+    clean_text = text.replace(" ", "").replace("　", "").replace("\n", "")
+    return "、".join(item for item in EQUIPMENT_LIST if item in clean_text)
+
+
+def legacy_extract_info_from_ocr(text, pages_text_list=None):
+    info = {}
+    if text:
+        for line in text.split('\n'):
+            clean_line = line.replace(" ", "").replace("　", "").strip()
+            if not clean_line:
+                continue
+            if "管理權人" in clean_line:
+                match = re.search(r"管理權人[:：|](.*)", clean_line)
+                if match and "通訊處" not in match.group(1):
+                    info['管理權人'] = match.group(1)
+            if "姓名" in clean_line and "檢修人員" not in clean_line and "管理權人" not in info:
+                match = re.search(r"姓名[:：|](.*)", clean_line)
+                if match:
+                    info['管理權人'] = match.group(1).split("身分證")[0]
+            if "地址" in clean_line:
+                if "場所地址" in clean_line:
+                    match = re.search(r"場所地址[:：|](.*)", clean_line)
+                    if match:
+                        info['場所地址'] = match.group(1)
+                elif '場所地址' not in info:
+                    match = re.search(r"地址[:：|](.*)", clean_line)
+                    if match:
+                        info['場所地址'] = match.group(1)
+            if "電話" in clean_line and '場所電話' not in info:
+                match = re.search(r"電話[:：|]([\d\-\(\)\s]+)", clean_line)
+                if match:
+                    val = match.group(1).strip()
+                    if any(char.isdigit() for char in val):
+                        info['場所電話'] = val
+            if "場所名稱" in clean_line:
+                match = re.search(r"場所名稱[:：|](.*)", clean_line)
+                if match:
+                    info['場所名稱'] = match.group(1)
+            if not pages_text_list:
+                if "申報項目" in clean_line or "檢修項目" in clean_line:
+                    match = re.search(r"(申報項目|檢修項目)[:：|](.*)", clean_line)
+                    if match:
+                        info['消防設備種類'] = legacy_normalize_equipment_str(match.group(2))
+
+    if pages_text_list and isinstance(pages_text_list, list):
+        target_page_text = None
+        for page_text in pages_text_list:
+            if "消防安全設備檢修申報書目錄" in page_text.replace(" ", ""):
+                target_page_text = page_text
+                break
+        if not target_page_text and len(pages_text_list) > 1:
+            target_page_text = pages_text_list[1]
+        if target_page_text:
+            checked_equipment = []
+            checked_markers = ['✓', '☑', 'v', 'V', '√', '✔', '☒', '▣', '■', '●', '✅']
+            unchecked_markers = ['☐', '□', '▢', '▫', '▪']
+            for line in target_page_text.split('\n'):
+                if any(unchecked in line for unchecked in unchecked_markers):
+                    continue
+                if any(marker in line for marker in checked_markers):
+                    clean_line = line.replace(" ", "").replace("　", "")
+                    for equipment in EQUIPMENT_LIST:
+                        if equipment in clean_line or equipment.replace("設備", "") in clean_line:
+                            if equipment not in checked_equipment:
+                                checked_equipment.append(equipment)
+                                break
+            if checked_equipment:
+                info['消防設備種類'] = "、".join(checked_equipment)
+    return info
+
+
+# ==========================================
+# 語料
+# ==========================================
+def load_sample_pages():
+    """讀取實際 OCR 結果 (ocr_system/test_ocr_result.json)"""
+    path = os.path.join(project_root, "ocr_system", "test_ocr_result.json")
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return ["\n".join(page["ocr_result"]["lines"]) for page in data]
+
+
+def make_synthetic_document(rng):
+    """產生一份合成的申報書 (封面 + 目錄頁 + 檢查表頁)"""
+    name = rng.choice(["嘉音小吃店", "鳳仙旅社", "知本溫泉飯店", "臺東轉運站", "長濱國小"])
+    cover = "\n".join([
+        "《消防安全設備檢修申報書》",
+        f"場 所 名 稱：{name}",
+        f"場所地址：臺東縣臺東市中華路{rng.randint(1, 3)}段{rng.randint(1, 500)}號",
+        f"管理權人：{rng.choice(['邱金蘭', '王大明', '陳美麗'])}",
+        f"電話：(089) {rng.randint(300000, 399999)}",
+        "檢修人員姓名：吳萬居",
+        "地址：台東市長安街92號",
+        "電話：089-339916",
+    ] + ["雜訊文字" * rng.randint(1, 5) for _ in range(20)])
+
+    toc_lines = ["消防安全設備檢修申報書目錄", "一、消防安全設備檢修申報表 1-1", "二、消防安全設備檢查表"]
+    for i, item in enumerate(EQUIPMENT_LIST):
+        marker = rng.choice(["☑", "□", "✓", ""])
+        toc_lines.append(f"{marker} {item}檢查表 2-{i + 1}")
+    toc = "\n".join(toc_lines)
+
+    checklist = "\n".join(
+        f"{rng.choice(EQUIPMENT_LIST)} 外觀檢查 {'合格' if rng.random() > 0.2 else '不合格'} 備註 {'x' * rng.randint(5, 40)}"
+        for _ in range(60)
+    )
+    return [cover, toc, checklist, checklist]
+
+
+def build_corpus(seed=0, synthetic_docs=50):
+    rng = random.Random(seed)
+    corpus = []
+    sample = load_sample_pages()
+    if sample:
+        corpus.append(sample)
+    for _ in range(synthetic_docs):
+        corpus.append(make_synthetic_document(rng))
+    return corpus
+
+
+# ==========================================
+# 執行
+# ==========================================
+def run_once(func, corpus):
+    for pages in corpus:
+        func(pages[0], pages)
+        func(pages[0], None)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="OCR 欄位解析器效能測試")
+    arg_parser.add_argument("--repeat", type=int, default=50)
+    arg_parser.add_argument("--docs", type=int, default=50)
+    args = arg_parser.parse_args()
+
+    corpus = build_corpus(synthetic_docs=args.docs)
+    pages_count = sum(len(pages) for pages in corpus)
+
+    def new_parser(text, pages):
+        return ocr_parser.extract_info_from_ocr(text, pages, equipment_list=EQUIPMENT_LIST)
+
+    # 1. 輸出一致性
+    mismatches = 0
+    for pages in corpus:
+        for pages_arg in (pages, None):
+            if legacy_extract_info_from_ocr(pages[0], pages_arg) != new_parser(pages[0], pages_arg):
+                mismatches += 1
+    print(f"📄 語料: {len(corpus)} 份文件 / {pages_count} 頁")
+    print(f"{'✅' if mismatches == 0 else '❌'} 輸出不一致: {mismatches}")
+
+    # 2. 速度 (取 5 輪中最快的一輪，降低其他程式干擾)
+    run_once(new_parser, corpus)  # 預先建立解析器
+    for label, func in [("舊版 (逐行 in + re.search)", legacy_extract_info_from_ocr),
+                        ("ocr_parser (整頁標籤 regex)", new_parser)]:
+        rounds = []
+        for _ in range(5):
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                run_once(func, corpus)
+            rounds.append(time.perf_counter() - start)
+        elapsed = min(rounds)
+        per_doc = elapsed / (args.repeat * len(corpus) * 2) * 1e6
+        print(f"⏱️ {label}: {elapsed:.3f}s ({per_doc:.1f} µs/份)")
+
+
+if __name__ == "__main__":
+    main()
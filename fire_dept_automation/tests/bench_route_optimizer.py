@@ -0,0 +1,77 @@
+"""
+送餐路線順序最佳化效能測試 (benchmark)
+
+以合成路線 (50 ~ 200 站，散布於臺東市區 / 郊區) 比較：
+  - 原始順序 (模擬依建檔 ID 排列)
+  - 最近鄰居法
+  - 最近鄰居法 + 2-opt / Or-opt (route_optimizer.solve_route_order)
+的路徑長度、預估時間與計算時間。
+
+執行方式：
+    python tests/bench_route_optimizer.py
+    python tests/bench_route_optimizer.py --sizes 50 100 200 --budget 1.0 --seeds 5
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import route_optimizer
+
+# 臺東市區中心與郊區聚落 (緯度, 經度, 標準差)
+CLUSTERS = [
+    (22.7583, 121.1444, 0.010),   # 市區
+    (22.7950, 121.1200, 0.006),   # 馬蘭 / 豐里
+    (22.7200, 121.0950, 0.006),   # 知本方向
+    (22.8300, 121.1700, 0.008),   # 北方郊區
+]
+
+
+def make_route(n, seed):
+    """產生 n 站的合成路線"""
+    rng = np.random.default_rng(seed)
+    which = rng.integers(0, len(CLUSTERS), n)
+    lats = np.array([CLUSTERS[k][0] for k in which]) + rng.normal(0, 1, n) * np.array([CLUSTERS[k][2] for k in which])
+    lons = np.array([CLUSTERS[k][1] for k in which]) + rng.normal(0, 1, n) * np.array([CLUSTERS[k][2] for k in which])
+    return lats, lons
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="送餐路線最佳化效能測試")
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[50, 100, 150, 200])
+    arg_parser.add_argument("--budget", type=float, default=route_optimizer.DEFAULT_TIME_BUDGET)
+    arg_parser.add_argument("--seeds", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    print(f"⏱️ 時間預算: {args.budget:.1f}s / 路線，每種站數 {args.seeds} 條路線")
+    print(f"{'站數':>4} | {'原始 km':>8} | {'最近鄰居 km':>10} | {'最佳化 km':>9} | {'改善':>6} | "
+          f"{'預估分鐘':>8} | {'矩陣 ms':>7} | {'求解 s':>6}")
+    for n in args.sizes:
+        stats = []
+        for seed in range(args.seeds):
+            lats, lons = make_route(n, seed)
+            start = time.perf_counter()
+            dist = route_optimizer.haversine_matrix(lats, lons)
+            matrix_ms = (time.perf_counter() - start) * 1000
+
+            original = route_optimizer.path_length(np.arange(n), dist)
+            nn = route_optimizer.path_length(route_optimizer.nearest_neighbour(dist, 0), dist)
+            start = time.perf_counter()
+            _, optimized = route_optimizer.solve_route_order(dist, 0, args.budget)
+            solve_s = time.perf_counter() - start
+            stats.append((original, nn, optimized, matrix_ms, solve_s))
+
+        original, nn, optimized, matrix_ms, solve_s = np.mean(stats, axis=0)
+        minutes = route_optimizer.estimate_minutes(optimized, n)
+        print(f"{n:>4} | {original:>8.1f} | {nn:>10.1f} | {optimized:>9.1f} | {1 - optimized / original:>6.1%} | "
+              f"{minutes:>8} | {matrix_ms:>7.2f} | {solve_s:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
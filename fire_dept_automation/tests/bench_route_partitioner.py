@@ -0,0 +1,51 @@
+"""
+送餐路線自動分區效能測試 (benchmark)
+
+以均勻散布於臺東市區的合成長者座標，量測 route_partitioner.partition
+在不同長者數 / 路線數下的計算時間與各路線站數範圍。
+
+執行方式：
+    python tests/bench_route_partitioner.py
+    python tests/bench_route_partitioner.py --sizes 1000 5000 --routes 20 25 --seeds 5
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import route_partitioner
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="送餐路線自動分區效能測試")
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000])
+    arg_parser.add_argument("--routes", type=int, nargs="+", default=[20, 25])
+    arg_parser.add_argument("--seeds", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    print(f"{'長者數':>6} | {'路線數':>6} | {'下限':>4} | {'上限':>4} | {'最少站':>6} | {'最多站':>6} | {'耗時 s':>6}")
+    for n in args.sizes:
+        for k in args.routes:
+            stats = []
+            for seed in range(args.seeds):
+                rng = np.random.default_rng(seed)
+                lats = 22.75 + rng.random(n) * 0.15
+                lons = 121.05 + rng.random(n) * 0.15
+                start = time.perf_counter()
+                labels, _ = route_partitioner.partition(route_partitioner.project_km(lats, lons), k, seed=seed)
+                elapsed = time.perf_counter() - start
+                counts = np.bincount(labels, minlength=k)
+                stats.append((counts.min(), counts.max(), elapsed))
+            low, high, elapsed = np.min([s[0] for s in stats]), np.max([s[1] for s in stats]), np.mean([s[2] for s in stats])
+            print(f"{n:>6} | {k:>6} | {route_partitioner.default_minimum(n, k):>4} | "
+                  f"{route_partitioner.default_capacity(n, k):>4} | {low:>6} | {high:>6} | {elapsed:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
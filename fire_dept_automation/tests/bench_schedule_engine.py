@@ -0,0 +1,69 @@
+"""
+固定排班產生器效能測試 (benchmark)
+
+在暫存資料庫建立 N 條路線 (週一至週六出車)，量測 schedule_engine.generate_tasks
+產生一段期間任務的時間，以及重複產生 (全部已存在) 的時間。
+
+執行方式：
+    python tests/bench_schedule_engine.py
+    python tests/bench_schedule_engine.py --routes 300 500 --days 365
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import db_manager
+import schedule_engine
+from temp_db import reset_meal_tables
+
+START = datetime.date(2030, 1, 7)
+
+
+def create_routes(n):
+    """建立 n 條週一至週六出車的路線"""
+    conn = db_manager.get_connection()
+    c = conn.cursor()
+    for i in range(n):
+        c.execute("INSERT INTO delivery_routes (route_name) VALUES (?)", (f"路線{i}",))
+        c.execute("INSERT INTO route_schedules (route_id, weekdays) VALUES (?, '0,1,2,3,4,5')", (c.lastrowid,))
+    conn.commit()
+    conn.close()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="固定排班產生器效能測試")
+    arg_parser.add_argument("--routes", type=int, nargs="+", default=[100, 300])
+    arg_parser.add_argument("--days", type=int, default=365)
+    args = arg_parser.parse_args()
+
+    temp_dir = tempfile.mkdtemp()
+    db_manager.DB_NAME = os.path.join(temp_dir, "bench_schedule.db")
+    db_manager.init_db()
+    try:
+        print(f"📅 {START} 起 {args.days} 天")
+        print(f"{'路線數':>6} | {'新增任務':>8} | {'產生 s':>6} | {'重複產生 s':>10}")
+        for n in args.routes:
+            reset_meal_tables()
+            create_routes(n)
+            start = time.perf_counter()
+            result = schedule_engine.generate_tasks(START, args.days)
+            first_s = time.perf_counter() - start
+            start = time.perf_counter()
+            schedule_engine.generate_tasks(START, args.days)
+            again_s = time.perf_counter() - start
+            print(f"{n:>6} | {result['created']:>8} | {first_s:>6.2f} | {again_s:>10.2f}")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+測試用暫存資料庫
+各測試檔共用：將 db_manager.DB_NAME 換成暫存目錄中的資料庫，並在每個測試前清空送餐資料表
+"""
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+
+# 設定路徑以便導入模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import db_manager
+
+# 送餐相關資料表 (子表在前，依序刪除不違反外鍵)
+MEAL_TABLES = (
+    'delivery_daily_summary', 'delivery_records', 'daily_tasks', 'route_schedules', 'holidays',
+    'elderly_profiles', 'delivery_routes', 'geocode_cache',
+)
+
+
+def reset_meal_tables(tables=MEAL_TABLES):
+    """清空送餐資料表 (含 init_db 載入的種子資料)"""
+    conn = db_manager.get_connection()
+    for table in tables:
+        conn.execute(f"DELETE FROM {table}")
+    conn.commit()
+    conn.close()
+
+
+class TempDBTestCase(unittest.TestCase):
+    """
+    使用暫存資料庫的測試基底類別
+
+    子類別可覆寫：
+        DB_FILE (str): 暫存資料庫檔名
+        RESET_MEAL_TABLES (bool): 每個測試前是否清空送餐資料表
+    覆寫 setUp / setUpClass 時請先呼叫 super()。
+    """
+    DB_FILE = "test.db"
+    RESET_MEAL_TABLES = True
+
+    @classmethod
+    def setUpClass(cls):
+        """使用暫存資料庫"""
+        cls.original_db = db_manager.DB_NAME
+        cls.temp_dir = tempfile.mkdtemp()
+        db_manager.DB_NAME = os.path.join(cls.temp_dir, cls.DB_FILE)
+        db_manager.init_db()
+
+    @classmethod
+    def tearDownClass(cls):
+        db_manager.DB_NAME = cls.original_db
+        shutil.rmtree(cls.temp_dir, ignore_errors=True)
+
+    def setUp(self):
+        if self.RESET_MEAL_TABLES:
+            reset_meal_tables()
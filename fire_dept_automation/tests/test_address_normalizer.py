@@ -0,0 +1,114 @@
+"""
+地址正規化測試
+測試範圍：國字數字轉換、縣市鄉鎮處理、結構化拆解、地址比對、地址索引、跨鄉鎮同名道路
+"""
+import unittest
+import sys
+import os
+
+# 設定路徑以便導入模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import pandas as pd
+import address_normalizer
+import place_index
+
+
+class TestAddressNormalizer(unittest.TestCase):
+
+    def test_1_chinese_numerals(self):
+        """測試 1: 國字數字與全形數字轉換"""
+        print("\n🧪 測試 1: 數字轉換...")
+        self.assertEqual(address_normalizer.chinese_to_int("二十三"), 23)
+        self.assertEqual(address_normalizer.chinese_to_int("一百零五"), 105)
+        self.assertEqual(address_normalizer.chinese_to_int("十"), 10)
+        self.assertEqual(address_normalizer.chinese_to_int("一二三"), 123)
+        self.assertEqual(address_normalizer.normalize_address_text("台東市中華路一段６８４號二樓之三"),
+                         "臺東市中華路1段684號2樓之3")
+        self.assertEqual(address_normalizer.normalize_address_text("中正路 12-1 號"), "中正路12之1號")
+        print("   ✅ 轉換正確")
+
+    def test_2_strip_county_and_township(self):
+        """測試 2: 郵遞區號、縣市寫法不同時標準鍵相同；鄉鎮保留在鍵中"""
+        print("\n🧪 測試 2: 縣市鄉鎮處理...")
+        key = address_normalizer.address_key("臺東縣臺東市中華路一段684號")
+        self.assertEqual(key, "臺東市中華路1段684號")
+        self.assertEqual(address_normalizer.address_key("950台東市中華路1段684號"), key)
+        self.assertEqual(address_normalizer.address_key("中華路一段６８４號"), "中華路1段684號")
+        self.assertEqual(address_normalizer.address_key(key, include_township=False), "中華路1段684號")
+        self.assertEqual(address_normalizer.address_key("台東縣太麻里鄉大王村1鄰1號"), "太麻里鄉大王村1鄰1號")
+        self.assertEqual(address_normalizer.address_key(""), "")
+        print("   ✅ 標準鍵一致")
+
+    def test_3_parse_components(self):
+        """測試 3: 拆解為村里、鄰、路、段、巷、弄、號、樓"""
+        print("\n🧪 測試 3: 結構化拆解...")
+        parts = address_normalizer.parse_address("臺東縣臺東市豐榮里5鄰博愛路三段12巷3弄45之1號B1樓")
+        self.assertEqual(parts.county, "臺東縣")
+        self.assertEqual(parts.township, "臺東市")
+        self.assertEqual(parts.village, "豐榮里")
+        self.assertEqual(parts.neighborhood, "5鄰")
+        self.assertEqual(parts.road, "博愛路")
+        self.assertEqual((parts.section, parts.lane, parts.alley), ("3段", "12巷", "3弄"))
+        self.assertEqual((parts.number, parts.floor, parts.extra), ("45之1號", "B1樓", ""))
+        print("   ✅ 拆解正確")
+
+    def test_4_addresses_match(self):
+        """測試 4: 完全相同與同一門牌 (樓層不同或缺漏)"""
+        print("\n🧪 測試 4: 地址比對...")
+        self.assertEqual(address_normalizer.addresses_match("台東市鐵花路215號1樓", "臺東縣臺東市鐵花路二一五號一樓"),
+                         "exact")
+        self.assertEqual(address_normalizer.addresses_match("台東市鐵花路215號", "臺東市鐵花路215號1樓"), "building")
+        self.assertIsNone(address_normalizer.addresses_match("台東市鐵花路215號", "臺東市鐵花路216號"))
+        self.assertIsNone(address_normalizer.addresses_match("", "臺東市鐵花路216號"))
+        print("   ✅ 比對正確")
+
+    def test_5_address_index(self):
+        """測試 5: 地址索引與場所索引的地址對應"""
+        print("\n🧪 測試 5: 地址索引...")
+        addresses = ["臺東市中正路1號", None, "台東市中正路一號", "臺東市安慶街"]
+        address_index = address_normalizer.build_address_index(addresses)
+        self.assertEqual(len(address_index), 3)
+        self.assertEqual(address_index.lookup("中正路1號"), [0, 2])
+        self.assertEqual(address_index.lookup("臺東縣臺東市安慶街"), [3])
+
+        df = pd.DataFrame({'場所名稱': ["鳳仙旅社", "嘉音小吃店", "臺東轉運站"],
+                           '場所地址': ["臺東市中正路1號", "台東市鐵花路215號", "臺東市安慶街"]})
+        index = place_index.get_place_index(df)
+        self.assertEqual(index.match_address("950臺東縣台東市鐵花路二一五號"), 1)
+        self.assertIsNone(index.match_address("臺東市中正路2號"))
+        self.assertIsNone(index.match_address(""))
+        print("   ✅ 索引正確")
+
+
+    def test_6_townships_with_same_road(self):
+        """測試 6: 不同鄉鎮的同名道路不視為相同；只有一方未寫鄉鎮時才只比路段門牌"""
+        print("\n🧪 測試 6: 跨鄉鎮同名道路...")
+        taitung, chenggong = "臺東縣臺東市中山路1號", "臺東縣成功鎮中山路1號"
+        self.assertNotEqual(address_normalizer.address_key(taitung), address_normalizer.address_key(chenggong))
+        self.assertIsNone(address_normalizer.addresses_match(taitung, chenggong))
+        self.assertIsNone(address_normalizer.addresses_match(taitung, "成功鎮中山路1號2樓"))
+        self.assertEqual(address_normalizer.addresses_match(taitung, "中山路1號"), "exact")
+        self.assertEqual(address_normalizer.comparable_keys(taitung, "中山路一號"), ("中山路1號", "中山路1號"))
+
+        # 「20號之1」與「20之1號」相同
+        self.assertEqual(address_normalizer.address_key("臺東市正氣路20號之1"),
+                         address_normalizer.address_key("臺東市正氣路20之1號"))
+        self.assertEqual(address_normalizer.addresses_match("正氣路20號之1", "臺東市正氣路二十之一號3樓"), "building")
+
+        df = pd.DataFrame({'場所名稱': ["成功漁會", "臺東旅社", "無鄉鎮商店"],
+                           '場所地址': [chenggong, taitung, "中華路1段9號"]})
+        index = place_index.get_place_index(df)
+        self.assertEqual(index.match_address("台東市中山路一號"), 1)
+        self.assertEqual(index.match_address("成功鎮中山路1號"), 0)
+        self.assertEqual(index.match_address("中山路1號"), 0)
+        self.assertIsNone(index.match_address("關山鎮中山路1號"))
+        self.assertEqual(index.match_address("臺東市中華路一段9號"), 2)
+        print("   ✅ 鄉鎮不同不相符")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,83 @@
+"""
+AI 分析 prompt 組合測試 (ai_engine)
+測試範圍：標籤與值分行時保留值、目錄行的優先順序、token 預算截斷、完整 prompt 組合
+"""
+import unittest
+import sys
+import os
+
+# 設定路徑以便導入模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import ai_engine
+
+EQUIPMENT = ["滅火器", "室內消防栓設備", "火警自動警報設備", "標示設備"]
+
+
+class TestPromptCompaction(unittest.TestCase):
+
+    def test_1_value_line_after_label(self):
+        """測試 1: OCR 把標籤與值拆成兩行時，值的那一行也保留"""
+        print("\n🧪 測試 1: 標籤與值分行...")
+        text = "\n".join([
+            "場 所 名 稱：",
+            "嘉音小吃店",
+            "場所地址",
+            "臺東市鐵花路215號1樓",
+            "這一行是雜訊說明文字",
+            "管理權人：邱金蘭",
+        ])
+        compacted = ai_engine.compact_ocr_text(text, token_budget=500, equipment_list=EQUIPMENT)
+        self.assertEqual(compacted.split("\n"), [
+            "場所名稱：", "嘉音小吃店", "場所地址", "臺東市鐵花路215號1樓", "管理權人：邱金蘭",
+        ])
+        print("   ✅ 值的行被保留")
+
+    def test_2_toc_lines_do_not_crowd_out_fields(self):
+        """測試 2: 目錄 / 檢查表行與設備行同一優先順序，預算不足時先保留基本資料"""
+        print("\n🧪 測試 2: 目錄行優先順序...")
+        self.assertEqual(ai_engine._classify_prompt_line("消防安全設備檢查表目錄", set()), 1)
+        self.assertEqual(ai_engine._classify_prompt_line("場所名稱：嘉音小吃店", set()), 0)
+
+        toc = [f"☑ 第{i}項檢查表 2-{i}" for i in range(1, 40)]
+        text = "\n".join(toc + ["場所名稱：嘉音小吃店", "場所地址：臺東市鐵花路215號"])
+        compacted = ai_engine.compact_ocr_text(text, token_budget=40, equipment_list=EQUIPMENT)
+        lines = compacted.split("\n")
+        self.assertIn("場所名稱：嘉音小吃店", lines)
+        self.assertIn("場所地址：臺東市鐵花路215號", lines)
+        self.assertLess(len(lines), len(toc))
+        print(f"   ✅ 保留 {len(lines)} 行")
+
+    def test_3_budget_cut_off(self):
+        """測試 3: 精簡結果不超過 token 預算；全為雜訊時退回原文並截斷"""
+        print("\n🧪 測試 3: 預算截斷...")
+        text = "\n".join(f"滅火器 第{i}具 合格" for i in range(200))
+        for budget in (10, 50, 200):
+            compacted = ai_engine.compact_ocr_text(text, token_budget=budget, equipment_list=EQUIPMENT)
+            used = sum(ai_engine.estimate_tokens(line) + 1 for line in compacted.split("\n"))
+            self.assertLessEqual(used, budget)
+            self.assertTrue(compacted.startswith("滅火器第0具合格"))
+
+        noise = "~~ ## ** " * 200
+        fallback = ai_engine.compact_ocr_text(noise, token_budget=30, equipment_list=EQUIPMENT)
+        self.assertTrue(fallback)
+        self.assertLessEqual(ai_engine.estimate_tokens(fallback), 30)
+        print("   ✅ 不超過預算")
+
+    def test_4_build_analysis_prompt(self):
+        """測試 4: 完整 prompt = 固定前綴 + 精簡後的 OCR 文字 + 結尾"""
+        print("\n🧪 測試 4: prompt 組合...")
+        text = "場所名稱：\n嘉音小吃店\n@@@\n☑ 滅火器檢查表 2-1"
+        prompt = ai_engine.build_analysis_prompt(text, token_budget=100, equipment_list=EQUIPMENT)
+        self.assertTrue(prompt.startswith(ai_engine.ANALYZE_PAGE_PROMPT_PREFIX))
+        self.assertTrue(prompt.endswith(ai_engine.ANALYZE_PAGE_PROMPT_SUFFIX))
+        body = prompt[len(ai_engine.ANALYZE_PAGE_PROMPT_PREFIX):-len(ai_engine.ANALYZE_PAGE_PROMPT_SUFFIX)]
+        self.assertEqual(body, "場所名稱：\n嘉音小吃店\n☑滅火器檢查表2-1")
+        print("   ✅ prompt 正確")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
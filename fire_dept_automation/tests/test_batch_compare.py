@@ -0,0 +1,111 @@
+"""
+批次比對引擎測試
+測試範圍：場所名稱合併、欄位狀態 (與比對頁面規則一致)、設備集合差異、差異報表、空的地址鍵
+"""
+import unittest
+import sys
+import os
+
+# 設定路徑以便導入模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import pandas as pd
+import batch_compare
+
+EQUIPMENT = sorted(["滅火器", "室內消防栓設備", "火警自動警報設備", "標示設備", "緊急照明設備"],
+                   key=len, reverse=True)
+
+REGISTRY = pd.DataFrame({
+    '場所名稱': ["臺東轉運站", "嘉音小吃店", "鳳仙旅社"],
+    '場所地址': ["臺東縣臺東市安慶街", "臺東縣台東市鐵花路215號1樓", "臺東市中正路1號"],
+    '管理權人姓名': ["王大明", "邱金蘭", None],
+    '場所電話': ["089-111111", "(089)357889", "089-222222"],
+    '消防安全設備': ["滅火器、標示設備", "滅火器、緊急照明設備", "滅火器"],
+})
+
+FILINGS = pd.DataFrame({
+    '場所名稱': ["台東轉運站", "嘉音 小吃店", "不存在的場所"],
+    '場所地址': ["台東市安慶街", "台東市鐵花路215號", "某地址"],
+    '管理權人': ["王大明", "", "陳美麗"],
+    '場所電話': ["089-999999", "(089)357889", ""],
+    '消防設備種類': ["滅火器、標示設備", "滅火器、火警自動警報設備", "滅火器"],
+})
+
+
+class TestBatchCompare(unittest.TestCase):
+
+    def setUp(self):
+        self.results = batch_compare.compare_filings(FILINGS, REGISTRY, equipment_list=EQUIPMENT)
+
+    def test_1_join_on_place_key(self):
+        """測試 1: 以正規化場所名稱 (台/臺、空白) 合併列管資料"""
+        print("\n🧪 測試 1: 場所名稱合併...")
+        self.assertEqual(self.results['列管場所'].tolist()[:2], ["臺東轉運站", "嘉音小吃店"])
+        self.assertTrue(pd.isna(self.results['列管場所'][2]))
+        self.assertEqual(self.results['場所名稱_狀態'].tolist()[:2], [batch_compare.STATUS_MATCH] * 2)
+        print("   ✅ 合併正確")
+
+    def test_2_field_statuses(self):
+        """測試 2: 地址正規化、部分符合、申報空白與不一致"""
+        print("\n🧪 測試 2: 欄位狀態...")
+        self.assertEqual(self.results['場所地址_狀態'][0], batch_compare.STATUS_MATCH)
+        self.assertEqual(self.results['場所地址_狀態'][1], batch_compare.STATUS_PARTIAL)
+        self.assertEqual(self.results['管理權人_狀態'][1], batch_compare.STATUS_FILING_EMPTY)
+        self.assertEqual(self.results['電話_狀態'][0], batch_compare.STATUS_MISMATCH)
+        self.assertLess(self.results['電話_相似度'][0], 1.0)
+        self.assertEqual(self.results['電話_相似度'][1], 1.0)
+        print("   ✅ 狀態正確")
+
+    def test_3_equipment_sets(self):
+        """測試 3: 設備集合比對列出漏報與新增"""
+        print("\n🧪 測試 3: 設備差異...")
+        self.assertEqual(self.results['消防設備種類_狀態'][0], batch_compare.STATUS_MATCH)
+        self.assertEqual(self.results['消防設備種類_狀態'][1], batch_compare.STATUS_MISMATCH)
+        self.assertEqual(self.results['消防設備種類_漏報'][1], "緊急照明設備")
+        self.assertEqual(self.results['消防設備種類_新增'][1], "火警自動警報設備")
+        print("   ✅ 設備差異正確")
+
+    def test_4_not_registered(self):
+        """測試 4: 不在列管資料的場所，所有欄位標記為需確認"""
+        print("\n🧪 測試 4: 未列管場所...")
+        row = self.results.iloc[2]
+        self.assertEqual(row['場所地址_狀態'], batch_compare.STATUS_NOT_REGISTERED)
+        self.assertEqual(row['不一致欄位數'], 5)
+        print("   ✅ 已標記")
+
+    def test_5_discrepancy_report(self):
+        """測試 5: 差異報表只保留需確認的申報，依不一致欄位數排序"""
+        print("\n🧪 測試 5: 差異報表...")
+        report = batch_compare.discrepancy_report(self.results)
+        self.assertEqual(report['場所名稱'].tolist(), ["不存在的場所", "嘉音 小吃店", "台東轉運站"])
+        self.assertEqual(report.iloc[1]['不一致欄位'], "管理權人、消防設備種類")
+        print("   ✅ 報表正確")
+
+    def test_6_non_canonical_equipment(self):
+        """測試 6: 申報的設備名稱非標準寫法 (空白、附註) 時，與列管資料以同一清單正規化後比對"""
+        print("\n🧪 測試 6: 非標準設備名稱...")
+        system = pd.Series(["滅火器、標示設備", "室內消防栓設備"])
+        filing = pd.Series(["滅火器(ABC乾粉10具)、標 示 設備", "室內 消防栓設備、自行加裝的偵煙器"])
+        equipment = batch_compare.compare_equipment_columns(system, filing, EQUIPMENT)
+        self.assertEqual(equipment['消防設備種類_狀態'].tolist(), [batch_compare.STATUS_MATCH] * 2)
+        self.assertEqual(equipment['消防設備種類_新增'].tolist(), ["", ""])
+        print("   ✅ 正規化後一致")
+
+    def test_7_empty_address_keys(self):
+        """測試 7: 只寫縣市或無法解析的地址正規化後為空鍵，不算一致也不算部分符合"""
+        print("\n🧪 測試 7: 空的地址鍵...")
+        system = pd.Series(["臺東縣", "臺東縣", "臺東市中正路1號", " 、", "不詳"])
+        filing = pd.Series(["花蓮縣", "臺東縣臺東市中正路1號", "臺東縣", " 、", "臺東市中正路1號"])
+        status, similarity = batch_compare.compare_field_columns(
+            system, filing, pair_normalizer=batch_compare.normalize_address_pair)
+        self.assertEqual(status.tolist(), [batch_compare.STATUS_MISMATCH] * 5)
+        self.assertEqual(similarity[:4].tolist(), [0.0] * 4)
+        self.assertLess(similarity[4], 1.0)
+        print("   ✅ 空鍵不一致")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,122 @@
+"""
+排班日曆事件增量更新測試 (calendar_events)
+測試範圍：首次同步、無異動不重建、認領 / 釋出只更新當天、新增任務與打卡進度、快取依範圍與使用者切換
+"""
+import unittest
+import sys
+import os
+import datetime
+
+# 設定路徑以便導入模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import db_manager
+from temp_db import TempDBTestCase
+import calendar_events
+
+TODAY = datetime.date.today()
+DAYS = [(TODAY + datetime.timedelta(days=i)).strftime("%Y-%m-%d") for i in range(4)]
+START, END = DAYS[0], (TODAY + datetime.timedelta(days=30)).strftime("%Y-%m-%d")
+
+
+class TestCalendarEvents(TempDBTestCase):
+
+    DB_FILE = "test_calendar.db"
+
+    def setUp(self):
+        """清空送餐資料，建立兩條路線與前三天的任務"""
+        super().setUp()
+        self.routes = [db_manager.create_delivery_route(name) for name in ("東線", "西線")]
+        self.elderly = db_manager.create_elderly_profile("張爺爺", "臺東市", "", route_id=self.routes[0], sequence=1)
+        self.tasks = {}
+        for date in DAYS[1:3]:
+            for route_id in self.routes:
+                self.tasks[(date, route_id)] = db_manager.create_daily_task(date, route_id)
+
+    def test_1_initial_sync_matches_full_query(self):
+        """測試 1: 首次同步的事件與 get_task_events 完全相同"""
+        print("\n🧪 測試 1: 首次同步...")
+        feed = calendar_events.CalendarEventFeed(START, END, "volunteer1")
+        delta = feed.sync()
+        self.assertEqual(delta['changed'], sorted({e['start'] for e in feed.events}))
+        self.assertEqual(feed.events, db_manager.get_task_events(START, END, current_user="volunteer1"))
+        print(f"   ✅ {len(feed.events)} 筆事件")
+
+    def test_2_no_change_no_rebuild(self):
+        """測試 2: 沒有異動時不重新查詢任務，事件列表為同一物件"""
+        print("\n🧪 測試 2: 無異動...")
+        feed = calendar_events.CalendarEventFeed(START, END)
+        feed.sync()
+        events = feed.events
+
+        original = db_manager.get_tasks_by_dates
+        calls = []
+        db_manager.get_tasks_by_dates = lambda dates: calls.append(dates) or original(dates)
+        try:
+            delta = feed.sync()
+        finally:
+            db_manager.get_tasks_by_dates = original
+        self.assertEqual(delta, {'changed': [], 'removed': []})
+        self.assertEqual(calls, [])
+        self.assertIs(feed.events, events)
+        print("   ✅ 沿用快取")
+
+    def test_3_claim_and_release_touch_one_day(self):
+        """測試 3: 認領與釋出只讓該任務的日期重新查詢"""
+        print("\n🧪 測試 3: 認領 / 釋出...")
+        feed = calendar_events.CalendarEventFeed(START, END, "volunteer1")
+        feed.sync()
+        task_id = self.tasks[(DAYS[2], self.routes[1])]
+
+        db_manager.claim_task(task_id, "volunteer1")
+        self.assertEqual(feed.sync(), {'changed': [DAYS[2]], 'removed': []})
+        event = [e for e in feed.events if e['extendedProps']['taskId'] == task_id][0]
+        self.assertEqual(event['title'], "🟢 西線 (我)")
+
+        db_manager.release_task(task_id)
+        self.assertEqual(feed.sync()['changed'], [DAYS[2]])
+        self.assertEqual(feed.events, db_manager.get_task_events(START, END, current_user="volunteer1"))
+        print("   ✅ 只更新當天")
+
+    def test_4_new_task_and_checkin(self):
+        """測試 4: 新增任務出現在新日期，打卡後事件顯示配送進度"""
+        print("\n🧪 測試 4: 新增任務與打卡...")
+        feed = calendar_events.CalendarEventFeed(START, END)
+        feed.sync()
+        new_task = db_manager.create_daily_task(DAYS[3], self.routes[0], "volunteer2")
+        self.assertEqual(feed.sync()['changed'], [DAYS[3]])
+        self.assertEqual(feed.events[-1]['extendedProps']['taskId'], new_task)
+
+        db_manager.create_delivery_record(new_task, self.elderly, volunteer_id="volunteer2")
+        self.assertEqual(feed.sync()['changed'], [DAYS[3]])
+        self.assertEqual(feed.events[-1]['title'], "👤 東線 (volunteer2) 1/1")
+
+        # 資料被直接刪除 (例如資料修復) 時移除該日事件
+        conn = db_manager.get_connection()
+        conn.execute("DELETE FROM daily_tasks WHERE date = ?", (DAYS[3],))
+        conn.commit()
+        conn.close()
+        self.assertEqual(feed.sync(), {'changed': [], 'removed': [DAYS[3]]})
+        self.assertFalse(any(e['start'] == DAYS[3] for e in feed.events))
+        print("   ✅ 新增 / 進度 / 移除正確")
+
+    def test_5_get_feed_reuses_cache(self):
+        """測試 5: get_feed 在相同範圍與使用者時沿用快取，不同時重建"""
+        print("\n🧪 測試 5: 快取切換...")
+        store = {}
+        feed, delta = calendar_events.get_feed(store, START, END, "volunteer1")
+        self.assertTrue(delta['changed'])
+        same, delta = calendar_events.get_feed(store, START, END, "volunteer1")
+        self.assertIs(same, feed)
+        self.assertEqual(delta['changed'], [])
+        other, _ = calendar_events.get_feed(store, START, END, "volunteer2")
+        self.assertIsNot(other, feed)
+        self.assertIs(store['calendar_feed'], other)
+        print("   ✅ 快取正確")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
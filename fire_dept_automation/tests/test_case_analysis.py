@@ -0,0 +1,125 @@
+"""
+案件分析結果儲存測試
+測試範圍：儲存 / 讀取、檔案雜湊與 OCR 引擎失效、部分欄位更新、重新辨識清除 AI 結果、刪除案件、Vision AI 結果往返
+"""
+import unittest
+import sys
+import os
+
+# 設定路徑以便導入模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import pandas as pd
+import db_manager
+from temp_db import TempDBTestCase
+
+PAGES_TEXT = ["消防安全設備檢修申報書 場所名稱: 嘉音小吃店", "檢修項目目錄 ☑滅火器"]
+PAGE_TYPES = ["申報書", "目錄"]
+
+
+class TestCaseAnalysis(TempDBTestCase):
+
+    DB_FILE = "test_cases.db"
+    RESET_MEAL_TABLES = False
+
+    def setUp(self):
+        super().setUp()
+        self.case_id = db_manager.create_case("王大明", "a@example.com", "0912345678",
+                                              "嘉音小吃店", "臺東市鐵花路215號", "uploads/a.pdf")
+        db_manager.save_case_analysis(self.case_id, "hash-a", "Tesseract", PAGES_TEXT, PAGE_TYPES,
+                                      engine_versions={"dpi": 300}, timings={"ocr": 12.5})
+
+    def test_1_save_and_load(self):
+        """測試 1: 儲存後可讀回每頁文字、頁面類型、版本與耗時"""
+        print("\n🧪 測試 1: 儲存與讀取...")
+        analysis = db_manager.get_case_analysis(self.case_id, "hash-a", "Tesseract")
+        self.assertEqual(analysis['pages_text'], PAGES_TEXT)
+        self.assertEqual(analysis['page_types'], PAGE_TYPES)
+        self.assertEqual(analysis['engine_versions'], {"dpi": 300})
+        self.assertEqual(analysis['timings'], {"ocr": 12.5})
+        self.assertIsNone(analysis['ai_result'])
+        print("   ✅ 讀取正確")
+
+    def test_2_invalidation(self):
+        """測試 2: 檔案雜湊或 OCR 引擎不同時視為失效"""
+        print("\n🧪 測試 2: 失效判斷...")
+        self.assertIsNone(db_manager.get_case_analysis(self.case_id, "hash-b"))
+        self.assertIsNone(db_manager.get_case_analysis(self.case_id, "hash-a", "PaddleOCR"))
+        self.assertIsNone(db_manager.get_case_analysis("no-such-case"))
+        self.assertIsNotNone(db_manager.get_case_analysis(self.case_id))
+        print("   ✅ 失效判斷正確")
+
+    def test_3_update_fields(self):
+        """測試 3: 更新 AI 結果與擷取欄位 (白名單外的欄位忽略)"""
+        print("\n🧪 測試 3: 部分欄位更新...")
+        db_manager.update_case_analysis_fields(self.case_id, {
+            'ai_result': {'place_name': "嘉音小吃店", 'equipment_list': ["滅火器"]},
+            'ai_model': "qwen2.5:7b",
+            'extracted_fields': {'場所名稱': "嘉音小吃店"},
+            'file_hash': "hacked",
+        })
+        analysis = db_manager.get_case_analysis(self.case_id, "hash-a")
+        self.assertEqual(analysis['ai_result']['equipment_list'], ["滅火器"])
+        self.assertEqual(analysis['ai_model'], "qwen2.5:7b")
+        self.assertEqual(analysis['extracted_fields'], {'場所名稱': "嘉音小吃店"})
+        print("   ✅ 更新正確")
+
+    def test_4_reocr_clears_ai(self):
+        """測試 4: 重新辨識 (新檔案) 時清除舊的 AI 結果"""
+        print("\n🧪 測試 4: 重新辨識...")
+        db_manager.update_case_analysis_fields(self.case_id, {'ai_result': {'x': 1}, 'ai_model': "m"})
+        db_manager.save_case_analysis(self.case_id, "hash-b", "Tesseract", ["新內容"], ["其他文件"])
+        self.assertIsNone(db_manager.get_case_analysis(self.case_id, "hash-a"))
+        analysis = db_manager.get_case_analysis(self.case_id, "hash-b")
+        self.assertEqual(analysis['pages_text'], ["新內容"])
+        self.assertIsNone(analysis['ai_result'])
+        self.assertIsNone(analysis['ai_model'])
+        print("   ✅ 已清除")
+
+    def test_5_delete(self):
+        """測試 5: 刪除分析結果與刪除案件"""
+        print("\n🧪 測試 5: 刪除...")
+        db_manager.delete_case_analysis(self.case_id)
+        self.assertIsNone(db_manager.get_case_analysis(self.case_id))
+
+        db_manager.save_case_analysis(self.case_id, "hash-a", "Tesseract", PAGES_TEXT, PAGE_TYPES)
+        db_manager.delete_case(self.case_id)
+        self.assertIsNone(db_manager.get_case_analysis(self.case_id))
+        print("   ✅ 刪除正確")
+
+
+    def test_6_vision_result_roundtrip(self):
+        """測試 6: Vision AI 結果 (含 DataFrame 驗證報告) 可儲存並還原為相同格式"""
+        print("\n🧪 測試 6: Vision AI 結果往返...")
+        import ai_engine
+        import page_classifier
+        page_map = {1: "申報書", 2: "目錄", 3: "滅火器檢查表"}
+        required = ["滅火器", "緊急照明燈"]
+        result = {
+            'page_map': page_map,
+            'toc_page': 2,
+            'required_items': required,
+            'validation_report': pd.DataFrame(page_classifier.check_integrity(required, page_map)),
+            'error': None,
+        }
+        db_manager.update_case_analysis_fields(self.case_id, {'vision_analysis': ai_engine.vision_result_to_json(result)})
+
+        stored = db_manager.get_case_analysis(self.case_id, "hash-a")['vision_analysis']
+        restored = ai_engine.vision_result_from_json(stored)
+        self.assertEqual(restored['page_map'], page_map)
+        self.assertEqual(restored['toc_page'], 2)
+        pd.testing.assert_frame_equal(restored['validation_report'], result['validation_report'])
+        self.assertEqual(restored['validation_report']['狀態'].str.contains('缺件').sum(), 1)
+
+        empty = dict(result, required_items=[], validation_report=pd.DataFrame([]))
+        db_manager.update_case_analysis_fields(self.case_id, {'vision_analysis': ai_engine.vision_result_to_json(empty)})
+        restored = ai_engine.vision_result_from_json(db_manager.get_case_analysis(self.case_id)['vision_analysis'])
+        self.assertTrue(restored['validation_report'].empty)
+        print("   ✅ 往返正確")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
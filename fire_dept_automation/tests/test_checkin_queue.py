@@ -0,0 +1,170 @@
+"""
+志工打卡佇列測試 (checkin_queue / sync_delivery_checkins)
+測試範圍：本機累積與去重、批次同步與彙總、重送冪等、佇列檔還原、同步失敗保留與同步時機、
+          打卡依批次或路線送完同步、多個 session 共用佇列檔
+"""
+import unittest
+import sys
+import os
+import time
+import tempfile
+import datetime
+
+# 設定路徑以便導入模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import db_manager
+from temp_db import TempDBTestCase
+import checkin_queue
+
+TODAY = datetime.date.today().strftime("%Y-%m-%d")
+
+
+class TestCheckinQueue(TempDBTestCase):
+
+    DB_FILE = "test_checkin.db"
+
+    def setUp(self):
+        """清空送餐資料，建立一條 4 位長者的路線與今日任務"""
+        super().setUp()
+        self.route_id = db_manager.create_delivery_route("建和線")
+        self.elderly = [db_manager.create_elderly_profile(f"長者{i}", "臺東市", "", route_id=self.route_id, sequence=i)
+                        for i in range(1, 5)]
+        self.task_id = db_manager.create_daily_task(TODAY, self.route_id, "volunteer1")
+        self.queue_dir = tempfile.mkdtemp(dir=self.temp_dir)
+
+    def record_count(self):
+        conn = db_manager.get_connection()
+        count = conn.execute("SELECT COUNT(*) FROM delivery_records WHERE task_id = ?", (self.task_id,)).fetchone()[0]
+        conn.close()
+        return count
+
+    def test_1_add_is_local_and_deduplicated(self):
+        """測試 1: add() 不寫入資料庫；同一戶重複打卡只保留第一筆"""
+        print("\n🧪 測試 1: 本機累積...")
+        queue = checkin_queue.CheckinQueue()
+        self.assertTrue(queue.add(self.task_id, self.elderly[0], photo_path="p1.jpg", volunteer_id="volunteer1"))
+        self.assertFalse(queue.add(self.task_id, self.elderly[0], status="異常"))
+        self.assertTrue(queue.add(self.task_id, self.elderly[1], status="異常", abnormal_reason="不在家"))
+        self.assertEqual(len(queue), 2)
+        self.assertEqual(queue.pending_keys(), {(self.task_id, self.elderly[0]), (self.task_id, self.elderly[1])})
+        self.assertEqual(queue.pending()[0]['status'], "已送達")
+        self.assertEqual(self.record_count(), 0)
+        print("   ✅ 未連資料庫")
+
+    def test_2_flush_writes_batch(self):
+        """測試 2: flush() 一次寫入，保留打卡當下時間與照片，彙總同步更新"""
+        print("\n🧪 測試 2: 批次同步...")
+        queue = checkin_queue.CheckinQueue()
+        queue.add(self.task_id, self.elderly[0], photo_path="p1.jpg", volunteer_id="volunteer1",
+                  checked_at="2026-01-05 01:30:00")
+        queue.add(self.task_id, self.elderly[1], status="異常", abnormal_reason="不在家")
+        self.assertEqual(queue.flush(), {'inserted': 2, 'duplicates': 0})
+        self.assertEqual(len(queue), 0)
+
+        records = {r['elderly_id']: r for r in db_manager.get_delivery_records_by_task(self.task_id)}
+        self.assertEqual(records[self.elderly[0]]['delivery_time'], "2026-01-05 01:30:00")
+        self.assertEqual(records[self.elderly[0]]['photo_path'], "p1.jpg")
+        self.assertEqual(records[self.elderly[1]]['abnormal_reason'], "不在家")
+        summary = db_manager.get_task_summaries([self.task_id])[self.task_id]
+        self.assertEqual((summary['visited_stops'], summary['delivered'], summary['abnormal']), (2, 1, 1))
+        self.assertEqual(db_manager.get_delivered_elderly_ids(self.task_id), set(self.elderly[:2]))
+        print("   ✅ 寫入正確")
+
+    def test_3_replay_is_idempotent(self):
+        """測試 3: 斷線後重送同一批不會重複建立；已線上打卡的長者略過"""
+        print("\n🧪 測試 3: 重送冪等...")
+        db_manager.create_delivery_record(self.task_id, self.elderly[2], volunteer_id="volunteer1")
+        batch = [{'task_id': self.task_id, 'elderly_id': e_id, 'volunteer_id': "volunteer1"} for e_id in self.elderly]
+        batch.append(dict(batch[0]))
+        self.assertEqual(db_manager.sync_delivery_checkins(batch), {'inserted': 3, 'duplicates': 2})
+        self.assertEqual(db_manager.sync_delivery_checkins(batch), {'inserted': 0, 'duplicates': 5})
+        self.assertEqual(self.record_count(), 4)
+        self.assertEqual(db_manager.get_task_summaries([self.task_id])[self.task_id]['visited_stops'], 4)
+        print("   ✅ 不重複建立")
+
+    def test_4_restore_from_file(self):
+        """測試 4: 佇列檔在程式重啟 (新的 session) 後還原並可同步"""
+        print("\n🧪 測試 4: 佇列檔還原...")
+        store = {}
+        queue = checkin_queue.get_queue(store, "volunteer1", self.queue_dir)
+        queue.add(self.task_id, self.elderly[0], volunteer_id="volunteer1")
+        queue.add(self.task_id, self.elderly[1], volunteer_id="volunteer1")
+        self.assertIs(checkin_queue.get_queue(store, "volunteer1", self.queue_dir), queue)
+
+        restored = checkin_queue.get_queue({}, "volunteer1", self.queue_dir)
+        self.assertEqual(restored.pending_keys(), queue.pending_keys())
+        self.assertEqual(restored.flush()['inserted'], 2)
+        self.assertEqual(len(checkin_queue.CheckinQueue(checkin_queue.queue_path("volunteer1", self.queue_dir))), 0)
+        print("   ✅ 還原成功")
+
+    def test_5_failure_keeps_queue_and_flush_policy(self):
+        """測試 5: 同步失敗時佇列保留；依筆數或等待時間決定是否同步"""
+        print("\n🧪 測試 5: 失敗保留與同步時機...")
+        queue = checkin_queue.CheckinQueue(batch_size=3, max_age=60)
+        self.assertFalse(queue.should_flush())
+        queue.add(self.task_id, self.elderly[0])
+        self.assertFalse(queue.should_flush())
+        self.assertTrue(queue.should_flush(now=time.time() + 61))
+
+        original = db_manager.sync_delivery_checkins
+        db_manager.sync_delivery_checkins = lambda checkins: (_ for _ in ()).throw(ConnectionError("offline"))
+        try:
+            self.assertIsNone(queue.flush())
+        finally:
+            db_manager.sync_delivery_checkins = original
+        self.assertEqual(len(queue), 1)
+
+        queue.add(self.task_id, self.elderly[1])
+        queue.add(self.task_id, self.elderly[2])
+        self.assertTrue(queue.should_flush())
+        self.assertEqual(queue.flush()['inserted'], 3)
+        self.assertEqual(self.record_count(), 3)
+        print("   ✅ 失敗保留、時機正確")
+
+    def test_6_checkin_batches(self):
+        """測試 6: checkin() 先存入佇列，累積一批或路線送完才寫入；寫入失敗時保留"""
+        print("\n🧪 測試 6: 批次打卡...")
+        queue = checkin_queue.CheckinQueue(batch_size=2)
+        self.assertEqual(queue.checkin(self.task_id, self.elderly[0], volunteer_id="volunteer1"), checkin_queue.QUEUED)
+        self.assertEqual((len(queue), self.record_count()), (1, 0))
+        self.assertEqual(queue.checkin(self.task_id, self.elderly[1], status="異常", abnormal_reason="不在家"),
+                         checkin_queue.SYNCED)
+        self.assertEqual((len(queue), self.record_count()), (0, 2))
+
+        original = db_manager.sync_delivery_checkins
+        db_manager.sync_delivery_checkins = lambda checkins: None
+        try:
+            self.assertEqual(queue.checkin(self.task_id, self.elderly[2], route_complete=True), checkin_queue.FAILED)
+        finally:
+            db_manager.sync_delivery_checkins = original
+        self.assertEqual((len(queue), self.record_count()), (1, 2))
+
+        # 最後一戶不等批次，連同先前失敗的一併寫入
+        self.assertEqual(queue.checkin(self.task_id, self.elderly[3], route_complete=True), checkin_queue.SYNCED)
+        self.assertEqual((len(queue), self.record_count()), (0, 4))
+        self.assertEqual(db_manager.get_task_summaries([self.task_id])[self.task_id]['abnormal'], 1)
+        print("   ✅ 批次寫入正確")
+
+    def test_7_sessions_share_queue_file(self):
+        """測試 7: 同一帳號兩個 session 各自加入打卡，佇列檔不會互相覆蓋，任一方同步後另一方也看到已清空"""
+        print("\n🧪 測試 7: 多個 session...")
+        first = checkin_queue.get_queue({}, "volunteer1", self.queue_dir)
+        second = checkin_queue.get_queue({}, "volunteer1", self.queue_dir)
+        self.assertIsNot(first, second)
+        first.add(self.task_id, self.elderly[0])
+        second.add(self.task_id, self.elderly[1])
+        self.assertFalse(second.add(self.task_id, self.elderly[0]))
+        self.assertEqual(first.pending_keys(), {(self.task_id, self.elderly[0]), (self.task_id, self.elderly[1])})
+
+        self.assertEqual(second.flush()['inserted'], 2)
+        self.assertEqual((len(first), first.flush()), (0, {'inserted': 0, 'duplicates': 0}))
+        self.assertEqual(self.record_count(), 2)
+        print("   ✅ 未互相覆蓋")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
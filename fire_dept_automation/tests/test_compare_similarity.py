@@ -0,0 +1,115 @@
+"""
+OCR 比對相似度引擎測試
+測試範圍：正規化快取、長度比例提早結束、引擎切換、批次最佳比對、自訂引擎
+"""
+import unittest
+import sys
+import os
+
+# 設定路徑以便導入模組 (ocr_system 以目錄內的模組名稱互相匯入)
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+ocr_system_dir = os.path.join(project_root, "ocr_system")
+if ocr_system_dir not in sys.path:
+    sys.path.insert(0, ocr_system_dir)
+
+import compare
+
+
+class TestCompareSimilarity(unittest.TestCase):
+
+    def setUp(self):
+        compare.set_similarity_engine("difflib")
+
+    def tearDown(self):
+        compare.set_similarity_engine(None)
+
+    def test_1_normalize_cached(self):
+        """測試 1: 正規化結果與快取"""
+        print("\n🧪 測試 1: 正規化...")
+        compare._normalize_cached.cache_clear()
+        self.assertEqual(compare.normalize_text("  臺東市  ＡＢＣ：１２３ "), "臺東市 abc:123")
+        compare.normalize_text("  臺東市  ＡＢＣ：１２３ ")
+        self.assertEqual(compare._normalize_cached.cache_info().hits, 1)
+        self.assertEqual(compare.normalize_text(None), "")
+        print("   ✅ 正規化正確且有快取")
+
+    def test_2_length_ratio_early_exit(self):
+        """測試 2: 長度比例已低於門檻時直接回傳 0，不呼叫引擎"""
+        print("\n🧪 測試 2: 長度比例提早結束...")
+
+        class FailingEngine(compare.SimilarityEngine):
+            name = "failing"
+
+            def ratio(self, str1, str2, score_cutoff=0.0):
+                raise AssertionError("不應呼叫引擎")
+
+        compare.set_similarity_engine(FailingEngine())
+        self.assertEqual(compare.calculate_similarity("台東", "台東縣台東市中華路一段", score_cutoff=0.85), 0.0)
+        self.assertEqual(compare.calculate_similarity("臺東", "台東", score_cutoff=0.85), 1.0)
+        print("   ✅ 未呼叫引擎")
+
+    def test_3_cutoff_consistency(self):
+        """測試 3: 使用門檻時，達到門檻的分數與不使用門檻時相同"""
+        print("\n🧪 測試 3: 門檻一致性...")
+        pairs = [("台東市中華路一段684號", "台東市中華路一段648號"), ("王大明", "王小明"), ("089-123456", "089123456")]
+        for str1, str2 in pairs:
+            full = compare.calculate_similarity(str1, str2)
+            cut = compare.calculate_similarity(str1, str2, score_cutoff=0.85)
+            self.assertEqual(cut, full if full >= 0.85 else 0.0)
+        print("   ✅ 結果一致")
+
+    def test_4_rapidfuzz_engine(self):
+        """測試 4: 有安裝 rapidfuzz 時可切換引擎"""
+        print("\n🧪 測試 4: rapidfuzz 引擎...")
+        if not compare._rapidfuzz_available:
+            with self.assertRaises(ImportError):
+                compare.set_similarity_engine("rapidfuzz")
+            self.skipTest("未安裝 rapidfuzz")
+        compare.set_similarity_engine("rapidfuzz")
+        self.assertAlmostEqual(compare.calculate_similarity("王大明", "王小明"), 2 * 2 / 6)
+        print("   ✅ 引擎切換正常")
+
+    def test_5_find_best_match_and_documents(self):
+        """測試 5: 批次最佳比對與 compare_documents 提早結束模式"""
+        print("\n🧪 測試 5: 批次比對...")
+        candidates = ["知本溫泉飯店", "嘉音小吃店", "嘉音小吃部", "鳳仙旅社"]
+        self.assertEqual(compare.find_best_match("嘉音小吃店", candidates), (1, 1.0))
+        self.assertIsNone(compare.find_best_match("臺東轉運站", candidates))
+
+        result = compare.compare_documents(
+            {"場所名稱": "嘉音小吃店", "電話": "089-123456"},
+            {"場所名稱": "嘉音小吃店", "電話": "02-2222"},
+            fields_to_compare=["場所名稱", "電話"],
+            early_exit=True
+        )
+        self.assertFalse(result.overall_match)
+        self.assertEqual(result.field_comparisons[1].match_type, compare.MatchType.MISMATCH)
+        print("   ✅ 批次比對正確")
+
+    def test_6_custom_engine(self):
+        """測試 6: 引擎基底為抽象類別，未實作 ratio 無法建立；自訂引擎可直接設定使用"""
+        print("\n🧪 測試 6: 自訂引擎...")
+        with self.assertRaises(TypeError):
+            compare.SimilarityEngine()
+
+        class Incomplete(compare.SimilarityEngine):
+            name = "incomplete"
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+        class ExactEngine(compare.SimilarityEngine):
+            name = "exact"
+
+            def ratio(self, str1, str2, score_cutoff=0.0):
+                return 1.0 if str1 == str2 else 0.0
+
+        compare.set_similarity_engine(ExactEngine())
+        self.assertEqual(compare.calculate_similarity("王大明", "王小明"), 0.0)
+        self.assertEqual(compare.calculate_similarity("嘉音 小吃店", "嘉音 小吃店"), 1.0)
+        print("   ✅ 自訂引擎可用")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
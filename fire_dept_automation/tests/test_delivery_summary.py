@@ -0,0 +1,134 @@
+"""
+每日送餐彙總表測試 (delivery_daily_summary)
+測試範圍：建立任務、打卡同步更新、志工異動與日曆進度、路線成員異動 (歷史不變)、重建與 KPI 彙總
+"""
+import unittest
+import sys
+import os
+import datetime
+
+# 設定路徑以便導入模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import db_manager
+from temp_db import TempDBTestCase
+
+TODAY = datetime.date.today().strftime("%Y-%m-%d")
+YESTERDAY = (datetime.date.today() - datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+TOMORROW = (datetime.date.today() + datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+class TestDeliverySummary(TempDBTestCase):
+
+    DB_FILE = "test_summary.db"
+
+    def setUp(self):
+        """清空送餐資料，建立一條 3 位長者的路線"""
+        super().setUp()
+        self.route_id = db_manager.create_delivery_route("建和線")
+        self.elderly = [db_manager.create_elderly_profile(name, "臺東市建和路", "", route_id=self.route_id, sequence=i)
+                        for i, name in enumerate(["張爺爺", "李奶奶", "王伯伯"], start=1)]
+
+    def summary(self, task_id):
+        return db_manager.get_task_summaries([task_id])[task_id]
+
+    def snapshot(self):
+        conn = db_manager.get_connection()
+        rows = conn.execute('''
+            SELECT task_id, date, route_id, volunteer, task_status, planned_stops, visited_stops,
+                   delivered, abnormal, first_delivery, last_delivery
+            FROM delivery_daily_summary ORDER BY task_id
+        ''').fetchall()
+        conn.close()
+        return [tuple(row) for row in rows]
+
+    def test_1_task_creation(self):
+        """測試 1: 建立任務時即有彙總列 (應送站數 = 路線上的啟用長者)"""
+        print("\n🧪 測試 1: 建立任務...")
+        task_id = db_manager.create_daily_task(TOMORROW, self.route_id, "volunteer1")
+        summary = self.summary(task_id)
+        self.assertEqual((summary['date'], summary['volunteer'], summary['planned_stops']), (TOMORROW, "volunteer1", 3))
+        self.assertEqual((summary['visited_stops'], summary['delivered'], summary['abnormal']), (0, 0, 0))
+        print("   ✅ 彙總列已建立")
+
+    def test_2_checkins_update_incrementally(self):
+        """測試 2: 打卡後立即更新已送達 / 異常 / 打卡時間，重複打卡不重複計算"""
+        print("\n🧪 測試 2: 打卡同步更新...")
+        task_id = db_manager.create_daily_task(TODAY, self.route_id, "volunteer1")
+        db_manager.create_delivery_record(task_id, self.elderly[0], volunteer_id="volunteer1")
+        db_manager.create_delivery_record(task_id, self.elderly[0], volunteer_id="volunteer1")
+        db_manager.create_delivery_record(task_id, self.elderly[1], status="異常", abnormal_reason="不在家")
+        summary = self.summary(task_id)
+        self.assertEqual((summary['visited_stops'], summary['delivered'], summary['abnormal']), (2, 1, 1))
+        self.assertIsNotNone(summary['first_delivery'])
+        self.assertLessEqual(summary['first_delivery'], summary['last_delivery'])
+        print("   ✅ 即時更新")
+
+    def test_3_volunteer_and_calendar(self):
+        """測試 3: 認領 / 釋出任務更新志工欄位，日曆事件顯示配送進度"""
+        print("\n🧪 測試 3: 志工異動與日曆...")
+        task_id = db_manager.create_daily_task(TODAY, self.route_id)
+        db_manager.claim_task(task_id, "volunteer2")
+        self.assertEqual(self.summary(task_id)['volunteer'], "volunteer2")
+        db_manager.create_delivery_record(task_id, self.elderly[0], volunteer_id="volunteer2")
+
+        event = [e for e in db_manager.get_task_events(TODAY, TODAY) if e['extendedProps']['taskId'] == task_id][0]
+        self.assertEqual((event['extendedProps']['plannedStops'], event['extendedProps']['visitedStops']), (3, 1))
+        self.assertTrue(event['title'].endswith("1/3"))
+
+        db_manager.release_task(task_id)
+        self.assertIsNone(self.summary(task_id)['volunteer'])
+        print("   ✅ 志工與進度正確")
+
+    def test_4_roster_change_keeps_history(self):
+        """測試 4: 長者轉出路線時，今天與未來任務的應送站數更新，過去任務維持原值"""
+        print("\n🧪 測試 4: 路線成員異動...")
+        past = db_manager.create_daily_task(YESTERDAY, self.route_id)
+        today = db_manager.create_daily_task(TODAY, self.route_id)
+        future = db_manager.create_daily_task(TOMORROW, self.route_id)
+        other_route = db_manager.create_delivery_route("溫泉線")
+
+        db_manager.update_elderly_profile_fields(self.elderly[2], {'route_id': other_route})
+        self.assertEqual([self.summary(t)['planned_stops'] for t in (past, today, future)], [3, 2, 2])
+        db_manager.delete_elderly_profile(self.elderly[1])
+        self.assertEqual([self.summary(t)['planned_stops'] for t in (past, today, future)], [3, 1, 1])
+
+        # 過去任務補打卡時，應送站數仍維持當時的值
+        db_manager.create_delivery_record(past, self.elderly[0])
+        self.assertEqual((self.summary(past)['planned_stops'], self.summary(past)['visited_stops']), (3, 1))
+        print("   ✅ 歷史保留")
+
+    def test_5_rebuild_and_kpis(self):
+        """測試 5: 重建結果與同步更新一致；KPI 可依月份 / 志工彙總"""
+        print("\n🧪 測試 5: 重建與 KPI...")
+        task_a = db_manager.create_daily_task(TODAY, self.route_id)  # 建立路線時已自動產生今日任務
+        db_manager.claim_task(task_a, "volunteer1")
+        task_b = db_manager.create_daily_task(TOMORROW, self.route_id, "volunteer2")
+        for elderly_id in self.elderly:
+            db_manager.create_delivery_record(task_a, elderly_id, volunteer_id="volunteer1")
+        db_manager.create_delivery_record(task_b, self.elderly[0], status="異常")
+        db_manager.update_task_status(task_a, "已完成")
+        before = self.snapshot()
+
+        conn = db_manager.get_connection()
+        conn.execute("DELETE FROM delivery_daily_summary WHERE task_id = ?", (task_b,))
+        conn.execute("UPDATE delivery_daily_summary SET delivered = 99 WHERE task_id = ?", (task_a,))
+        conn.commit()
+        conn.close()
+        db_manager.rebuild_delivery_daily_summary()
+        self.assertEqual(self.snapshot(), before)
+
+        by_volunteer = {r['volunteer']: r for r in db_manager.get_delivery_report_summary(TODAY, TOMORROW, "volunteer")}
+        self.assertEqual(by_volunteer["volunteer1"]['completion_rate'], 100.0)
+        self.assertEqual(by_volunteer["volunteer2"]['abnormal'], 1)
+        months = db_manager.get_delivery_report_summary(TODAY, TOMORROW, "month")
+        self.assertEqual(sum(r['visited_stops'] for r in months), 4)
+        self.assertEqual(sum(r['planned_stops'] for r in months), 6)
+        print("   ✅ 重建一致")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,217 @@
+"""
+Word 轉檔服務測試 (以模擬工作者取代 LibreOffice)
+測試範圍：回傳獨立暫存檔、內容雜湊快取、同時轉檔合併、同名檔案隔離、失敗與逾時處理、快取清除、結束時停止服務
+"""
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+# 設定路徑以便導入模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import doc_converter
+
+
+class FakeWorker:
+    """模擬 LibreOffice：把來源內容寫成 PDF"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.killed = threading.Event()
+        self.stopped = 0
+
+    def convert(self, src, output_dir):
+        self.calls.append(src)
+        deadline = time.time() + self.delay
+        while time.time() < deadline:
+            if self.killed.is_set():
+                raise doc_converter.ConversionError("killed")
+            time.sleep(0.01)
+        with open(src, encoding="utf-8") as f:
+            content = f.read()
+        if content == "broken":
+            raise RuntimeError("無法開啟文件")
+        dst = os.path.join(output_dir, os.path.splitext(os.path.basename(src))[0] + ".pdf")
+        with open(dst, "w", encoding="utf-8") as f:
+            f.write(f"%PDF {content}")
+        return dst
+
+    def kill(self):
+        self.killed.set()
+
+    def stop(self):
+        self.stopped += 1
+        self.killed.clear()
+
+
+class TestDocConverter(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.workers = []
+
+    def tearDown(self):
+        self.converter.shutdown()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def make_converter(self, workers=2, delay=0.0, timeout=5, **kwargs):
+        def factory(i):
+            worker = FakeWorker(delay)
+            self.workers.append(worker)
+            return worker
+        self.converter = doc_converter.DocConverter(
+            factory, workers=workers, timeout=timeout,
+            cache_dir=os.path.join(self.temp_dir, "cache"), job_dir=os.path.join(self.temp_dir, "jobs"), **kwargs
+        )
+        return self.converter
+
+    def make_doc(self, content, name="申報書.docx", subdir=""):
+        folder = os.path.join(self.temp_dir, subdir)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    @staticmethod
+    def read(path):
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def calls(self):
+        return sum(len(worker.calls) for worker in self.workers)
+
+    def test_1_returns_private_copy(self):
+        """測試 1: 每次回傳新的暫存 PDF，呼叫端刪除不影響快取"""
+        print("\n🧪 測試 1: 獨立暫存檔...")
+        converter = self.make_converter()
+        doc = self.make_doc("A")
+        first = converter.convert(doc)
+        second = converter.convert(doc)
+        self.assertNotEqual(first, second)
+        self.assertEqual(self.read(first), "%PDF A")
+        os.remove(first)
+        self.assertEqual(self.read(converter.convert(doc)), "%PDF A")
+        self.assertNotEqual(os.path.dirname(first), os.path.dirname(doc))
+        print("   ✅ 暫存檔正確")
+
+    def test_2_content_hash_cache(self):
+        """測試 2: 內容相同 (即使檔名不同) 只轉檔一次"""
+        print("\n🧪 測試 2: 內容雜湊快取...")
+        converter = self.make_converter()
+        converter.convert(self.make_doc("A", "a.docx"))
+        converter.convert(self.make_doc("A", "copy_of_a.docx"))
+        self.assertEqual(self.calls(), 1)
+        converter.convert(self.make_doc("B", "b.docx"))
+        self.assertEqual(self.calls(), 2)
+        print("   ✅ 快取命中")
+
+    def test_3_concurrent_same_document(self):
+        """測試 3: 多人同時轉同一份文件時只執行一次"""
+        print("\n🧪 測試 3: 同時轉檔合併...")
+        converter = self.make_converter(delay=0.2)
+        doc = self.make_doc("C")
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(converter.convert(doc))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(results)), 5)
+        self.assertEqual(self.calls(), 1)
+        print("   ✅ 只轉檔一次")
+
+    def test_4_same_name_isolation(self):
+        """測試 4: 不同使用者上傳同名文件，各自得到正確結果"""
+        print("\n🧪 測試 4: 同名檔案隔離...")
+        converter = self.make_converter(delay=0.05)
+        doc_a = self.make_doc("使用者甲", subdir="user_a")
+        doc_b = self.make_doc("使用者乙", subdir="user_b")
+        results = {}
+        threads = [threading.Thread(target=lambda d=d: results.update({d: converter.convert(d)}))
+                   for d in (doc_a, doc_b)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.read(results[doc_a]), "%PDF 使用者甲")
+        self.assertEqual(self.read(results[doc_b]), "%PDF 使用者乙")
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, "user_a", "申報書.pdf")))
+        print("   ✅ 結果互不影響")
+
+    def test_5_failure_and_timeout(self):
+        """測試 5: 轉檔失敗與逾時回報 ConversionError，工作者重新啟動後可繼續使用"""
+        print("\n🧪 測試 5: 失敗與逾時...")
+        converter = self.make_converter(workers=1, delay=0.0, timeout=0.3)
+        with self.assertRaises(doc_converter.ConversionError):
+            converter.convert(self.make_doc("broken", "bad.docx"))
+        self.assertEqual(self.workers[0].stopped, 1)
+
+        self.workers[0].delay = 2.0
+        with self.assertRaises(doc_converter.ConversionError):
+            converter.convert(self.make_doc("slow", "slow.docx"))
+        self.workers[0].delay = 0.0
+        self.assertEqual(self.read(converter.convert(self.make_doc("ok", "ok.docx"))), "%PDF ok")
+        print("   ✅ 錯誤處理正確")
+
+    def test_6_cache_eviction(self):
+        """測試 6: 超過容量時刪除最久未使用的快取；超過保存期限的快取與暫存 PDF 一併清除"""
+        print("\n🧪 測試 6: 快取清除...")
+        converter = self.make_converter(workers=1, max_cache_bytes=20)
+        docs = {name: self.make_doc(name, f"{name}.docx") for name in "ABCD"}
+        for name in "ABC":
+            converter.convert(docs[name])
+
+        def cached():
+            return sorted(self.read(entry.path)[-1] for entry in os.scandir(converter.cache_dir))
+
+        self.assertEqual(cached(), ["A", "B", "C"])
+        now = time.time()
+        for entry, age in zip(sorted(os.scandir(converter.cache_dir), key=lambda e: self.read(e.path)), (100, 50, 10)):
+            os.utime(entry.path, (now - age, now - age))
+        converter.convert(docs["A"])  # 快取命中：A 變成最近使用
+        converter.convert(docs["D"])
+        self.assertEqual(cached(), ["A", "C", "D"])
+        self.assertEqual(self.calls(), 4)
+
+        removed = converter.evict_cache(now=now + doc_converter.MAX_CACHE_AGE + 1)
+        self.assertEqual(cached(), [])
+        self.assertEqual([e for e in os.scandir(converter.job_dir) if e.is_file()], [])
+        self.assertGreater(removed, 3)
+        self.assertEqual(self.read(converter.convert(docs["B"])), "%PDF B")
+        print("   ✅ 快取已清除")
+
+    def test_7_shutdown_at_exit(self):
+        """測試 7: 共用轉檔服務在行程結束時停止 (atexit)，重複呼叫 shutdown 不出錯"""
+        print("\n🧪 測試 7: 結束時停止服務...")
+        with mock.patch.object(doc_converter, "find_uno_python", return_value=None), \
+                mock.patch.object(doc_converter, "CommandWorker", lambda soffice, profile: FakeWorker()), \
+                mock.patch.object(doc_converter.atexit, "register") as register:
+            self.converter = doc_converter.get_converter("fake_soffice", workers=1)
+        try:
+            registered = [call.args[0] for call in register.call_args_list]
+            self.assertIn(self.converter.shutdown, registered)
+            self.assertIn(shutil.rmtree, registered)
+            self.assertLess(registered.index(shutil.rmtree), registered.index(self.converter.shutdown))
+            self.converter.shutdown()
+            self.converter.shutdown()
+            self.assertFalse(any(thread.is_alive() for thread in self.converter._threads))
+        finally:
+            doc_converter._converters.pop("fake_soffice", None)
+            for call in register.call_args_list:
+                if call.args[0] is shutil.rmtree:
+                    call.args[0](*call.args[1:], **call.kwargs)
+        print("   ✅ 已註冊並停止")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
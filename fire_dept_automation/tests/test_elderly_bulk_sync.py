@@ -0,0 +1,129 @@
+"""
+長者資料批次同步測試 (st.data_editor 儲存)
+測試範圍：未變動不寫入、只更新變動列、新增與軟刪除、路線站點數重算、單一交易與失敗回滾
+"""
+import unittest
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# 設定路徑以便導入模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import db_manager
+from temp_db import TempDBTestCase
+
+
+class TestElderlyBulkSync(TempDBTestCase):
+
+    DB_FILE = "test_bulk_sync.db"
+
+    def setUp(self):
+        """清空送餐資料並建立兩條路線、三位長者"""
+        super().setUp()
+        self.route_a = db_manager.create_delivery_route("路線A")
+        self.route_b = db_manager.create_delivery_route("路線B")
+        for i, name in enumerate(["王阿公", "陳阿嬤", "林伯伯"], start=1):
+            db_manager.create_elderly_profile(name, f"臺東市中華路{i}號", "089-000000",
+                                              diet_type="一般", route_id=self.route_a, sequence=i)
+        db_manager.update_route_stop_count(self.route_a)
+
+    def load_df(self):
+        """與頁面相同的方式產生編輯器資料"""
+        return pd.DataFrame([dict(p) for p in db_manager.get_all_elderly()])
+
+    def route_stops(self):
+        return {r['id']: r['num_stops'] for r in db_manager.get_all_routes()}
+
+    def test_1_no_changes(self):
+        """測試 1: 沒有變動時不寫入任何資料"""
+        print("\n🧪 測試 1: 未變動...")
+        df = self.load_df()
+        result = db_manager.bulk_sync_elderly_profiles(df, df.copy())
+        self.assertEqual(result, {'inserted': 0, 'updated': 0, 'deleted': 0})
+        print("   ✅ 無寫入")
+
+    def test_2_update_changed_rows_only(self):
+        """測試 2: 只更新有變動的列；換路線時兩條路線的站點數都重新計算"""
+        print("\n🧪 測試 2: 更新變動列...")
+        df = self.load_df()
+        edited = df.copy()
+        edited.loc[edited['name'] == "王阿公", 'phone'] = "0912-345678"
+        edited.loc[edited['name'] == "陳阿嬤", 'route_id'] = self.route_b
+        result = db_manager.bulk_sync_elderly_profiles(df, edited)
+        self.assertEqual(result['updated'], 2)
+
+        profiles = {p['name']: p for p in db_manager.get_all_elderly()}
+        self.assertEqual(profiles["王阿公"]['phone'], "0912-345678")
+        self.assertEqual(profiles["陳阿嬤"]['route_id'], self.route_b)
+        self.assertEqual(self.route_stops(), {self.route_a: 2, self.route_b: 1})
+        print("   ✅ 更新正確")
+
+    def test_3_insert_and_soft_delete(self):
+        """測試 3: 新增列 (id 為 NaN) 寫入、空白列略過，移除的列改為停用"""
+        print("\n🧪 測試 3: 新增與刪除...")
+        df = self.load_df()
+        edited = df[df['name'] != "林伯伯"].copy()
+        new_rows = pd.DataFrame([
+            {'id': np.nan, 'name': "張奶奶", 'address': "臺東市更生路1號", 'route_id': self.route_b, 'sequence': np.nan},
+            {'id': np.nan, 'name': None, 'address': None, 'route_id': np.nan, 'sequence': np.nan},
+        ])
+        edited = pd.concat([edited, new_rows], ignore_index=True)
+        result = db_manager.bulk_sync_elderly_profiles(df, edited)
+        self.assertEqual(result, {'inserted': 1, 'updated': 0, 'deleted': 1})
+
+        names = {p['name']: p for p in db_manager.get_all_elderly()}
+        self.assertNotIn("林伯伯", names)
+        self.assertEqual(names["張奶奶"]['status'], "啟用")
+        self.assertEqual(names["張奶奶"]['sequence'], 0)
+        self.assertEqual(self.route_stops(), {self.route_a: 2, self.route_b: 1})
+        print("   ✅ 新增與刪除正確")
+
+    def test_4_single_connection(self):
+        """測試 4: 新增、更新、刪除在同一個連線 (交易) 中完成"""
+        print("\n🧪 測試 4: 單一交易...")
+        df = self.load_df()
+        edited = df[df['name'] != "林伯伯"].copy()
+        edited.loc[edited['name'] == "王阿公", 'special_notes'] = "需切碎"
+        edited = pd.concat([edited, pd.DataFrame([{'id': np.nan, 'name': "新長者", 'address': "臺東市"}])],
+                           ignore_index=True)
+
+        original_get_connection = db_manager.get_connection
+        calls = []
+
+        def counting_connection():
+            calls.append(1)
+            return original_get_connection()
+
+        db_manager.get_connection = counting_connection
+        try:
+            result = db_manager.bulk_sync_elderly_profiles(df, edited)
+        finally:
+            db_manager.get_connection = original_get_connection
+        self.assertEqual(result, {'inserted': 1, 'updated': 1, 'deleted': 1})
+        self.assertEqual(len(calls), 1)
+        print("   ✅ 只開啟一次連線")
+
+    def test_5_rollback_on_failure(self):
+        """測試 5: 任一列寫入失敗 (姓名清空違反 NOT NULL) 時全部回滾"""
+        print("\n🧪 測試 5: 失敗回滾...")
+        df = self.load_df()
+        edited = df.copy()
+        edited.loc[edited['name'] == "王阿公", 'phone'] = "0988-888888"
+        edited.loc[edited['name'] == "陳阿嬤", 'name'] = None
+        edited = pd.concat([edited, pd.DataFrame([{'id': np.nan, 'name': "新長者", 'address': "臺東市"}])],
+                           ignore_index=True)
+        self.assertIsNone(db_manager.bulk_sync_elderly_profiles(df, edited))
+
+        after = self.load_df()
+        self.assertEqual(len(after), 3)
+        self.assertNotIn("0988-888888", after['phone'].tolist())
+        print("   ✅ 已回滾")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,107 @@
+"""
+消防設備代碼表測試
+測試範圍：固定代碼、編碼 / 解碼、位元差異、整欄遮罩、未知設備、代碼表上限
+"""
+import unittest
+import sys
+import os
+
+# 設定路徑以便導入模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import numpy as np
+import pandas as pd
+import equipment_vocab
+
+EQUIPMENT = sorted(["滅火器", "室內消防栓設備", "火警自動警報設備", "標示設備", "緊急照明設備"],
+                   key=len, reverse=True)
+
+
+class TestEquipmentVocab(unittest.TestCase):
+
+    def test_1_stable_ids(self):
+        """測試 1: 代碼即代碼表位置，新建代碼表結果相同"""
+        print("\n🧪 測試 1: 固定代碼...")
+        vocab = equipment_vocab.EquipmentVocab()
+        self.assertEqual(vocab.id_of("滅火器"), 0)
+        self.assertEqual(vocab.id_of("標示設備"), equipment_vocab.EQUIPMENT_CATALOG.index("標示設備"))
+        self.assertEqual(vocab.names, equipment_vocab.EQUIPMENT_CATALOG)
+        print("   ✅ 代碼固定")
+
+    def test_2_encode_decode(self):
+        """測試 2: 字串 -> 遮罩 -> 名稱 (依代碼順序、忽略空白項目)"""
+        print("\n🧪 測試 2: 編碼解碼...")
+        vocab = equipment_vocab.EquipmentVocab()
+        mask = vocab.encode_str("標示設備、滅火器、、 滅火器")
+        self.assertEqual(mask, 1 << 0 | 1 << vocab.id_of("標示設備"))
+        self.assertEqual(vocab.decode(mask), ["滅火器", "標示設備"])
+        self.assertEqual(vocab.decode_str(mask), "滅火器、標示設備")
+        self.assertEqual(vocab.encode_str(None), 0)
+        print("   ✅ 編碼正確")
+
+    def test_3_diff(self):
+        """測試 3: 漏報與新增為兩次位元運算，結果與集合差集相同"""
+        print("\n🧪 測試 3: 位元差異...")
+        sys_mask = equipment_vocab.as_mask({"滅火器", "緊急照明設備"})
+        ocr_mask = equipment_vocab.as_mask("滅火器、火警自動警報設備")
+        missing, extra = equipment_vocab.diff(sys_mask, ocr_mask)
+        self.assertEqual(equipment_vocab.decode(missing), ["緊急照明設備"])
+        self.assertEqual(equipment_vocab.decode(extra), ["火警自動警報設備"])
+        self.assertTrue(equipment_vocab.contains(sys_mask, "滅火器"))
+        self.assertEqual(equipment_vocab.diff(sys_mask, sys_mask), (0, 0))
+        print("   ✅ 差異正確")
+
+    def test_4_mask_series(self):
+        """測試 4: 整欄遮罩 (原始文字先依標準清單正規化) 並向量化比對"""
+        print("\n🧪 測試 4: 整欄遮罩...")
+        system = pd.Series(["本場所設有滅火器及標示設備", None, "緊急照明設備 滅火器"])
+        filing = pd.Series(["滅火器、標示設備", "滅火器", "滅火器"])
+        sys_masks = equipment_vocab.mask_series(system, EQUIPMENT)
+        ocr_masks = equipment_vocab.mask_series(filing)
+        self.assertEqual(sys_masks.dtype, np.int64)
+        missing, extra = equipment_vocab.diff(sys_masks, ocr_masks)
+        self.assertEqual(equipment_vocab.decode_series(missing).tolist(), ["", "", "緊急照明設備"])
+        self.assertEqual(equipment_vocab.decode_series(extra).tolist(), ["", "滅火器", ""])
+        print("   ✅ 向量化比對正確")
+
+    def test_5_unknown_items(self):
+        """測試 5: 不在代碼表的名稱配發新代碼，不影響既有代碼"""
+        print("\n🧪 測試 5: 未知設備...")
+        vocab = equipment_vocab.EquipmentVocab()
+        new_id = vocab.id_of("手寫設備")
+        self.assertEqual(new_id, len(equipment_vocab.EQUIPMENT_CATALOG))
+        self.assertEqual(vocab.id_of("手寫設備"), new_id)
+        self.assertEqual(vocab.decode(vocab.encode_str("手寫設備、滅火器")), ["滅火器", "手寫設備"])
+        print("   ✅ 新代碼配發正確")
+
+    def test_6_overflow(self):
+        """測試 6: 代碼表滿 63 項後，未知名稱歸入「其他」並記錄，遮罩仍為 int64"""
+        print("\n🧪 測試 6: 代碼表上限...")
+        vocab = equipment_vocab.EquipmentVocab()
+        other_id = vocab.id_of(equipment_vocab.OTHER)
+        free = vocab.max_size - vocab.size
+        ids = [vocab.id_of(f"手寫設備{i}") for i in range(free + 10)]
+        self.assertEqual(ids[:free], list(range(vocab.size - free, vocab.size)))
+        self.assertEqual(ids[free:], [other_id] * 10)
+        self.assertEqual(vocab.size, 63)
+        self.assertEqual(vocab.overflow, {f"手寫設備{i}" for i in range(free, free + 10)})
+        self.assertEqual(vocab.decode(vocab.encode_str(f"滅火器、手寫設備{free + 3}")), ["滅火器", "其他"])
+        self.assertEqual(vocab.id_of(f"手寫設備{free - 1}"), vocab.size - 1)
+
+        # 共用代碼表溢位時整欄遮罩仍可放入 int64
+        filing = pd.Series([f"滅火器、溢位設備{i}" for i in range(80)])
+        masks = equipment_vocab.mask_series(filing)
+        self.assertEqual(masks.dtype, np.int64)
+        self.assertTrue(all(equipment_vocab.contains(mask, "滅火器") for mask in masks))
+        self.assertEqual(equipment_vocab.get_vocab().size, 63)
+
+        with self.assertRaises(ValueError):
+            equipment_vocab.EquipmentVocab([f"設備{i}" for i in range(63)])
+        print("   ✅ 溢位歸入「其他」")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
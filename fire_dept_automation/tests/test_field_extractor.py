@@ -0,0 +1,111 @@
+"""
+分層欄位提取引擎測試
+測試範圍：規則提取信心分數、目錄頁勾選設備、信心不足時才呼叫 LLM
+"""
+import unittest
+import sys
+import os
+import types
+from unittest import mock
+
+# 設定路徑以便導入模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import field_extractor
+
+EQUIPMENT = sorted([
+    "滅火器", "室內消防栓設備", "室外消防栓設備", "自動撒水設備",
+    "火警自動警報設備", "標示設備", "避難器具", "緊急照明設備", "配線"
+], key=len, reverse=True)
+
+PAGE_ONE = "\n".join([
+    "消防安全設備檢修申報書",
+    "場所名稱：嘉音小吃店",
+    "場所地址：台東市鐵花路215號1樓",
+    "管理權人：邱金蘭",
+    "場所電話：089-357889",
+    "檢修人員姓名：吳萬居",
+    "地址：台東市長安街92號",
+])
+
+TOC_PAGE = "\n".join([
+    "消防安全設備檢修申報書目錄",
+    "☑ 滅火器檢查表 2-1",
+    "□ 室外消防栓設備",
+    "火警自動警報設備檢查表 2-13",
+])
+
+
+class TestFieldExtractor(unittest.TestCase):
+
+    def test_1_rule_confidence(self):
+        """測試 1: 明確標籤的欄位應有高信心，且不被後面的檢修單位地址覆蓋"""
+        print("\n🧪 測試 1: 規則提取信心分數...")
+        fields = field_extractor.extract_fields_with_confidence(PAGE_ONE, equipment_list=EQUIPMENT)
+        self.assertEqual(fields['場所名稱']['value'], "嘉音小吃店")
+        self.assertEqual(fields['場所地址']['value'], "台東市鐵花路215號1樓")
+        self.assertEqual(fields['管理權人']['value'], "邱金蘭")
+        self.assertEqual(fields['場所電話']['value'], "089-357889")
+        for field in ['場所名稱', '場所地址', '管理權人', '場所電話']:
+            self.assertGreaterEqual(fields[field]['confidence'], field_extractor.DEFAULT_CONFIDENCE_THRESHOLD)
+        print("   ✅ 規則提取正確")
+
+    def test_2_low_confidence_values(self):
+        """測試 2: 格式可疑的值應降低信心"""
+        print("\n🧪 測試 2: 格式可疑的值...")
+        fields = field_extractor.extract_fields_with_confidence(
+            "場所地址：詳如附件\n電話：12\n管理權人：某某股份有限公司代表人",
+            equipment_list=EQUIPMENT
+        )
+        self.assertLess(fields['場所地址']['confidence'], field_extractor.DEFAULT_CONFIDENCE_THRESHOLD)
+        self.assertLess(fields['場所電話']['confidence'], field_extractor.DEFAULT_CONFIDENCE_THRESHOLD)
+        self.assertLess(fields['管理權人']['confidence'], field_extractor.DEFAULT_CONFIDENCE_THRESHOLD)
+        print("   ✅ 信心分數已降低")
+
+    def test_3_checked_equipment(self):
+        """測試 3: 目錄頁只提取已勾選 (或有頁碼) 的設備"""
+        print("\n🧪 測試 3: 目錄頁勾選設備...")
+        checked = field_extractor.extract_checked_equipment(TOC_PAGE, EQUIPMENT)
+        self.assertEqual(checked, ["滅火器", "火警自動警報設備"])
+        print(f"   ✅ 勾選設備: {checked}")
+
+    def test_4_skip_llm_when_confident(self):
+        """測試 4: 所有欄位信心足夠時不呼叫 LLM"""
+        print("\n🧪 測試 4: 信心足夠時略過 LLM...")
+        fake_engine = types.SimpleNamespace(
+            DEFAULT_TEXT_MODEL="llama3",
+            analyze_page_with_ai=mock.Mock(side_effect=AssertionError("不應呼叫 LLM"))
+        )
+        with mock.patch.dict(sys.modules, {"ai_engine": fake_engine}):
+            result = field_extractor.extract_fields(PAGE_ONE, [PAGE_ONE, TOC_PAGE], equipment_list=EQUIPMENT)
+        self.assertEqual(result['llm_fields'], [])
+        self.assertEqual(result['place_name'], "嘉音小吃店")
+        self.assertEqual(result['equipment_list'], ["滅火器", "火警自動警報設備"])
+        self.assertEqual(result['toc_page_num'], 2)
+        print("   ✅ 未呼叫 LLM")
+
+    def test_5_llm_only_for_missing_fields(self):
+        """測試 5: 只有缺漏欄位送交 LLM，且只送出相關片段"""
+        print("\n🧪 測試 5: 缺漏欄位才呼叫 LLM...")
+        page_one = "\n".join(line for line in PAGE_ONE.split("\n") if not line.startswith("管理權人"))
+        fake_engine = types.SimpleNamespace(
+            DEFAULT_TEXT_MODEL="llama3",
+            analyze_page_with_ai=mock.Mock(return_value={"management_person": "邱金蘭"})
+        )
+        with mock.patch.dict(sys.modules, {"ai_engine": fake_engine}):
+            result = field_extractor.extract_fields(page_one, [page_one, TOC_PAGE], equipment_list=EQUIPMENT)
+
+        fake_engine.analyze_page_with_ai.assert_called_once()
+        _, kwargs = fake_engine.analyze_page_with_ai.call_args
+        self.assertEqual(kwargs['fields'], ['management_person'])
+        self.assertEqual(result['llm_fields'], ['管理權人'])
+        self.assertEqual(result['management_person'], "邱金蘭")
+        self.assertEqual(result['place_name'], "嘉音小吃店")
+        print("   ✅ 只送出缺漏欄位")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
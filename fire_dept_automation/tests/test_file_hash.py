@@ -0,0 +1,60 @@
+"""
+檔案內容雜湊測試 (file_hash)
+測試範圍：SHA-256 與 hashlib 一致、檔案未變更時沿用上次結果、檔案變更後重新計算
+"""
+import unittest
+import sys
+import os
+import hashlib
+import shutil
+import tempfile
+from unittest import mock
+
+# 設定路徑以便導入模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import file_hash
+
+
+class TestFileHash(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "申報書.pdf")
+        self._write(b"%PDF-1.4 " * 300000)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _write(self, data, mtime=None):
+        with open(self.path, 'wb') as f:
+            f.write(data)
+        if mtime is not None:
+            os.utime(self.path, (mtime, mtime))
+
+    def test_1_sha256(self):
+        """測試 1: 分段讀取的雜湊與一次讀入相同"""
+        print("\n🧪 測試 1: SHA-256...")
+        with open(self.path, 'rb') as f:
+            expected = hashlib.sha256(f.read()).hexdigest()
+        self.assertEqual(file_hash.file_sha256(self.path), expected)
+        self.assertEqual(file_hash.file_sha256(self.path, chunk_size=7), expected)
+        print("   ✅ 雜湊一致")
+
+    def test_2_cached_per_version(self):
+        """測試 2: 檔案未變更時不重讀；內容或 mtime 改變後重新計算"""
+        print("\n🧪 測試 2: 依檔案版本快取...")
+        first = file_hash.cached_file_sha256(self.path)
+        with mock.patch.object(file_hash, "file_sha256", side_effect=AssertionError("不應重讀檔案")):
+            self.assertEqual(file_hash.cached_file_sha256(self.path), first)
+
+        self._write(b"changed", mtime=os.path.getmtime(self.path) + 10)
+        self.assertEqual(file_hash.cached_file_sha256(self.path), hashlib.sha256(b"changed").hexdigest())
+        print("   ✅ 快取依版本失效")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
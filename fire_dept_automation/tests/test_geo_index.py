@@ -0,0 +1,131 @@
+"""
+送餐站點座標索引測試 (geo_index)
+測試範圍：半徑查詢與暴力法一致、最近點、邊界情況、共用索引依資料版本重建、打卡位置檢查與查詢效能、
+          異動計數與版本檢查間隔
+"""
+import unittest
+import sys
+import os
+import time
+import numpy as np
+
+# 設定路徑以便導入模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import db_manager
+from temp_db import TempDBTestCase
+import geo_index
+
+
+def random_points(n, seed=0):
+    """臺東市附近的隨機點"""
+    rng = np.random.default_rng(seed)
+    return 22.75 + rng.uniform(-0.15, 0.15, n), 121.1 + rng.uniform(-0.1, 0.1, n)
+
+
+class TestGeoIndex(TempDBTestCase):
+
+    DB_FILE = "test_geo_index.db"
+
+    def test_1_within_matches_brute_force(self):
+        """測試 1: 半徑查詢結果與逐點計算相同 (含跨網格與大半徑)"""
+        print("\n🧪 測試 1: 半徑查詢...")
+        lats, lons = random_points(3000)
+        index = geo_index.GridIndex(range(3000), lats, lons)
+        rng = np.random.default_rng(1)
+        for _ in range(100):
+            lat, lon, radius = 22.75 + rng.uniform(-0.2, 0.2), 121.1 + rng.uniform(-0.12, 0.12), rng.uniform(30, 3000)
+            distances = geo_index.haversine_m(lat, lon, lats, lons)
+            expected = sorted(np.nonzero(distances <= radius)[0].tolist(), key=lambda i: (distances[i], i))
+            self.assertEqual([i for i, _ in index.within(lat, lon, radius)], expected)
+        print("   ✅ 與暴力法一致")
+
+    def test_2_nearest(self):
+        """測試 2: 最近 k 點與逐點計算相同；max_radius_m 範圍外不回傳"""
+        print("\n🧪 測試 2: 最近點...")
+        lats, lons = random_points(2000, seed=2)
+        index = geo_index.GridIndex(range(2000), lats, lons, cell_m=150)
+        rng = np.random.default_rng(3)
+        for _ in range(100):
+            lat, lon, k = 22.75 + rng.uniform(-0.3, 0.3), 121.1 + rng.uniform(-0.2, 0.2), int(rng.integers(1, 6))
+            distances = geo_index.haversine_m(lat, lon, lats, lons)
+            got = index.nearest(lat, lon, k)
+            np.testing.assert_allclose([d for _, d in got], np.sort(distances)[:k])
+        far = index.nearest(24.0, 121.5, 1, max_radius_m=1000)
+        self.assertEqual(far, [])
+        print("   ✅ 最近點正確")
+
+    def test_3_edge_cases(self):
+        """測試 3: 空索引、同一座標多個站點、無座標站點的距離"""
+        print("\n🧪 測試 3: 邊界情況...")
+        empty = geo_index.GridIndex([], [], [])
+        self.assertEqual((empty.within(22.75, 121.1, 500), empty.nearest(22.75, 121.1)), ([], []))
+        index = geo_index.GridIndex(["a", "b", "c"], [22.75, 22.75, 22.76], [121.1, 121.1, 121.1])
+        self.assertEqual([i for i, _ in index.within(22.75, 121.1, 10)], ["a", "b"])
+        self.assertAlmostEqual(index.distance_to("c", 22.75, 121.1), 1112, delta=2)
+        self.assertIsNone(index.distance_to("z", 22.75, 121.1))
+        print("   ✅ 邊界情況正確")
+
+    def test_4_shared_index_and_checkin(self):
+        """測試 4: 共用索引在座標異動後重建；打卡位置檢查"""
+        print("\n🧪 測試 4: 共用索引與打卡檢查...")
+        near = db_manager.create_elderly_profile("張爺爺", "臺東市", "", gps_lat=22.7562, gps_lon=121.1500)
+        no_gps = db_manager.create_elderly_profile("李奶奶", "臺東市", "")
+
+        index, profiles = geo_index.get_stop_index(max_age=0)
+        self.assertEqual(set(profiles), {near})
+        self.assertIs(geo_index.get_stop_index(max_age=0)[0], index)
+
+        ok, distance = geo_index.check_checkin_location(near, 22.7565, 121.1500)
+        self.assertTrue(ok)
+        self.assertLess(distance, 50)
+        self.assertFalse(geo_index.check_checkin_location(near, 22.7600, 121.1500)[0])
+        self.assertEqual(geo_index.check_checkin_location(no_gps, 22.7562, 121.15), (None, None))
+
+        db_manager.update_elderly_gps([(22.7563, 121.1501, no_gps)])
+        self.assertIsNot(geo_index.get_stop_index(max_age=0)[0], index)
+        nearby = geo_index.stops_within(22.7562, 121.1500, 100)
+        self.assertEqual([p['id'] for p, _ in nearby], [near, no_gps])
+        print("   ✅ 重建與打卡檢查正確")
+
+    def test_5_query_speed(self):
+        """測試 5: 5000 個站點時單次半徑查詢在 0.5 毫秒內"""
+        print("\n🧪 測試 5: 查詢效能...")
+        lats, lons = random_points(5000, seed=4)
+        index = geo_index.GridIndex(range(5000), lats, lons)
+        start = time.perf_counter()
+        for _ in range(2000):
+            index.within(22.75, 121.1, 150)
+        per_query = (time.perf_counter() - start) / 2000
+        self.assertLess(per_query, 0.0005)
+        print(f"   ✅ 每次查詢 {per_query * 1e6:.0f} 微秒")
+
+    def test_6_version_counter_and_interval(self):
+        """測試 6: 姓名 / 地址修改也會重建索引；檢查間隔內不查詢資料版本"""
+        print("\n🧪 測試 6: 資料版本與檢查間隔...")
+        elderly_id = db_manager.create_elderly_profile("張爺爺", "臺東市", "", gps_lat=22.7562, gps_lon=121.1500)
+        index, profiles = geo_index.get_stop_index(max_age=0)
+
+        db_manager.update_elderly_profile_fields(elderly_id, {'name': "張大爺", 'address': "臺東市中華路一段1號"})
+        # 檢查間隔內沿用舊索引，不連資料庫
+        original = db_manager.get_elderly_data_version
+        db_manager.get_elderly_data_version = lambda: self.fail("檢查間隔內不應查詢資料版本")
+        try:
+            self.assertIs(geo_index.get_stop_index()[0], index)
+        finally:
+            db_manager.get_elderly_data_version = original
+
+        index, profiles = geo_index.get_stop_index(max_age=0)
+        self.assertEqual((profiles[elderly_id]['name'], profiles[elderly_id]['address']), ("張大爺", "臺東市中華路一段1號"))
+        version = db_manager.get_elderly_data_version()
+        db_manager.delete_elderly_profile(elderly_id)
+        self.assertGreater(db_manager.get_elderly_data_version(), version)
+        self.assertEqual(geo_index.get_stop_index(max_age=0)[1], {})
+        print("   ✅ 版本與間隔正確")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,93 @@
+"""
+地址座標快取測試 (geocode_cache)
+測試範圍：TWD97 轉換、門牌資料匯入 (整欄 / 拆欄)、地址鍵比對、人工補登不被覆蓋、補齊長者座標
+"""
+import unittest
+import sys
+import os
+import io
+import pandas as pd
+
+# 設定路徑以便導入模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import db_manager
+from temp_db import TempDBTestCase
+import geocode_cache
+
+
+class TestGeocodeCache(TempDBTestCase):
+
+    DB_FILE = "test_geocode.db"
+
+    def test_1_twd97_to_wgs84(self):
+        """測試 1: TWD97 二度分帶轉經緯度 (中央經線與北緯 23 度參考點)"""
+        print("\n🧪 測試 1: TWD97 轉換...")
+        lat, lon = geocode_cache.twd97_to_wgs84(250000, 2544283.12)
+        self.assertAlmostEqual(float(lat), 23.0, places=6)
+        self.assertAlmostEqual(float(lon), 121.0, places=9)
+        lat, lon = geocode_cache.twd97_to_wgs84([266000], [2520000])
+        self.assertTrue(22.7 < lat[0] < 22.85 and 121.1 < lon[0] < 121.2)
+        print("   ✅ 轉換正確")
+
+    def test_2_import_full_address_csv(self):
+        """測試 2: 匯入含完整地址與經緯度的 CSV，不同寫法 (台/臺、國字數字、樓層) 查得到同一座標"""
+        print("\n🧪 測試 2: 匯入整欄地址...")
+        csv_text = "地址,緯度,經度\n臺東縣臺東市中華路一段100號,22.7562,121.1500\n臺東市更生路5號,22.7600,121.1400\n,22.0,121.0\n"
+        count = geocode_cache.import_gazetteer(io.StringIO(csv_text))
+        self.assertEqual(count, 2)
+        found = geocode_cache.lookup(["台東市中華路1段100號3樓", "更生路5號", "臺東市博愛路1號"])
+        self.assertEqual(found["台東市中華路1段100號3樓"], (22.7562, 121.15))
+        self.assertEqual(found["更生路5號"], (22.76, 121.14))
+        self.assertNotIn("臺東市博愛路1號", found)
+        print("   ✅ 匯入與查詢正確")
+
+    def test_3_import_split_columns_twd97(self):
+        """測試 3: 門牌拆欄 + TWD97 座標；未寫鄉鎮的地址遇到多鄉鎮同名門牌時不採用"""
+        print("\n🧪 測試 3: 拆欄與同名門牌...")
+        df = pd.DataFrame({
+            "縣市": ["臺東縣", "臺東縣"],
+            "鄉鎮市區": ["臺東市", "成功鎮"],
+            "街路段": ["中山路", "中山路"],
+            "號": ["010", "10"],
+            "TWD97_X": ["266000", "290000"],
+            "TWD97_Y": ["2520000", "2556000"],
+        })
+        self.assertEqual(geocode_cache.import_gazetteer(df), 2)
+        found = geocode_cache.lookup(["臺東市中山路10號", "成功鎮中山路10號", "中山路10號"])
+        self.assertAlmostEqual(found["臺東市中山路10號"][0], 22.7806, places=3)
+        self.assertGreater(found["成功鎮中山路10號"][1], found["臺東市中山路10號"][1])
+        self.assertNotIn("中山路10號", found)
+        print("   ✅ 拆欄正確、同名門牌不誤用")
+
+    def test_4_reviewer_not_overwritten(self):
+        """測試 4: 人工補登的座標不會被之後的門牌匯入覆蓋"""
+        print("\n🧪 測試 4: 人工補登...")
+        self.assertTrue(geocode_cache.save_reviewed("臺東市建和里5鄰10號", 22.71, 121.11, reviewer="admin"))
+        self.assertFalse(geocode_cache.save_reviewed("", 22.0, 121.0))
+        geocode_cache.import_gazetteer(pd.DataFrame({"地址": ["臺東市建和里5鄰10號"], "lat": [22.0], "lon": [121.0]}))
+        self.assertEqual(geocode_cache.lookup(["台東市建和里五鄰十號"]), {"台東市建和里五鄰十號": (22.71, 121.11)})
+        print("   ✅ 未被覆蓋")
+
+    def test_5_fill_missing_gps(self):
+        """測試 5: 以快取補齊長者座標，查無的長者列出待補登"""
+        print("\n🧪 測試 5: 補齊長者座標...")
+        geocode_cache.import_gazetteer(pd.DataFrame({"地址": ["臺東市中華路一段100號"], "緯度": [22.7562], "經度": [121.15]}))
+        found_id = db_manager.create_elderly_profile("張爺爺", "台東市中華路1段100號2樓", "")
+        missing_id = db_manager.create_elderly_profile("李奶奶", "臺東市博愛路1號", "")
+        located_id = db_manager.create_elderly_profile("王伯伯", "臺東市更生路5號", "", gps_lat=22.76, gps_lon=121.14)
+
+        result = geocode_cache.fill_missing_gps()
+        self.assertEqual(result['filled'], 1)
+        self.assertEqual([p['id'] for p in result['missing']], [missing_id])
+        profiles = {p['id']: p for p in db_manager.get_all_elderly()}
+        self.assertEqual((profiles[found_id]['gps_lat'], profiles[found_id]['gps_lon']), (22.7562, 121.15))
+        self.assertEqual(profiles[located_id]['gps_lat'], 22.76)
+        print("   ✅ 補齊正確")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
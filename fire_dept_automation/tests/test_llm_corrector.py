@@ -0,0 +1,95 @@
+"""
+LLM 回應 JSON 修補與 Schema 修正測試 (ocr_system/llm_corrector，ai_engine 共用)
+測試範圍：多餘逗號、markdown 區塊、截斷的物件、欄位型別錯誤、結構化回應解析
+"""
+import unittest
+import sys
+import os
+
+# 設定路徑以便導入模組 (ocr_system 以目錄內的模組名稱互相匯入)
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+ocr_system_dir = os.path.join(project_root, "ocr_system")
+if ocr_system_dir not in sys.path:
+    sys.path.insert(0, ocr_system_dir)
+
+import llm_corrector
+
+SCHEMA = llm_corrector.build_json_schema(["place_name", "address"], ["equipment"])
+
+
+class TestJsonRepair(unittest.TestCase):
+
+    def test_1_trailing_commas(self):
+        """測試 1: } 或 ] 前多餘的逗號被移除"""
+        print("\n🧪 測試 1: 多餘逗號...")
+        text = '{"place_name": "嘉音小吃店", "equipment": ["滅火器", "標示設備",],}'
+        self.assertEqual(llm_corrector.repair_json_text(text),
+                         '{"place_name": "嘉音小吃店", "equipment": ["滅火器", "標示設備"]}')
+        self.assertEqual(llm_corrector.parse_json_response(text),
+                         {"place_name": "嘉音小吃店", "equipment": ["滅火器", "標示設備"]})
+        print("   ✅ 逗號已移除")
+
+    def test_2_code_fences(self):
+        """測試 2: markdown 區塊與前後說明文字被去除"""
+        print("\n🧪 測試 2: markdown 區塊...")
+        text = '以下是結果：\n```json\n{"place_name": "嘉音小吃店", "address": null}\n```\n請確認。'
+        self.assertEqual(llm_corrector.repair_json_text(text),
+                         '{"place_name": "嘉音小吃店", "address": null}')
+        self.assertEqual(llm_corrector.parse_json_response(text),
+                         {"place_name": "嘉音小吃店", "address": None})
+        self.assertEqual(llm_corrector.repair_json_text("沒有 JSON"), "")
+        self.assertIsNone(llm_corrector.parse_json_response("沒有 JSON"))
+        print("   ✅ 區塊已去除")
+
+    def test_3_truncated_objects(self):
+        """測試 3: 截斷的字串被關閉；不完整的鍵與陣列項目被移除"""
+        print("\n🧪 測試 3: 截斷的物件...")
+        cases = {
+            '{"place_name": "嘉音", "address": "臺東': {"place_name": "嘉音", "address": "臺東"},
+            '{"place_name": "嘉音", "addr': {"place_name": "嘉音"},
+            '{"place_name": "嘉音", "address":': {"place_name": "嘉音"},
+            '{"address":': {"address": None},
+            '{"equipment": ["滅火器", "標示': {"equipment": ["滅火器"]},
+            '{"place_name": "a\\"b': {"place_name": 'a"b'},
+        }
+        for text, expected in cases.items():
+            self.assertEqual(llm_corrector.parse_json_response(text), expected, text)
+        self.assertIsNone(llm_corrector.parse_json_response('["滅火器"]'))
+        print("   ✅ 截斷的物件已修補")
+
+    def test_4_wrong_types(self):
+        """測試 4: 字串欄位收到物件/陣列、陣列欄位收到字串、"null" 字串與多餘欄位"""
+        print("\n🧪 測試 4: 欄位型別修正...")
+        data = {
+            "place_name": {"name": "嘉音", "suffix": "小吃店"},
+            "address": "null",
+            "equipment": "滅火器、標示設備，火警自動警報設備",
+            "extra": "x",
+        }
+        self.assertEqual(llm_corrector.coerce_to_schema(data, SCHEMA), {
+            "place_name": "嘉音小吃店",
+            "address": None,
+            "equipment": ["滅火器", "標示設備", "火警自動警報設備"],
+        })
+        data = {"place_name": ["臺東", "嘉音"], "address": 215, "equipment": [" 滅火器 ", "", None]}
+        self.assertEqual(llm_corrector.coerce_to_schema(data, SCHEMA), {
+            "place_name": "臺東嘉音", "address": "215", "equipment": ["滅火器"],
+        })
+        self.assertEqual(llm_corrector.coerce_to_schema({}, SCHEMA),
+                         {"place_name": None, "address": None, "equipment": []})
+        print("   ✅ 型別已修正")
+
+    def test_5_parse_structured_response(self):
+        """測試 5: parse_structured_response 修補後依欄位回傳；無法解析時各欄位為 None"""
+        print("\n🧪 測試 5: 結構化回應...")
+        fields = ["place_name", "address"]
+        self.assertEqual(llm_corrector.parse_structured_response('```json\n{"place_name": "嘉音",', fields),
+                         {"place_name": "嘉音", "address": None})
+        self.assertEqual(llm_corrector.parse_structured_response("無法辨識", fields),
+                         {"place_name": None, "address": None})
+        print("   ✅ 解析正確")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,116 @@
+"""
+共用 OCR 欄位解析器測試
+測試範圍：關鍵字比對器、第一頁欄位、目錄頁勾選模式與區段模式、重疊標籤與行號
+"""
+import unittest
+import sys
+import os
+
+# 設定路徑以便導入模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import ocr_parser
+
+EQUIPMENT = sorted([
+    "滅火器", "室內消防栓設備", "室外消防栓設備", "火警自動警報設備",
+    "警報設備", "標示設備", "避難器具", "緊急照明設備", "配線"
+], key=len, reverse=True)
+
+PAGE_ONE = "\n".join([
+    "《消防安全設備檢修申報書》",
+    "場 所 名 稱：嘉音小吃店",
+    "場所地址：台東市鐵花路215號1樓",
+    "管理權人：邱金蘭",
+    "電話：(089) 357889",
+    "檢修人員姓名：吳萬居",
+    "地址：台東市長安街92號",
+    "電話：089-339916",
+])
+
+
+class TestOcrParser(unittest.TestCase):
+
+    def test_1_automaton_overlapping_matches(self):
+        """測試 1: 比對器應找出所有重疊的模式，並依結束位置輸出"""
+        print("\n🧪 測試 1: 重疊比對...")
+        patterns = {"火警自動警報設備": "A", "警報設備": "B", "設備": "C"}
+        for automaton in (ocr_parser.KeywordScanner(patterns), ocr_parser.build_automaton(patterns)):
+            found = sorted((end, value) for end, value in automaton.iter("含火警自動警報設備"))
+            self.assertEqual(found, [(8, "A"), (8, "B"), (8, "C")])
+        ends = [end for end, _ in ocr_parser.KeywordScanner({"設備": 1, "滅火器": 2}).iter("滅火器設備設備")]
+        self.assertEqual(ends, [2, 4, 6])
+        print("   ✅ 重疊模式皆被找到")
+
+    def test_2_page_one_fields(self):
+        """測試 2: 第一頁欄位 (不被後面的檢修單位地址、電話覆蓋)"""
+        print("\n🧪 測試 2: 第一頁欄位...")
+        info = ocr_parser.extract_info_from_ocr(PAGE_ONE, equipment_list=EQUIPMENT)
+        self.assertEqual(info['場所名稱'], "嘉音小吃店")
+        self.assertEqual(info['場所地址'], "台東市鐵花路215號1樓")
+        self.assertEqual(info['管理權人'], "邱金蘭")
+        self.assertEqual(info['場所電話'], "(089)357889")
+        print(f"   ✅ {info}")
+
+    def test_3_checked_mode(self):
+        """測試 3: 勾選模式只列出有勾選符號的設備，空白方框的行排除"""
+        print("\n🧪 測試 3: 目錄頁勾選模式...")
+        toc = "\n".join([
+            "消防安全設備檢修申報書目錄",
+            "☑ 滅火器檢查表 2-1",
+            "□ 室外消防栓設備檢查表",
+            "✓ 室內消防栓檢查表 2-2",
+            "火警自動警報設備檢查表 2-13",
+        ])
+        info = ocr_parser.extract_info_from_ocr(PAGE_ONE, [PAGE_ONE, toc], equipment_list=EQUIPMENT)
+        self.assertEqual(info['消防設備種類'], "滅火器、室內消防栓設備")
+        self.assertNotIn('toc_page_num', info)
+        print(f"   ✅ {info['消防設備種類']}")
+
+    def test_4_section_mode(self):
+        """測試 4: 區段模式取「消防安全設備檢查表」之後的所有設備 (可跨行)，並記錄目錄頁碼"""
+        print("\n🧪 測試 4: 目錄頁區段模式...")
+        toc = "\n".join([
+            "附表",
+            "一、標示設備說明",
+            "二、消防安全設備檢查表",
+            "滅火器檢查表",
+            "緊急照",
+            "明設備檢查表",
+            "火警自動警報設備檢查表",
+        ])
+        info = ocr_parser.extract_info_from_ocr(
+            PAGE_ONE, [PAGE_ONE, "雜訊", toc],
+            equipment_list=EQUIPMENT,
+            toc_keywords=ocr_parser.EXTENDED_TOC_KEYWORDS,
+            toc_mode=ocr_parser.TOC_MODE_SECTION,
+            record_toc_page=True
+        )
+        self.assertEqual(info['toc_page_num'], 3)
+        self.assertEqual(info['消防設備種類'], "火警自動警報設備、緊急照明設備、警報設備、滅火器")
+        print(f"   ✅ {info['消防設備種類']}")
+
+    def test_5_normalize_equipment_str(self):
+        """測試 5: 系統資料設備字串正規化 (依標準清單順序)"""
+        print("\n🧪 測試 5: 設備字串正規化...")
+        result = ocr_parser.normalize_equipment_str("滅火器、標示 設備、不存在的設備", EQUIPMENT)
+        self.assertEqual(result, "標示設備、滅火器")
+        self.assertEqual(ocr_parser.normalize_equipment_str(None, EQUIPMENT), "")
+        print(f"   ✅ {result}")
+
+    def test_6_overlapping_labels(self):
+        """測試 6: 「場所電話：」同時是「電話」標籤；行號與原文一致；申報項目只取標準設備"""
+        print("\n🧪 測試 6: 重疊標籤...")
+        parser = ocr_parser.get_parser(tuple(EQUIPMENT))
+        text = ocr_parser.clean_text("標題\n\n場所電話：089-123456 地址：臺東市\n無標籤\n申報項目：滅火器、標示設備、不存在")
+        rows = [(idx, sorted(labels)) for idx, _, labels in parser.iter_label_values(text)]
+        self.assertEqual(rows, [(2, ["地址", "場所電話", "電話"]), (4, ["申報項目"])])
+        info = parser.parse(text)
+        self.assertEqual((info['場所電話'], info['場所地址']), ("089-123456", "臺東市"))
+        self.assertEqual(info['消防設備種類'], "標示設備、滅火器")
+        print("   ✅ 標籤與行號正確")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
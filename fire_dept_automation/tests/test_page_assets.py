@@ -0,0 +1,188 @@
+"""
+頁面影像資產測試
+測試範圍：縮圖產生、原始影像磁碟快取 (記憶體映射)、延遲載入序列、LRU 清除、由來源檔重新轉出、行程專屬目錄、延遲轉出原始頁面
+"""
+import unittest
+import sys
+import os
+import io
+import shutil
+import tempfile
+import time
+
+# 設定路徑以便導入模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import fitz  # pymupdf
+from PIL import Image
+import page_assets
+
+
+def make_page(color, size=(2480, 3508)):
+    """產生一張 A4 300 DPI 大小的測試頁面"""
+    return Image.new("RGB", size, color)
+
+
+def make_pdf(path, colors):
+    """產生每頁填滿指定顏色 (0~1 RGB) 的 PDF"""
+    doc = fitz.open()
+    for color in colors:
+        page = doc.new_page(width=200, height=300)
+        page.draw_rect(page.rect, color=color, fill=color)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+class TestPageAssets(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.store = page_assets.PageAssetStore(cache_dir=self.cache_dir, max_documents=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_1_thumbnail(self):
+        """測試 1: 縮圖縮小至指定寬度且遠小於原始影像"""
+        print("\n🧪 測試 1: 縮圖...")
+        data = page_assets.make_thumbnail(make_page("red"))
+        thumb = Image.open(io.BytesIO(data))
+        self.assertEqual(thumb.width, page_assets.THUMBNAIL_WIDTH)
+        self.assertEqual(thumb.format, page_assets.THUMBNAIL_FORMAT)
+        self.assertLess(len(data), 2480 * 3508 * 3 / 100)
+        small = Image.open(io.BytesIO(page_assets.make_thumbnail(make_page("red", (400, 300)))))
+        self.assertEqual(small.size, (400, 300))
+        print(f"   ✅ 縮圖 {len(data)} bytes")
+
+    def test_2_full_page_roundtrip(self):
+        """測試 2: 原始影像寫入磁碟後以記憶體映射讀回，內容相同"""
+        print("\n🧪 測試 2: 原始影像快取...")
+        pages = [make_page("red"), make_page("blue", (1000, 800))]
+        assets = self.store.put("doc_a", pages)
+        self.assertEqual(assets.page_count, 2)
+        self.assertEqual(assets.sizes, [(2480, 3508), (1000, 800)])
+        restored = assets.full_page(1)
+        self.assertEqual(restored.size, (1000, 800))
+        self.assertEqual(restored.getpixel((10, 10)), (0, 0, 255))
+        print("   ✅ 讀回正確")
+
+    def test_3_page_sequence(self):
+        """測試 3: 延遲載入序列可取代 PIL Image 列表 (len / 索引 / 迭代)"""
+        print("\n🧪 測試 3: 延遲載入序列...")
+        assets = self.store.put("doc_a", [make_page("red", (100, 100)), make_page("green", (100, 100))])
+        pages = assets.full_pages()
+        self.assertEqual(len(pages), 2)
+        self.assertEqual(pages[-1].getpixel((0, 0)), (0, 128, 0))
+        self.assertEqual([p.getpixel((0, 0)) for p in pages], [(255, 0, 0), (0, 128, 0)])
+        with self.assertRaises(IndexError):
+            pages[2]
+        print("   ✅ 序列正確")
+
+    def test_4_lru_eviction(self):
+        """測試 4: 超過文件數時清除最久未使用的文件"""
+        print("\n🧪 測試 4: LRU 清除...")
+        a = self.store.put("doc_a", [make_page("red", (100, 100))])
+        b = self.store.put("doc_b", [make_page("red", (100, 100))])
+        a.full_page(0)  # doc_a 變為最近使用
+        c = self.store.put("doc_c", [make_page("red", (100, 100))])
+        self.assertTrue(a.is_available())
+        self.assertFalse(b.is_available())
+        self.assertTrue(c.is_available())
+        self.assertFalse(os.path.exists(b.directory))
+        with self.assertRaises(KeyError):
+            b.full_page(0)
+        print("   ✅ 清除正確")
+
+    def test_5_byte_budget(self):
+        """測試 5: 超過容量上限時清除舊文件，但保留剛寫入的文件"""
+        print("\n🧪 測試 5: 容量上限...")
+        store = page_assets.PageAssetStore(cache_dir=self.cache_dir, max_bytes=100 * 100 * 3 * 2)
+        a = store.put("doc_a", [make_page("red", (100, 100))] * 2)
+        b = store.put("doc_b", [make_page("red", (100, 100))] * 3)
+        self.assertFalse(a.is_available())
+        self.assertTrue(b.is_available())
+        self.assertEqual(store.total_bytes, 100 * 100 * 3 * 3)
+        print("   ✅ 容量控制正確")
+
+
+    def test_6_rerender_from_source(self):
+        """測試 6: 文件被 LRU 清除後，由來源 PDF 重新轉出頁面 (不丟出 KeyError)"""
+        print("\n🧪 測試 6: 由來源檔重新轉出...")
+        pdf_path = make_pdf(os.path.join(self.cache_dir, "a.pdf"), [(1, 0, 0), (0, 0, 1)])
+        pages = [page_assets.render_page(pdf_path, i, 72) for i in range(2)]
+        a = self.store.put("doc_a", pages, source=pdf_path, dpi=72)
+        self.store.put("doc_b", [make_page("red", (100, 100))])
+        self.store.put("doc_c", [make_page("red", (100, 100))])
+        self.assertFalse(self.store.contains("doc_a"))
+        self.assertTrue(a.is_available())
+        page = a.full_page(1)
+        self.assertEqual(page.size, (200, 300))
+        self.assertEqual(page.getpixel((100, 150)), (0, 0, 255))
+        self.assertTrue(self.store.contains("doc_a"))
+        self.assertTrue(os.path.exists(a.page_path(1)))
+        print("   ✅ 重新轉出正確")
+
+    def test_7_owned_source_evicted(self):
+        """測試 7: 暫存來源檔移入文件目錄，隨文件清除後不可用 (頁面需先檢查 is_available)"""
+        print("\n🧪 測試 7: 暫存來源檔...")
+        temp_pdf = make_pdf(os.path.join(self.cache_dir, "converted.pdf"), [(0, 1, 0)])
+        a = self.store.put("doc_a", [make_page("green", (100, 100))], source=temp_pdf, dpi=72, source_owned=True)
+        self.assertFalse(os.path.exists(temp_pdf))
+        self.assertTrue(a.source.startswith(a.directory))
+        self.store.put("doc_b", [make_page("red", (100, 100))])
+        self.store.put("doc_c", [make_page("red", (100, 100))])
+        self.assertFalse(a.is_available())
+        with self.assertRaises(KeyError):
+            a.full_page(0)
+        print("   ✅ 清除後不可用")
+
+    def test_8_process_directory(self):
+        """測試 8: 共用快取使用行程專屬子目錄；只清除其他行程久未更新的目錄"""
+        print("\n🧪 測試 8: 行程專屬目錄...")
+        other_active = os.path.join(self.cache_dir, "pid_1")
+        other_stale = os.path.join(self.cache_dir, "pid_2")
+        for directory in (other_active, other_stale):
+            os.makedirs(os.path.join(directory, "doc"))
+        old = time.time() - page_assets.STALE_DIR_SECONDS - 60
+        os.utime(other_stale, (old, old))
+
+        original_root, original_store = page_assets.ASSET_CACHE_DIR, page_assets._store
+        page_assets.ASSET_CACHE_DIR, page_assets._store = self.cache_dir, None
+        try:
+            store = page_assets.get_store()
+            self.assertEqual(store.cache_dir, os.path.join(self.cache_dir, f"pid_{os.getpid()}"))
+            store.put("doc_a", [make_page("red", (100, 100))])
+            store.clear()
+        finally:
+            page_assets.ASSET_CACHE_DIR, page_assets._store = original_root, original_store
+        self.assertTrue(os.path.isdir(other_active))
+        self.assertFalse(os.path.exists(other_stale))
+        self.assertFalse(os.path.exists(store.cache_dir))
+        print("   ✅ 只清除本行程與過期目錄")
+
+    def test_9_open_source_is_lazy(self):
+        """測試 9: open_source 只產生縮圖；讀取某頁時才轉出該頁的原始解析度影像"""
+        print("\n🧪 測試 9: 延遲轉出...")
+        pdf_path = make_pdf(os.path.join(self.cache_dir, "a.pdf"), [(1, 0, 0), (0, 0, 1), (0, 1, 0)])
+        store = page_assets.PageAssetStore(cache_dir=self.cache_dir, thumbnail_width=100)
+        assets = store.open_source("doc_a", pdf_path, dpi=300)
+        self.assertEqual(assets.page_count, 3)
+        self.assertEqual(assets.sizes[0], (834, 1250))
+        self.assertEqual(Image.open(io.BytesIO(assets.thumbnail(2))).size, (100, 150))
+        self.assertEqual(store.total_bytes, 0)
+        self.assertFalse(any(os.path.exists(assets.page_path(i)) for i in range(3)))
+
+        page = assets.full_page(1)
+        self.assertEqual(page.size, assets.sizes[1])
+        self.assertEqual(page.getpixel((400, 600)), (0, 0, 255))
+        self.assertEqual([os.path.exists(assets.page_path(i)) for i in range(3)], [False, True, False])
+        self.assertEqual(store.total_bytes, 834 * 1250 * 3)
+        print("   ✅ 只轉出需要的頁面")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
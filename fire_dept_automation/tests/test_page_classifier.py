@@ -0,0 +1,87 @@
+"""
+頁面分類索引測試
+測試範圍：頁首關鍵字優先順序、目錄行比對、反向索引完整性檢查、批次檢查
+"""
+import unittest
+import sys
+import os
+
+# 設定路徑以便導入模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import page_classifier
+
+
+def legacy_identify_page_type(header_text):
+    """重構前的逐一 `in` 比對 (作為比較基準)"""
+    if not header_text:
+        return "未知頁面"
+    text = header_text.replace(" ", "").replace("\n", "")
+    for key, value in page_classifier.PAGE_TYPE_KEYWORDS:
+        if key in text:
+            return value
+    return "其他文件"
+
+
+class TestPageClassifier(unittest.TestCase):
+
+    def test_1_identify_page_type_priority(self):
+        """測試 1: 多個關鍵字同時出現時，依優先順序取第一個"""
+        print("\n🧪 測試 1: 頁首關鍵字優先順序...")
+        samples = [
+            "", "消防安全設備檢修申報書目錄", "滅火器 室內消防栓 檢查表",
+            "火警自動警報設備檢查表(含緊急廣播)", "消防設備師證書 身分證",
+            "平面圖", "檢修報告書\n排煙設備",
+        ]
+        for text in samples:
+            self.assertEqual(page_classifier.identify_page_type(text), legacy_identify_page_type(text))
+        self.assertEqual(page_classifier.identify_page_type("滅火器 室內消防栓"), "滅火器檢查表")
+        print("   ✅ 與舊版結果一致")
+
+    def test_2_match_toc_document(self):
+        """測試 2: 目錄行以前 4 字比對，共用前綴時取清單中較前者"""
+        print("\n🧪 測試 2: 目錄行比對...")
+        self.assertEqual(page_classifier.match_toc_document("☑滅火器檢表2-1"), "滅火器檢查表")
+        self.assertEqual(page_classifier.match_toc_document("消防安全設備改善計畫書"), "消防安全設備檢修申報表")
+        self.assertIsNone(page_classifier.match_toc_document("雜訊"))
+        print("   ✅ 目錄行比對正確")
+
+    def test_3_check_integrity(self):
+        """測試 3: 完整性檢查 (含 Vision AI 回傳的自由文字類型)"""
+        print("\n🧪 測試 3: 完整性檢查...")
+        page_map = {1: "消防安全設備檢修申報表", 2: "目錄", 3: "滅火器檢查表", 4: "滅火器檢查表", 5: "消防栓檢查表"}
+        report = page_classifier.check_integrity(["滅火器", "室內消防栓設備檢查表", "消防栓"], page_map)
+        self.assertEqual(report[0]['實際頁數'], "第3頁, 第4頁")
+        self.assertEqual(report[0]['狀態'], page_classifier.STATUS_OK)
+        self.assertEqual(report[1]['狀態'], page_classifier.STATUS_MISSING)
+        self.assertEqual(report[2]['實際頁數'], "第5頁")
+        print("   ✅ 報告正確")
+
+    def test_4_index_matches_pairwise(self):
+        """測試 4: 反向索引結果與逐一比對 (item in doc_type or doc_type in item) 一致"""
+        print("\n🧪 測試 4: 反向索引 vs 逐一比對...")
+        page_map = {i + 1: t for i, t in enumerate(page_classifier.KNOWN_PAGE_TYPES + ("檢修目錄", "平面圖"))}
+        index = page_classifier.PageTypeIndex(page_map)
+        items = page_classifier.STANDARD_DOCUMENTS + ["滅火器", "目錄", "平面", "消防安全設備"]
+        for item in items:
+            expected = [p for p, t in page_map.items() if item in t or t in item]
+            self.assertEqual(index.find_pages(item), expected, item)
+        print("   ✅ 結果一致")
+
+    def test_5_check_integrity_batch(self):
+        """測試 5: 批次檢查多份申報案件"""
+        print("\n🧪 測試 5: 批次檢查...")
+        results = page_classifier.check_integrity_batch({
+            "A001": (["滅火器檢查表"], {1: "滅火器檢查表"}),
+            "A002": (["滅火器檢查表", "排煙設備檢查表"], {1: "目錄", 2: "排煙設備檢查表"}),
+        })
+        self.assertEqual(results["A001"]["missing"], [])
+        self.assertEqual(results["A002"]["missing"], ["滅火器檢查表"])
+        print("   ✅ 批次結果正確")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
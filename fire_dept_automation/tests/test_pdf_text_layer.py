@@ -0,0 +1,111 @@
+"""
+PDF 文字層擷取測試
+測試範圍：文字層可信度判斷、Wingdings 勾選框轉換、區塊排序、掃描頁交給 OCR、路徑 / bytes 輸入
+"""
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+
+# 設定路徑以便導入模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import fitz  # pymupdf
+import pdf_text_layer
+
+HEADER = "消防安全設備檢修申報書"
+PLACE_LINE = "場所名稱: 嘉音小吃店 場所地址: 臺東市鐵花路215號"
+
+
+def make_text_page(doc, lines):
+    """建立數位頁面 (lines: [(y 座標, 文字)])"""
+    page = doc.new_page()
+    for y, text in lines:
+        page.insert_text((50, y), text, fontname="china-t")
+    return page
+
+
+def make_scanned_page(doc, header=None):
+    """建立掃描頁 (整頁影像，可加上一行頁首文字)"""
+    page = doc.new_page()
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 60, 80), False)
+    pix.set_rect(pix.irect, (240, 240, 240))
+    page.insert_image(page.rect, pixmap=pix)
+    if header:
+        page.insert_text((50, 30), header, fontname="china-t")
+    return page
+
+
+class TestPdfTextLayer(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_1_plausible_text(self):
+        """測試 1: 正常中文可用；過短、無中文、亂碼過多時不可用"""
+        print("\n🧪 測試 1: 文字層可信度...")
+        self.assertTrue(pdf_text_layer.is_plausible_text(f"{HEADER}\n{PLACE_LINE}"))
+        self.assertFalse(pdf_text_layer.is_plausible_text("第 1 頁"))
+        self.assertFalse(pdf_text_layer.is_plausible_text("Page 1 of 3 - generated by printer driver"))
+        garbled = HEADER + "\ufffd" * 10 + "\ue123" * 10
+        self.assertFalse(pdf_text_layer.is_plausible_text(garbled))
+        print("   ✅ 判斷正確")
+
+    def test_2_normalize_glyphs(self):
+        """測試 2: Wingdings 勾選框轉為 ☑ / □，轉換後不算亂碼"""
+        print("\n🧪 測試 2: 勾選框轉換...")
+        raw = "\uf0fe滅火器 \uf0a8室內消防栓設備 \uf06f自動撒水設備"
+        self.assertEqual(pdf_text_layer.normalize_glyphs(raw), "☑滅火器 □室內消防栓設備 □自動撒水設備")
+        self.assertTrue(pdf_text_layer.is_plausible_text(pdf_text_layer.normalize_glyphs(raw * 2)))
+        print("   ✅ 轉換正確")
+
+    def test_3_block_order(self):
+        """測試 3: 文字區塊依座標由上而下排序 (與寫入順序無關)"""
+        print("\n🧪 測試 3: 區塊排序...")
+        with fitz.open() as doc:
+            page = make_text_page(doc, [(200, PLACE_LINE), (100, HEADER)])
+            text = pdf_text_layer.page_text_layer(page)
+        self.assertEqual(text.split("\n"), [HEADER, PLACE_LINE])
+        print("   ✅ 排序正確")
+
+    def test_4_scanned_page_needs_ocr(self):
+        """測試 4: 掃描頁 (整頁影像，僅有頁首文字) 回傳 None"""
+        print("\n🧪 測試 4: 掃描頁...")
+        with fitz.open() as doc:
+            doc.new_page()
+            make_scanned_page(doc, header=HEADER + " 第 1 頁 共 3 頁 " + PLACE_LINE)
+            self.assertIsNone(pdf_text_layer.page_text_layer(doc[0]))
+            self.assertIsNone(pdf_text_layer.page_text_layer(doc[1]))
+        print("   ✅ 交給 OCR")
+
+    def test_5_extract_from_path_and_bytes(self):
+        """測試 5: 路徑、bytes 與 file-like 輸入結果一致；無法開啟時回傳空列表"""
+        print("\n🧪 測試 5: 整份文件擷取...")
+        path = os.path.join(self.temp_dir, "申報書.pdf")
+        with fitz.open() as doc:
+            make_text_page(doc, [(100, HEADER), (140, PLACE_LINE)])
+            make_scanned_page(doc)
+            doc.save(path)
+
+        layers = pdf_text_layer.extract_text_layers(path)
+        self.assertEqual(len(layers), 2)
+        self.assertIn("嘉音小吃店", layers[0])
+        self.assertIsNone(layers[1])
+        with open(path, "rb") as f:
+            data = f.read()
+        self.assertEqual(pdf_text_layer.extract_text_layers(data), layers)
+        with open(path, "rb") as f:
+            self.assertEqual(pdf_text_layer.extract_text_layers(f), layers)
+        self.assertEqual(pdf_text_layer.extract_text_layers(b"not a pdf"), [])
+        print("   ✅ 擷取正確")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
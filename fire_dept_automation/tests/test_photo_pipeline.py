@@ -0,0 +1,131 @@
+"""
+送達證明照片處理管線測試 (photo_pipeline)
+測試範圍：背景處理與縮圖、EXIF 轉正、內容定址去重、無法解碼的原檔保留、重啟補處理與報表縮圖
+"""
+import unittest
+import sys
+import os
+import io
+import shutil
+import tempfile
+from PIL import Image
+
+# 設定路徑以便導入模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import photo_pipeline
+
+
+def make_jpeg(width, height, color=(200, 50, 50), orientation=None):
+    """產生測試用 JPEG (可指定 EXIF Orientation)"""
+    image = Image.new("RGB", (width, height), color)
+    buffer = io.BytesIO()
+    if orientation:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        image.save(buffer, "JPEG", exif=exif)
+    else:
+        image.save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+class TestPhotoPipeline(unittest.TestCase):
+
+    def setUp(self):
+        """每個測試使用獨立的照片目錄"""
+        self.root = tempfile.mkdtemp()
+        self.pipeline = photo_pipeline.PhotoPipeline(root=self.root, workers=2)
+
+    def tearDown(self):
+        self.pipeline.shutdown()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_1_async_resize_and_thumbnail(self):
+        """測試 1: 立即回傳路徑，背景完成 800px 照片與縮圖，暫存檔移除"""
+        print("\n🧪 測試 1: 背景處理...")
+        data = make_jpeg(2400, 1800)
+        photo_path = self.pipeline.submit(io.BytesIO(data))
+        digest = photo_pipeline.content_hash(data)
+        self.assertEqual(photo_path, photo_pipeline.proof_paths(digest, self.root)[0])
+
+        self.assertTrue(self.pipeline.wait(timeout=30))
+        self.assertEqual(Image.open(photo_path).size, (800, 600))
+        thumb = photo_pipeline.thumbnail_path(photo_path, self.root)
+        self.assertEqual(Image.open(thumb).size, (photo_pipeline.THUMB_SIZE, 120))
+        self.assertEqual(os.listdir(os.path.join(self.root, "incoming")), [])
+        self.assertEqual(self.pipeline.pending_count(), 0)
+        print("   ✅ 照片與縮圖完成")
+
+    def test_2_exif_orientation(self):
+        """測試 2: 手機直拍照片 (EXIF Orientation=6) 轉正後寬高對調"""
+        print("\n🧪 測試 2: EXIF 轉正...")
+        photo_path = self.pipeline.submit(make_jpeg(1600, 1200, orientation=6))
+        self.pipeline.wait(timeout=30)
+        self.assertEqual(Image.open(photo_path).size, (800, 1067))
+        print("   ✅ 已轉正")
+
+    def test_3_deduplicate(self):
+        """測試 3: 同一張照片重複上傳只處理、儲存一份"""
+        print("\n🧪 測試 3: 內容定址去重...")
+        data = make_jpeg(1000, 1000)
+        first = self.pipeline.submit(data)
+        second = self.pipeline.submit(io.BytesIO(data))
+        self.pipeline.wait(timeout=30)
+        third = self.pipeline.submit(data)
+        other = self.pipeline.submit(make_jpeg(1000, 1000, color=(0, 0, 255)))
+        self.pipeline.wait(timeout=30)
+
+        self.assertEqual(first, second)
+        self.assertEqual(first, third)
+        self.assertNotEqual(first, other)
+        stored = [f for d in os.listdir(self.root) if len(d) == 2 for f in os.listdir(os.path.join(self.root, d))]
+        self.assertEqual(len(stored), 2)
+        print("   ✅ 重複上傳只存一份")
+
+    def test_4_undecodable_and_recover(self):
+        """測試 4: 無法解碼的檔案保留原檔；重啟後補處理暫存區中未完成的照片"""
+        print("\n🧪 測試 4: 原檔保留與補處理...")
+        broken = b"not an image"
+        photo_path = self.pipeline.submit(broken)
+        self.pipeline.wait(timeout=30)
+        with open(photo_path, "rb") as f:
+            self.assertEqual(f.read(), broken)
+        self.assertIsNone(photo_pipeline.thumbnail_data_uri(photo_path, self.root))
+
+        # 模擬上次執行中斷：暫存檔存在但尚未處理
+        data = make_jpeg(900, 300)
+        digest = photo_pipeline.content_hash(data)
+        with open(os.path.join(self.root, "incoming", f"{digest}.upload"), "wb") as f:
+            f.write(data)
+        self.assertEqual(self.pipeline.recover(), 1)
+        self.pipeline.wait(timeout=30)
+        self.assertTrue(os.path.exists(photo_pipeline.proof_paths(digest, self.root)[0]))
+        print("   ✅ 原檔保留、已補處理")
+
+    def test_5_thumbnail_data_uri(self):
+        """測試 5: 報表縮圖 — 新照片讀預先產生的縮圖，舊照片即時縮小，缺檔回傳 None"""
+        print("\n🧪 測試 5: 報表縮圖...")
+        photo_path = self.pipeline.submit(make_jpeg(1200, 900))
+        self.pipeline.wait(timeout=30)
+        uri = photo_pipeline.thumbnail_data_uri(photo_path, self.root)
+        self.assertTrue(uri.startswith("data:image/jpeg;base64,"))
+
+        legacy_dir = os.path.join(self.root, "202601")
+        os.makedirs(legacy_dir)
+        legacy_path = os.path.join(legacy_dir, "12_20260105_093000.jpg")
+        with open(legacy_path, "wb") as f:
+            f.write(make_jpeg(800, 600))
+        self.assertIsNone(photo_pipeline.thumbnail_path(legacy_path, self.root))
+        legacy_uri = photo_pipeline.thumbnail_data_uri(legacy_path, self.root)
+        self.assertTrue(legacy_uri.startswith("data:image/jpeg;base64,"))
+
+        self.assertIsNone(photo_pipeline.thumbnail_data_uri(None, self.root))
+        self.assertIsNone(photo_pipeline.thumbnail_data_uri(os.path.join(legacy_dir, "missing.jpg"), self.root))
+        print("   ✅ 縮圖正確")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
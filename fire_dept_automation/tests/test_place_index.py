@@ -0,0 +1,93 @@
+"""
+場所名稱索引測試
+測試範圍：自動對應 (與原本逐列比對一致)、側邊欄搜尋、相似度排序、索引快取
+"""
+import unittest
+import sys
+import os
+import random
+
+# 設定路徑以便導入模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import pandas as pd
+import place_index
+
+NAMES = ["臺東轉運站", "嘉音小吃店", "知本溫泉飯店", "台東縣立體育場", "鳳仙旅社", "嘉音小吃店"]
+
+
+def legacy_match(df, ocr_name):
+    """重構前的逐列比對 (作為比較基準)"""
+    match = df[df['場所名稱'] == ocr_name]
+    if not match.empty:
+        return df.index.get_loc(match.index[0])
+    clean_ocr = ocr_name.replace("台", "臺").replace(" ", "")
+    for pos, (_, row) in enumerate(df.iterrows()):
+        clean_sys = str(row['場所名稱']).replace("台", "臺").replace(" ", "")
+        if clean_ocr and (clean_ocr in clean_sys or clean_sys in clean_ocr):
+            return pos
+    return None
+
+
+class TestPlaceIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({'場所名稱': NAMES, '地址': [f"地址{i}" for i in range(len(NAMES))]})
+        self.index = place_index.get_place_index(self.df)
+
+    def test_1_match(self):
+        """測試 1: 完全符合、台/臺差異、互相包含"""
+        print("\n🧪 測試 1: 自動對應...")
+        self.assertEqual(self.index.match("嘉音小吃店"), 1)
+        self.assertEqual(self.index.match("臺東縣立體育場"), 3)
+        self.assertEqual(self.index.match("知本溫泉"), 2)
+        self.assertEqual(self.index.match("臺東縣鳳仙旅社"), 4)
+        self.assertIsNone(self.index.match("不存在的場所"))
+        print("   ✅ 對應正確")
+
+    def test_2_match_parity(self):
+        """測試 2: 隨機名稱與查詢，結果與原本的逐列比對一致"""
+        print("\n🧪 測試 2: 與逐列比對一致...")
+        rng = random.Random(0)
+        chars = "臺台東市中華路小吃店旅社溫泉飯店國小 "
+        names = ["".join(rng.choice(chars) for _ in range(rng.randint(1, 8))) for _ in range(300)]
+        df = pd.DataFrame({'場所名稱': names})
+        index = place_index.PlaceIndex(names)
+        queries = [rng.choice(names)[rng.randint(0, 2):] for _ in range(50)]
+        queries += ["".join(rng.choice(chars) for _ in range(rng.randint(1, 6))) for _ in range(50)]
+        for query in queries:
+            self.assertEqual(index.match(query), legacy_match(df, query), query)
+        print("   ✅ 結果一致")
+
+    def test_3_search(self):
+        """測試 3: 側邊欄搜尋忽略台/臺差異，名稱不重複且依列順序"""
+        print("\n🧪 測試 3: 側邊欄搜尋...")
+        self.assertEqual(self.index.search("台東"), ["臺東轉運站", "台東縣立體育場"])
+        self.assertEqual(self.index.search("嘉音"), ["嘉音小吃店"])
+        self.assertEqual(self.index.search(""), self.index.unique_names)
+        print("   ✅ 搜尋正確")
+
+    def test_4_top_k(self):
+        """測試 4: OCR 有錯字時依相似度列出候選"""
+        print("\n🧪 測試 4: 相似度排序...")
+        candidates = self.index.top_k("知本温泉飯店", k=2)
+        self.assertEqual(candidates[0][:2], (2, "知本溫泉飯店"))
+        self.assertGreaterEqual(candidates[0][2], 0.5)
+        self.assertEqual(self.index.top_k(""), [])
+        print(f"   ✅ {candidates}")
+
+    def test_5_index_cache(self):
+        """測試 5: 同一份名稱只建立一次索引，名稱改變時重建"""
+        print("\n🧪 測試 5: 索引快取...")
+        self.assertIs(place_index.get_place_index(self.df.copy()), self.index)
+        changed = self.df.copy()
+        changed.loc[0, '場所名稱'] = "新場所"
+        self.assertIsNot(place_index.get_place_index(changed), self.index)
+        print("   ✅ 快取正確")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
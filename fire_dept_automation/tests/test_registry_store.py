@@ -0,0 +1,161 @@
+"""
+列管場所資料快取測試
+測試範圍：第一次解析後改讀快取、內容改變時更新、覆蓋相同內容不重新解析、型別還原、快取資料庫位置、上傳檔快取上限
+"""
+import unittest
+import sys
+import os
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+# 設定路徑以便導入模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import pandas as pd
+import registry_store
+
+
+class CountingReader:
+    """模擬 Excel 解析 (依檔案內容產生資料，並記錄解析次數)"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, source, header=registry_store.DEFAULT_HEADER_ROW):
+        self.calls += 1
+        with open(source, encoding='utf-8') as f:
+            names = f.read().split(",")
+        return pd.DataFrame({
+            '場所名稱': names,
+            '列管編號': range(1, len(names) + 1),
+            '備註': [None] + ["x"] * (len(names) - 1),
+            '檢修日期': pd.to_datetime(["2024-01-02"] * len(names)),
+        })
+
+
+class TestRegistryStore(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, "registry_cache.db")
+        self.source = os.path.join(self.temp_dir, "00. 列管場所資料.xls")
+        self._write("嘉音小吃店,鳳仙旅社")
+        self.reader = CountingReader()
+        registry_store.invalidate(db_path=self.db_path)
+
+    def tearDown(self):
+        registry_store.invalidate(db_path=self.db_path)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _write(self, content, mtime=None):
+        with open(self.source, 'w', encoding='utf-8') as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(self.source, (mtime, mtime))
+
+    def _load(self):
+        return registry_store.load_registry(self.source, db_path=self.db_path, reader=self.reader)
+
+    def test_1_cache_hit(self):
+        """測試 1: 第二次讀取 (含清除行程內快取後) 不再解析 Excel"""
+        print("\n🧪 測試 1: 快取命中...")
+        first = self._load()
+        registry_store._memo.clear()  # 模擬重新啟動 / 快取被清除
+        second = self._load()
+        self.assertEqual(self.reader.calls, 1)
+        pd.testing.assert_frame_equal(first, second)
+        print("   ✅ 只解析一次")
+
+    def test_2_refresh_on_change(self):
+        """測試 2: 來源檔內容改變時自動重新解析"""
+        print("\n🧪 測試 2: 來源改變...")
+        self._load()
+        self._write("嘉音小吃店,鳳仙旅社,知本溫泉飯店", mtime=os.path.getmtime(self.source) + 10)
+        df = self._load()
+        self.assertEqual(self.reader.calls, 2)
+        self.assertEqual(len(df), 3)
+        print("   ✅ 已重新解析")
+
+    def test_3_same_content_touched(self):
+        """測試 3: 只有 mtime 改變 (內容雜湊相同) 時不重新解析"""
+        print("\n🧪 測試 3: 內容相同...")
+        self._load()
+        os.utime(self.source, (os.path.getmtime(self.source) + 10,) * 2)
+        self._load()
+        self.assertEqual(self.reader.calls, 1)
+        print("   ✅ 雜湊相同，沿用快取")
+
+    def test_4_dtypes_restored(self):
+        """測試 4: 快取讀回的欄位名稱、日期與空值與原始解析結果一致"""
+        print("\n🧪 測試 4: 型別還原...")
+        self._load()
+        registry_store._memo.clear()
+        df = self._load()
+        self.assertEqual(list(df.columns), ['場所名稱', '列管編號', '備註', '檢修日期'])
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df['檢修日期']))
+        self.assertTrue(pd.isna(df['備註'][0]))
+        print("   ✅ 型別一致")
+
+    def test_5_returned_copy(self):
+        """測試 5: 呼叫端修改回傳的 DataFrame 不影響快取"""
+        print("\n🧪 測試 5: 回傳副本...")
+        df = self._load()
+        df.loc[0, '場所名稱'] = "已修改"
+        self.assertEqual(self._load().loc[0, '場所名稱'], "嘉音小吃店")
+        print("   ✅ 快取未被修改")
+
+    def test_6_default_db_path(self):
+        """測試 6: 快取資料庫放在設定的資料目錄或 Excel 旁，不寫到目前工作目錄"""
+        print("\n🧪 測試 6: 快取位置...")
+        ocr_config = {k: v for k, v in registry_store.config_loader.CONFIG.get("ocr", {}).items()
+                      if k != "registry_cache_dir"}
+        with mock.patch.dict(registry_store.config_loader.CONFIG, {"ocr": ocr_config}):
+            self.assertEqual(registry_store.default_db_path(self.source),
+                             os.path.join(self.temp_dir, registry_store.REGISTRY_DB_NAME))
+            self.assertEqual(registry_store.default_db_path(None),
+                             os.path.join(registry_store.APP_DIR, registry_store.REGISTRY_DB_NAME))
+            with mock.patch.object(registry_store.os, "access", return_value=False):
+                self.assertEqual(os.path.dirname(registry_store.default_db_path(self.source)), registry_store.APP_DIR)
+
+            registry_store.load_registry(self.source, reader=self.reader)
+            self.assertTrue(os.path.exists(os.path.join(self.temp_dir, registry_store.REGISTRY_DB_NAME)))
+            registry_store.invalidate(self.source)
+
+        data_dir = os.path.join(self.temp_dir, "data")
+        with mock.patch.dict(registry_store.config_loader.CONFIG, {"ocr": dict(ocr_config, registry_cache_dir=data_dir)}):
+            self.assertEqual(registry_store.default_db_path(self.source),
+                             os.path.join(data_dir, registry_store.REGISTRY_DB_NAME))
+            self.assertTrue(os.path.isdir(data_dir))
+        print("   ✅ 位置正確")
+
+    def test_7_upload_entries_evicted(self):
+        """測試 7: 上傳檔以內容雜湊快取，只保留最近幾份，較舊的版本資訊與資料表被刪除"""
+        print("\n🧪 測試 7: 上傳檔快取上限...")
+
+        def upload_reader(source, header=registry_store.DEFAULT_HEADER_ROW):
+            return pd.DataFrame({'場所名稱': source.getvalue().decode('utf-8').split(",")})
+
+        keep = registry_store.MAX_UPLOAD_ENTRIES
+        for i in range(keep + 2):
+            df = registry_store.load_registry(io.BytesIO(f"場所{i},鳳仙旅社".encode('utf-8')),
+                                              db_path=self.db_path, reader=upload_reader)
+            self.assertEqual(df['場所名稱'][0], f"場所{i}")
+        self._load()
+
+        conn = registry_store.get_connection(self.db_path)
+        uploads = conn.execute("SELECT COUNT(*) FROM registry_sources WHERE source_key LIKE 'upload:%'").fetchone()[0]
+        sources = conn.execute("SELECT COUNT(*) FROM registry_sources").fetchone()[0]
+        tables = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' "
+                              "AND name LIKE 'registry_rows_%'").fetchone()[0]
+        conn.close()
+        self.assertEqual((uploads, sources, tables), (keep, keep + 1, keep + 1))
+        print("   ✅ 只保留最近的上傳檔")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
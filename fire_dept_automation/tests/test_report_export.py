@@ -0,0 +1,165 @@
+"""
+送餐報表串流匯出測試
+測試範圍：cursor 分批讀取、伺服器端分頁、SQL 彙總、CSV / XLSX 分批寫入、總筆數與彙總一致、過期匯出檔清除
+"""
+import unittest
+import sys
+import os
+import csv
+import time
+
+# 設定路徑以便導入模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import db_manager
+from temp_db import TempDBTestCase, reset_meal_tables
+import report_export
+
+DATES = ["2026-01-01", "2026-01-02", "2026-01-03"]
+ELDERLY_PER_ROUTE = 10
+
+
+class TestReportExport(TempDBTestCase):
+
+    DB_FILE = "test_report.db"
+    RESET_MEAL_TABLES = False
+
+    @classmethod
+    def setUpClass(cls):
+        """使用暫存資料庫，建立 2 條路線 x 3 天 x 10 位長者 = 60 筆紀錄 (每條路線每天 1 筆異常)"""
+        super().setUpClass()
+        reset_meal_tables()
+
+        for route_name in ["東區", "西區"]:
+            route_id = db_manager.create_delivery_route(route_name)
+            elderly_ids = [db_manager.create_elderly_profile(f"{route_name}長者{i}", "臺東市", "", route_id=route_id, sequence=i)
+                           for i in range(ELDERLY_PER_ROUTE)]
+            for date in DATES:
+                task_id = db_manager.create_daily_task(date, route_id, "volunteer1")
+                for i, elderly_id in enumerate(elderly_ids):
+                    if i == 0:
+                        db_manager.create_delivery_record(task_id, elderly_id, status="異常", abnormal_reason="不在家")
+                    else:
+                        db_manager.create_delivery_record(task_id, elderly_id, volunteer_id="volunteer1")
+
+    def test_1_iter_in_chunks(self):
+        """測試 1: 分批讀取的總數與順序和一次讀取相同"""
+        print("\n🧪 測試 1: cursor 分批讀取...")
+        chunks = list(db_manager.iter_delivery_reports(DATES[0], DATES[-1], chunk_size=25))
+        self.assertEqual([len(chunk) for chunk in chunks], [25, 25, 10])
+        flat = [tuple(row) for chunk in chunks for row in chunk]
+        self.assertEqual(flat, [tuple(row) for row in db_manager.get_delivery_reports(DATES[0], DATES[-1])])
+        self.assertEqual(flat[0][0], DATES[-1])
+        print("   ✅ 分批正確")
+
+    def test_2_pagination(self):
+        """測試 2: 分頁結果串接後等於完整結果，總筆數正確"""
+        print("\n🧪 測試 2: 伺服器端分頁...")
+        self.assertEqual(db_manager.count_delivery_reports(DATES[0], DATES[-1]), 60)
+        self.assertEqual(db_manager.count_delivery_reports(DATES[0], DATES[0]), 20)
+        pages = [db_manager.get_delivery_reports_page(DATES[0], DATES[-1], page, 40) for page in (1, 2, 3)]
+        self.assertEqual([len(p) for p in pages], [40, 20, 0])
+        full = db_manager.get_delivery_reports(DATES[0], DATES[-1])
+        self.assertEqual([tuple(r) for r in pages[0] + pages[1]], [tuple(r) for r in full])
+        print("   ✅ 分頁正確")
+
+    def test_3_summary(self):
+        """測試 3: 各路線與每日彙總 (已送達 / 異常)"""
+        print("\n🧪 測試 3: 彙總...")
+        by_route = {r['route_name']: r for r in db_manager.get_delivery_report_summary(DATES[0], DATES[-1], "route")}
+        self.assertEqual(set(by_route), {"東區", "西區"})
+        self.assertEqual((by_route["東區"]['visited_stops'], by_route["東區"]['delivered'], by_route["東區"]['abnormal']), (30, 27, 3))
+        by_date = db_manager.get_delivery_report_summary(DATES[0], DATES[-1], "date")
+        self.assertEqual([r['date'] for r in by_date], DATES)
+        self.assertEqual([r['abnormal'] for r in by_date], [2, 2, 2])
+        with self.assertRaises(ValueError):
+            db_manager.get_delivery_report_summary(DATES[0], DATES[-1], "volunteer; DROP TABLE")
+        print("   ✅ 彙總正確")
+
+    def test_4_export_csv(self):
+        """測試 4: CSV 匯出 (含 BOM 與中文標題)，內容與查詢結果一致"""
+        print("\n🧪 測試 4: CSV 匯出...")
+        path, count = report_export.export_delivery_report(DATES[0], DATES[-1], "csv", chunk_size=7)
+        try:
+            self.assertEqual(count, 60)
+            with open(path, encoding="utf-8-sig", newline="") as f:
+                rows = list(csv.reader(f))
+            self.assertEqual(rows[0], [label for _, label in report_export.REPORT_COLUMNS])
+            self.assertEqual(len(rows), 61)
+            with open(path, "rb") as f:
+                self.assertTrue(f.read(3) == b"\xef\xbb\xbf")
+            abnormal = [r for r in rows[1:] if r[4] == "異常"]
+            self.assertEqual(len(abnormal), 6)
+            self.assertTrue(all(r[5] == "不在家" for r in abnormal))
+        finally:
+            os.remove(path)
+        print("   ✅ CSV 正確")
+
+    @unittest.skipUnless(report_export._openpyxl_available, "openpyxl 未安裝")
+    def test_5_export_xlsx(self):
+        """測試 5: XLSX 匯出 (write-only)，不支援的格式回報錯誤"""
+        print("\n🧪 測試 5: XLSX 匯出...")
+        from openpyxl import load_workbook
+        path, count = report_export.export_delivery_report(DATES[0], DATES[0], "xlsx")
+        try:
+            self.assertEqual(count, 20)
+            sheet = load_workbook(path, read_only=True).active
+            rows = list(sheet.iter_rows(values_only=True))
+            self.assertEqual(rows[0][0], "日期")
+            self.assertEqual(len(rows), 21)
+            self.assertTrue(all(row[0] == DATES[0] for row in rows[1:]))
+        finally:
+            os.remove(path)
+        with self.assertRaises(ValueError):
+            report_export.export_delivery_report(DATES[0], DATES[0], "pdf")
+        print("   ✅ XLSX 正確")
+
+    def test_6_count_matches_summary(self):
+        """測試 6: 長者資料已刪除的紀錄仍列入明細與總筆數，與彙總的已拜訪數一致"""
+        print("\n🧪 測試 6: 總筆數與彙總一致...")
+        date = "2026-02-01"
+        route_id = db_manager.create_delivery_route("南區")
+        elderly_ids = [db_manager.create_elderly_profile(f"南區長者{i}", "臺東市", "", route_id=route_id, sequence=i)
+                       for i in range(3)]
+        task_id = db_manager.create_daily_task(date, route_id, "volunteer1")
+        for elderly_id in elderly_ids:
+            db_manager.create_delivery_record(task_id, elderly_id, volunteer_id="volunteer1")
+        conn = db_manager.get_connection()
+        conn.execute("DELETE FROM elderly_profiles WHERE id = ?", (elderly_ids[0],))
+        conn.commit()
+        conn.close()
+
+        summary = db_manager.get_delivery_report_summary(date, date, "route")
+        self.assertEqual(db_manager.count_delivery_reports(date, date), sum(r['visited_stops'] for r in summary))
+        rows = db_manager.get_delivery_reports(date, date)
+        self.assertEqual(len(rows), 3)
+        self.assertIn("(已刪除的個案)", [r['elderly_name'] for r in rows])
+        print("   ✅ 筆數一致")
+
+    def test_7_stale_exports_removed(self):
+        """測試 7: 匯出檔寫在匯出目錄，每次匯出前刪除超過保留時間的舊檔"""
+        print("\n🧪 測試 7: 過期匯出檔...")
+        export_dir = os.path.join(self.temp_dir, "exports")
+        os.makedirs(export_dir)
+        stale = os.path.join(export_dir, "delivery_report_old.csv")
+        recent = os.path.join(export_dir, "delivery_report_recent.csv")
+        for path in (stale, recent):
+            with open(path, "w") as f:
+                f.write("x")
+        old = time.time() - report_export.EXPORT_TTL - 60
+        os.utime(stale, (old, old))
+
+        path, _ = report_export.export_delivery_report(DATES[0], DATES[0], "csv", export_dir=export_dir)
+        self.assertEqual(os.path.dirname(path), export_dir)
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(recent))
+        self.assertEqual(report_export.cleanup_exports(export_dir, now=time.time() + report_export.EXPORT_TTL + 60), 2)
+        self.assertEqual(os.listdir(export_dir), [])
+        print("   ✅ 舊檔已刪除")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,107 @@
+"""
+送餐路線順序最佳化測試
+測試範圍：haversine 距離、最近鄰居 + 區域搜尋、起點固定、寫回資料庫、無座標站點
+"""
+import unittest
+import sys
+import os
+import numpy as np
+
+# 設定路徑以便導入模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import db_manager
+from temp_db import TempDBTestCase
+import route_optimizer
+
+# 臺東市區附近
+BASE_LAT, BASE_LON = 22.7583, 121.1444
+
+
+def line_points(n, step=0.001):
+    """沿經度排成一直線的站點 (最佳順序即為由西向東)"""
+    return [BASE_LAT] * n, [BASE_LON + i * step for i in range(n)]
+
+
+class TestRouteOptimizer(TempDBTestCase):
+
+    DB_FILE = "test_routes.db"
+
+    def test_1_haversine(self):
+        """測試 1: 距離矩陣對稱、對角線為 0，經度 0.01 度約 1.03 公里"""
+        print("\n🧪 測試 1: haversine 距離...")
+        dist = route_optimizer.haversine_matrix([BASE_LAT, BASE_LAT, 22.8], [BASE_LON, BASE_LON + 0.01, 121.2])
+        self.assertTrue(np.allclose(dist, dist.T))
+        self.assertTrue(np.allclose(np.diag(dist), 0))
+        self.assertAlmostEqual(dist[0, 1], 1.026, places=2)
+        print("   ✅ 距離正確")
+
+    def test_2_recovers_line_order(self):
+        """測試 2: 打亂的直線站點可還原為由起點依序前進"""
+        print("\n🧪 測試 2: 直線路徑...")
+        lats, lons = line_points(30)
+        rng = np.random.default_rng(0)
+        perm = np.concatenate([[0], rng.permutation(np.arange(1, 30))])
+        dist = route_optimizer.haversine_matrix(np.array(lats)[perm], np.array(lons)[perm])
+        order, length = route_optimizer.solve_route_order(dist, start=0)
+        self.assertEqual(perm[order].tolist(), list(range(30)))
+        self.assertAlmostEqual(length, dist[0].max(), places=6)
+        print("   ✅ 順序正確")
+
+    def test_3_local_search_improves(self):
+        """測試 3: 隨機站點下 2-opt / Or-opt 不劣於最近鄰居法，且起點不變"""
+        print("\n🧪 測試 3: 區域搜尋...")
+        rng = np.random.default_rng(1)
+        dist = route_optimizer.haversine_matrix(BASE_LAT + rng.random(80) * 0.05, BASE_LON + rng.random(80) * 0.05)
+        nn_length = route_optimizer.path_length(route_optimizer.nearest_neighbour(dist, 5), dist)
+        order, length = route_optimizer.solve_route_order(dist, start=5, time_budget=2.0)
+        self.assertEqual(order[0], 5)
+        self.assertEqual(sorted(order), list(range(80)))
+        self.assertLess(length, nn_length)
+        self.assertAlmostEqual(length, route_optimizer.path_length(order, dist), places=9)
+        print(f"   ✅ {nn_length:.2f} km -> {length:.2f} km")
+
+    def test_4_optimize_route_writes_back(self):
+        """測試 4: 寫回 sequence 與 delivery_routes.estimated_time，取回時依新順序排列"""
+        print("\n🧪 測試 4: 寫回資料庫...")
+        route_id = db_manager.create_delivery_route("測試路線A")
+        lats, lons = line_points(6, step=0.01)
+        shuffled = [0, 3, 5, 1, 4, 2]
+        ids = {}
+        for seq, i in enumerate(shuffled, start=1):
+            ids[i] = db_manager.create_elderly_profile(f"長者{i}", "臺東市", "", lats[i], lons[i],
+                                                       route_id=route_id, sequence=seq)
+
+        result = route_optimizer.optimize_route(route_id)
+        self.assertEqual(result['ordered_ids'], [ids[i] for i in range(6)])
+        self.assertLess(result['after_km'], result['before_km'])
+
+        stored = db_manager.get_elderly_by_route(route_id)
+        self.assertEqual([p['id'] for p in stored], result['ordered_ids'])
+        self.assertEqual([p['sequence'] for p in stored], [1, 2, 3, 4, 5, 6])
+        route = [r for r in db_manager.get_all_routes() if r['id'] == route_id][0]
+        self.assertEqual(route['estimated_time'], result['estimated_time'])
+        self.assertEqual(result['estimated_time'], route_optimizer.estimate_minutes(result['after_km'], 6))
+        print("   ✅ 已寫回")
+
+    def test_5_missing_gps_and_preview(self):
+        """測試 5: 無座標的長者排在最後；apply=False 時不寫入"""
+        print("\n🧪 測試 5: 無座標站點...")
+        route_id = db_manager.create_delivery_route("測試路線B")
+        no_gps = db_manager.create_elderly_profile("無座標", "臺東市", "", route_id=route_id, sequence=1)
+        far = db_manager.create_elderly_profile("遠", "臺東市", "", BASE_LAT, BASE_LON + 0.02, route_id=route_id, sequence=2)
+        start = db_manager.create_elderly_profile("起點", "臺東市", "", BASE_LAT, BASE_LON, route_id=route_id, sequence=3)
+        near = db_manager.create_elderly_profile("近", "臺東市", "", BASE_LAT, BASE_LON + 0.01, route_id=route_id, sequence=4)
+
+        preview = route_optimizer.optimize_route(route_id, apply=False)
+        self.assertEqual(preview['ordered_ids'], [far, near, start, no_gps])
+        self.assertEqual(preview['missing_gps'], [no_gps])
+        self.assertEqual([p['id'] for p in db_manager.get_elderly_by_route(route_id)], [no_gps, far, start, near])
+        print("   ✅ 處理正確")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
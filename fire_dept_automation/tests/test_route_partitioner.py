@@ -0,0 +1,190 @@
+"""
+送餐路線自動分區測試
+測試範圍：容量限制、地理分群、建議異動清單、寫回資料庫、大量長者、無座標長者佔用容量、
+          站數下限、預估時間平均
+"""
+import unittest
+import sys
+import os
+import numpy as np
+
+# 設定路徑以便導入模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import db_manager
+from temp_db import TempDBTestCase
+import route_partitioner
+
+# 兩個相距約 10 公里的聚落
+WEST = (22.7583, 121.1000)
+EAST = (22.7583, 121.2000)
+
+
+def cluster(center, n, rng, spread=0.003):
+    return center[0] + rng.normal(0, spread, n), center[1] + rng.normal(0, spread, n)
+
+
+class TestRoutePartitioner(TempDBTestCase):
+
+    DB_FILE = "test_partition.db"
+
+    def test_1_capacity_respected(self):
+        """測試 1: 每區站數不超過容量，且所有點都有分區"""
+        print("\n🧪 測試 1: 容量限制...")
+        rng = np.random.default_rng(0)
+        # 70% 的點集中在西側，容量限制迫使部分點分到其他區
+        lats = np.concatenate([cluster(WEST, 70, rng)[0], cluster(EAST, 30, rng)[0]])
+        lons = np.concatenate([cluster(WEST, 70, rng)[1], cluster(EAST, 30, rng)[1]])
+        points = route_partitioner.project_km(lats, lons)
+        labels, _ = route_partitioner.partition(points, 4, capacity=26)
+        counts = np.bincount(labels, minlength=4)
+        self.assertEqual(counts.sum(), 100)
+        self.assertLessEqual(counts.max(), 26)
+        with self.assertRaises(ValueError):
+            route_partitioner.partition(points, 4, capacity=20)
+        print(f"   ✅ 各區站數: {counts.tolist()}")
+
+    def test_2_geographic_clusters(self):
+        """測試 2: 兩個聚落分成兩區時，同一聚落在同一區"""
+        print("\n🧪 測試 2: 地理分群...")
+        rng = np.random.default_rng(1)
+        w_lat, w_lon = cluster(WEST, 40, rng)
+        e_lat, e_lon = cluster(EAST, 40, rng)
+        points = route_partitioner.project_km(np.concatenate([w_lat, e_lat]), np.concatenate([w_lon, e_lon]))
+        labels, _ = route_partitioner.partition(points, 2)
+        self.assertEqual(len(set(labels[:40])), 1)
+        self.assertEqual(len(set(labels[40:])), 1)
+        self.assertNotEqual(labels[0], labels[40])
+        print("   ✅ 分群正確")
+
+    def test_3_propose_diff(self):
+        """測試 3: 路線成員混雜時，建議異動只包含需要搬移的長者，且路線維持原本區域"""
+        print("\n🧪 測試 3: 建議異動...")
+        rng = np.random.default_rng(2)
+        route_w = db_manager.create_delivery_route("西區")
+        route_e = db_manager.create_delivery_route("東區")
+        w_lat, w_lon = cluster(WEST, 10, rng)
+        e_lat, e_lon = cluster(EAST, 10, rng)
+        misplaced = []
+        for i in range(10):
+            db_manager.create_elderly_profile(f"西{i}", "臺東市", "", w_lat[i], w_lon[i], route_id=route_w)
+            # 東側前兩位被誤編到西區
+            elderly_id = db_manager.create_elderly_profile(f"東{i}", "臺東市", "", e_lat[i], e_lon[i],
+                                                           route_id=route_w if i < 2 else route_e)
+            if i < 2:
+                misplaced.append(elderly_id)
+        db_manager.create_elderly_profile("無座標", "臺東市", "", route_id=route_w)
+
+        proposal = route_partitioner.propose_routes()
+        self.assertEqual(sorted(c['elderly_id'] for c in proposal['changes']), misplaced)
+        self.assertTrue(all(c['proposed_route_id'] == route_e for c in proposal['changes']))
+        self.assertEqual(len(proposal['missing_gps']), 1)
+        summary = {s['route_id']: s for s in proposal['summary']}
+        self.assertEqual((summary[route_w]['stops_before'], summary[route_w]['stops_after']), (12, 10))
+        self.assertEqual(summary[route_e]['stops_after'], 10)
+        self.assertLess(summary[route_w]['minutes_after'], summary[route_w]['minutes_before'])
+        print("   ✅ 異動清單正確")
+
+    def test_4_apply_changes(self):
+        """測試 4: 套用後更新 route_id、站點數與預估時間"""
+        print("\n🧪 測試 4: 寫回資料庫...")
+        rng = np.random.default_rng(3)
+        route_a = db_manager.create_delivery_route("路線A")
+        route_b = db_manager.create_delivery_route("路線B")
+        w_lat, w_lon = cluster(WEST, 6, rng)
+        e_lat, e_lon = cluster(EAST, 6, rng)
+        for i in range(6):
+            db_manager.create_elderly_profile(f"西{i}", "臺東市", "", w_lat[i], w_lon[i], route_id=route_a)
+            db_manager.create_elderly_profile(f"東{i}", "臺東市", "", e_lat[i], e_lon[i], route_id=route_a)
+
+        proposal = route_partitioner.propose_routes()
+        self.assertEqual(len(proposal['changes']), 6)
+        route_partitioner.apply_route_changes(proposal['changes'])
+        self.assertEqual(len(db_manager.get_elderly_by_route(route_a)), 6)
+        self.assertEqual(len(db_manager.get_elderly_by_route(route_b)), 6)
+        routes = {r['id']: r for r in db_manager.get_all_routes()}
+        self.assertEqual(routes[route_b]['num_stops'], 6)
+        self.assertEqual([p['sequence'] for p in db_manager.get_elderly_by_route(route_b)], list(range(1, 7)))
+        self.assertEqual(route_partitioner.propose_routes()['changes'], [])
+        print("   ✅ 已寫回")
+
+    def test_5_scales_to_thousands(self):
+        """測試 5: 5000 位長者 / 25 條路線完成分區 (計算時間見 tests/bench_route_partitioner.py)"""
+        print("\n🧪 測試 5: 大量長者...")
+        rng = np.random.default_rng(4)
+        lats = 22.75 + rng.random(5000) * 0.15
+        lons = 121.05 + rng.random(5000) * 0.15
+        points = route_partitioner.project_km(lats, lons)
+        labels, _ = route_partitioner.partition(points, 25)
+        counts = np.bincount(labels, minlength=25)
+        self.assertEqual(counts.sum(), 5000)
+        self.assertLessEqual(counts.max(), 220)
+        print(f"   ✅ 各區站數 {counts.min()} ~ {counts.max()}")
+
+    def test_6_pinned_members_use_capacity(self):
+        """測試 6: 留在原路線的無座標長者佔用該路線容量，整體站數仍平均"""
+        print("\n🧪 測試 6: 無座標長者佔用容量...")
+        rng = np.random.default_rng(5)
+        route_w = db_manager.create_delivery_route("西區")
+        route_e = db_manager.create_delivery_route("東區")
+        # 全部 20 位有座標的長者都在西側聚落，西區另有 4 位無座標長者
+        w_lat, w_lon = cluster(WEST, 20, rng)
+        for i in range(20):
+            db_manager.create_elderly_profile(f"西{i}", "臺東市", "", w_lat[i], w_lon[i],
+                                              route_id=route_w if i < 10 else route_e)
+        for i in range(4):
+            db_manager.create_elderly_profile(f"無座標{i}", "臺東市", "", route_id=route_w)
+
+        proposal = route_partitioner.propose_routes(slack=0.0)
+        summary = {s['route_id']: s for s in proposal['summary']}
+        self.assertEqual(summary[route_w]['pinned'], 4)
+        self.assertEqual(summary[route_e]['pinned'], 0)
+        # 總站數 24、每條路線上限 12：西區有座標的長者最多 8 位
+        self.assertEqual(summary[route_w]['stops_after'], 8)
+        self.assertEqual(summary[route_e]['stops_after'], 12)
+        self.assertEqual(len(proposal['missing_gps']), 4)
+        print("   ✅ 容量已扣除")
+
+    def test_7_minimum_stops(self):
+        """測試 7: 5000 位長者 / 20 條路線，每條路線站數都在平均的 ±10% 內"""
+        print("\n🧪 測試 7: 站數下限...")
+        rng = np.random.default_rng(4)
+        lats = 22.75 + rng.random(5000) * 0.15
+        lons = 121.05 + rng.random(5000) * 0.15
+        labels, _ = route_partitioner.partition(route_partitioner.project_km(lats, lons), 20)
+        counts = np.bincount(labels, minlength=20)
+        self.assertEqual((route_partitioner.default_minimum(5000, 20), route_partitioner.default_capacity(5000, 20)),
+                         (225, 275))
+        self.assertGreaterEqual(counts.min(), 225)
+        self.assertLessEqual(counts.max(), 275)
+        print(f"   ✅ 站數 {counts.min()} ~ {counts.max()}")
+
+    def test_8_minutes_even_out(self):
+        """測試 8: 原本大小懸殊的路線重新分區後，站數與預估時間都接近"""
+        print("\n🧪 測試 8: 預估時間平均...")
+        rng = np.random.default_rng(6)
+        route_ids = [db_manager.create_delivery_route(f"路線{i}") for i in range(6)]
+        members = np.repeat(np.arange(6), [120, 60, 40, 40, 20, 20])
+        rng.shuffle(members)
+        lats = 22.75 + rng.random(300) * 0.1
+        lons = 121.05 + rng.random(300) * 0.1
+        for i in range(300):
+            db_manager.create_elderly_profile(f"長者{i}", "臺東市", "", lats[i], lons[i],
+                                              route_id=route_ids[members[i]])
+
+        summary = route_partitioner.propose_routes()['summary']
+        stops = [s['stops_after'] for s in summary]
+        before = [s['minutes_before'] for s in summary]
+        after = [s['minutes_after'] for s in summary]
+        self.assertGreaterEqual(min(stops), 45)
+        self.assertLessEqual(max(stops), 55)
+        self.assertLess(max(after) / min(after), 1.5)
+        self.assertLess(max(after) - min(after), (max(before) - min(before)) / 4)
+        print(f"   ✅ 預估時間 {min(after):.0f} ~ {max(after):.0f} 分鐘 (原 {min(before):.0f} ~ {max(before):.0f})")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
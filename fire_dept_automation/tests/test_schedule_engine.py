@@ -0,0 +1,131 @@
+"""
+固定排班產生器測試 (schedule_engine)
+測試範圍：規則展開 (星期 / 假日 / 預設志工)、批次產生與彙總、重複產生不重複建立、重複任務合併遷移、一年份任務
+"""
+import unittest
+import sys
+import os
+import datetime
+
+# 設定路徑以便導入模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import db_manager
+from temp_db import TempDBTestCase
+import schedule_engine
+
+MONDAY = datetime.date(2030, 1, 7)
+
+
+class TestScheduleEngine(TempDBTestCase):
+
+    DB_FILE = "test_schedule.db"
+
+    def setUp(self):
+        """清空送餐資料，建立兩條路線 (各 2 位長者) 與排班規則"""
+        super().setUp()
+        self.route_a = db_manager.create_delivery_route("建和線")
+        self.route_b = db_manager.create_delivery_route("溫泉線")
+        for route_id in (self.route_a, self.route_b):
+            for i in range(2):
+                db_manager.create_elderly_profile(f"長者{route_id}-{i}", "臺東市", "", route_id=route_id, sequence=i)
+        db_manager.save_route_schedule(self.route_a, "0,2,4", skip_holidays=True, default_volunteer="volunteer1")
+        db_manager.save_route_schedule(self.route_b, "5", skip_holidays=False)
+
+    def tasks_between(self, start, end):
+        return db_manager.get_tasks_by_date_range(start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
+
+    def test_1_expand_rules(self):
+        """測試 1: 依星期展開、假日停送 (只影響設定停送的路線)、帶入預設志工"""
+        print("\n🧪 測試 1: 規則展開...")
+        rules = [dict(r) for r in db_manager.get_route_schedules()]
+        holidays = {"2030-01-09", "2030-01-12"}  # 週三、週六
+        tasks = schedule_engine.expand_rules(rules, MONDAY, MONDAY + datetime.timedelta(days=13), holidays)
+        route_a = [t for t in tasks if t[1] == self.route_a]
+        route_b = [t for t in tasks if t[1] == self.route_b]
+        self.assertEqual([t[0] for t in route_a],
+                         ["2030-01-07", "2030-01-11", "2030-01-14", "2030-01-16", "2030-01-18"])
+        self.assertTrue(all(t[2] == "volunteer1" for t in route_a))
+        self.assertEqual([t[0] for t in route_b], ["2030-01-12", "2030-01-19"])
+        self.assertTrue(all(t[2] is None for t in route_b))
+        with self.assertRaises(ValueError):
+            schedule_engine.parse_weekdays("1,7")
+        print("   ✅ 展開正確")
+
+    def test_2_generate_with_summaries(self):
+        """測試 2: 產生任務並同時建立彙總列 (應送站數)；可只產生指定路線"""
+        print("\n🧪 測試 2: 批次產生...")
+        db_manager.save_holidays(schedule_engine.parse_holiday_lines("2030/01/09 測試假日\n無效行"))
+        result = schedule_engine.generate_tasks(MONDAY, 14, route_ids=[self.route_a])
+        self.assertEqual((result['planned'], result['created']), (5, 5))
+
+        tasks = self.tasks_between(MONDAY, MONDAY + datetime.timedelta(days=13))
+        self.assertEqual({t['route_id'] for t in tasks}, {self.route_a})
+        summaries = db_manager.get_task_summaries([t['id'] for t in tasks])
+        self.assertTrue(all(s['planned_stops'] == 2 and s['volunteer'] == "volunteer1" for s in summaries.values()))
+        print("   ✅ 任務與彙總已建立")
+
+    def test_3_idempotent(self):
+        """測試 3: 重複產生不重複建立，已釋出的任務維持原狀；create_daily_task 回傳既有任務"""
+        print("\n🧪 測試 3: 重複產生...")
+        first = schedule_engine.generate_tasks(MONDAY, 28)
+        task = self.tasks_between(MONDAY, MONDAY)[0]
+        db_manager.release_task(task['id'])
+
+        second = schedule_engine.generate_tasks(MONDAY, 35)
+        self.assertEqual(first['created'], 16)
+        self.assertEqual((second['planned'], second['created']), (20, 4))
+        self.assertIsNone(self.tasks_between(MONDAY, MONDAY)[0]['assigned_volunteer'])
+
+        date = MONDAY.strftime("%Y-%m-%d")
+        self.assertEqual(db_manager.create_daily_task(date, self.route_a, "volunteer2"), task['id'])
+        self.assertEqual(db_manager.insert_daily_tasks([(date, self.route_a, None)]), 0)
+        print("   ✅ 重複產生不重複建立")
+
+    def test_4_migration_merges_duplicates(self):
+        """測試 4: 舊資料庫的重複任務在建立唯一索引前合併，送達紀錄移到保留的任務"""
+        print("\n🧪 測試 4: 重複任務合併...")
+        date = MONDAY.strftime("%Y-%m-%d")
+        conn = db_manager.get_connection()
+        conn.execute("DROP INDEX idx_daily_tasks_route_date")
+        c = conn.cursor()
+        ids = []
+        for volunteer in (None, "volunteer2"):
+            c.execute("INSERT INTO daily_tasks (date, route_id, assigned_volunteer) VALUES (?, ?, ?)",
+                      (date, self.route_a, volunteer))
+            ids.append(c.lastrowid)
+        elderly_id = c.execute("SELECT id FROM elderly_profiles WHERE route_id = ?", (self.route_a,)).fetchone()[0]
+        c.execute("INSERT INTO delivery_records (task_id, elderly_id) VALUES (?, ?)", (ids[1], elderly_id))
+        conn.commit()
+        conn.close()
+
+        db_manager.migrate_database()
+        tasks = self.tasks_between(MONDAY, MONDAY)
+        self.assertEqual([(t['id'], t['assigned_volunteer']) for t in tasks], [(ids[0], "volunteer2")])
+        self.assertEqual(len(db_manager.get_delivery_records_by_task(ids[0])), 1)
+        self.assertEqual(db_manager.get_task_summaries([ids[0]])[ids[0]]['visited_stops'], 1)
+        self.assertEqual(db_manager.create_daily_task(date, self.route_a), ids[0])
+        print("   ✅ 已合併並建立唯一索引")
+
+    def test_5_year_for_hundreds_of_routes(self):
+        """測試 5: 300 條路線 x 一年 (約 9 萬筆任務) 一次產生 (計算時間見 tests/bench_schedule_engine.py)"""
+        print("\n🧪 測試 5: 一年份任務...")
+        conn = db_manager.get_connection()
+        c = conn.cursor()
+        for i in range(300):
+            c.execute("INSERT INTO delivery_routes (route_name) VALUES (?)", (f"路線{i}",))
+            c.execute("INSERT INTO route_schedules (route_id, weekdays) VALUES (?, '0,1,2,3,4,5')", (c.lastrowid,))
+        conn.commit()
+        conn.close()
+
+        result = schedule_engine.generate_tasks(MONDAY, 365)
+        self.assertGreater(result['created'], 90000)
+        self.assertEqual(schedule_engine.generate_tasks(MONDAY, 365)['created'], 0)
+        print(f"   ✅ {result['created']} 筆")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -4,12 +4,15 @@ import urllib.request
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import pandas as pd
 import fitz  # pymupdf
 from PIL import Image
 import subprocess
-import re
 import config_loader as cfg
+import ocr_parser
+import registry_store
+import equipment_vocab
+import pdf_text_layer
+import photo_pipeline
 
 # 簡繁轉換工具
 try:
@@ -452,7 +455,6 @@ def download_lang_data():
         except:
             pass # 英文非必要，失敗就算了
 
-import shutil
 import uuid
 
 def get_default_tesseract_path():
@@ -481,18 +483,22 @@ def render_equipment_diff(sys_set, ocr_set):
     渲染消防設備比對結果（視覺化 Diff View）
     
     Args:
-        sys_set: 系統列管設備集合
-        ocr_set: 申報設備集合
+        sys_set: 系統列管設備 (集合、頓號分隔字串或 equipment_vocab 位元遮罩)
+        ocr_set: 申報設備 (集合、頓號分隔字串或 equipment_vocab 位元遮罩)
     
     Returns:
         HTML 字串，包含顏色標記的比對結果
     """
+    sys_mask = equipment_vocab.as_mask(sys_set)
+    ocr_mask = equipment_vocab.as_mask(ocr_set)
+    missing, extra = equipment_vocab.diff(sys_mask, ocr_mask)
+
     html = "<div style='line-height: 2.5;'>"
     
     # 1. 顯示系統有的 (漏報的標紅，吻合的標綠)
     html += "<strong>系統列管：</strong><br>"
-    for item in sorted(sys_set):
-        if item in ocr_set:
+    for item in sorted(equipment_vocab.decode(sys_mask)):
+        if not equipment_vocab.contains(missing, item):
             # 吻合 (綠色底)
             html += f"<span style='background-color:#d1fae5; color:#065f46; padding:4px 8px; border-radius:4px; margin-right:5px; margin-bottom:5px; display:inline-block;'>✅ {item}</span>"
         else:
@@ -500,8 +506,8 @@ def render_equipment_diff(sys_set, ocr_set):
             html += f"<span style='background-color:#fee2e2; color:#991b1b; padding:4px 8px; border-radius:4px; margin-right:5px; margin-bottom:5px; display:inline-block;'>❌ {item} (漏報)</span>"
     
     html += "<br><br><strong>申報資料：</strong><br>"
-    for item in sorted(ocr_set):
-        if item in sys_set:
+    for item in sorted(equipment_vocab.decode(ocr_mask)):
+        if not equipment_vocab.contains(extra, item):
             # 吻合 (綠色底)
             html += f"<span style='background-color:#d1fae5; color:#065f46; padding:4px 8px; border-radius:4px; margin-right:5px; margin-bottom:5px; display:inline-block;'>✅ {item}</span>"
         else:
@@ -513,37 +519,20 @@ def render_equipment_diff(sys_set, ocr_set):
 
 @st.cache_data
 def load_system_data(excel_path):
-    """讀取系統列管資料 Excel (使用複製策略以避免檔案鎖定)"""
+    """
+    讀取系統列管資料 Excel
+
+    第一次讀取後轉存於 registry_store 的 SQLite 快取 (以檔案 mtime / 雜湊判斷是否更新)，
+    之後即使 st.cache_data 被清除也不需重新解析 Excel。
+    """
     if excel_path is None or not os.path.exists(excel_path):
         return None
         
-    temp_path = f"temp_system_data_{uuid.uuid4().hex[:8]}.xls"
-    
     try:
-        # 1. 複製檔案到暫存檔
-        shutil.copy2(excel_path, temp_path)
-        
-        # 2. 讀取暫存檔
-        if excel_path.endswith('.xls'):
-            df = pd.read_excel(temp_path, header=1, engine='xlrd')
-        else:
-            df = pd.read_excel(temp_path, header=1)
-            
-        # 清理欄位名稱 (去除前後空白、換行符號)
-        df.columns = df.columns.astype(str).str.strip().str.replace('\n', '').str.replace('\r', '')
-        return df
-        
+        return registry_store.load_registry(excel_path)
     except Exception as e:
         st.error(f"讀取 Excel 失敗: {e}")
         return None
-        
-    finally:
-        # 3. 刪除暫存檔
-        if os.path.exists(temp_path):
-            try:
-                os.remove(temp_path)
-            except:
-                pass # 刪除失敗不影響流程
 
 def pdf_to_images(pdf_file, dpi=300):
     """將 PDF 轉為圖片列表 (每一頁一張圖)"""
@@ -568,6 +557,15 @@ def pdf_to_images(pdf_file, dpi=300):
         images.append(img)
     return images
 
+def extract_pdf_text_layers(pdf_file):
+    """
+    擷取 PDF 每頁的文字層 (數位 PDF 可直接使用，不需 OCR)
+
+    Returns:
+        list: 每頁的文字，掃描頁或文字層不可信的頁面為 None
+    """
+    return pdf_text_layer.extract_text_layers(pdf_file)
+
 def perform_ocr(image, tesseract_cmd):
     """對圖片進行 OCR 辨識"""
     temp_img_path = os.path.join(os.getcwd(), "temp_ocr_image.png")
@@ -619,125 +617,19 @@ def perform_ocr(image, tesseract_cmd):
 
 def normalize_equipment_str(text):
     """將輸入的文字進行模糊比對，只保留標準設備清單中的項目"""
-    if not text or not isinstance(text, str):
-        return ""
-    
-    found_items = []
-    clean_text = text.replace(" ", "").replace("　", "").replace("\n", "")
-    
-    for item in VALID_EQUIPMENT_LIST:
-        if item in clean_text:
-            found_items.append(item)
-            
-    return "、".join(found_items)
+    return ocr_parser.normalize_equipment_str(text, VALID_EQUIPMENT_LIST)
 
 def extract_info_from_ocr(text, pages_text_list=None):
-    """從 OCR 文字中提取關鍵資訊"""
-    info = {}
+    """
+    從 OCR 文字中提取關鍵資訊 (共用解析器，見 ocr_parser.py)
     
-    # --- 第一頁解析 (基本資料) ---
-    if text:
-        lines = text.split('\n')
-        for line in lines:
-            clean_line = line.replace(" ", "").replace("　", "").strip()
-            if not clean_line: continue
-            
-            # 1. 管理權人
-            if "管理權人" in clean_line:
-                match = re.search(r"管理權人[:：|](.*)", clean_line)
-                if match:
-                    val = match.group(1)
-                    if "通訊處" not in val:
-                        info['管理權人'] = val
-            
-            # 備用：找 "姓名"
-            if "姓名" in clean_line and "檢修人員" not in clean_line and "管理權人" not in info:
-                 match = re.search(r"姓名[:：|](.*)", clean_line)
-                 if match:
-                     val = match.group(1)
-                     if "身分證" in val:
-                         val = val.split("身分證")[0]
-                     info['管理權人'] = val
-            
-            # 2. 地址
-            if "地址" in clean_line:
-                 if "場所地址" in clean_line:
-                     match = re.search(r"場所地址[:：|](.*)", clean_line)
-                     if match:
-                         info['場所地址'] = match.group(1)
-                 elif "地址" in clean_line and '場所地址' not in info:
-                     match = re.search(r"地址[:：|](.*)", clean_line)
-                     if match:
-                         info['場所地址'] = match.group(1)
-
-            # 3. 電話
-            if "電話" in clean_line:
-                if '場所電話' not in info:
-                    match = re.search(r"電話[:：|]([\d\-\(\)\s]+)", clean_line)
-                    if match:
-                        val = match.group(1).strip()
-                        if any(char.isdigit() for char in val):
-                            info['場所電話'] = val
-                     
-            # 4. 場所名稱
-            if "場所名稱" in clean_line:
-                match = re.search(r"場所名稱[:：|](.*)", clean_line)
-                if match:
-                    info['場所名稱'] = match.group(1)
-
-            # 5. 消防設備種類 (第一頁備用)
-            if not pages_text_list:
-                if "申報項目" in clean_line or "檢修項目" in clean_line:
-                     match = re.search(r"(申報項目|檢修項目)[:：|](.*)", clean_line)
-                     if match:
-                         info['消防設備種類'] = normalize_equipment_str(match.group(2))
-
-    # --- 多頁解析 (尋找消防設備種類) ---
-    if pages_text_list and isinstance(pages_text_list, list):
-        target_page_text = None
-        
-        for page_text in pages_text_list:
-            if "消防安全設備檢修申報書目錄" in page_text.replace(" ", ""):
-                target_page_text = page_text
-                break
-        
-        if not target_page_text and len(pages_text_list) > 1:
-            target_page_text = pages_text_list[1]
-            
-        if target_page_text:
-            # 解析有勾選的設備項目
-            checked_equipment = []
-            
-            # 擴充的勾選符號清單（包含各種可能的打勾標記）
-            checked_markers = ['✓', '☑', 'v', 'V', '√', '✔', '☒', '▣', '■', '●', '✅']
-            # 空白方框符號（這些代表未勾選，應該排除）
-            unchecked_markers = ['☐', '□', '▢', '▫', '▪']
-            
-            # 將文字按行分割
-            lines = target_page_text.split('\n')
-            
-            for line in lines:
-                # 【重要】先檢查是否包含空白方框 - 如果有，跳過這一行
-                if any(unchecked in line for unchecked in unchecked_markers):
-                    continue
-                
-                # 檢查是否包含勾選符號
-                if any(marker in line for marker in checked_markers):
-                    # 去除空格和特殊符號後提取設備名稱
-                    clean_line = line.replace(" ", "").replace("　", "")
-                    
-                    # 使用 normalize_equipment_str 從這一行提取標準設備名稱
-                    for equipment in VALID_EQUIPMENT_LIST:
-                        if equipment in clean_line or equipment.replace("設備", "") in clean_line:
-                            if equipment not in checked_equipment:
-                                checked_equipment.append(equipment)
-                                break
-            
-            # 轉換為字串格式
-            if checked_equipment:
-                info['消防設備種類'] = "、".join(checked_equipment)
-                  
-    return info
+    目錄頁逐行判斷勾選符號，只列出已勾選的設備。
+    """
+    return ocr_parser.extract_info_from_ocr(
+        text, pages_text_list,
+        equipment_list=VALID_EQUIPMENT_LIST,
+        toc_mode=ocr_parser.TOC_MODE_CHECKED
+    )
 
 def save_delivery_photo(uploaded_file, task_id):
     """
@@ -768,67 +660,19 @@ def save_delivery_photo(uploaded_file, task_id):
 def save_proof_photo(file_buffer, task_id):
     """
     儲存送達證明照片（強制拍照模式）
-    - 按月份分類資料夾
-    - 壓縮圖片至 800px 寬
+    - 原始檔寫入暫存區後立即回傳，轉正、壓縮至 800px 與縮圖由 photo_pipeline 背景處理
+    - 以內容雜湊命名，同一張照片重複上傳只存一份
     
     Args:
         file_buffer: Streamlit camera_input 或 file_uploader 的 buffer
-        task_id: 任務 ID
+        task_id: 任務 ID (檔名改用內容雜湊，保留參數以相容既有呼叫)
         
     Returns:
         str: 儲存的檔案相對路徑
     """
     if file_buffer is None:
         return None
-    
-    import datetime
-    from PIL import Image
-    import io
-    
-    # 按月份建立資料夾
-    now = datetime.datetime.now()
-    year_month = now.strftime("%Y%m")
-    upload_dir = f"uploads/delivery_proofs/{year_month}"
-    
-    if not os.path.exists(upload_dir):
-        os.makedirs(upload_dir)
-    
-    # 生成檔名
-    timestamp = now.strftime("%Y%m%d_%H%M%S")
-    filename = f"{task_id}_{timestamp}.jpg"
-    file_path = os.path.join(upload_dir, filename)
-    
-    try:
-        # 開啟圖片
-        image = Image.open(file_buffer)
-        
-        # 壓縮圖片（寬度 800px）
-        if image.width > 800:
-            ratio = 800 / image.width
-            new_height = int(image.height * ratio)
-            image = image.resize((800, new_height), Image.Resampling.LANCZOS)
-        
-        # 轉換為 RGB（避免 RGBA 錯誤）
-        if image.mode in ("RGBA", "P"):
-            image = image.convert("RGB")
-        
-        # 儲存圖片
-        image.save(file_path, "JPEG", quality=85, optimize=True)
-        
-        return file_path
-        
-    except Exception as e:
-        print(f"圖片處理失敗: {e}")
-        # 如果壓縮失敗，直接儲存原圖
-        with open(file_path, "wb") as f:
-            f.write(file_buffer.getbuffer())
-        return file_path
-    except Exception as e:
-        # 如果失敗，嘗試清理
-        if os.path.exists(pdf_path):
-            try: os.remove(pdf_path)
-            except: pass
-        raise e
+    return photo_pipeline.get_pipeline().submit(file_buffer)
 
 def get_libreoffice_path():
     """自動偵測 LibreOffice 執行檔路徑"""
@@ -846,38 +690,17 @@ def get_libreoffice_path():
     return None
 
 def convert_doc_to_pdf_libreoffice(doc_path, libreoffice_path):
-    """使用 LibreOffice 將 Word 轉 PDF (Headless 模式，不開啟視窗)"""
-    import subprocess
-    import os
-    
-    doc_path = os.path.abspath(doc_path)
-    output_dir = os.path.dirname(doc_path)
-    
-    # LibreOffice 的 --convert-to pdf 會將檔案輸出到 --outdir 指定的目錄
-    # 檔名會自動變成 [原檔名].pdf
-    
-    cmd = [
-        libreoffice_path,
-        "--headless",
-        "--convert-to", "pdf",
-        "--outdir", output_dir,
-        doc_path
-    ]
-    
+    """
+    使用 LibreOffice 將 Word 轉 PDF (Headless 模式，不開啟視窗)
+
+    透過常駐的轉檔服務 (doc_converter) 執行：同一份文件只轉一次，
+    回傳的 PDF 為獨立暫存檔，呼叫端用完可刪除。
+    """
+    import doc_converter
     try:
-        # 執行轉換
-        subprocess.run(cmd, check=True, capture_output=True, timeout=120)
-        
-        # 預期產生的 PDF 路徑
-        pdf_path = os.path.splitext(doc_path)[0] + ".pdf"
-        
-        if os.path.exists(pdf_path):
-            return pdf_path
-        else:
-            raise Exception("LibreOffice 轉換失敗：未產生 PDF 檔案")
-            
-    except subprocess.CalledProcessError as e:
-        raise Exception(f"LibreOffice 執行錯誤: {e.stderr.decode('utf-8', errors='ignore')}")
+        return doc_converter.get_converter(libreoffice_path).convert(doc_path)
+    except doc_converter.ConversionError:
+        raise
     except Exception as e:
         raise Exception(f"LibreOffice 轉換發生例外: {str(e)}")
 